@@ -8,6 +8,10 @@ Configuración de ASGI para el proyecto reconocimiento_facial.
 
 Expone el llamable ASGI como una variable a nivel de módulo llamada ``application``.
 
+La vista en vivo del reconocimiento (video MJPEG y eventos de asistencia) usa vistas
+asíncronas y respuestas continuas, por lo que debe servirse con un servidor ASGI, por ejemplo:
+    uvicorn reconocimiento_facial.asgi:application
+
 Para más información sobre este archivo, vea
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -15,6 +15,7 @@ Para la lista completa de configuraciones y sus valores, vea
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Construir rutas dentro del proyecto como esto: BASE_DIR / 'subdir'.
@@ -90,6 +91,18 @@ DATABASES = {
     }
 }
 
+# Con la variable de entorno RECONOCIMIENTO_BD=sqlite se usa SQLite en lugar de MySQL (por
+# ejemplo, para correr los benchmarks en un equipo sin servidor de base de datos). El archivo
+# se indica con RECONOCIMIENTO_SQLITE; la primera vez hay que crear las tablas con
+# 'python manage.py migrate'.
+if os.environ.get('RECONOCIMIENTO_BD') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('RECONOCIMIENTO_SQLITE', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+
 # Validación de contraseña
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -134,3 +147,126 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+
+# Reconocimiento facial
+# Configuración propia de la aplicación 'usuarios'.
+
+# Número de procesos usados para desencriptar y decodificar el dataset al entrenar.
+# None usa todos los núcleos disponibles.
+ENTRENAMIENTO_PROCESOS = None
+
+# Minutos sin señales de vida tras los cuales un entrenamiento en segundo plano se da por
+# abandonado y se permite iniciar otro.
+ENTRENAMIENTO_MINUTOS_ABANDONO = 5
+
+# Detector de rostros usado en la captura y el reconocimiento.
+#   BACKEND: 'haar' (original), 'lbp' (requiere CASCADA_LBP) o 'yunet' (requiere MODELO_YUNET, archivo ONNX).
+#   ESCALA: factor para reducir el fotograma antes de detectar (por ejemplo 0.5 = mitad de resolución).
+#   SCALE_FACTOR, MIN_NEIGHBORS y MIN_SIZE: parámetros de detectMultiScale; MIN_SIZE se indica
+#   en píxeles del fotograma original ((0, 0) = sin mínimo).
+DETECTOR_ROSTROS = {
+    'BACKEND': 'haar',
+    'ESCALA': 1.0,
+    'SCALE_FACTOR': 1.3,
+    'MIN_NEIGHBORS': 5,
+    'MIN_SIZE': (0, 0),
+}
+
+# Parámetros del reconocimiento y la confirmación de asistencia.
+#   TIEMPO_CONFIRMACION: segundos que un rostro debe reconocerse antes de registrar su asistencia.
+#   UMBRAL_CONFIANZA: distancia máxima de LBPH para aceptar una predicción (menor es más estricto).
+#   PREDECIR_CADA: cada cuántos fotogramas se vuelve a predecir un rostro que ya se está siguiendo.
+#   COINCIDENCIAS_LOTE: rostros de un mismo lote enviado por un cliente en que debe reconocerse a
+#       un usuario para registrar su asistencia.
+#   MAX_IMAGENES_LOTE: máximo de imágenes aceptadas en un lote.
+#   FUENTE_TRANSMISION: cámara (número) o URL que usa la vista en vivo.
+#   CALIDAD_JPEG: calidad de los fotogramas transmitidos a los navegadores.
+#   SEGUNDOS_SIN_ESPECTADORES: la transmisión en vivo se detiene tras este tiempo sin espectadores.
+RECONOCIMIENTO = {
+    'TIEMPO_CONFIRMACION': 2,
+    'UMBRAL_CONFIANZA': 40,
+    'PREDECIR_CADA': 5,
+    'COINCIDENCIAS_LOTE': 2,
+    'MAX_IMAGENES_LOTE': 32,
+    'FUENTE_TRANSMISION': 0,
+    'CALIDAD_JPEG': 80,
+    'SEGUNDOS_SIN_ESPECTADORES': 30,
+}
+
+# Reconocedor de rostros.
+#   BACKEND: 'lbph' (original, OpenCV), 'lbp' (histogramas LBP por usuario comparados con un
+#       producto de matrices) o 'sface' (red SFace de OpenCV, requiere MODELO_SFACE, archivo ONNX).
+#       Al cambiarlo hay que volver a entrenar el modelo.
+#   GRILLA_LBP: celdas por lado del histograma LBP del backend 'lbp'.
+#   UMBRAL_EMBEDDINGS: distancia máxima (0 a 200) para aceptar una predicción con 'lbp' o 'sface';
+#       reemplaza a RECONOCIMIENTO['UMBRAL_CONFIANZA'], que corresponde a la escala de LBPH.
+#   FORMATO_LBPH: 'binario' (modelo_lbph.bin, se abre mapeado en memoria y lo comparten todos los
+#       procesos) o 'yml' (modelo_lbph.yml de OpenCV). Un .yml existente se convierte con
+#       'python manage.py exportar_modelo_lbph'.
+#   PRECISION_LBPH: 'float32' (mismas distancias que OpenCV) o 'float16' (la mitad de espacio,
+#       distancias con diferencias del orden de 0,01%).
+RECONOCEDOR = {
+    'BACKEND': 'lbph',
+    'GRILLA_LBP': 8,
+    'MODELO_SFACE': None,
+    'UMBRAL_EMBEDDINGS': 35,
+    'FORMATO_LBPH': 'binario',
+    'PRECISION_LBPH': 'float32',
+}
+
+# Control de calidad de las capturas al enrolar un usuario.
+#   TOTAL_CAPTURAS: rostros que se guardan por usuario.
+#   TAMANO_MINIMO: lado mínimo (en píxeles) del rostro detectado.
+#   BRILLO_MINIMO y BRILLO_MAXIMO: rango aceptado del promedio de gris (0 a 255).
+#   NITIDEZ_MINIMA: varianza mínima del Laplaciano; valores bajos indican una imagen borrosa.
+#   DISTANCIA_HASH: bits distintos mínimos (de 64) respecto de las capturas recientes; menos
+#       se considera un duplicado.
+#   HASHES_RECIENTES: cantidad de capturas aceptadas con que se compara cada rostro nuevo.
+CAPTURA = {
+    'TOTAL_CAPTURAS': 100,
+    'TAMANO_MINIMO': 80,
+    'BRILLO_MINIMO': 40,
+    'BRILLO_MAXIMO': 220,
+    'NITIDEZ_MINIMA': 60.0,
+    'DISTANCIA_HASH': 6,
+    'HASHES_RECIENTES': 20,
+}
+
+# Registro de asistencia de los kioscos.
+#   DIARIO: anota cada asistencia en un diario local (SQLite en media/diario/) y la copia a la
+#       base de datos en segundo plano, para que el reconocimiento no espere a la base de datos.
+#       Con False se guarda directamente, por lotes.
+#   INTERVALO_SINCRONIZACION: segundos máximos entre revisiones del diario.
+#   LOTE_SINCRONIZACION: asistencias enviadas por INSERT.
+#   ESPERA_MAXIMA: segundos máximos entre reintentos cuando la base de datos no responde.
+#   DIAS_CONSERVAR: días que se guardan en el diario las asistencias ya sincronizadas.
+ASISTENCIA = {
+    'DIARIO': True,
+    'INTERVALO_SINCRONIZACION': 1.0,
+    'LOTE_SINCRONIZACION': 500,
+    'ESPERA_MAXIMA': 60,
+    'DIAS_CONSERVAR': 7,
+}
+
+# Métricas del procesamiento (publicadas en /metrics en formato Prometheus).
+#   ACTIVAS: mide los tiempos por etapa y los contadores; con False no se mide nada.
+#   RESUMEN_SESION: al terminar una captura o un reconocimiento escribe su resumen en el log
+#       'usuarios.metricas'.
+METRICAS = {
+    'ACTIVAS': True,
+    'RESUMEN_SESION': True,
+}
+
+# Muestra en la consola los mensajes informativos de la aplicación (por ejemplo, los
+# resúmenes de las sesiones).
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'consola': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'usuarios': {'handlers': ['consola'], 'level': 'INFO'},
+    },
+}
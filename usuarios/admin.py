@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Usuario, Evento, Asistencia
+from .models import Usuario, Evento, Asistencia, Entrenamiento
 
 # Este archivo registra los modelos de la aplicación 'usuarios' en el panel de administración de Django.
 # Al registrar un modelo, Django crea automáticamente una interfaz de administración
@@ -12,4 +12,7 @@ admin.site.register(Usuario)
 admin.site.register(Evento)
 
 # Registra el modelo 'Asistencia' para que sea gestionable desde el panel de administración.
-admin.site.register(Asistencia)
\ No newline at end of file
+admin.site.register(Asistencia)
+
+# Registra el modelo 'Entrenamiento' para revisar el historial de entrenamientos del modelo.
+admin.site.register(Entrenamiento)
\ No newline at end of file
@@ -0,0 +1,298 @@
+# --- Almacén preprocesado de rostros para el entrenamiento ---
+# Guarda todos los rostros del dataset en un solo archivo binario encriptado, ya recortados
+# y redimensionados a un tamaño fijo, junto con un archivo de etiquetas (IDs de usuario).
+# Cada rostro se encripta por separado con Fernet; como todos tienen el mismo tamaño, todos
+# los registros encriptados miden lo mismo y el archivo se puede mapear en memoria (memmap)
+# y leer en una sola pasada secuencial, sin decodificar JPEG ni escribir nada en claro en disco.
+#
+# Archivos dentro de 'media/almacen/':
+#   rostros.bin    -> registros encriptados de longitud fija, uno por rostro
+#   etiquetas.bin  -> un entero int32 por registro con el ID del usuario
+#   origenes.json  -> imágenes del dataset ya agregadas: {"<carpeta>/<archivo>": [tamaño, mtime_ns, registro]}
+#   .bloqueo       -> archivo vacío que se bloquea con el sistema operativo mientras se escribe
+# Además del servidor web, otros procesos escriben en el almacén (por ejemplo el comando
+# 'importar_usuarios'), así que las escrituras se protegen con un bloqueo de archivo y no solo
+# con un lock de hilos. Las lecturas toman el bloqueo compartido solo mientras abren los archivos.
+#
+# Cada imagen del dataset tiene a lo más un registro vigente. Cuando una imagen se vuelve a
+# agregar (por ejemplo, una nueva captura sobrescribe 'rostro_0.jpg') o desaparece del dataset,
+# su registro anterior se marca como borrado cambiando su etiqueta por ETIQUETA_BORRADA; no se
+# lee más y 'compactar' lo elimina. Un registro borrado que ya estaba en el modelo obliga a
+# reentrenarlo completo (ver 'borrados' y 'requiere_entrenamiento_completo').
+import json  # Para leer y escribir el índice de orígenes
+import os  # Para manejar rutas y archivos
+import threading  # Para evitar escrituras simultáneas desde varios hilos
+from contextlib import contextmanager, nullcontext  # Para el bloqueo del almacén
+try:
+    import fcntl  # Bloqueo de archivos en Linux y macOS
+except ImportError:
+    fcntl = None
+    import msvcrt  # Bloqueo de archivos en Windows
+import cv2  # OpenCV para redimensionar los rostros
+import numpy as np  # Para manejar los rostros y etiquetas como arreglos
+from cryptography.fernet import Fernet  # Encriptación simétrica de cada registro
+from django.conf import settings  # Para obtener la carpeta MEDIA_ROOT
+from .cifrado import obtener_servicio  # Servicio de encriptación compartido del proceso
+
+# Tamaño fijo (ancho y alto en píxeles) al que se normalizan todos los rostros
+TAMANO_ROSTRO = 100
+# Cantidad de bytes de un rostro sin encriptar (escala de grises, 1 byte por píxel)
+BYTES_ROSTRO = TAMANO_ROSTRO * TAMANO_ROSTRO
+# Longitud de un registro encriptado. Un token Fernet solo depende del largo del mensaje,
+# así que se calcula una vez con una clave cualquiera.
+BYTES_REGISTRO = len(Fernet(Fernet.generate_key()).encrypt(bytes(BYTES_ROSTRO)))
+# Cada etiqueta se guarda como un entero de 32 bits
+TIPO_ETIQUETA = np.dtype("<i4")
+# Etiqueta de los registros reemplazados o cuyo archivo ya no existe (ningún usuario tiene este ID)
+ETIQUETA_BORRADA = -1
+
+# Lock compartido por todas las instancias del proceso (el bloqueo de archivo protege entre procesos)
+_lock = threading.Lock()
+
+# Bloquea un archivo abierto con el sistema operativo hasta que se libere.
+# 'compartido' permite varios lectores a la vez (en Windows el bloqueo siempre es exclusivo).
+def _bloquear(archivo, compartido=False):
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_SH if compartido else fcntl.LOCK_EX)
+        return
+    archivo.seek(0)
+    while True:
+        try:
+            # LK_LOCK reintenta durante unos 10 segundos y luego falla; se vuelve a intentar
+            msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+def _desbloquear(archivo):
+    if fcntl is not None:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+    else:
+        archivo.seek(0)
+        msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+
+# Convierte un recorte de rostro en escala de grises al tamaño fijo del almacén
+def normalizar_rostro(rostro):
+    if rostro.shape[:2] == (TAMANO_ROSTRO, TAMANO_ROSTRO):
+        return np.ascontiguousarray(rostro, dtype=np.uint8)
+    return cv2.resize(rostro, (TAMANO_ROSTRO, TAMANO_ROSTRO), interpolation=cv2.INTER_AREA)
+
+# Clase que representa el almacén de rostros de una carpeta
+class AlmacenRostros:
+
+    def __init__(self, carpeta=None):
+        # Por defecto el almacén vive en 'media/almacen'
+        self.carpeta = carpeta or os.path.join(settings.MEDIA_ROOT, "almacen")
+        self.path_rostros = os.path.join(self.carpeta, "rostros.bin")
+        self.path_etiquetas = os.path.join(self.carpeta, "etiquetas.bin")
+        self.path_origenes = os.path.join(self.carpeta, "origenes.json")
+        self.path_bloqueo = os.path.join(self.carpeta, ".bloqueo")
+
+    # Bloqueo del almacén entre hilos y procesos. Las escrituras usan el exclusivo; las lecturas,
+    # el compartido, que solo espera a que termine una escritura en curso.
+    @contextmanager
+    def bloqueo(self, compartido=False):
+        os.makedirs(self.carpeta, exist_ok=True)
+        with (nullcontext() if compartido else _lock), open(self.path_bloqueo, "a+b") as archivo:
+            _bloquear(archivo, compartido)
+            try:
+                yield
+            finally:
+                _desbloquear(archivo)
+
+    # Número de registros completos. Se toma el mínimo de ambos archivos por si una
+    # escritura quedó a medias (los rostros se escriben antes que las etiquetas).
+    def __len__(self):
+        try:
+            rostros = os.path.getsize(self.path_rostros) // BYTES_REGISTRO
+            etiquetas = os.path.getsize(self.path_etiquetas) // TIPO_ETIQUETA.itemsize
+        except OSError:
+            return 0
+        return min(rostros, etiquetas)
+
+    # Devuelve el índice de imágenes del dataset ya agregadas: {"<carpeta>/<archivo>": [tamaño, mtime_ns, registro]}.
+    # Los índices guardados por versiones anteriores no tienen el registro (solo [tamaño, mtime_ns]).
+    def origenes(self):
+        try:
+            with open(self.path_origenes, "r", encoding="utf-8") as archivo:
+                return json.load(archivo)
+        except (OSError, ValueError):
+            return {}
+
+    # Guarda el índice de orígenes de forma atómica
+    def _guardar_origenes(self, origenes):
+        temporal = f"{self.path_origenes}.tmp"
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            json.dump(origenes, archivo)
+        os.replace(temporal, self.path_origenes)
+
+    # Agrega rostros al final del almacén.
+    # 'origenes' es opcional: {"<carpeta>/<archivo>": [tamaño, mtime_ns]} de las imágenes del dataset
+    # que se agregan, una por rostro y en el mismo orden. Si una de ellas ya estaba en el almacén,
+    # su registro anterior queda borrado.
+    def agregar(self, rostros, labels, origenes=None, fernet=None):
+        if len(rostros) != len(labels):
+            raise ValueError("Debe haber una etiqueta por cada rostro.")
+        if origenes and len(origenes) != len(rostros):
+            raise ValueError("Debe haber un origen por cada rostro.")
+        fernet = fernet or obtener_servicio().fernet()
+        # Encripta cada rostro normalizado; todos los registros quedan del mismo largo
+        registros = b"".join(fernet.encrypt(normalizar_rostro(r).tobytes()) for r in rostros)
+        etiquetas = np.asarray(labels, dtype=TIPO_ETIQUETA).tobytes()
+
+        with self.bloqueo():
+            # Recorta restos de una escritura interrumpida para mantener ambos archivos alineados
+            n = len(self)
+            self._truncar(n)
+            # Primero los rostros y luego las etiquetas: un registro solo cuenta cuando tiene etiqueta
+            with open(self.path_rostros, "ab") as archivo:
+                archivo.write(registros)
+            with open(self.path_etiquetas, "ab") as archivo:
+                archivo.write(etiquetas)
+            if origenes:
+                indice = self.origenes()
+                reemplazados = [indice[relativo][2] for relativo in origenes
+                                if relativo in indice and len(indice[relativo]) > 2]
+                for i, (relativo, firma) in enumerate(origenes.items()):
+                    indice[relativo] = [*firma[:2], n + i]
+                self._borrar_registros(reemplazados)
+                self._guardar_origenes(indice)
+        return n + len(rostros)
+
+    # Marca como borrados los registros indicados (debe llamarse con el bloqueo tomado)
+    def _borrar_registros(self, registros):
+        if len(registros) == 0:
+            return
+        etiquetas = np.memmap(self.path_etiquetas, dtype=TIPO_ETIQUETA, mode="r+")
+        etiquetas[np.asarray(registros, dtype=np.int64)] = ETIQUETA_BORRADA
+        etiquetas.flush()
+        del etiquetas
+
+    # Deja en el índice solo las imágenes que siguen en el dataset y borra los registros que
+    # ninguna imagen respalda: los de 'quitar' (imágenes que ya no existen o índices de versiones
+    # anteriores, sin el registro) y los que se agregaron sin origen. Devuelve cuántos se borraron.
+    def recolectar(self, quitar):
+        with self.bloqueo():
+            n = len(self)
+            indice = self.origenes()
+            for relativo in quitar:
+                indice.pop(relativo, None)
+            if n == 0:
+                self._guardar_origenes(indice)
+                return 0
+            respaldados = np.zeros(n, dtype=bool)
+            registros = [entrada[2] for entrada in indice.values() if len(entrada) > 2 and entrada[2] < n]
+            respaldados[np.asarray(registros, dtype=np.int64)] = True
+            labels = np.fromfile(self.path_etiquetas, dtype=TIPO_ETIQUETA, count=n)
+            huerfanos = np.flatnonzero(~respaldados & (labels != ETIQUETA_BORRADA))
+            self._borrar_registros(huerfanos)
+            self._guardar_origenes(indice)
+            return len(huerfanos)
+
+    # Cantidad de registros borrados entre los primeros 'hasta' registros (todos si es None)
+    def borrados(self, hasta=None):
+        labels = self.etiquetas()
+        return int(np.count_nonzero(labels[:hasta] == ETIQUETA_BORRADA))
+
+    # Deja ambos archivos con exactamente 'n' registros
+    def _truncar(self, n):
+        for path, largo in ((self.path_rostros, BYTES_REGISTRO), (self.path_etiquetas, TIPO_ETIQUETA.itemsize)):
+            if os.path.exists(path) and os.path.getsize(path) > n * largo:
+                with open(path, "r+b") as archivo:
+                    archivo.truncate(n * largo)
+
+    # Abre ambos archivos con el bloqueo compartido y devuelve (registros completos, archivo de
+    # rostros, archivo de etiquetas), o (0, None, None) si el almacén está vacío. Una vez abiertos
+    # se pueden leer sin bloqueo: las escrituras solo agregan al final o reemplazan los archivos
+    # (los abiertos siguen apuntando a los anteriores).
+    def _abrir(self):
+        if not os.path.exists(self.path_etiquetas):
+            return 0, None, None
+        with self.bloqueo(compartido=True):
+            n = len(self)
+            if n == 0:
+                return 0, None, None
+            return n, open(self.path_rostros, "rb"), open(self.path_etiquetas, "rb")
+
+    # Lee solo las etiquetas (no requiere desencriptar nada)
+    def etiquetas(self, desde=0):
+        n, archivo_rostros, archivo_etiquetas = self._abrir()
+        if n == 0:
+            return np.empty(0, dtype=TIPO_ETIQUETA)
+        with archivo_rostros, archivo_etiquetas:
+            return np.fromfile(archivo_etiquetas, dtype=TIPO_ETIQUETA, count=n)[desde:]
+
+    # Lee los rostros en una sola pasada secuencial, desde el registro 'desde'.
+    # Si se entrega 'ids_validos', solo devuelve los rostros de esos usuarios.
+    # Devuelve un arreglo (n, TAMANO_ROSTRO, TAMANO_ROSTRO) de uint8 y un arreglo de etiquetas.
+    # 'progreso' es una función opcional que recibe (rostros leídos, total).
+    def leer(self, desde=0, ids_validos=None, fernet=None, progreso=None):
+        n, archivo_rostros, archivo_etiquetas = self._abrir()
+        if n <= desde:
+            if n:
+                archivo_rostros.close()
+                archivo_etiquetas.close()
+            return np.empty((0, TAMANO_ROSTRO, TAMANO_ROSTRO), dtype=np.uint8), np.empty(0, dtype=TIPO_ETIQUETA)
+        with archivo_rostros, archivo_etiquetas:
+            labels = np.fromfile(archivo_etiquetas, dtype=TIPO_ETIQUETA, count=n)[desde:]
+            return self._leer_registros(archivo_rostros, n, desde, labels, ids_validos, fernet, progreso)
+
+    # Desencripta los registros seleccionados desde el archivo de rostros ya abierto
+    def _leer_registros(self, archivo_rostros, n, desde, labels, ids_validos, fernet, progreso):
+        seleccion = np.arange(len(labels))
+        if ids_validos is not None:
+            seleccion = seleccion[np.isin(labels, np.fromiter(ids_validos, dtype=TIPO_ETIQUETA))]
+
+        imagenes = np.empty((len(seleccion), TAMANO_ROSTRO, TAMANO_ROSTRO), dtype=np.uint8)
+        if len(seleccion) == 0:
+            return imagenes, labels[seleccion]
+
+        fernet = fernet or obtener_servicio().fernet()
+        # Mapea el archivo en memoria: cada fila es un registro encriptado
+        registros = np.memmap(archivo_rostros, dtype=np.uint8, mode="r", shape=(n, BYTES_REGISTRO))
+        destino = imagenes.reshape(len(seleccion), BYTES_ROSTRO)
+        for i, fila in enumerate(seleccion):
+            # Desencripta directamente en el arreglo de salida, sin pasar por disco
+            destino[i] = np.frombuffer(fernet.decrypt(registros[desde + fila].tobytes()), dtype=np.uint8)
+            if progreso and (i + 1) % 1000 == 0:
+                progreso(i + 1, len(seleccion))
+        del registros
+        if progreso:
+            progreso(len(seleccion), len(seleccion))
+        return imagenes, labels[seleccion]
+
+    # Elimina del almacén los rostros de usuarios que ya no existen y los registros borrados.
+    # Los registros encriptados se copian tal cual, sin desencriptar.
+    def compactar(self, ids_validos):
+        with self.bloqueo():
+            n = len(self)
+            if n == 0:
+                return 0
+            labels = np.fromfile(self.path_etiquetas, dtype=TIPO_ETIQUETA, count=n)
+            conservar = np.isin(labels, np.fromiter(ids_validos, dtype=TIPO_ETIQUETA))
+            if conservar.all():
+                return 0
+
+            registros = np.memmap(self.path_rostros, dtype=np.uint8, mode="r", shape=(n, BYTES_REGISTRO))
+            # Escribe los archivos nuevos en temporales y luego los reemplaza
+            with open(f"{self.path_rostros}.tmp", "wb") as archivo:
+                for inicio in range(0, n, 4096):
+                    bloque = registros[inicio:inicio + 4096]
+                    archivo.write(bloque[conservar[inicio:inicio + 4096]].tobytes())
+            del registros
+            labels[conservar].tofile(f"{self.path_etiquetas}.tmp")
+            os.replace(f"{self.path_rostros}.tmp", self.path_rostros)
+            os.replace(f"{self.path_etiquetas}.tmp", self.path_etiquetas)
+
+            # Quita del índice las imágenes de los registros eliminados y renumera las demás
+            nuevos = np.cumsum(conservar) - 1
+            validos = {str(i) for i in ids_validos}
+            indice = {}
+            for relativo, entrada in self.origenes().items():
+                if len(entrada) > 2:
+                    if entrada[2] < n and conservar[entrada[2]]:
+                        indice[relativo] = [*entrada[:2], int(nuevos[entrada[2]])]
+                elif relativo.split("_")[0] in validos:
+                    indice[relativo] = entrada
+            self._guardar_origenes(indice)
+            return int(n - conservar.sum())
@@ -0,0 +1,108 @@
+# --- Registro de asistencia durante el reconocimiento ---
+# Mantiene en memoria los datos que el reconocimiento consulta en cada fotograma, para no
+# hacer varias consultas a la base de datos por cada rostro:
+#   - los IDs de los usuarios que ya tienen asistencia registrada en el evento
+#   - el nombre de cada usuario, para mostrarlo sobre el rostro
+# Las asistencias confirmadas se acumulan y se guardan por lotes con 'bulk_create'. La
+# restricción única (usuario, evento) de 'Asistencia' evita duplicados aunque dos sesiones
+# registren a la misma persona.
+# Si la sesión recibe un diario local ('diario.py'), cada asistencia se anota en él al
+# confirmarse y un hilo aparte la copia a la base de datos: el reconocimiento nunca espera a
+# la base de datos central.
+import time  # Para decidir cuándo enviar el lote pendiente
+from .models import Asistencia, Usuario  # Modelos de la base de datos
+from .listados import invalidar_conteos  # Conteos de asistencias en caché
+from .metricas import medir  # Tiempo de las consultas a la base de datos
+
+# Sesión de registro de asistencia para un evento
+class SesionAsistencia:
+
+    def __init__(self, evento, tamano_lote=20, intervalo=2.0, usuarios=None, reloj=time.monotonic, diario=None,
+                 registrados=None):
+        self.evento = evento
+        # Diario local de asistencias (DiarioAsistencias) o None para guardar directamente
+        self.diario = diario
+        # Función que devuelve el instante actual; al reproducir una grabación se usa el tiempo
+        # del video para que los lotes se envíen con la misma frecuencia que en el kiosco
+        self.reloj = reloj
+        # Cantidad de asistencias que se acumulan antes de guardarlas
+        self.tamano_lote = tamano_lote
+        # Segundos máximos que una asistencia confirmada espera antes de guardarse
+        self.intervalo = intervalo
+        # Si se indican 'usuarios' (IDs), solo se cargan los datos de esos usuarios; sirve para
+        # peticiones cortas que únicamente necesitan a las personas reconocidas en ellas
+        asistencias = Asistencia.objects.filter(evento_asist_id=evento.id)
+        usuarios_qs = Usuario.objects.all()
+        if usuarios is not None:
+            asistencias = asistencias.filter(usuario_id__in=usuarios)
+            usuarios_qs = usuarios_qs.filter(id__in=usuarios)
+        # 'registrados' permite indicar los usuarios que se consideran ya registrados sin consultar
+        # la base de datos (por ejemplo, un conjunto vacío para reproducir una grabación desde cero)
+        with medir('bd'):
+            if registrados is None:
+                # Usuarios que ya tienen asistencia en este evento (se consulta una sola vez)
+                self.registrados = set(asistencias.values_list('usuario_id', flat=True))
+            else:
+                self.registrados = set(registrados)
+            # Nombres de los usuarios, sin cargar el resto de sus columnas
+            self.nombres = dict(usuarios_qs.values_list('id', 'nombre'))
+        if diario is not None and registrados is None:
+            # También las anotadas en el diario que aún no llegan a la base de datos
+            registrados = diario.registrados(evento.id)
+            self.registrados |= registrados if usuarios is None else registrados & set(usuarios)
+        if usuarios is not None:
+            # Los IDs que no existen quedan como None, para no volver a consultarlos
+            for usuario_id in usuarios:
+                self.nombres.setdefault(usuario_id, None)
+        # Asistencias confirmadas que aún no se guardan
+        self.pendientes = []
+        self.ultimo_envio = reloj()
+
+    # Devuelve el nombre de un usuario o None si no existe.
+    # Si el usuario se creó después de iniciar la sesión, se consulta una vez y se guarda.
+    def nombre(self, usuario_id):
+        if usuario_id not in self.nombres:
+            self.nombres[usuario_id] = (
+                Usuario.objects.filter(id=usuario_id).values_list('nombre', flat=True).first()
+            )
+        return self.nombres[usuario_id]
+
+    # Indica si el usuario ya tiene asistencia en el evento (guardada o pendiente)
+    def ya_registrado(self, usuario_id):
+        return usuario_id in self.registrados
+
+    # Registra la asistencia de un usuario. Devuelve False si ya estaba registrada.
+    def registrar(self, usuario_id):
+        if usuario_id in self.registrados:
+            return False
+        self.registrados.add(usuario_id)
+        if self.diario is not None:
+            with medir('diario'):
+                self.diario.anotar(self.evento.id, usuario_id)
+            self.diario.avisar()
+            return True
+        self.pendientes.append(Asistencia(usuario_id=usuario_id, evento_asist_id=self.evento.id))
+        if len(self.pendientes) >= self.tamano_lote:
+            self.enviar(forzar=True)
+        return True
+
+    # Guarda las asistencias pendientes en un solo INSERT. Sin 'forzar', solo lo hace si ya
+    # pasó el intervalo desde el último envío (se llama en cada fotograma).
+    def enviar(self, forzar=False):
+        if not self.pendientes:
+            self.ultimo_envio = self.reloj()
+            return 0
+        if not forzar and self.reloj() - self.ultimo_envio < self.intervalo:
+            return 0
+        lote, self.pendientes = self.pendientes, []
+        # 'ignore_conflicts' hace que la restricción única descarte los duplicados sin error
+        with medir('bd'):
+            Asistencia.objects.bulk_create(lote, ignore_conflicts=True)
+        # El listado de eventos debe mostrar la nueva cantidad de asistencias
+        invalidar_conteos([self.evento.id])
+        self.ultimo_envio = self.reloj()
+        return len(lote)
+
+    # Guarda todo lo pendiente al terminar la sesión
+    def cerrar(self):
+        return self.enviar(forzar=True)
@@ -0,0 +1,65 @@
+# --- Utilidades para los benchmarks ---
+# Funciones compartidas por los comandos de benchmark: generan datasets sintéticos
+# (sin necesidad de una cámara ni de rostros reales), miden tiempos y comparan los
+# resultados con una base guardada.
+import os  # Para crear las carpetas del dataset
+import statistics  # Para resumir las repeticiones de cada medición
+import time  # Para medir tiempos
+import cv2  # OpenCV para generar las imágenes sintéticas
+import numpy as np  # Para generar datos aleatorios
+from .cifrado import guardar_imagen_encriptada  # Guarda las imágenes encriptadas como en una captura real
+
+# Genera un "rostro" sintético: un patrón suave propio de cada usuario más un poco de ruido por captura
+def rostro_sintetico(patron, rng, tamano=120):
+    base = cv2.resize(patron, (tamano, tamano), interpolation=cv2.INTER_CUBIC).astype(np.int16)
+    ruido = rng.integers(-12, 13, size=base.shape, dtype=np.int16)
+    return np.clip(base + ruido, 0, 255).astype(np.uint8)
+
+# Devuelve el patrón base de un usuario sintético (siempre el mismo para la misma semilla e ID)
+def patron_usuario(usuario_id, semilla=0):
+    rng = np.random.default_rng((semilla, usuario_id))
+    return rng.integers(0, 256, size=(12, 12), dtype=np.uint8)
+
+# Crea un dataset sintético encriptado con la misma estructura que 'capturar_imagenes':
+# 'data_path/<id>_<nombre>/rostro_<n>.jpg'. Devuelve el número de imágenes creadas.
+def generar_dataset_sintetico(data_path, usuarios, capturas, semilla=0, primer_id=1):
+    rng = np.random.default_rng(semilla)
+    total = 0
+    for usuario_id in range(primer_id, primer_id + usuarios):
+        carpeta = os.path.join(data_path, f"{usuario_id}_Sintetico{usuario_id}")
+        os.makedirs(carpeta, exist_ok=True)
+        patron = patron_usuario(usuario_id, semilla)
+        for n in range(capturas):
+            guardar_imagen_encriptada(os.path.join(carpeta, f"rostro_{n}.jpg"), rostro_sintetico(patron, rng))
+            total += 1
+    return total
+
+# Mide el tiempo de ejecución de una función; devuelve (segundos, resultado)
+def medir(funcion, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = funcion(*args, **kwargs)
+    return time.perf_counter() - inicio, resultado
+
+# Resume las repeticiones de una medición (en milisegundos). Se compara la mediana, que es
+# menos sensible que el promedio a una repetición interrumpida por otro proceso.
+def resumir_tiempos(muestras_ms):
+    return {
+        "mediana_ms": round(statistics.median(muestras_ms), 4),
+        "minimo_ms": round(min(muestras_ms), 4),
+        "maximo_ms": round(max(muestras_ms), 4),
+        "repeticiones": len(muestras_ms),
+    }
+
+# Compara los resultados con los de una base. Devuelve una lista de
+# (etapa, mediana base, mediana actual, cambio relativo, es regresión) con las etapas presentes
+# en ambos. Una etapa es una regresión si su mediana supera la de la base en más de 'tolerancia'
+# (0.25 = 25 % más lenta).
+def comparar_resultados(resultados, base, tolerancia):
+    comparacion = []
+    for etapa, actual in resultados["etapas"].items():
+        anterior = base.get("etapas", {}).get(etapa)
+        if anterior is None or not anterior["mediana_ms"]:
+            continue
+        cambio = actual["mediana_ms"] / anterior["mediana_ms"] - 1
+        comparacion.append((etapa, anterior["mediana_ms"], actual["mediana_ms"], cambio, cambio > tolerancia))
+    return comparacion
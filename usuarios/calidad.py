@@ -0,0 +1,104 @@
+# --- Control de calidad de las capturas ---
+# Al enrolar a un usuario, los fotogramas consecutivos son casi idénticos y algunos salen
+# movidos, oscuros o con el rostro muy lejos. Guardarlos todos agranda el dataset y el tiempo
+# de entrenamiento sin mejorar el reconocimiento. Este módulo evalúa cada recorte antes de
+# guardarlo:
+#   - tamaño: el lado del recorte original debe superar un mínimo
+#   - brillo: el promedio de gris debe estar dentro de un rango
+#   - nitidez: la varianza del Laplaciano (baja = imagen borrosa)
+#   - duplicados: un hash perceptual (dHash de 64 bits) se compara con los últimos recortes
+#     aceptados; si se parece demasiado a alguno, se descarta
+# Los parámetros se configuran en 'settings.CAPTURA'.
+from collections import Counter, deque  # Motivos de rechazo y hashes recientes
+import cv2  # OpenCV para el Laplaciano y para redimensionar
+import numpy as np  # Para calcular el hash
+from django.conf import settings  # Para leer la configuración
+from .almacen import normalizar_rostro  # Tamaño fijo de los rostros
+
+# Configuración por defecto; 'settings.CAPTURA' puede sobrescribir cualquiera de estas claves
+CONFIGURACION_POR_DEFECTO = {
+    'TOTAL_CAPTURAS': 100,
+    'TAMANO_MINIMO': 80,
+    'BRILLO_MINIMO': 40,
+    'BRILLO_MAXIMO': 220,
+    'NITIDEZ_MINIMA': 60.0,
+    'DISTANCIA_HASH': 6,
+    'HASHES_RECIENTES': 20,
+}
+
+# Devuelve la configuración de la captura combinando la de 'settings' y la indicada
+def configuracion_captura(**opciones):
+    configuracion = dict(CONFIGURACION_POR_DEFECTO)
+    configuracion.update(getattr(settings, 'CAPTURA', {}))
+    configuracion.update({clave.upper(): valor for clave, valor in opciones.items()})
+    return configuracion
+
+# Hash de diferencias (dHash): compara cada píxel con su vecino de la derecha en una versión
+# de 9x8 de la imagen. Imágenes parecidas dan hashes con pocos bits distintos.
+def hash_diferencia(rostro):
+    pequeno = cv2.resize(rostro, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (pequeno[:, 1:] > pequeno[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+# Cantidad de bits distintos entre dos hashes
+def distancia_hash(a, b):
+    return bin(a ^ b).count("1")
+
+# Calcula las métricas de calidad de un recorte en escala de grises
+def evaluar_rostro(rostro, normalizado=None):
+    normalizado = normalizar_rostro(rostro) if normalizado is None else normalizado
+    return {
+        'tamano': int(min(rostro.shape[:2])),
+        'brillo': float(normalizado.mean()),
+        # La nitidez se mide sobre el rostro normalizado para no depender de su tamaño original
+        'nitidez': float(cv2.Laplacian(normalizado, cv2.CV_64F).var()),
+    }
+
+# Filtro de capturas de un usuario: decide qué recortes se guardan
+class FiltroCapturas:
+
+    # 'configuracion' permite entregar la configuración ya combinada (por ejemplo, a procesos de
+    # trabajo que no cargan 'settings'); si no, se combina la de 'settings' con las 'opciones'
+    def __init__(self, configuracion=None, **opciones):
+        self.configuracion = configuracion or configuracion_captura(**opciones)
+        self.recientes = deque(maxlen=self.configuracion['HASHES_RECIENTES'])
+        # Cantidad de recortes rechazados por cada motivo
+        self.rechazos = Counter()
+        self.aceptados = 0
+
+    # Evalúa un recorte en escala de grises. Devuelve (aceptado, motivo, rostro normalizado);
+    # el motivo es None si se acepta o 'pequeno', 'oscuro', 'claro', 'borroso' o 'duplicado'.
+    def evaluar(self, rostro):
+        configuracion = self.configuracion
+        normalizado = normalizar_rostro(rostro)
+        metricas = evaluar_rostro(rostro, normalizado)
+        motivo = None
+        if metricas['tamano'] < configuracion['TAMANO_MINIMO']:
+            motivo = 'pequeno'
+        elif metricas['brillo'] < configuracion['BRILLO_MINIMO']:
+            motivo = 'oscuro'
+        elif metricas['brillo'] > configuracion['BRILLO_MAXIMO']:
+            motivo = 'claro'
+        elif metricas['nitidez'] < configuracion['NITIDEZ_MINIMA']:
+            motivo = 'borroso'
+
+        if motivo is None:
+            huella = hash_diferencia(normalizado)
+            if any(distancia_hash(huella, otra) < configuracion['DISTANCIA_HASH'] for otra in self.recientes):
+                motivo = 'duplicado'
+            else:
+                self.recientes.append(huella)
+
+        if motivo:
+            self.rechazos[motivo] += 1
+            return False, motivo, normalizado
+        self.aceptados += 1
+        return True, None, normalizado
+
+    # Registra un rostro normalizado que ya estaba guardado, para descartar los duplicados de él
+    def registrar(self, normalizado):
+        self.recientes.append(hash_diferencia(normalizado))
+
+    # Resumen de la captura: aceptados y rechazados por motivo
+    def resumen(self):
+        return {'aceptados': self.aceptados, 'rechazados': dict(self.rechazos)}
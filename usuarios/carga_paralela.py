@@ -0,0 +1,126 @@
+# --- Carga paralela del dataset ---
+# Desencripta y decodifica las imágenes del dataset repartiendo el trabajo en varios
+# procesos, una tarea por carpeta de usuario. Los procesos no devuelven las imágenes por
+# pickle: el proceso principal reserva un bloque de memoria compartida con espacio para
+# todos los rostros y cada proceso escribe los suyos directamente en su posición.
+#
+# Las funciones que ejecutan los procesos no usan Django; reciben las claves de
+# encriptación como argumento para que funcionen con los métodos 'spawn' y 'forkserver'.
+# Los procesos nunca se crean con 'fork': el entrenamiento corre en un hilo del servidor web
+# (ASGI), y copiar un proceso con varios hilos puede dejar locks tomados en el proceso hijo.
+import multiprocessing  # Para elegir cómo se crean los procesos de trabajo
+import os  # Para construir rutas y obtener el número de núcleos
+from concurrent.futures import ProcessPoolExecutor  # Grupo de procesos de trabajo
+from multiprocessing import shared_memory  # Memoria compartida entre procesos
+import numpy as np  # Para manejar los rostros como arreglos
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet  # Desencriptación en los procesos
+from django.conf import settings  # Para leer la cantidad de procesos configurada
+from .almacen import BYTES_ROSTRO, TAMANO_ROSTRO, normalizar_rostro  # Formato de los rostros
+from .cifrado import cargar_claves, leer_imagen_encriptada  # Funciones de encriptación
+
+# Objetos MultiFernet creados en cada proceso de trabajo, para no reconstruirlos en cada tarea
+_fernets = {}
+
+# Devuelve el número de procesos a usar: el valor indicado, el de 'settings' o todos los núcleos
+def numero_procesos(procesos=None):
+    procesos = procesos or getattr(settings, "ENTRENAMIENTO_PROCESOS", None) or os.cpu_count() or 1
+    return max(1, int(procesos))
+
+# Contexto con que se crean los procesos de trabajo: 'forkserver' donde existe (Linux y macOS),
+# que parte de un proceso limpio sin los hilos del servidor, o 'spawn' (Windows)
+def contexto_procesos():
+    metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(metodo)
+
+# Devuelve (y guarda para las siguientes tareas) el objeto MultiFernet de unas claves
+def _fernet_proceso(claves):
+    fernet = _fernets.get(claves)
+    if fernet is None:
+        fernet = _fernets[claves] = MultiFernet([Fernet(clave) for clave in claves])
+    return fernet
+
+# Tarea de un proceso de trabajo: lee todas las imágenes de una carpeta de usuario y las
+# escribe normalizadas en la memoria compartida a partir de la posición 'inicio'.
+# Devuelve la posición de inicio y los índices (dentro de la carpeta) que se leyeron bien.
+def _cargar_carpeta(tarea):
+    nombre_memoria, claves, data_path, inicio, relativos = tarea
+    fernet = _fernet_proceso(claves)
+    memoria = shared_memory.SharedMemory(name=nombre_memoria)
+    try:
+        destino = np.ndarray((len(relativos), TAMANO_ROSTRO, TAMANO_ROSTRO), dtype=np.uint8,
+                             buffer=memoria.buf, offset=inicio * BYTES_ROSTRO)
+        leidos = []
+        for i, relativo in enumerate(relativos):
+            try:
+                img = leer_imagen_encriptada(os.path.join(data_path, relativo), fernet)
+            except (OSError, InvalidToken):
+                img = None
+            # Omite archivos que no se pudieron leer, desencriptar o decodificar
+            if img is None:
+                continue
+            destino[i] = normalizar_rostro(img)
+            leidos.append(i)
+        del destino
+    finally:
+        memoria.close()
+    return inicio, leidos
+
+# Carga las imágenes indicadas en 'lista' [(label, "<carpeta>/<archivo>"), ...] usando 'procesos' procesos.
+# Devuelve un arreglo (n, TAMANO_ROSTRO, TAMANO_ROSTRO) de uint8, las etiquetas y las rutas leídas.
+# 'progreso' es una función opcional que recibe (imágenes procesadas, total) al terminar cada carpeta.
+def cargar_dataset(lista, data_path, procesos=None, path_clave=None, progreso=None):
+    procesos = numero_procesos(procesos)
+    # Agrupa las imágenes por carpeta de usuario: una tarea por carpeta
+    carpetas = {}
+    for label, relativo in lista:
+        carpetas.setdefault(relativo.split("/")[0], []).append((label, relativo))
+
+    total = len(lista)
+    if total == 0:
+        return np.empty((0, TAMANO_ROSTRO, TAMANO_ROSTRO), dtype=np.uint8), np.empty(0, dtype=np.int32), []
+
+    claves = tuple(cargar_claves(path_clave))
+    memoria = shared_memory.SharedMemory(create=True, size=total * BYTES_ROSTRO)
+    try:
+        # Asigna a cada carpeta su posición dentro del bloque de memoria compartida
+        tareas = []
+        orden = []
+        inicio = 0
+        for elementos in carpetas.values():
+            tareas.append((memoria.name, claves, data_path, inicio, [r for _, r in elementos]))
+            orden.extend(elementos)
+            inicio += len(elementos)
+
+        # Informa el avance a medida que se completa cada carpeta
+        resultados = []
+        def registrar(resultados_carpetas):
+            procesadas = 0
+            for tarea, resultado in zip(tareas, resultados_carpetas):
+                resultados.append(resultado)
+                procesadas += len(tarea[4])
+                if progreso:
+                    progreso(procesadas, total)
+
+        if procesos == 1 or len(tareas) == 1:
+            # Con un solo proceso no vale la pena crear el grupo de procesos
+            registrar(_cargar_carpeta(tarea) for tarea in tareas)
+        else:
+            with ProcessPoolExecutor(max_workers=min(procesos, len(tareas)), mp_context=contexto_procesos()) as pool:
+                registrar(pool.map(_cargar_carpeta, tareas))
+
+        # Marca las posiciones que quedaron con un rostro válido
+        validos = np.zeros(total, dtype=bool)
+        for inicio, leidos in resultados:
+            validos[inicio + np.asarray(leidos, dtype=np.intp)] = True
+
+        todos = np.ndarray((total, TAMANO_ROSTRO, TAMANO_ROSTRO), dtype=np.uint8, buffer=memoria.buf)
+        # La selección con una máscara copia los datos fuera de la memoria compartida
+        imagenes = todos[validos]
+        del todos
+    finally:
+        memoria.close()
+        memoria.unlink()
+
+    labels = np.array([int(orden[i][0]) for i in np.flatnonzero(validos)], dtype=np.int32)
+    leidos = [orden[i][1] for i in np.flatnonzero(validos)]
+    return imagenes, labels, leidos
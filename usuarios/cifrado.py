@@ -0,0 +1,171 @@
+# --- Funciones de Encriptación ---
+# Este módulo agrupa las funciones que protegen las imágenes de rostros guardadas en disco.
+# Se separaron de 'views.py' para que el entrenamiento y otras partes de la aplicación
+# puedan usarlas sin importar las vistas.
+#
+# La clave se carga una sola vez por proceso mediante 'ServicioCifrado', que guarda el
+# objeto MultiFernet ya construido y solo vuelve a leer el archivo de la clave cuando este
+# cambia (por ejemplo, al rotar la clave). El archivo puede contener varias claves, una por
+# línea: la primera se usa para encriptar y todas sirven para desencriptar.
+import os  # Para manejar rutas y consultar el archivo de la clave
+import threading  # Para recargar la clave de forma segura entre hilos
+import time  # Para limitar la frecuencia con que se revisa el archivo de la clave
+import cv2  # OpenCV para codificar y decodificar las imágenes en memoria
+import numpy as np  # Para convertir los bytes desencriptados en un arreglo
+from cryptography.fernet import Fernet, MultiFernet  # Librería para encriptación simétrica
+from django.conf import settings  # Para obtener la carpeta MEDIA_ROOT
+from .metricas import medir  # Tiempo de encriptación y desencriptación
+
+# Ruta del archivo que contiene la clave (o claves) de encriptación
+def ruta_clave():
+    return os.path.join(settings.MEDIA_ROOT, "encryption_key.key")
+
+# Genera una clave de encriptación y la guarda en un archivo
+def generar_clave():
+    # Genera una nueva clave
+    clave = Fernet.generate_key()
+    # Abre el archivo de la clave en modo de escritura binaria
+    with open(ruta_clave(), "wb") as key_file:
+        # Escribe la clave en el archivo
+        key_file.write(clave)
+
+# Lee todas las claves guardadas en el archivo (una por línea, la primera es la actual)
+def cargar_claves(path=None):
+    # Abre el archivo de la clave en modo de lectura binaria
+    with open(path or ruta_clave(), "rb") as key_file:
+        return [linea.strip() for linea in key_file.read().splitlines() if linea.strip()]
+
+# Carga la clave de encriptación actual desde el archivo
+def cargar_clave():
+    return cargar_claves()[0]
+
+# Servicio de encriptación compartido por todo el proceso
+class ServicioCifrado:
+    # Cada cuántos segundos, como máximo, se revisa si el archivo de la clave cambió
+    INTERVALO_REVISION = 1.0
+
+    def __init__(self, path_clave=None):
+        self.path_clave = path_clave or ruta_clave()
+        self._lock = threading.Lock()
+        self._fernet = None  # Objeto MultiFernet construido con las claves del archivo
+        self._firma = None  # Fecha de modificación y tamaño del archivo al cargarlo
+        self._ultima_revision = 0.0
+
+    # Devuelve la fecha de modificación y el tamaño actuales del archivo de la clave
+    def _firma_actual(self):
+        estado = os.stat(self.path_clave)
+        return (estado.st_mtime_ns, estado.st_size)
+
+    # Devuelve el objeto MultiFernet, recargándolo solo si el archivo de la clave cambió
+    def fernet(self):
+        ahora = time.monotonic()
+        if self._fernet is not None and ahora - self._ultima_revision < self.INTERVALO_REVISION:
+            return self._fernet
+        with self._lock:
+            firma = self._firma_actual()
+            if self._fernet is None or firma != self._firma:
+                claves = cargar_claves(self.path_clave)
+                # Se construye el objeto completo antes de publicarlo, así otros hilos
+                # siempre ven una versión válida de la clave
+                self._fernet = MultiFernet([Fernet(clave) for clave in claves])
+                self._firma = firma
+            self._ultima_revision = ahora
+            return self._fernet
+
+    # Fuerza a leer nuevamente el archivo de la clave en el próximo uso
+    def recargar(self):
+        with self._lock:
+            self._fernet = None
+            self._firma = None
+
+    # Encripta bytes y devuelve el token encriptado
+    def encriptar(self, datos):
+        with medir('encriptar'):
+            return self.fernet().encrypt(datos)
+
+    # Desencripta un token con cualquiera de las claves vigentes
+    def desencriptar(self, token):
+        with medir('desencriptar'):
+            return self.fernet().decrypt(token)
+
+    # Vuelve a encriptar un token con la clave actual (útil después de rotar la clave)
+    def reencriptar(self, token):
+        return self.fernet().rotate(token)
+
+    # Genera una clave nueva y la deja como actual, conservando las anteriores para desencriptar
+    def rotar_clave(self):
+        with self._lock:
+            claves = [Fernet.generate_key()] + cargar_claves(self.path_clave)
+            temporal = f"{self.path_clave}.tmp"
+            with open(temporal, "wb") as key_file:
+                key_file.write(b"\n".join(claves))
+            # Reemplaza el archivo de una sola vez para que nunca se lea a medio escribir
+            os.replace(temporal, self.path_clave)
+            self._fernet = None
+            self._firma = None
+
+# Servicios creados en este proceso, uno por archivo de clave
+_servicios = {}
+_servicios_lock = threading.Lock()
+
+# Devuelve el servicio de encriptación del proceso (se crea la primera vez que se usa)
+def obtener_servicio(path_clave=None):
+    path_clave = os.path.abspath(path_clave or ruta_clave())
+    servicio = _servicios.get(path_clave)
+    if servicio is None:
+        with _servicios_lock:
+            servicio = _servicios.setdefault(path_clave, ServicioCifrado(path_clave))
+    return servicio
+
+# Encripta bytes en memoria con la clave actual
+def encriptar_bytes(datos):
+    return obtener_servicio().encriptar(datos)
+
+# Desencripta bytes en memoria
+def desencriptar_bytes(token):
+    return obtener_servicio().desencriptar(token)
+
+# Encripta un archivo de imagen
+def encriptar_imagen(path_imagen):
+    # Abre la imagen en modo de lectura binaria
+    with open(path_imagen, "rb") as file:
+        datos = file.read()
+    # Encripta los datos de la imagen
+    datos_encriptados = encriptar_bytes(datos)
+    # Abre la misma imagen en modo de escritura binaria (sobrescribe el original)
+    with open(path_imagen, "wb") as file:
+        # Escribe los datos encriptados en el archivo
+        file.write(datos_encriptados)
+
+# Desencripta un archivo de imagen
+def desencriptar_imagen(path_imagen):
+    # Abre el archivo encriptado en modo de lectura binaria
+    with open(path_imagen, "rb") as file:
+        datos_encriptados = file.read()
+    # Desencripta los datos
+    datos_desencriptados = desencriptar_bytes(datos_encriptados)
+    # Abre el archivo en modo de escritura binaria (sobrescribe el encriptado)
+    with open(path_imagen, "wb") as file:
+        # Escribe los datos desencriptados
+        file.write(datos_desencriptados)
+
+# Codifica una imagen como JPEG en memoria, la encripta y la escribe una sola vez en disco
+def guardar_imagen_encriptada(path_imagen, imagen, extension=".jpg"):
+    ok, buffer = cv2.imencode(extension, imagen)
+    if not ok:
+        raise ValueError(f"No se pudo codificar la imagen {path_imagen}")
+    with open(path_imagen, "wb") as file:
+        file.write(encriptar_bytes(buffer.tobytes()))
+
+# Lee una imagen encriptada y la devuelve decodificada, sin escribir nunca el contenido en claro en disco
+def leer_imagen_encriptada(path_imagen, fernet=None, flags=cv2.IMREAD_GRAYSCALE):
+    # Si no se entrega un objeto Fernet, usa el del servicio del proceso
+    if fernet is None:
+        fernet = obtener_servicio().fernet()
+    # Lee el contenido encriptado del archivo
+    with open(path_imagen, "rb") as file:
+        datos_encriptados = file.read()
+    # Desencripta en memoria
+    datos = fernet.decrypt(datos_encriptados)
+    # Decodifica el JPEG directamente desde los bytes (por defecto en escala de grises)
+    return cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), flags)
@@ -0,0 +1,140 @@
+# --- Detección de rostros ---
+# Capa común para los detectores de rostros usados en la captura y el reconocimiento.
+# Los detectores se crean una sola vez por hilo (no en cada petición) y se pueden elegir
+# en 'settings.DETECTOR_ROSTROS':
+#   'haar'  -> clasificador de Haar de OpenCV (el comportamiento original)
+#   'lbp'   -> clasificador LBP, más rápido que Haar en CPU
+#   'yunet' -> detector YuNet (red neuronal ONNX) de OpenCV, más preciso y rápido en CPU
+# Además, el fotograma se puede reducir antes de detectar ('ESCALA'); los rectángulos
+# encontrados se devuelven siempre en las coordenadas del fotograma original.
+import threading  # Para guardar un detector por hilo
+import cv2  # OpenCV para los detectores
+import numpy as np  # Para manejar los rectángulos como arreglos
+from django.conf import settings  # Para leer la configuración del detector
+from django.core.exceptions import ImproperlyConfigured  # Error de configuración
+
+# Configuración por defecto; 'settings.DETECTOR_ROSTROS' puede sobrescribir cualquiera de estas claves
+CONFIGURACION_POR_DEFECTO = {
+    'BACKEND': 'haar',
+    'ESCALA': 1.0,
+    'SCALE_FACTOR': 1.3,
+    'MIN_NEIGHBORS': 5,
+    'MIN_SIZE': (0, 0),
+    'CASCADA_HAAR': None,
+    'CASCADA_LBP': None,
+    'MODELO_YUNET': None,
+    'UMBRAL_YUNET': 0.8,
+}
+
+# Detectores creados en cada hilo. Los clasificadores de OpenCV no garantizan ser seguros
+# entre hilos, así que cada hilo tiene los suyos y los reutiliza en todas sus peticiones.
+_locales = threading.local()
+
+# Devuelve la configuración del detector combinando la de 'settings' y la indicada
+def configuracion_detector(**opciones):
+    configuracion = dict(CONFIGURACION_POR_DEFECTO)
+    configuracion.update(getattr(settings, 'DETECTOR_ROSTROS', {}))
+    configuracion.update({clave.upper(): valor for clave, valor in opciones.items()})
+    return configuracion
+
+# Detector basado en un clasificador en cascada (Haar o LBP); trabaja en escala de grises
+class DetectorCascada:
+    usa_color = False
+
+    def __init__(self, path, scale_factor, min_neighbors):
+        self.clasificador = cv2.CascadeClassifier(path)
+        if self.clasificador.empty():
+            raise ImproperlyConfigured(f"No se pudo cargar el clasificador de rostros '{path}'.")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+
+    def detectar(self, imagen, min_size):
+        rostros = self.clasificador.detectMultiScale(imagen, self.scale_factor, self.min_neighbors,
+                                                    minSize=min_size)
+        return np.asarray(rostros, dtype=np.int32).reshape(-1, 4)
+
+# Detector YuNet de OpenCV (cv2.FaceDetectorYN); trabaja con la imagen a color
+class DetectorYuNet:
+    usa_color = True
+
+    def __init__(self, path, umbral):
+        if not path:
+            raise ImproperlyConfigured("Configure DETECTOR_ROSTROS['MODELO_YUNET'] con la ruta del modelo ONNX de YuNet.")
+        self.detector = cv2.FaceDetectorYN.create(path, "", (320, 320), umbral)
+        self.tamano = (320, 320)
+
+    def detectar(self, imagen, min_size):
+        alto, ancho = imagen.shape[:2]
+        # YuNet necesita conocer el tamaño de la imagen de entrada
+        if self.tamano != (ancho, alto):
+            self.detector.setInputSize((ancho, alto))
+            self.tamano = (ancho, alto)
+        _, caras = self.detector.detect(imagen)
+        if caras is None:
+            return np.empty((0, 4), dtype=np.int32)
+        rostros = np.round(caras[:, :4]).astype(np.int32)
+        # Aplica el tamaño mínimo igual que los clasificadores en cascada
+        return rostros[(rostros[:, 2] >= min_size[0]) & (rostros[:, 3] >= min_size[1])]
+
+# Detector de rostros configurado: reduce el fotograma, detecta y lleva los rectángulos al tamaño original
+class DetectorRostros:
+
+    def __init__(self, backend, escala=1.0, min_size=(0, 0)):
+        self.backend = backend
+        self.escala = float(escala)
+        self.min_size = tuple(min_size)
+
+    # Detecta los rostros de un fotograma BGR. Si ya se tiene la imagen en grises, se puede
+    # entregar para no volver a convertirla. Devuelve un arreglo de rectángulos (x, y, w, h).
+    def detectar(self, frame, gris=None):
+        if self.backend.usa_color:
+            imagen = frame
+        else:
+            imagen = gris if gris is not None else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        escala = self.escala
+        min_size = self.min_size
+        if escala != 1.0:
+            imagen = cv2.resize(imagen, None, fx=escala, fy=escala, interpolation=cv2.INTER_AREA)
+            min_size = tuple(int(lado * escala) for lado in min_size)
+
+        rostros = self.backend.detectar(imagen, min_size)
+        if escala != 1.0 and len(rostros):
+            rostros = np.round(rostros / escala).astype(np.int32)
+
+        # Ajusta los rectángulos para que no se salgan del fotograma
+        if len(rostros):
+            alto, ancho = frame.shape[:2]
+            rostros[:, 0] = np.clip(rostros[:, 0], 0, ancho - 1)
+            rostros[:, 1] = np.clip(rostros[:, 1], 0, alto - 1)
+            rostros[:, 2] = np.minimum(rostros[:, 2], ancho - rostros[:, 0])
+            rostros[:, 3] = np.minimum(rostros[:, 3], alto - rostros[:, 1])
+        return rostros
+
+# Crea el detector indicado por la configuración
+def crear_detector(configuracion):
+    backend = configuracion['BACKEND']
+    if backend == 'haar':
+        path = configuracion['CASCADA_HAAR'] or cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+        motor = DetectorCascada(path, configuracion['SCALE_FACTOR'], configuracion['MIN_NEIGHBORS'])
+    elif backend == 'lbp':
+        if not configuracion['CASCADA_LBP']:
+            raise ImproperlyConfigured("Configure DETECTOR_ROSTROS['CASCADA_LBP'] con la ruta de lbpcascade_frontalface_improved.xml.")
+        motor = DetectorCascada(configuracion['CASCADA_LBP'], configuracion['SCALE_FACTOR'], configuracion['MIN_NEIGHBORS'])
+    elif backend == 'yunet':
+        motor = DetectorYuNet(configuracion['MODELO_YUNET'], configuracion['UMBRAL_YUNET'])
+    else:
+        raise ImproperlyConfigured(f"Detector de rostros desconocido: '{backend}'.")
+    return DetectorRostros(motor, configuracion['ESCALA'], configuracion['MIN_SIZE'])
+
+# Devuelve el detector del hilo actual para la configuración indicada, creándolo solo la primera vez
+def obtener_detector(**opciones):
+    configuracion = configuracion_detector(**opciones)
+    clave = tuple(sorted((k, str(v)) for k, v in configuracion.items()))
+    detectores = getattr(_locales, 'detectores', None)
+    if detectores is None:
+        detectores = _locales.detectores = {}
+    detector = detectores.get(clave)
+    if detector is None:
+        detector = detectores[clave] = crear_detector(configuracion)
+    return detector
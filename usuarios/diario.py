@@ -0,0 +1,366 @@
+# --- Diario local de asistencias ---
+# El reconocimiento no escribe las asistencias directamente en la base de datos central
+# (MySQL): si el servidor está lento o no responde, el kiosco se quedaría detenido con la fila
+# de personas esperando. En su lugar, cada asistencia confirmada se anota en un diario local,
+# un archivo SQLite en modo WAL dentro de 'media/diario/', lo que toma menos de un milisegundo.
+# Un hilo en segundo plano ('SincronizadorDiario') copia las anotaciones pendientes a la tabla
+# 'Asistencia' por lotes y, si la base de datos falla, reintenta con esperas crecientes.
+#
+# Cada anotación tiene una clave de idempotencia "<evento>:<usuario>", la misma combinación que
+# la restricción única de 'Asistencia':
+#   - anotar dos veces a la misma persona en el mismo evento no crea otra fila en el diario
+#     (si la anotación ya estaba sincronizada, vuelve a quedar pendiente: la sesión solo vuelve
+#     a anotar a alguien cuyo registro no encontró en la base de datos, por ejemplo porque un
+#     administrador lo borró)
+#   - reenviar un lote (por ejemplo, si se cortó la conexión después del INSERT pero antes de
+#     marcarlo como sincronizado) no crea duplicados en la base de datos central
+# así que varios procesos del mismo equipo pueden compartir el diario y sincronizarlo a la vez.
+# Se configura en 'settings.ASISTENCIA'.
+import logging  # Para informar los errores de sincronización
+import os  # Para crear la carpeta del diario
+import sqlite3  # Base de datos local del diario
+import threading  # Hilo de sincronización y acceso al diario desde varios hilos
+import time  # Para las esperas entre reintentos
+from datetime import datetime, timedelta, timezone as tz  # Fechas de las anotaciones
+from django.conf import settings  # Para leer la configuración y MEDIA_ROOT
+from django.db import DatabaseError, close_old_connections, connection  # Base de datos central
+from .listados import invalidar_conteos  # Conteos de asistencias en caché
+from .metricas import contar, medir  # Tiempos y contadores de la sincronización
+from .models import Asistencia, Evento, Usuario  # Modelos de la base de datos central
+
+logger = logging.getLogger(__name__)
+
+# Configuración por defecto; 'settings.ASISTENCIA' puede sobrescribir cualquiera de estas claves
+CONFIGURACION_POR_DEFECTO = {
+    'DIARIO': True,
+    'INTERVALO_SINCRONIZACION': 1.0,
+    'LOTE_SINCRONIZACION': 500,
+    'ESPERA_MAXIMA': 60,
+    'DIAS_CONSERVAR': 7,
+}
+
+# Estados de una anotación
+PENDIENTE = 0
+SINCRONIZADA = 1
+DESCARTADA = 2  # El usuario o el evento ya no existen en la base de datos central
+
+# Cada cuántos segundos el sincronizador borra las anotaciones antiguas ya sincronizadas
+INTERVALO_PURGA = 3600
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS asistencias (
+    clave TEXT PRIMARY KEY,
+    evento_id INTEGER NOT NULL,
+    usuario_id INTEGER NOT NULL,
+    fecha TEXT NOT NULL,
+    estado INTEGER NOT NULL DEFAULT 0,
+    intentos INTEGER NOT NULL DEFAULT 0,
+    actualizada TEXT
+);
+CREATE INDEX IF NOT EXISTS asistencias_estado ON asistencias (estado);
+CREATE INDEX IF NOT EXISTS asistencias_evento ON asistencias (evento_id, usuario_id);
+"""
+
+# Configuración del diario combinando la de 'settings' y los valores por defecto
+def configuracion_asistencia():
+    configuracion = dict(CONFIGURACION_POR_DEFECTO)
+    configuracion.update(getattr(settings, 'ASISTENCIA', {}))
+    return configuracion
+
+# Ruta por defecto del archivo del diario
+def ruta_diario():
+    return os.path.join(settings.MEDIA_ROOT, "diario", "asistencias.sqlite3")
+
+# Fecha y hora actual en UTC, en el formato en que se guarda en el diario
+def _ahora():
+    return datetime.now(tz.utc).isoformat()
+
+
+class DiarioAsistencias:
+
+    def __init__(self, path=None):
+        self.path = path or ruta_diario()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Una sola conexión compartida por los hilos del proceso, protegida por un lock; cada
+        # operación es muy corta. 'isolation_level=None' deja cada sentencia en su propia transacción.
+        self._lock = threading.Lock()
+        self._conexion = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        # WAL permite leer mientras otro proceso escribe; con 'synchronous=NORMAL' cada escritura
+        # no espera a que el disco confirme (una anotación sobrevive a la caída del programa,
+        # aunque no necesariamente a un corte de energía)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.executescript(ESQUEMA)
+        # Sincronizador asociado (lo crea 'obtener_diario'); se avisa cuando hay anotaciones nuevas
+        self.sincronizador = None
+
+    # Anota la asistencia de un usuario. Si ya estaba anotada y sincronizada (o descartada),
+    # vuelve a quedar pendiente con la fecha nueva. Devuelve False si ya estaba pendiente.
+    def anotar(self, evento_id, usuario_id, fecha=None):
+        fecha = (fecha or datetime.now(tz.utc)).isoformat()
+        with self._lock:
+            cursor = self._conexion.execute(
+                "INSERT INTO asistencias (clave, evento_id, usuario_id, fecha) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (clave) DO UPDATE SET fecha = excluded.fecha, estado = ?, intentos = 0, "
+                "actualizada = NULL WHERE estado != ?",
+                (f"{evento_id}:{usuario_id}", evento_id, usuario_id, fecha, PENDIENTE, PENDIENTE),
+            )
+        return cursor.rowcount == 1
+
+    # IDs de los usuarios anotados en un evento que aún no llegan a la base de datos central.
+    # Las ya sincronizadas no se incluyen: la sesión las obtiene de la tabla 'Asistencia', y si
+    # alguien borró la fila, la persona se puede volver a registrar.
+    def registrados(self, evento_id):
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT usuario_id FROM asistencias WHERE evento_id = ? AND estado = ?", (evento_id, PENDIENTE)
+            ).fetchall()
+        return {usuario_id for usuario_id, in filas}
+
+    # Anotaciones pendientes, en el orden en que se anotaron: [(clave, evento_id, usuario_id, fecha)]
+    def pendientes(self, limite=500):
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT clave, evento_id, usuario_id, fecha FROM asistencias WHERE estado = ? ORDER BY rowid LIMIT ?",
+                (PENDIENTE, limite),
+            ).fetchall()
+        return [(clave, evento_id, usuario_id, datetime.fromisoformat(fecha))
+                for clave, evento_id, usuario_id, fecha in filas]
+
+    # Cambia el estado de varias anotaciones
+    def marcar(self, claves, estado):
+        ahora = _ahora()
+        with self._lock:
+            self._conexion.executemany(
+                "UPDATE asistencias SET estado = ?, actualizada = ? WHERE clave = ?",
+                [(estado, ahora, clave) for clave in claves],
+            )
+
+    # Cambia el estado de anotaciones leídas con 'pendientes', solo si siguen pendientes con la
+    # misma fecha: si una se volvió a anotar mientras se sincronizaba (por ejemplo, porque se borró
+    # su asistencia), la anotación nueva queda pendiente para el lote siguiente
+    def marcar_leidas(self, filas, estado):
+        ahora = _ahora()
+        with self._lock:
+            self._conexion.executemany(
+                "UPDATE asistencias SET estado = ?, actualizada = ? WHERE clave = ? AND fecha = ? AND estado = ?",
+                [(estado, ahora, clave, fecha.isoformat(), PENDIENTE) for clave, _, _, fecha in filas],
+            )
+
+    # Suma un intento fallido a varias anotaciones
+    def sumar_intento(self, claves):
+        with self._lock:
+            self._conexion.executemany(
+                "UPDATE asistencias SET intentos = intentos + 1 WHERE clave = ?", [(clave,) for clave in claves]
+            )
+
+    # Borra las anotaciones ya sincronizadas o descartadas hace más de 'dias' días.
+    # Devuelve cuántas se borraron.
+    def purgar(self, dias):
+        limite = (datetime.now(tz.utc) - timedelta(days=dias)).isoformat()
+        with self._lock:
+            cursor = self._conexion.execute(
+                "DELETE FROM asistencias WHERE estado != ? AND actualizada < ?", (PENDIENTE, limite)
+            )
+        return cursor.rowcount
+
+    # Cantidad de anotaciones por estado
+    def resumen(self):
+        with self._lock:
+            filas = dict(self._conexion.execute("SELECT estado, COUNT(*) FROM asistencias GROUP BY estado").fetchall())
+        return {
+            'pendientes': filas.get(PENDIENTE, 0),
+            'sincronizadas': filas.get(SINCRONIZADA, 0),
+            'descartadas': filas.get(DESCARTADA, 0),
+        }
+
+    # Avisa al sincronizador que hay anotaciones nuevas
+    def avisar(self):
+        if self.sincronizador is not None:
+            self.sincronizador.avisar()
+
+    def cerrar(self):
+        with self._lock:
+            self._conexion.close()
+
+
+# Copia las anotaciones pendientes del diario a la tabla 'Asistencia'
+class SincronizadorDiario:
+
+    def __init__(self, diario, intervalo=None, lote=None, espera_maxima=None, dias_conservar=None):
+        configuracion = configuracion_asistencia()
+        self.diario = diario
+        # Segundos entre revisiones del diario cuando no llegan avisos
+        self.intervalo = intervalo or configuracion['INTERVALO_SINCRONIZACION']
+        self.lote = lote or configuracion['LOTE_SINCRONIZACION']
+        # Espera máxima entre reintentos cuando la base de datos falla
+        self.espera_maxima = espera_maxima or configuracion['ESPERA_MAXIMA']
+        self.dias_conservar = dias_conservar or configuracion['DIAS_CONSERVAR']
+        self._aviso = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._ultima_purga = 0.0
+        self.fallos_seguidos = 0
+        self.ultimo_error = None
+        self.ultimo_error_en = None  # Fecha (time.time()) del último error
+
+    def avisar(self):
+        self._aviso.set()
+
+    # Indica si el hilo de sincronización está en marcha
+    def activo(self):
+        return self._hilo is not None and self._hilo.is_alive()
+
+    # Inicia el hilo de sincronización (una sola vez)
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._ejecutar, name="sincronizador-asistencias", daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self):
+        self._detener.set()
+        self._aviso.set()
+
+    # Copia un lote de anotaciones pendientes. Devuelve cuántas se procesaron (0 si no quedan).
+    # Si la base de datos central falla, la excepción se propaga y el lote queda pendiente.
+    def sincronizar_lote(self):
+        filas = self.diario.pendientes(self.lote)
+        if not filas:
+            return 0
+        claves = [clave for clave, _, _, _ in filas]
+        try:
+            with medir('sincronizar_asistencias'):
+                # Las anotaciones de usuarios o eventos eliminados se descartan antes de insertar:
+                # según la base de datos, la clave foránea fallaría al confirmar la transacción
+                # (SQLite, PostgreSQL) o la fila se omitiría en silencio (MySQL)
+                filas, descartadas = self._separar_inexistentes(filas)
+                self._insertar(filas)
+        except DatabaseError:
+            self.diario.sumar_intento(claves)
+            raise
+        if descartadas:
+            self.diario.marcar_leidas(descartadas, DESCARTADA)
+            logger.warning("Se descartaron %s asistencias de usuarios o eventos eliminados", len(descartadas))
+        self.diario.marcar_leidas(filas, SINCRONIZADA)
+        invalidar_conteos({evento_id for _, evento_id, _, _ in filas})
+        contar('asistencias_sincronizadas', len(filas))
+        return len(claves)
+
+    # Inserta las anotaciones; la restricción única descarta las que ya estaban en la tabla
+    def _insertar(self, filas):
+        if not filas:
+            return
+        Asistencia.objects.bulk_create(
+            [Asistencia(usuario_id=usuario_id, evento_asist_id=evento_id, fecha=fecha)
+             for _, evento_id, usuario_id, fecha in filas],
+            ignore_conflicts=True,
+        )
+
+    # Separa las anotaciones cuyo usuario y evento existen de las que no. Devuelve (válidas, descartadas).
+    def _separar_inexistentes(self, filas):
+        usuarios = set(Usuario.objects.filter(id__in={u for _, _, u, _ in filas}).values_list('id', flat=True))
+        eventos = set(Evento.objects.filter(id__in={e for _, e, _, _ in filas}).values_list('id', flat=True))
+        validas = [fila for fila in filas if fila[2] in usuarios and fila[1] in eventos]
+        descartadas = [fila for fila in filas if fila[2] not in usuarios or fila[1] not in eventos]
+        return validas, descartadas
+
+    # Copia todas las anotaciones pendientes. Devuelve cuántas se procesaron.
+    def sincronizar(self):
+        total = 0
+        while True:
+            cantidad = self.sincronizar_lote()
+            if not cantidad:
+                return total
+            total += cantidad
+
+    # Espera hasta que no queden anotaciones pendientes o pase 'timeout' segundos.
+    # Devuelve True si el diario quedó al día.
+    def vaciar(self, timeout=10):
+        limite = time.monotonic() + timeout
+        while self.diario.resumen()['pendientes']:
+            if time.monotonic() >= limite:
+                return False
+            self.avisar()
+            time.sleep(0.1)
+        return True
+
+    # Cuerpo del hilo: sincroniza cuando llega un aviso o pasa el intervalo; si algo falla (la
+    # base de datos central, el diario bloqueado por otro proceso o cualquier otro error), espera
+    # el doble que la vez anterior (hasta 'espera_maxima') antes de reintentar. El hilo nunca
+    # termina por un error: si terminara, las asistencias se seguirían anotando sin enviarse.
+    def _ejecutar(self):
+        espera = self.intervalo
+        while not self._detener.is_set():
+            self._aviso.wait(espera)
+            self._aviso.clear()
+            if self._detener.is_set():
+                break
+            try:
+                self.sincronizar()
+                if time.monotonic() - self._ultima_purga >= INTERVALO_PURGA:
+                    self.diario.purgar(self.dias_conservar)
+                    self._ultima_purga = time.monotonic()
+                self.fallos_seguidos = 0
+                espera = self.intervalo
+            except Exception as error:
+                self.fallos_seguidos += 1
+                self.ultimo_error = f"{type(error).__name__}: {error}"
+                self.ultimo_error_en = time.time()
+                espera = min(self.espera_maxima, self.intervalo * 2 ** self.fallos_seguidos)
+                if isinstance(error, (DatabaseError, sqlite3.Error)):
+                    logger.warning("No se pudieron sincronizar las asistencias (intento %s, siguiente en %.1f s): %s",
+                                   self.fallos_seguidos, espera, self.ultimo_error)
+                else:
+                    logger.exception("Error inesperado al sincronizar las asistencias (intento %s, siguiente en %.1f s)",
+                                     self.fallos_seguidos, espera)
+                # Descarta la conexión, que pudo quedar rota, para que el próximo intento abra otra
+                connection.close()
+                # Durante la espera no se atienden avisos: se reintenta al cumplirse el plazo
+                self._detener.wait(espera)
+                espera = 0
+            finally:
+                close_old_connections()
+        connection.close()
+
+# Diarios abiertos en este proceso, uno por archivo
+_diarios = {}
+_diarios_lock = threading.Lock()
+
+# Devuelve el diario del proceso con su sincronizador en marcha, o None si el diario está
+# desactivado en 'settings.ASISTENCIA' (las asistencias se guardan directamente)
+def obtener_diario(path=None):
+    if not configuracion_asistencia()['DIARIO']:
+        return None
+    path = os.path.abspath(path or ruta_diario())
+    diario = _diarios.get(path)
+    if diario is None:
+        with _diarios_lock:
+            diario = _diarios.get(path)
+            if diario is None:
+                diario = DiarioAsistencias(path)
+                diario.sincronizador = SincronizadorDiario(diario).iniciar()
+                # Al abrir el diario se envía lo que haya quedado pendiente de ejecuciones anteriores
+                diario.avisar()
+                _diarios[path] = diario
+    return diario
+
+# Estado de los diarios abiertos en este proceso, para '/metrics' y 'modelo/estado/'
+def metricas_diarios():
+    metricas = []
+    for path, diario in list(_diarios.items()):
+        sincronizador = diario.sincronizador
+        try:
+            pendientes = diario.resumen()['pendientes']
+        except sqlite3.Error:
+            # El diario puede estar bloqueado por otro proceso en este momento
+            pendientes = None
+        metricas.append({
+            'path': path,
+            'pendientes': pendientes,
+            'sincronizando': sincronizador.activo(),
+            'fallos_seguidos': sincronizador.fallos_seguidos,
+            'ultimo_error': sincronizador.ultimo_error,
+            'ultimo_error_en': sincronizador.ultimo_error_en,
+        })
+    return metricas
@@ -0,0 +1,235 @@
+# --- Reconocedor basado en vectores de características (embeddings) ---
+# Alternativa al reconocedor LBPH. LBPH compara el histograma de cada rostro con TODOS los
+# histogramas de entrenamiento (usuarios x capturas), así que su tiempo crece con cada usuario
+# enrolado. Este reconocedor calcula un vector compacto por captura y guarda un solo vector
+# por usuario (el promedio o "centroide" de sus capturas) en una matriz float32 contigua.
+# Cada consulta, o un lote completo de consultas, se resuelve con un solo producto de matrices.
+#
+# Extractores disponibles ('settings.RECONOCEDOR["BACKEND"]'):
+#   'lbp'   -> histograma LBP uniforme por celdas (59 valores por celda), calculado con NumPy
+#   'sface' -> red SFace de OpenCV (ONNX, 128 valores), requiere 'MODELO_SFACE'
+# El modelo se guarda en 'media/modelo_embeddings.npz' con la suma de los vectores y la
+# cantidad de capturas de cada usuario, para poder agregar capturas nuevas sin recalcular todo.
+import io  # Para escribir el modelo en memoria antes de guardarlo
+import json  # Para guardar los parámetros del extractor dentro del modelo
+import os  # Para guardar el modelo de forma atómica
+import sys  # Distancia de los rostros sin candidatos
+import cv2  # OpenCV para SFace y para redimensionar
+import numpy as np  # Para los vectores y el producto de matrices
+from django.conf import settings  # Para leer la configuración del reconocedor
+from django.core.exceptions import ImproperlyConfigured  # Error de configuración
+from .almacen import TAMANO_ROSTRO, normalizar_rostro  # Tamaño fijo de los rostros del almacén
+
+# Configuración por defecto; 'settings.RECONOCEDOR' puede sobrescribir cualquiera de estas claves
+CONFIGURACION_POR_DEFECTO = {
+    'BACKEND': 'lbph',
+    'GRILLA_LBP': 8,
+    'MODELO_SFACE': None,
+    'UMBRAL_EMBEDDINGS': 35,
+    'FORMATO_LBPH': 'binario',
+    'PRECISION_LBPH': 'float32',
+}
+
+# Distancia que se devuelve cuando el índice no tiene usuarios: la misma que devuelve LBPH de
+# OpenCV sin coincidencias. Es finita para que se pueda enviar en una respuesta JSON.
+DISTANCIA_MAXIMA = sys.float_info.max
+
+# Devuelve la configuración del reconocedor combinando la de 'settings' y la indicada
+def configuracion_reconocedor(**opciones):
+    configuracion = dict(CONFIGURACION_POR_DEFECTO)
+    configuracion.update(getattr(settings, 'RECONOCEDOR', {}))
+    configuracion.update({clave.upper(): valor for clave, valor in opciones.items()})
+    return configuracion
+
+# Indica si el reconocedor configurado es el de embeddings (y no LBPH)
+def usa_embeddings():
+    return configuracion_reconocedor()['BACKEND'] != 'lbph'
+
+# Tabla que convierte cada código LBP (0-255) en su índice de patrón uniforme (0-58).
+# Los patrones con más de dos transiciones 0/1 comparten el último índice.
+def _tabla_uniforme():
+    tabla = np.full(256, 58, dtype=np.int64)
+    indice = 0
+    for codigo in range(256):
+        bits = [(codigo >> i) & 1 for i in range(8)]
+        transiciones = sum(bits[i] != bits[(i + 1) % 8] for i in range(8))
+        if transiciones <= 2:
+            tabla[codigo] = indice
+            indice += 1
+    return tabla
+
+TABLA_UNIFORME = _tabla_uniforme()
+PATRONES_UNIFORMES = 59
+
+# Extractor de histogramas LBP uniformes. Procesa lotes completos de rostros con NumPy.
+class ExtractorLBP:
+
+    nombre = 'lbp'
+
+    def __init__(self, grilla=8):
+        self.grilla = grilla
+        # Tamaño útil de la imagen de códigos (sin el borde de 1 píxel), múltiplo de la grilla
+        self.celda = (TAMANO_ROSTRO - 2) // grilla
+        self.dimension = grilla * grilla * PATRONES_UNIFORMES
+
+    def parametros(self):
+        return {'extractor': self.nombre, 'grilla': self.grilla}
+
+    # Recibe rostros en escala de grises (una lista o un arreglo (n, alto, ancho)) y devuelve
+    # una matriz float32 (n, dimension) con un vector normalizado por rostro
+    def extraer(self, rostros):
+        if not len(rostros):
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        imagenes = np.stack([normalizar_rostro(r) for r in rostros]).astype(np.int16)
+        n = len(imagenes)
+        centro = imagenes[:, 1:-1, 1:-1]
+        codigos = np.zeros(centro.shape, dtype=np.uint8)
+        # Compara cada píxel con sus 8 vecinos (mismo orden que OpenCV) y arma el código de 8 bits
+        vecinos = ((0, 0), (0, 1), (0, 2), (1, 2), (2, 2), (2, 1), (2, 0), (1, 0))
+        alto, ancho = centro.shape[1:]
+        for bit, (dy, dx) in enumerate(vecinos):
+            codigos |= (imagenes[:, dy:dy+alto, dx:dx+ancho] >= centro).astype(np.uint8) << bit
+
+        # Histograma de patrones uniformes por celda, para todo el lote con un solo 'bincount'
+        lado = self.celda * self.grilla
+        uniformes = TABLA_UNIFORME[codigos[:, :lado, :lado]]
+        filas = np.arange(lado) // self.celda
+        celdas = (filas[:, None] * self.grilla + filas[None, :])
+        indices = (np.arange(n)[:, None, None] * self.grilla * self.grilla + celdas) * PATRONES_UNIFORMES + uniformes
+        histogramas = np.bincount(indices.ravel(), minlength=n * self.dimension)
+        histogramas = histogramas.reshape(n, self.dimension).astype(np.float32)
+        # La raíz cuadrada hace que el producto punto se comporte como la distancia de Hellinger,
+        # más adecuada que la euclidiana para comparar histogramas
+        return normalizar_filas(np.sqrt(histogramas))
+
+# Extractor con la red SFace de OpenCV (vector de 128 valores por rostro)
+class ExtractorSFace:
+
+    nombre = 'sface'
+    dimension = 128
+
+    def __init__(self, modelo):
+        if not modelo or not os.path.exists(modelo):
+            raise ImproperlyConfigured("Configure RECONOCEDOR['MODELO_SFACE'] con la ruta de face_recognition_sface_2021dec.onnx.")
+        self.modelo = modelo
+        self.red = cv2.FaceRecognizerSF.create(modelo, "")
+
+    def parametros(self):
+        return {'extractor': self.nombre}
+
+    def extraer(self, rostros):
+        vectores = np.empty((len(rostros), self.dimension), dtype=np.float32)
+        for i, rostro in enumerate(rostros):
+            # SFace espera un rostro en color de 112x112
+            if rostro.ndim == 2:
+                rostro = cv2.cvtColor(rostro, cv2.COLOR_GRAY2BGR)
+            vectores[i] = self.red.feature(cv2.resize(rostro, (112, 112))).ravel()
+        return normalizar_filas(vectores)
+
+# Normaliza cada fila a largo 1 (así el producto punto es la similitud coseno)
+def normalizar_filas(matriz):
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    return matriz / np.maximum(normas, 1e-12)
+
+# Crea el extractor indicado por la configuración o por los parámetros guardados en un modelo
+def crear_extractor(configuracion=None, parametros=None):
+    configuracion = configuracion or configuracion_reconocedor()
+    nombre = parametros['extractor'] if parametros else configuracion['BACKEND']
+    if nombre == 'lbp':
+        return ExtractorLBP(parametros['grilla'] if parametros else configuracion['GRILLA_LBP'])
+    if nombre == 'sface':
+        return ExtractorSFace(configuracion['MODELO_SFACE'])
+    raise ImproperlyConfigured(f"Reconocedor desconocido: '{nombre}'.")
+
+# Índice de usuarios: suma de vectores y cantidad de capturas por usuario.
+# Los centroides normalizados se calculan una vez y se guardan en una matriz float32 contigua.
+class IndiceEmbeddings:
+
+    def __init__(self, extractor, labels=None, sumas=None, conteos=None):
+        self.extractor = extractor
+        self.labels = np.zeros(0, dtype=np.int32) if labels is None else np.asarray(labels, dtype=np.int32)
+        self.sumas = np.zeros((0, extractor.dimension), dtype=np.float32) if sumas is None else sumas
+        self.conteos = np.zeros(0, dtype=np.int64) if conteos is None else np.asarray(conteos, dtype=np.int64)
+        self._actualizar_centroides()
+
+    def _actualizar_centroides(self):
+        if len(self.labels):
+            self.centroides = np.ascontiguousarray(normalizar_filas(self.sumas / self.conteos[:, None]), dtype=np.float32)
+        else:
+            self.centroides = np.zeros((0, self.extractor.dimension), dtype=np.float32)
+
+    # Agrega los vectores de un grupo de rostros a los usuarios correspondientes
+    def agregar(self, rostros, labels, lote=1000):
+        labels = np.asarray(labels, dtype=np.int32)
+        nuevos = np.setdiff1d(np.unique(labels), self.labels)
+        if len(nuevos):
+            self.labels = np.concatenate([self.labels, nuevos])
+            self.sumas = np.concatenate([self.sumas, np.zeros((len(nuevos), self.extractor.dimension), np.float32)])
+            self.conteos = np.concatenate([self.conteos, np.zeros(len(nuevos), np.int64)])
+        posicion = {int(label): i for i, label in enumerate(self.labels)}
+        filas = np.array([posicion[int(label)] for label in labels], dtype=np.int64)
+        # Extrae por lotes para no tener todos los vectores en memoria a la vez
+        for inicio in range(0, len(labels), lote):
+            vectores = self.extractor.extraer(rostros[inicio:inicio + lote])
+            np.add.at(self.sumas, filas[inicio:inicio + lote], vectores)
+            np.add.at(self.conteos, filas[inicio:inicio + lote], 1)
+        self._actualizar_centroides()
+
+    # Quita los usuarios que no estén en 'ids_validos'
+    def conservar(self, ids_validos):
+        mascara = np.isin(self.labels, np.asarray(list(ids_validos), dtype=np.int32))
+        self.labels, self.sumas, self.conteos = self.labels[mascara], self.sumas[mascara], self.conteos[mascara]
+        self._actualizar_centroides()
+
+    # Devuelve un índice nuevo solo con los usuarios indicados (comparte el extractor)
+    def subconjunto(self, ids):
+        mascara = np.isin(self.labels, np.asarray(list(ids), dtype=np.int32))
+        return IndiceEmbeddings(self.extractor, self.labels[mascara], self.sumas[mascara], self.conteos[mascara])
+
+    # Busca el usuario más parecido para cada vector. Devuelve (labels, distancias), donde la
+    # distancia es 100 * (1 - similitud coseno): 0 es idéntico y valores menores son mejores,
+    # igual que la "confianza" de LBPH.
+    def buscar(self, vectores):
+        similitudes = vectores @ self.centroides.T
+        mejores = np.argmax(similitudes, axis=1)
+        distancias = 100.0 * (1.0 - similitudes[np.arange(len(vectores)), mejores])
+        return self.labels[mejores], distancias
+
+    # Guarda el índice de forma atómica (primero en un temporal y luego lo reemplaza)
+    def guardar(self, path):
+        buffer = io.BytesIO()
+        np.savez(buffer, labels=self.labels, sumas=self.sumas, conteos=self.conteos,
+                 parametros=np.array(json.dumps(self.extractor.parametros())))
+        temporal = f"{path}.tmp"
+        with open(temporal, "wb") as archivo:
+            archivo.write(buffer.getvalue())
+        os.replace(temporal, path)
+
+    @classmethod
+    def cargar(cls, path, configuracion=None):
+        with np.load(path) as datos:
+            parametros = json.loads(str(datos['parametros']))
+            extractor = crear_extractor(configuracion, parametros)
+            return cls(extractor, datos['labels'], datos['sumas'].astype(np.float32), datos['conteos'])
+
+# Reconocedor con la misma interfaz que LBPH ('predict' devuelve (label, confianza)), para que
+# el resto del código lo use sin cambios, más 'predict_lote' para resolver varios rostros juntos
+class ReconocedorEmbeddings:
+
+    def __init__(self, indice, umbral_confianza=None):
+        self.indice = indice
+        # La escala de distancias es distinta a la de LBPH, así que trae su propio umbral
+        self.umbral_confianza = umbral_confianza or configuracion_reconocedor()['UMBRAL_EMBEDDINGS']
+
+    def predict(self, rostro):
+        labels, distancias = self.predict_lote([rostro])
+        return int(labels[0]), float(distancias[0])
+
+    def predict_lote(self, rostros):
+        if not len(self.indice.labels):
+            return np.full(len(rostros), -1, dtype=np.int32), np.full(len(rostros), DISTANCIA_MAXIMA)
+        return self.indice.buscar(self.indice.extractor.extraer(rostros))
+
+    # Memoria que ocupan los centroides y las sumas
+    def bytes_memoria(self):
+        return self.indice.centroides.nbytes + self.indice.sumas.nbytes + self.indice.labels.nbytes
@@ -0,0 +1,282 @@
+# --- Entrenamiento del modelo de reconocimiento facial ---
+# Este módulo contiene la lógica de entrenamiento del reconocedor LBPH y del reconocedor
+# por embeddings ('embeddings.py'); 'settings.RECONOCEDOR["BACKEND"]' elige cuál se usa.
+# Los rostros se leen desde el almacén preprocesado ('almacen.py'); las imágenes del dataset
+# que todavía no están en él se incorporan antes de entrenar.
+# Para no reentrenar desde cero cada vez que se enrola un usuario, se mantiene un
+# manifiesto (archivo JSON) con la cantidad de registros del almacén que ya forman parte
+# del modelo guardado. Los registros nuevos se agregan con 'update()'; el reentrenamiento
+# completo solo se realiza cuando un usuario se elimina o se edita, o cuando cambia o desaparece
+# una imagen que ya estaba en el modelo (su registro del almacén queda borrado).
+# El modelo LBPH se guarda por defecto en el formato binario de 'lbph_binario.py'; OpenCV solo
+# se usa para calcular los histogramas de los rostros.
+import json  # Para leer y escribir el manifiesto
+import os  # Para recorrer carpetas y consultar archivos
+import cv2  # OpenCV para el reconocedor LBPH
+import numpy as np  # Para construir el arreglo de etiquetas
+from django.conf import settings  # Para obtener la carpeta MEDIA_ROOT
+from .almacen import ETIQUETA_BORRADA, AlmacenRostros  # Almacén preprocesado de rostros
+from .carga_paralela import cargar_dataset  # Carga del dataset en varios procesos
+from .embeddings import IndiceEmbeddings, crear_extractor, usa_embeddings  # Reconocedor por embeddings
+from .lbph_binario import (agregar_lbph, crear_lbph_como, es_modelo_binario, exportar_lbph,
+                           nombre_manifiesto_lbph, nombre_modelo_lbph)  # Modelo LBPH binario
+from .metricas import medir  # Tiempo de cada fase del entrenamiento
+from .models import Usuario  # Modelo de usuarios, para detectar usuarios eliminados
+
+# Construye una ruta dentro de la carpeta 'media' del proyecto
+def ruta_media(*partes):
+    return os.path.join(settings.MEDIA_ROOT, *partes)
+
+# Rutas por defecto del dataset, del modelo y de su manifiesto
+def ruta_dataset():
+    return ruta_media("dataset")
+
+def ruta_modelo():
+    return ruta_media("modelo_embeddings.npz" if usa_embeddings() else nombre_modelo_lbph())
+
+def ruta_manifiesto():
+    return ruta_media("modelo_embeddings_manifiesto.json" if usa_embeddings() else nombre_manifiesto_lbph())
+
+# Lee el manifiesto del modelo. Si no existe o está dañado, devuelve None
+def cargar_manifiesto(path=None):
+    path = path or ruta_manifiesto()
+    try:
+        with open(path, "r", encoding="utf-8") as archivo:
+            return json.load(archivo)
+    except (OSError, ValueError):
+        return None
+
+# Guarda el reconocedor de forma atómica: primero en un archivo temporal de la misma carpeta y
+# luego lo reemplaza, para que quien lea el modelo nunca encuentre un archivo a medio escribir.
+# El temporal conserva la extensión porque OpenCV elige el formato según ella.
+def guardar_modelo(recognizer, path_modelo):
+    base, extension = os.path.splitext(path_modelo)
+    temporal = f"{base}.tmp{extension}"
+    recognizer.save(temporal)
+    os.replace(temporal, path_modelo)
+
+# Guarda el manifiesto de forma atómica (primero en un archivo temporal y luego lo reemplaza)
+def guardar_manifiesto(manifiesto, path=None):
+    path = path or ruta_manifiesto()
+    temporal = f"{path}.tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        json.dump(manifiesto, archivo)
+    os.replace(temporal, path)
+
+# Marca el modelo para que el próximo entrenamiento sea completo (por ejemplo, al editar un usuario).
+# Sin 'path' se marcan los manifiestos de todos los reconocedores y formatos, por si luego se cambia de uno a otro.
+def marcar_reentrenamiento_completo(path=None):
+    paths = [path] if path else [ruta_media("modelo_lbph_manifiesto.json"),
+                                 ruta_media(nombre_manifiesto_lbph("modelo_lbph.bin")),
+                                 ruta_media("modelo_embeddings_manifiesto.json")]
+    for path_manifiesto in paths:
+        manifiesto = cargar_manifiesto(path_manifiesto)
+        # Si no hay manifiesto, el próximo entrenamiento ya será completo
+        if manifiesto is None:
+            continue
+        manifiesto["reentrenar"] = True
+        guardar_manifiesto(manifiesto, path_manifiesto)
+
+# Carpeta del dataset de un usuario ("<id>_<nombre>", sin separadores de ruta). Si el usuario ya
+# tiene una carpeta se reutiliza aunque su nombre haya cambiado, así una nueva captura reemplaza a
+# las anteriores en lugar de duplicarlas en otra carpeta.
+def carpeta_usuario(usuario_id, nombre, data_path=None):
+    data_path = data_path or ruta_dataset()
+    prefijo = f"{usuario_id}_"
+    if os.path.isdir(data_path):
+        existentes = sorted(c for c in os.listdir(data_path)
+                            if c.startswith(prefijo) and os.path.isdir(os.path.join(data_path, c)))
+        if existentes:
+            return existentes[0]
+    return f"{prefijo}{nombre}".replace("/", "_").replace("\\", "_")
+
+# Recorre el dataset y devuelve, por usuario, las imágenes con su tamaño y fecha de modificación
+# Resultado: {"<id>": {"<carpeta>/<archivo>": [tamaño, mtime_ns]}}
+def escanear_dataset(data_path=None):
+    data_path = data_path or ruta_dataset()
+    inventario = {}
+    if not os.path.isdir(data_path):
+        return inventario
+
+    for carpeta in os.listdir(data_path):
+        carpeta_path = os.path.join(data_path, carpeta)
+        if not os.path.isdir(carpeta_path):
+            continue
+        # Extrae el ID del usuario del nombre de la carpeta (ej: "1_Nombre")
+        label = carpeta.split("_")[0]
+        if not label.isdigit():
+            continue
+        archivos = inventario.setdefault(str(int(label)), {})
+        for file in os.listdir(carpeta_path):
+            estado = os.stat(os.path.join(carpeta_path, file))
+            archivos[f"{carpeta}/{file}"] = [estado.st_size, estado.st_mtime_ns]
+    return inventario
+
+# Pone el almacén de rostros al día con el dataset: borra los registros de las imágenes que ya no
+# existen y agrega las nuevas o modificadas (por ejemplo, capturas antiguas, importadas o
+# repetidas), reemplazando su registro anterior. Devuelve cuántos rostros se agregaron.
+# Los índices de versiones anteriores no saben qué registro corresponde a cada imagen: la primera
+# vez se borran esos registros y sus imágenes se vuelven a agregar.
+def sincronizar_almacen(almacen, ids_validos, data_path=None, procesos=None, progreso=None):
+    data_path = data_path or ruta_dataset()
+    inventario = escanear_dataset(data_path)
+    firmas_actuales = {relativo: firma for archivos in inventario.values() for relativo, firma in archivos.items()}
+    origenes = almacen.origenes()
+    quitar = [relativo for relativo, entrada in origenes.items()
+              if len(entrada) < 3 or relativo not in firmas_actuales]
+    almacen.recolectar(quitar)
+    for relativo in quitar:
+        origenes.pop(relativo, None)
+    pendientes = [
+        (label, relativo)
+        for label, archivos in inventario.items() if label in ids_validos
+        for relativo, firma in archivos.items() if origenes.get(relativo, [])[:2] != firma
+    ]
+    if not pendientes:
+        return 0
+    # Desencripta y decodifica las imágenes en paralelo, una carpeta de usuario por tarea
+    imagenes, labels, leidos = cargar_dataset(pendientes, data_path, procesos, progreso=progreso)
+    if len(imagenes):
+        firmas = {relativo: inventario[str(label)][relativo] for label, relativo in zip(labels, leidos)}
+        almacen.agregar(imagenes, labels, firmas)
+    return len(imagenes)
+
+# Decide si se debe reentrenar desde cero comparando el manifiesto con el estado actual
+def requiere_entrenamiento_completo(manifiesto, almacen, ids_existentes, path_modelo):
+    # Sin modelo o sin manifiesto no hay nada sobre lo que actualizar
+    if manifiesto is None or not os.path.exists(path_modelo):
+        return True
+    # Un usuario fue editado desde el último entrenamiento
+    if manifiesto.get("reentrenar"):
+        return True
+    # Un usuario del modelo fue eliminado de la base de datos
+    if any(label not in ids_existentes for label in manifiesto.get("usuarios", [])):
+        return True
+    # El almacén se reconstruyó o perdió registros desde el último entrenamiento
+    if manifiesto.get("registros", 0) > len(almacen):
+        return True
+    # Una imagen que ya estaba en el modelo cambió o se eliminó: su rostro anterior sigue en el
+    # modelo y 'update()' no lo puede quitar
+    return almacen.borrados(manifiesto.get("registros", 0)) > manifiesto.get("borrados", 0)
+
+# Prepara un entrenamiento: incorpora las capturas nuevas al almacén, decide si debe ser
+# completo y lee los rostros necesarios. Devuelve (completo, imágenes, etiquetas, IDs existentes).
+def preparar_entrenamiento(incremental, data_path, path_modelo, path_manifiesto, almacen, procesos, progreso):
+    # Adapta la función de progreso a cada fase del entrenamiento
+    def avance(fase):
+        if progreso is None:
+            return None
+        return lambda cargadas, total: progreso(fase, cargadas, total)
+
+    # Solo se entrenan los rostros de usuarios que siguen existiendo en la base de datos
+    ids_existentes = {str(i) for i in Usuario.objects.values_list("id", flat=True)}
+    # Incorpora al almacén las imágenes del dataset que aún no estén en él
+    with medir('sincronizar_almacen'):
+        sincronizar_almacen(almacen, ids_existentes, data_path, procesos, avance("sincronizando"))
+    manifiesto = cargar_manifiesto(path_manifiesto)
+
+    completo = not incremental or requiere_entrenamiento_completo(
+        manifiesto, almacen, ids_existentes, path_modelo
+    )
+
+    with medir('leer_almacen'):
+        if completo:
+            # Quita del almacén los rostros de usuarios eliminados y lee todo en una sola pasada
+            almacen.compactar([int(i) for i in ids_existentes])
+            imagenes, labels = almacen.leer(ids_validos=[int(i) for i in ids_existentes],
+                                            progreso=avance("leyendo"))
+        else:
+            # Solo los registros agregados después del último entrenamiento
+            imagenes, labels = almacen.leer(desde=manifiesto.get("registros", 0),
+                                            ids_validos=[int(i) for i in ids_existentes],
+                                            progreso=avance("leyendo"))
+
+    if progreso:
+        progreso("entrenando", len(imagenes), len(imagenes))
+    return completo, imagenes, labels, ids_existentes
+
+# Actualiza el manifiesto con el estado actual del almacén
+def actualizar_manifiesto(almacen, ids_existentes, path_manifiesto):
+    etiquetas = almacen.etiquetas()
+    usuarios = sorted({str(label) for label in np.unique(etiquetas)} & ids_existentes)
+    guardar_manifiesto({"reentrenar": False, "registros": len(etiquetas), "usuarios": usuarios,
+                        "borrados": int(np.count_nonzero(etiquetas == ETIQUETA_BORRADA))},
+                       path_manifiesto)
+
+# Entrena el modelo LBPH a partir del almacén de rostros. Por defecto es incremental: solo
+# agrega los rostros que entraron al almacén después del último entrenamiento.
+# Si 'path_modelo' termina en '.bin' se guarda en el formato binario; si no, como .yml de OpenCV.
+# Devuelve un diccionario con el modo usado y el número de imágenes procesadas.
+# 'progreso' es una función opcional que recibe (fase, imágenes cargadas, total de la fase).
+def entrenar_modelo_lbph(incremental=True, data_path=None, path_modelo=None, path_manifiesto=None,
+                         almacen=None, procesos=None, progreso=None):
+    path_modelo = path_modelo or ruta_media(nombre_modelo_lbph())
+    path_manifiesto = path_manifiesto or ruta_media(nombre_manifiesto_lbph(path_modelo))
+    almacen = almacen or AlmacenRostros()
+    completo, imagenes, labels, ids_existentes = preparar_entrenamiento(
+        incremental, data_path, path_modelo, path_manifiesto, almacen, procesos, progreso
+    )
+    resultado = {"modo": "completo" if completo else "incremental", "imagenes": len(imagenes)}
+
+    if es_modelo_binario(path_modelo):
+        if completo:
+            recognizer = cv2.face.LBPHFaceRecognizer_create()
+            recognizer.train(list(imagenes), labels.astype(np.int32))
+            exportar_lbph(recognizer, path_modelo)
+        elif len(imagenes):
+            # Solo se calculan los histogramas de las imágenes nuevas (con los parámetros del
+            # modelo guardado) y se agregan al archivo, sin leer el modelo completo en OpenCV
+            recognizer = crear_lbph_como(path_modelo)
+            recognizer.train(list(imagenes), labels.astype(np.int32))
+            agregar_lbph(path_modelo, recognizer)
+        actualizar_manifiesto(almacen, ids_existentes, path_manifiesto)
+        return resultado
+
+    # Crea una instancia del reconocedor de rostros LBPH
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    if completo:
+        # Entrena el reconocedor con todas las imágenes y sus etiquetas
+        recognizer.train(list(imagenes), labels.astype(np.int32))
+        # Guarda el modelo entrenado en un archivo .yml
+        guardar_modelo(recognizer, path_modelo)
+    elif len(imagenes):
+        # Carga el modelo existente y le agrega solo las imágenes nuevas
+        recognizer.read(path_modelo)
+        recognizer.update(list(imagenes), labels.astype(np.int32))
+        guardar_modelo(recognizer, path_modelo)
+
+    actualizar_manifiesto(almacen, ids_existentes, path_manifiesto)
+    return resultado
+
+# Entrena el reconocedor por embeddings: calcula el vector de cada rostro y acumula la suma y
+# la cantidad de capturas por usuario. En modo incremental solo se procesan los rostros nuevos.
+# Recibe los mismos parámetros y devuelve lo mismo que 'entrenar_modelo_lbph'.
+def entrenar_modelo_embeddings(incremental=True, data_path=None, path_modelo=None, path_manifiesto=None,
+                               almacen=None, procesos=None, progreso=None):
+    path_modelo = path_modelo or ruta_media("modelo_embeddings.npz")
+    path_manifiesto = path_manifiesto or ruta_media("modelo_embeddings_manifiesto.json")
+    almacen = almacen or AlmacenRostros()
+    completo, imagenes, labels, ids_existentes = preparar_entrenamiento(
+        incremental, data_path, path_modelo, path_manifiesto, almacen, procesos, progreso
+    )
+    resultado = {"modo": "completo" if completo else "incremental", "imagenes": len(imagenes)}
+
+    if completo:
+        indice = IndiceEmbeddings(crear_extractor())
+    else:
+        indice = IndiceEmbeddings.cargar(path_modelo)
+    if completo or len(imagenes):
+        indice.agregar(imagenes, labels)
+        # Quita a los usuarios eliminados de la base de datos
+        indice.conservar([int(i) for i in ids_existentes])
+        indice.guardar(path_modelo)
+
+    actualizar_manifiesto(almacen, ids_existentes, path_manifiesto)
+    return resultado
+
+# Entrena el reconocedor elegido en 'settings.RECONOCEDOR'
+def entrenar_modelo(**opciones):
+    with medir('entrenar'):
+        if usa_embeddings():
+            return entrenar_modelo_embeddings(**opciones)
+        return entrenar_modelo_lbph(**opciones)
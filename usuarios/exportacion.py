@@ -0,0 +1,101 @@
+# --- Exportación de asistencias a CSV ---
+# Genera el CSV de asistencias (con los datos del usuario y del evento) línea a línea, leyendo
+# la base de datos por lotes. Así la memoria usada no depende de la cantidad de filas, tanto en
+# la vista de descarga (StreamingHttpResponse) como en el comando 'exportar_asistencias'.
+# La vista es asíncrona y usa 'lineas_csv_async': con ASGI, un iterador síncrono en una
+# StreamingHttpResponse se consume completo en memoria antes de enviarlo.
+#
+# Los lotes se piden por clave ('id' mayor que el último leído) en lugar de usar
+# '.iterator()': con MySQL el controlador descarga el resultado completo de una consulta a la
+# memoria aunque se recorra con un iterador, así que solo consultas acotadas mantienen la
+# memoria constante.
+import csv  # Para escribir las filas con el formato CSV correcto
+from asgiref.sync import sync_to_async  # Para leer cada lote desde la vista asíncrona
+from django.utils import timezone  # Para mostrar las fechas en la zona horaria local
+from .models import Asistencia  # Modelo de asistencias
+
+# Filas que se leen de la base de datos en cada consulta
+TAMANO_LOTE = 2000
+
+# Encabezados del CSV y columnas que se leen para cada fila (el 'id' va primero para los lotes)
+ENCABEZADOS = ['RUT', 'Nombre', 'Carrera', 'Evento', 'Fecha del evento', 'Fecha de registro']
+COLUMNAS = ['id', 'usuario__rut', 'usuario__nombre', 'usuario__carrera',
+            'evento_asist__nom_evento', 'evento_asist__fecha', 'fecha']
+
+# Asistencias a exportar, con los filtros opcionales por evento, rango de fechas y carrera
+def asistencias_exportables(evento_id=None, desde=None, hasta=None, carrera=None):
+    asistencias = Asistencia.objects.all()
+    if evento_id:
+        asistencias = asistencias.filter(evento_asist_id=evento_id)
+    if desde:
+        asistencias = asistencias.filter(fecha__date__gte=desde)
+    if hasta:
+        asistencias = asistencias.filter(fecha__date__lte=hasta)
+    if carrera:
+        asistencias = asistencias.filter(usuario__carrera=carrera)
+    return asistencias
+
+# Caracteres con que Excel y LibreOffice interpretan una celda como fórmula
+INICIOS_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+# Lee las filas (tuplas con las COLUMNAS) del lote que sigue al 'id' indicado
+def leer_lote(asistencias, ultimo, tamano_lote=TAMANO_LOTE):
+    return list(asistencias.order_by('id').values_list(*COLUMNAS).filter(id__gt=ultimo)[:tamano_lote])
+
+# Recorre las filas (tuplas con las COLUMNAS) de 'tamano_lote' en 'tamano_lote'
+def filas_por_lotes(asistencias, tamano_lote=TAMANO_LOTE):
+    ultimo = 0
+    while True:
+        lote = leer_lote(asistencias, ultimo, tamano_lote)
+        yield from lote
+        if len(lote) < tamano_lote:
+            return
+        ultimo = lote[-1][0]
+
+# Antepone un apóstrofo a los textos que una planilla ejecutaría como fórmula (inyección en CSV),
+# por ejemplo un nombre o evento que empieza con '=HYPERLINK(...)'
+def escapar_celda(valor):
+    if isinstance(valor, str) and valor.startswith(INICIOS_FORMULA):
+        return f"'{valor}"
+    return valor
+
+# Objeto con la interfaz de archivo que devuelve lo escrito en lugar de guardarlo, para que
+# 'csv.writer' produzca cada línea como texto
+class _Eco:
+
+    def write(self, valor):
+        return valor
+
+# Línea del encabezado. 'bom' antepone la marca UTF-8 para que Excel reconozca los acentos.
+def _encabezado(escritor, bom):
+    return ("\ufeff" if bom else "") + escritor.writerow(ENCABEZADOS)
+
+# Línea CSV de una fila
+def _linea(escritor, fila):
+    _, rut, nombre, carrera, evento, fecha_evento, fecha = fila
+    return escritor.writerow([
+        escapar_celda(rut), escapar_celda(nombre), escapar_celda(carrera or ''), escapar_celda(evento),
+        fecha_evento.isoformat(), timezone.localtime(fecha).strftime('%Y-%m-%d %H:%M:%S'),
+    ])
+
+# Genera el CSV línea a línea
+def lineas_csv(asistencias, tamano_lote=TAMANO_LOTE, bom=True):
+    escritor = csv.writer(_Eco())
+    yield _encabezado(escritor, bom)
+    for fila in filas_por_lotes(asistencias, tamano_lote):
+        yield _linea(escritor, fila)
+
+# Igual que 'lineas_csv', pero como generador asíncrono: cada lote se lee en el hilo de la base
+# de datos con 'sync_to_async' y se envía antes de pedir el siguiente
+async def lineas_csv_async(asistencias, tamano_lote=TAMANO_LOTE, bom=True):
+    escritor = csv.writer(_Eco())
+    yield _encabezado(escritor, bom)
+    ultimo = 0
+    while True:
+        lote = await sync_to_async(leer_lote)(asistencias, ultimo, tamano_lote)
+        # Un bloque por lote: menos escrituras al socket que una por línea
+        if lote:
+            yield "".join(_linea(escritor, fila) for fila in lote)
+        if len(lote) < tamano_lote:
+            return
+        ultimo = lote[-1][0]
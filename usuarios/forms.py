@@ -1,4 +1,5 @@
 from django import forms
+from .rut import normalizar_rut
 from .models import Usuario, Evento
 
 # Define un formulario de Django basado en el modelo 'Usuario'.
@@ -10,6 +11,10 @@ class UsuarioForm(forms.ModelForm):
         # Lista los campos del modelo que se incluirán en el formulario.
         fields = ['nombre', 'rut', 'carrera']
 
+    # Normaliza el RUT antes de validar que sea único, así '12.345.678-9' y '12345678-9' chocan
+    def clean_rut(self):
+        return normalizar_rut(self.cleaned_data.get('rut'))
+
 # Define un formulario de Django basado en el modelo 'Evento'.
 # Este formulario se utiliza para la creación y edición de eventos.
 class EventoForm(forms.ModelForm):
@@ -17,7 +22,7 @@ class EventoForm(forms.ModelForm):
         # Vincula el formulario al modelo 'Evento'.
         model = Evento
         # Define los campos del modelo que se mostrarán en el formulario.
-        fields = ['nom_evento', 'fecha', 'relator', 'descripcion', 'estado']
+        fields = ['nom_evento', 'fecha', 'relator', 'descripcion', 'estado', 'invitados']
 
         # 'widgets' permite personalizar cómo se renderizan los campos del formulario en HTML.
         widgets = {
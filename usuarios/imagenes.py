@@ -0,0 +1,58 @@
+# --- Almacén de imágenes de perfil ---
+# Las imágenes de perfil de los usuarios no se guardan en la tabla de usuarios (donde cualquier
+# consulta las arrastraba por la conexión a la base de datos) sino en archivos encriptados con
+# la clave de la aplicación, dentro de 'media/imagenes/'. Cada archivo se nombra con el SHA-256
+# del contenido original ("direccionado por contenido"):
+#   - el usuario solo guarda la huella (64 caracteres)
+#   - imágenes idénticas se guardan una sola vez
+#   - un archivo nunca cambia después de escrito, así que se puede leer sin bloqueos
+# Los archivos se reparten en subcarpetas según los dos primeros caracteres de la huella para
+# no tener miles de archivos en una sola carpeta.
+import hashlib  # Para calcular la huella del contenido
+import os  # Para rutas y archivos
+from django.conf import settings  # Para obtener la carpeta MEDIA_ROOT
+from .cifrado import obtener_servicio  # Encriptación con la clave de la aplicación
+
+
+class AlmacenImagenes:
+
+    def __init__(self, carpeta=None):
+        # Por defecto el almacén vive en 'media/imagenes'
+        self.carpeta = carpeta or os.path.join(settings.MEDIA_ROOT, "imagenes")
+
+    # Ruta del archivo de una huella
+    def ruta(self, huella):
+        return os.path.join(self.carpeta, huella[:2], f"{huella}.bin")
+
+    def existe(self, huella):
+        return os.path.exists(self.ruta(huella))
+
+    # Encripta y guarda los bytes de una imagen; devuelve su huella. Si ya estaba guardada no
+    # se vuelve a escribir.
+    def guardar(self, datos):
+        huella = hashlib.sha256(datos).hexdigest()
+        path = self.ruta(huella)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temporal = f"{path}.{os.getpid()}.tmp"
+            with open(temporal, "wb") as archivo:
+                archivo.write(obtener_servicio().encriptar(datos))
+            # Reemplaza de una sola vez para que nunca se lea un archivo a medio escribir
+            os.replace(temporal, path)
+        return huella
+
+    # Lee y desencripta la imagen de una huella; devuelve None si no existe
+    def leer(self, huella):
+        try:
+            with open(self.ruta(huella), "rb") as archivo:
+                token = archivo.read()
+        except FileNotFoundError:
+            return None
+        return obtener_servicio().desencriptar(token)
+
+    # Elimina el archivo de una huella (solo si ningún usuario la usa; lo decide quien llama)
+    def eliminar(self, huella):
+        try:
+            os.remove(self.ruta(huella))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,155 @@
+# --- Importación masiva de usuarios con fotos ---
+# Funciones usadas por el comando 'importar_usuarios' para enrolar a muchos usuarios de una
+# vez a partir de un CSV (nombre, rut, carrera) y de una carpeta o archivo ZIP con fotos.
+# Las fotos se asocian a cada usuario por su RUT, de cualquiera de estas dos formas:
+#   <rut>/foto1.jpg, <rut>/foto2.jpg ...   (una carpeta por usuario)
+#   <rut>.jpg, <rut>_2.jpg ...             (el RUT al inicio del nombre del archivo)
+# Si el nombre del archivo empieza con un RUT se usa ese, aunque esté dentro de otra carpeta
+# (por ejemplo 'fotos/12345678-9.jpg'); si no, se usa la carpeta que contiene la foto.
+#
+# Cada usuario es una tarea de un proceso de trabajo: lee sus fotos, detecta el rostro más
+# grande, revisa su calidad con 'FiltroCapturas', lo encripta en memoria y lo escribe en el
+# dataset con la misma estructura que 'capturar_imagenes'. El proceso devuelve los rostros
+# normalizados para agregarlos al almacén de entrenamiento y los archivos que fallaron.
+#
+# Igual que en 'carga_paralela', las tareas no usan Django: reciben las claves de encriptación
+# y las configuraciones del detector y de la captura ya calculadas.
+#
+# Los RUT que devuelve este módulo ya están normalizados con 'normalizar_rut', pero quien cree
+# usuarios con ellos debe normalizar también los suyos: 'bulk_create' no llama a 'Usuario.save',
+# que es donde se normaliza el RUT al guardar (el comando 'importar_usuarios' lo hace al leer el CSV).
+import hashlib  # Para nombrar los archivos importados según su contenido
+import os  # Para rutas y carpetas
+import re  # Para reconocer un RUT en el nombre de una foto
+import zipfile  # Para leer las fotos desde un ZIP
+import cv2  # OpenCV para decodificar las fotos
+import numpy as np  # Para manejar las imágenes como arreglos
+from cryptography.fernet import InvalidToken  # Error al desencriptar un rostro ya importado
+from .calidad import FiltroCapturas  # Control de calidad y duplicados
+from .carga_paralela import _fernet_proceso  # Objeto MultiFernet reutilizado en cada proceso
+from .cifrado import leer_imagen_encriptada  # Para leer los rostros ya importados
+from .detectores import crear_detector  # Detector de rostros
+from .rut import normalizar_rut  # Forma en que se guardan los RUT
+
+# Extensiones de imagen que se importan
+EXTENSIONES = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+# Lado máximo al que se reduce una foto antes de detectar (las fotos de cámara son muy grandes)
+LADO_MAXIMO = 1280
+
+# Forma de un RUT ya normalizado: el número y el dígito verificador, con o sin guion
+PATRON_RUT = re.compile(r'^\d{6,8}-?[\dK]$')
+
+# Detectores creados en cada proceso de trabajo, uno por configuración
+_detectores = {}
+
+# RUT al que pertenece una foto según su ruta relativa dentro de la carpeta o del ZIP:
+# el del inicio del nombre del archivo si lo tiene, o si no el de la carpeta que la contiene
+def rut_de_foto(relativo):
+    partes = relativo.replace('\\', '/').split('/')
+    rut = normalizar_rut(os.path.splitext(partes[-1])[0].split('_')[0])
+    if PATRON_RUT.match(rut) or len(partes) == 1:
+        return rut
+    return normalizar_rut(partes[-2])
+
+# Lista las fotos de una carpeta o ZIP y las agrupa por RUT: {rut: [ruta relativa, ...]}
+def listar_fotos(origen):
+    if zipfile.is_zipfile(origen):
+        with zipfile.ZipFile(origen) as archivo:
+            nombres = [n for n in archivo.namelist() if not n.endswith('/') and '__MACOSX' not in n]
+    else:
+        nombres = [
+            os.path.relpath(os.path.join(raiz, nombre), origen).replace(os.sep, '/')
+            for raiz, _, archivos in os.walk(origen) for nombre in archivos
+        ]
+    fotos = {}
+    for nombre in sorted(nombres):
+        if os.path.splitext(nombre)[1].lower() in EXTENSIONES:
+            fotos.setdefault(rut_de_foto(nombre), []).append(nombre)
+    return fotos
+
+# Devuelve (y guarda para las siguientes tareas) el detector del proceso para una configuración
+def _detector_proceso(configuracion):
+    clave = tuple(sorted((k, str(v)) for k, v in configuracion.items()))
+    detector = _detectores.get(clave)
+    if detector is None:
+        detector = _detectores[clave] = crear_detector(configuracion)
+    return detector
+
+# Lee los bytes de una foto de la carpeta o del ZIP ya abierto
+def _leer_foto(origen, archivo_zip, relativo):
+    if archivo_zip is not None:
+        return archivo_zip.read(relativo)
+    with open(os.path.join(origen, relativo), 'rb') as archivo:
+        return archivo.read()
+
+# Tarea de un proceso de trabajo: importa las fotos de un usuario.
+# Devuelve (id del usuario, rostros normalizados, firmas {"<carpeta>/<archivo>": [tamaño, mtime_ns]},
+# fallos [(foto, motivo)], omitidas). Las fotos cuyo archivo ya existe en el dataset se omiten,
+# así el comando se puede volver a ejecutar sin duplicar capturas.
+def importar_fotos_usuario(tarea):
+    (usuario_id, carpeta, fotos, origen, data_path, claves,
+     configuracion_detector, configuracion_captura) = tarea
+    fernet = _fernet_proceso(claves)
+    detector = _detector_proceso(configuracion_detector)
+    filtro = FiltroCapturas(configuracion_captura)
+    destino = os.path.join(data_path, carpeta)
+
+    rostros, firmas, fallos, omitidas = [], {}, [], 0
+    archivo_zip = zipfile.ZipFile(origen) if zipfile.is_zipfile(origen) else None
+    try:
+        for relativo in fotos:
+            try:
+                datos = _leer_foto(origen, archivo_zip, relativo)
+            except (OSError, KeyError, zipfile.BadZipFile):
+                fallos.append((relativo, 'no se pudo leer'))
+                continue
+            nombre = f"importado_{hashlib.sha1(datos).hexdigest()[:16]}.jpg"
+            path = os.path.join(destino, nombre)
+            if os.path.exists(path):
+                # Se omite, pero el filtro debe conocerla para descartar las fotos parecidas
+                # que se rechazaron como duplicadas la primera vez
+                try:
+                    anterior = leer_imagen_encriptada(path, fernet)
+                except (OSError, InvalidToken):
+                    anterior = None
+                if anterior is not None:
+                    filtro.registrar(anterior)
+                omitidas += 1
+                continue
+
+            frame = cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                fallos.append((relativo, 'no es una imagen válida'))
+                continue
+            alto, ancho = frame.shape[:2]
+            if max(alto, ancho) > LADO_MAXIMO:
+                factor = LADO_MAXIMO / max(alto, ancho)
+                frame = cv2.resize(frame, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA)
+            gris = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+            detectados = detector.detectar(frame, gris)
+            if len(detectados) == 0:
+                fallos.append((relativo, 'sin rostro'))
+                continue
+            # Si hay varios rostros se usa el más grande (la persona retratada)
+            x, y, w, h = max(detectados, key=lambda r: int(r[2]) * int(r[3]))
+            aceptado, motivo, rostro = filtro.evaluar(gris[y:y+h, x:x+w])
+            if not aceptado:
+                fallos.append((relativo, motivo))
+                continue
+
+            # Codifica y encripta en memoria; el rostro en claro nunca se escribe en disco
+            ok, buffer = cv2.imencode('.jpg', rostro)
+            if not ok:
+                fallos.append((relativo, 'no se pudo codificar'))
+                continue
+            os.makedirs(destino, exist_ok=True)
+            with open(path, 'wb') as archivo:
+                archivo.write(fernet.encrypt(buffer.tobytes()))
+            estado = os.stat(path)
+            firmas[f"{carpeta}/{nombre}"] = [estado.st_size, estado.st_mtime_ns]
+            rostros.append(rostro)
+    finally:
+        if archivo_zip is not None:
+            archivo_zip.close()
+    return usuario_id, rostros, firmas, fallos, omitidas
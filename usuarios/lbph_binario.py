@@ -0,0 +1,284 @@
+# --- Modelo LBPH en formato binario mapeado en memoria ---
+# 'LBPHFaceRecognizer.save' escribe el modelo como YAML de texto: el archivo es varias veces
+# más grande que los datos, tarda en leerse y cada proceso que lo carga guarda su propia copia
+# de todos los histogramas. Este módulo guarda el mismo modelo en un archivo binario
+#   [cabecera de 4 KB: firma, versión y parámetros en JSON]
+#   [etiquetas: int32 por histograma]
+#   [sumas: float64 por histograma, la suma de sus valores]
+#   [histogramas: matriz contigua (dimensión x cantidad) float32 o float16]
+# que se abre con 'numpy.memmap': no hay nada que interpretar al cargarlo y todos los procesos
+# que lo usan comparten las mismas páginas de la caché del sistema operativo.
+# 'ReconocedorLBPHBinario' predice directamente sobre esa matriz y reproduce a LBPH de OpenCV:
+# el mismo código LBP circular (elbp), el mismo histograma por celdas y el vecino más cercano
+# con la distancia chi-cuadrado alternativa (HISTCMP_CHISQR_ALT).
+# La matriz se guarda por posición del histograma (una fila por posición, con el valor de todos
+# los histogramas del modelo): cada consulta solo lee las filas de las posiciones donde ella no
+# es cero, que son filas contiguas del archivo, y las demás páginas ni se tocan.
+import json  # Para los parámetros de la cabecera
+import math  # Para las posiciones de los vecinos del código LBP
+import os  # Para guardar el archivo de forma atómica
+import struct  # Para la firma y el largo de la cabecera
+import sys  # Distancia máxima, como la que devuelve OpenCV sin coincidencias
+import numpy as np  # Para los histogramas y las distancias
+from .embeddings import configuracion_reconocedor  # Configuración del reconocedor
+
+# Firma y versión del formato
+FIRMA = b"LBPHBIN\x00"
+VERSION = 1
+# Tamaño fijo de la cabecera; los datos empiezan alineados después de ella
+TAMANO_CABECERA = 4096
+ALINEACION = 64
+# Posiciones del histograma que se procesan a la vez (limita la memoria temporal de cada
+# consulta y de la escritura del archivo)
+POSICIONES_POR_BLOQUE = 512
+# Distancia que devuelve OpenCV cuando ningún histograma está bajo el umbral
+DISTANCIA_MAXIMA = sys.float_info.max
+EPSILON_FLOAT32 = np.finfo(np.float32).eps
+
+# Nombre del archivo del modelo LBPH según el formato configurado en 'settings.RECONOCEDOR'
+def nombre_modelo_lbph():
+    return "modelo_lbph.bin" if configuracion_reconocedor()['FORMATO_LBPH'] == 'binario' else "modelo_lbph.yml"
+
+# Nombre del manifiesto de entrenamiento de un modelo LBPH. Cada formato tiene el suyo, así al
+# cambiar de formato no se actualiza por error un archivo que quedó desactualizado.
+def nombre_manifiesto_lbph(path_modelo=None):
+    binario = es_modelo_binario(path_modelo or nombre_modelo_lbph())
+    return "modelo_lbph_bin_manifiesto.json" if binario else "modelo_lbph_manifiesto.json"
+
+# Indica si un archivo de modelo es del formato binario (se decide por la extensión)
+def es_modelo_binario(path):
+    return str(path).endswith(".bin")
+
+def _alinear(posicion):
+    return -(-posicion // ALINEACION) * ALINEACION
+
+# Calcula el histograma LBPH de un rostro en escala de grises, igual que OpenCV: código LBP
+# circular con interpolación bilineal (en float32, como en C++) y un histograma normalizado
+# de 2^vecinos valores por cada celda de la grilla.
+def histograma_lbph(rostro, radio=1, vecinos=8, grilla_x=8, grilla_y=8):
+    src = np.asarray(rostro, dtype=np.float32)
+    alto, ancho = src.shape[0] - 2 * radio, src.shape[1] - 2 * radio
+    patrones = 2 ** vecinos
+    if alto <= 0 or ancho <= 0:
+        return np.zeros(grilla_x * grilla_y * patrones, dtype=np.float32)
+
+    centro = src[radio:radio + alto, radio:radio + ancho]
+    codigos = np.zeros((alto, ancho), dtype=np.int64)
+    uno = np.float32(1)
+    for n in range(vecinos):
+        # Posición del vecino n sobre el círculo y pesos de los 4 píxeles que lo rodean
+        x = np.float32(radio * math.cos(2.0 * math.pi * n / float(vecinos)))
+        y = np.float32(-radio * math.sin(2.0 * math.pi * n / float(vecinos)))
+        fx, fy = int(math.floor(x)), int(math.floor(y))
+        cx, cy = int(math.ceil(x)), int(math.ceil(y))
+        tx, ty = x - np.float32(fx), y - np.float32(fy)
+        pesos = ((uno - tx) * (uno - ty), tx * (uno - ty), (uno - tx) * ty, tx * ty)
+        posiciones = ((fy, fx), (fy, cx), (cy, fx), (cy, cx))
+        t = None
+        for peso, (dy, dx) in zip(pesos, posiciones):
+            vecino = src[radio + dy:radio + dy + alto, radio + dx:radio + dx + ancho]
+            t = peso * vecino if t is None else t + peso * vecino
+        bit = (t > centro) | (np.abs(t - centro) < EPSILON_FLOAT32)
+        codigos |= bit.astype(np.int64) << n
+
+    # Histograma de cada celda (las filas y columnas que sobran de la división se ignoran)
+    celda_alto, celda_ancho = alto // grilla_y, ancho // grilla_x
+    celdas = grilla_x * grilla_y
+    if celda_alto == 0 or celda_ancho == 0:
+        return np.zeros(celdas * patrones, dtype=np.float32)
+    codigos = codigos[:celda_alto * grilla_y, :celda_ancho * grilla_x]
+    codigos = codigos.reshape(grilla_y, celda_alto, grilla_x, celda_ancho).transpose(0, 2, 1, 3)
+    codigos = codigos.reshape(celdas, celda_alto * celda_ancho) + (np.arange(celdas) * patrones)[:, None]
+    conteos = np.bincount(codigos.ravel(), minlength=celdas * patrones)
+    # OpenCV multiplica por el inverso del total en doble precisión y luego redondea a float32
+    return (conteos * (1.0 / (celda_alto * celda_ancho))).astype(np.float32)
+
+
+# Reconocedor LBPH que predice sobre la matriz de histogramas del archivo binario
+class ReconocedorLBPHBinario:
+
+    def __init__(self, parametros, labels, sumas, histogramas, path=None):
+        self.parametros = parametros  # radio, vecinos, grilla_x, grilla_y, umbral
+        self.labels = labels
+        self.sumas = sumas
+        self.histogramas = histogramas
+        self.path = path
+
+    @classmethod
+    def cargar(cls, path):
+        parametros = leer_cabecera(path)
+        cantidad, dimension = parametros['cantidad'], parametros['dimension']
+        if cantidad == 0:
+            return cls(parametros, np.zeros(0, dtype=np.int32), np.zeros(0), np.zeros((dimension, 0), np.float32), path)
+        # Los arreglos quedan mapeados: las páginas se leen del disco solo cuando se usan y
+        # se comparten entre todos los procesos que abren el mismo archivo
+        labels = np.memmap(path, dtype="<i4", mode="r", offset=parametros['offset_labels'], shape=(cantidad,))
+        sumas = np.memmap(path, dtype="<f8", mode="r", offset=parametros['offset_sumas'], shape=(cantidad,))
+        histogramas = np.memmap(path, dtype=np.dtype(parametros['tipo']).newbyteorder("<"), mode="r",
+                                offset=parametros['offset_histogramas'], shape=(dimension, cantidad))
+        return cls(parametros, labels, sumas, histogramas, path)
+
+    def histograma(self, rostro):
+        p = self.parametros
+        return histograma_lbph(rostro, p['radio'], p['vecinos'], p['grilla_x'], p['grilla_y'])
+
+    # Distancia chi-cuadrado alternativa, 2 * suma((h - q)^2 / (h + q)), de la consulta a cada
+    # histograma del modelo. En las posiciones donde la consulta vale 0 cada término es h, así
+    # que solo se recorren las posiciones no nulas de la consulta y el resto se obtiene de la
+    # suma guardada de cada histograma.
+    def distancias(self, consulta):
+        posiciones = np.flatnonzero(consulta)
+        resultado = np.array(self.sumas, dtype=np.float64)
+        for inicio in range(0, len(posiciones), POSICIONES_POR_BLOQUE):
+            seleccion = posiciones[inicio:inicio + POSICIONES_POR_BLOQUE]
+            valores = consulta[seleccion][:, None]
+            bloque = np.take(self.histogramas, seleccion, axis=0).astype(np.float32, copy=False)
+            # (h - q)^2 / (h + q) - h: el término real menos el 'h' que ya está en la suma
+            terminos = bloque - valores
+            terminos *= terminos
+            np.divide(terminos, bloque + valores, out=terminos)
+            terminos -= bloque
+            resultado += terminos.sum(axis=0, dtype=np.float64)
+        return 2.0 * resultado
+
+    # Misma interfaz que LBPH de OpenCV: devuelve (label, distancia) del histograma más cercano,
+    # o (-1, distancia máxima) si ninguno queda bajo el umbral del modelo
+    def predict(self, rostro):
+        if not len(self.labels):
+            return -1, DISTANCIA_MAXIMA
+        distancias = self.distancias(self.histograma(rostro))
+        # 'argmin' devuelve el primero en caso de empate, como el '<' estricto de OpenCV
+        mejor = int(np.argmin(distancias))
+        umbral = self.parametros.get('umbral')
+        if umbral is not None and not distancias[mejor] < umbral:
+            return -1, DISTANCIA_MAXIMA
+        return int(self.labels[mejor]), float(distancias[mejor])
+
+    def predict_lote(self, rostros):
+        pares = [self.predict(rostro) for rostro in rostros]
+        return (np.array([p[0] for p in pares], dtype=np.int32),
+                np.array([p[1] for p in pares], dtype=np.float64))
+
+    # Reconocedor con solo los histogramas de los usuarios indicados (copia solo esas columnas)
+    def subconjunto(self, ids):
+        mascara = np.isin(self.labels, np.asarray(list(ids), dtype=np.int32))
+        return ReconocedorLBPHBinario(dict(self.parametros, cantidad=int(mascara.sum())),
+                                      np.asarray(self.labels[mascara]), np.asarray(self.sumas[mascara]),
+                                      np.compress(mascara, self.histogramas, axis=1))
+
+    # Bytes de los histogramas; si están mapeados, son páginas compartidas entre procesos
+    def bytes_memoria(self):
+        return self.histogramas.nbytes + self.labels.nbytes + self.sumas.nbytes
+
+# Lee y valida la cabecera de un modelo binario
+def leer_cabecera(path):
+    with open(path, "rb") as archivo:
+        firma, version, largo = struct.unpack("<8sII", archivo.read(16))
+        if firma != FIRMA:
+            raise ValueError(f"'{path}' no es un modelo LBPH binario.")
+        if version != VERSION:
+            raise ValueError(f"Versión {version} del modelo LBPH binario no soportada.")
+        return json.loads(archivo.read(largo).decode("utf-8"))
+
+# Escribe un modelo binario de forma atómica. 'bloques' entrega la matriz por partes, en orden
+# (arreglos de (posiciones, cantidad)), para no tener que reunirla toda en memoria.
+def _escribir(path, parametros, labels, sumas, bloques, tipo):
+    labels = np.asarray(labels, dtype="<i4")
+    sumas = np.asarray(sumas, dtype="<f8")
+    cantidad = len(labels)
+    dimension = parametros['grilla_x'] * parametros['grilla_y'] * 2 ** parametros['vecinos']
+    offset_labels = TAMANO_CABECERA
+    offset_sumas = _alinear(offset_labels + labels.nbytes)
+    offset_histogramas = _alinear(offset_sumas + sumas.nbytes)
+    cabecera = dict(parametros, cantidad=cantidad, dimension=dimension, tipo=np.dtype(tipo).name,
+                    offset_labels=offset_labels, offset_sumas=offset_sumas, offset_histogramas=offset_histogramas)
+    texto = json.dumps(cabecera).encode("utf-8")
+    if 16 + len(texto) > TAMANO_CABECERA:
+        raise ValueError("La cabecera del modelo no cabe en el espacio reservado.")
+
+    temporal = f"{path}.tmp"
+    with open(temporal, "wb") as archivo:
+        archivo.write(struct.pack("<8sII", FIRMA, VERSION, len(texto)) + texto)
+        archivo.seek(offset_labels)
+        archivo.write(labels.tobytes())
+        archivo.seek(offset_sumas)
+        archivo.write(sumas.tobytes())
+        archivo.seek(offset_histogramas)
+        escritas = 0
+        for bloque in bloques:
+            bloque = np.asarray(bloque, dtype=np.dtype(tipo).newbyteorder("<")).reshape(-1, cantidad)
+            archivo.write(bloque.tobytes())
+            escritas += len(bloque)
+        if escritas != dimension:
+            raise ValueError(f"Se esperaban {dimension} posiciones y se escribieron {escritas}.")
+        # Si el modelo no tiene histogramas, el archivo igual llega hasta el inicio de la matriz
+        archivo.truncate(offset_histogramas + cantidad * dimension * np.dtype(tipo).itemsize)
+    os.replace(temporal, path)
+
+# Parámetros de un reconocedor LBPH de OpenCV
+def _parametros_opencv(recognizer):
+    umbral = recognizer.getThreshold()
+    return {
+        'radio': recognizer.getRadius(),
+        'vecinos': recognizer.getNeighbors(),
+        'grilla_x': recognizer.getGridX(),
+        'grilla_y': recognizer.getGridY(),
+        # OpenCV usa DBL_MAX como "sin umbral"
+        'umbral': None if umbral >= DISTANCIA_MAXIMA else umbral,
+    }
+
+# Histogramas y etiquetas de un reconocedor LBPH de OpenCV
+def _datos_opencv(recognizer):
+    histogramas = recognizer.getHistograms() or []
+    etiquetas = recognizer.getLabels()
+    labels = np.zeros(0, dtype=np.int32) if etiquetas is None else np.asarray(etiquetas, dtype=np.int32).ravel()
+    sumas = np.array([float(h.sum(dtype=np.float64)) for h in histogramas], dtype=np.float64)
+    return histogramas, labels, sumas
+
+# Entrega los histogramas de OpenCV (una lista de vectores) por bloques de posiciones, ya
+# traspuestos al orden del archivo
+def _bloques_opencv(histogramas, dimension):
+    vectores = [h.reshape(-1) for h in histogramas]
+    for inicio in range(0, dimension, POSICIONES_POR_BLOQUE):
+        fin = min(inicio + POSICIONES_POR_BLOQUE, dimension)
+        if not vectores:
+            yield np.zeros((fin - inicio, 0), dtype=np.float32)
+        else:
+            yield np.stack([v[inicio:fin] for v in vectores], axis=1)
+
+# Guarda un reconocedor LBPH de OpenCV (entrenado o leído de un .yml) en el formato binario.
+# 'tipo' es 'float32' (los mismos valores que OpenCV) o 'float16' (la mitad de espacio).
+def exportar_lbph(recognizer, path, tipo=None):
+    tipo = tipo or configuracion_reconocedor()['PRECISION_LBPH']
+    parametros = _parametros_opencv(recognizer)
+    histogramas, labels, sumas = _datos_opencv(recognizer)
+    dimension = parametros['grilla_x'] * parametros['grilla_y'] * 2 ** parametros['vecinos']
+    _escribir(path, parametros, labels, sumas, _bloques_opencv(histogramas, dimension), tipo)
+
+# Agrega al modelo binario los histogramas de un reconocedor de OpenCV entrenado solo con los
+# rostros nuevos (con los mismos parámetros). El archivo se reescribe completo y se reemplaza;
+# los procesos que tenían mapeado el anterior lo siguen usando hasta recargarlo.
+def agregar_lbph(path, recognizer):
+    actual = ReconocedorLBPHBinario.cargar(path)
+    parametros = {clave: actual.parametros[clave] for clave in ('radio', 'vecinos', 'grilla_x', 'grilla_y', 'umbral')}
+    if _parametros_opencv(recognizer) != parametros:
+        raise ValueError("Los parámetros del reconocedor no coinciden con los del modelo.")
+    histogramas, labels, sumas = _datos_opencv(recognizer)
+    dimension = actual.parametros['dimension']
+
+    # Cada bloque de posiciones del modelo actual se extiende con las mismas posiciones de los nuevos
+    def bloques():
+        for inicio, nuevos in zip(range(0, dimension, POSICIONES_POR_BLOQUE), _bloques_opencv(histogramas, dimension)):
+            yield np.hstack([actual.histogramas[inicio:inicio + POSICIONES_POR_BLOQUE], nuevos])
+
+    _escribir(path, parametros, np.concatenate([actual.labels, labels]), np.concatenate([actual.sumas, sumas]),
+              bloques(), actual.parametros['tipo'])
+
+# Crea un reconocedor LBPH de OpenCV vacío con los parámetros de un modelo binario existente
+def crear_lbph_como(path):
+    import cv2  # OpenCV solo se necesita para entrenar
+    p = leer_cabecera(path)
+    recognizer = cv2.face.LBPHFaceRecognizer_create(p['radio'], p['vecinos'], p['grilla_x'], p['grilla_y'])
+    if p.get('umbral') is not None:
+        recognizer.setThreshold(p['umbral'])
+    return recognizer
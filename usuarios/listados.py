@@ -0,0 +1,159 @@
+# --- Utilidades para las vistas de listado ---
+# Las listas de usuarios, eventos y asistencias pueden tener cientos de miles de filas, así que:
+#   - se paginan "por clave" (keyset): en lugar de OFFSET, cada página continúa después de la
+#     última fila de la anterior, lo que mantiene constante el costo de cualquier página
+#   - los filtros (evento, fechas, carrera) se aplican en la consulta
+#   - la cantidad de asistencias de cada evento se guarda unos segundos en la caché
+import base64  # Para codificar el cursor de la página en la URL
+import json  # Para serializar el cursor
+from datetime import date, datetime  # Para leer y escribir las fechas del cursor y de los filtros
+from django.core.cache import cache  # Caché de los conteos por evento
+from django.core.exceptions import FieldDoesNotExist, ValidationError  # Errores al validar el cursor
+from django.db.models import Count, Q  # Para los conteos y las condiciones del cursor
+from .models import Asistencia  # Modelo de asistencias, para los conteos
+
+# Filas por página por defecto y máximo permitido
+TAMANO_PAGINA = 50
+MAX_TAMANO_PAGINA = 500
+# Segundos que se guarda en caché la cantidad de asistencias de un evento
+SEGUNDOS_CACHE_CONTEOS = 30
+
+# Página de resultados: las filas y el cursor de la página siguiente (None si es la última)
+class Pagina:
+
+    def __init__(self, filas, siguiente):
+        self.filas = filas
+        self.siguiente = siguiente
+
+    def __iter__(self):
+        return iter(self.filas)
+
+    def __len__(self):
+        return len(self.filas)
+
+# Convierte un valor del cursor a texto (las fechas se guardan en formato ISO)
+def _a_texto(valor):
+    return valor.isoformat() if isinstance(valor, (date, datetime)) else valor
+
+# Codifica los valores de la última fila como un texto apto para la URL
+def codificar_cursor(valores):
+    datos = json.dumps([_a_texto(v) for v in valores]).encode()
+    return base64.urlsafe_b64encode(datos).decode().rstrip("=")
+
+# Decodifica un cursor; devuelve None si no es válido
+def decodificar_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        datos = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valores = json.loads(datos)
+    except ValueError:
+        return None
+    return valores if isinstance(valores, list) else None
+
+# Convierte los valores de un cursor al tipo de cada campo del orden (los campos pueden cruzar
+# relaciones, como 'usuario__nombre'). Devuelve None si alguno no corresponde, por ejemplo si el
+# cursor de la URL fue modificado: esa página se trata como la primera en lugar de fallar.
+def valores_cursor(modelo, campos, valores):
+    if not valores or len(valores) != len(campos):
+        return None
+    convertidos = []
+    for campo, valor in zip(campos, valores):
+        if not isinstance(valor, (str, int, float)) or isinstance(valor, bool):
+            return None
+        try:
+            actual = modelo
+            for parte in campo.split("__"):
+                field = actual._meta.get_field(parte)
+                actual = field.related_model or actual
+            convertido = field.to_python(valor)
+        except (FieldDoesNotExist, ValidationError, ValueError, TypeError, OverflowError):
+            return None
+        if convertido is None:
+            return None
+        convertidos.append(convertido)
+    return convertidos
+
+# Pagina un queryset por clave. 'orden' es la lista de campos del orden (con '-' si es
+# descendente) y debe terminar en un campo único (por ejemplo 'id'). Las filas pueden ser
+# objetos o diccionarios (con '.values()'); los valores del cursor se convierten al tipo de cada
+# campo con 'valores_cursor' y un cursor inválido se ignora.
+def paginar_por_clave(queryset, orden, cursor=None, tamano=TAMANO_PAGINA):
+    tamano = max(1, min(int(tamano), MAX_TAMANO_PAGINA))
+    queryset = queryset.order_by(*orden)
+    campos = [campo.lstrip("-") for campo in orden]
+
+    valores = valores_cursor(queryset.model, campos, decodificar_cursor(cursor))
+    if valores:
+        # (a > x) o (a = x y b > y) o ... según el sentido de cada campo
+        condicion = Q()
+        for i, campo in enumerate(orden):
+            nombre = campos[i]
+            operador = "lt" if campo.startswith("-") else "gt"
+            paso = Q(**{f"{nombre}__{operador}": valores[i]})
+            for anterior, valor in zip(campos[:i], valores[:i]):
+                paso &= Q(**{anterior: valor})
+            condicion |= paso
+        queryset = queryset.filter(condicion)
+
+    # Se pide una fila de más para saber si hay otra página
+    filas = list(queryset[:tamano + 1])
+    siguiente = None
+    if len(filas) > tamano:
+        filas = filas[:tamano]
+        ultima = filas[-1]
+        if isinstance(ultima, dict):
+            siguiente = codificar_cursor([ultima[campo] for campo in campos])
+        else:
+            siguiente = codificar_cursor([getattr(ultima, campo) for campo in campos])
+    return Pagina(filas, siguiente)
+
+# Lee una fecha 'AAAA-MM-DD' de los parámetros de la petición; devuelve None si no es válida
+def fecha_parametro(valor):
+    try:
+        return date.fromisoformat(valor) if valor else None
+    except ValueError:
+        return None
+
+# Lee un entero de los parámetros de la petición; devuelve None si no es válido
+def entero_parametro(valor):
+    return int(valor) if valor and valor.isdigit() else None
+
+# Clave de caché de la cantidad de asistencias de un evento
+def clave_conteo(evento_id):
+    return f"asistencias_evento_{evento_id}"
+
+# Devuelve {evento_id: cantidad de asistencias} usando la caché; los eventos que no están en
+# ella se cuentan todos juntos en una sola consulta
+def conteos_asistencias(eventos_ids):
+    eventos_ids = list(eventos_ids)
+    guardados = cache.get_many([clave_conteo(i) for i in eventos_ids])
+    conteos = {i: guardados[clave_conteo(i)] for i in eventos_ids if clave_conteo(i) in guardados}
+    faltantes = [i for i in eventos_ids if i not in conteos]
+    if faltantes:
+        nuevos = dict.fromkeys(faltantes, 0)
+        nuevos.update(
+            Asistencia.objects.filter(evento_asist_id__in=faltantes)
+            .values_list("evento_asist_id").annotate(n=Count("id")).order_by()
+        )
+        cache.set_many({clave_conteo(i): n for i, n in nuevos.items()}, SEGUNDOS_CACHE_CONTEOS)
+        conteos.update(nuevos)
+    return conteos
+
+# Descarta de la caché los conteos de los eventos indicados (por ejemplo, al registrar asistencias)
+def invalidar_conteos(eventos_ids):
+    cache.delete_many([clave_conteo(i) for i in eventos_ids])
+
+# Parámetros de la petición para la página siguiente (conserva los filtros) y para la primera
+def enlaces_pagina(request, pagina):
+    parametros = request.GET.copy()
+    parametros.pop("cursor", None)
+    primera = parametros.urlencode()
+    siguiente = None
+    if pagina.siguiente:
+        parametros["cursor"] = pagina.siguiente
+        siguiente = parametros.urlencode()
+    return {
+        'pagina_siguiente': f"?{siguiente}" if siguiente else None,
+        'pagina_primera': f"?{primera}" if request.GET.get("cursor") else None,
+    }
@@ -0,0 +1,40 @@
+# Comando: python manage.py benchmark_carga [--usuarios 50] [--capturas 100] [--procesos 1,4,32]
+# Mide cuántas imágenes por segundo desencripta y decodifica la carga del dataset
+# con distintos números de procesos, usando un dataset sintético en una carpeta temporal.
+import os  # Para obtener el número de núcleos
+import tempfile  # Para crear la carpeta temporal del dataset
+from django.core.management.base import BaseCommand  # Clase base de los comandos de Django
+from django.test import override_settings  # Para usar un MEDIA_ROOT temporal
+from usuarios.benchmarks import generar_dataset_sintetico, medir  # Utilidades de benchmark
+from usuarios.carga_paralela import cargar_dataset  # Carga paralela del dataset
+from usuarios.cifrado import generar_clave  # Para crear una clave temporal
+from usuarios.entrenamiento import escanear_dataset  # Para listar las imágenes del dataset
+
+
+class Command(BaseCommand):
+    help = "Mide el rendimiento (imágenes por segundo) de la carga del dataset con 1, 4 y N procesos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuarios", type=int, default=50, help="Número de usuarios sintéticos.")
+        parser.add_argument("--capturas", type=int, default=100, help="Capturas por usuario.")
+        parser.add_argument("--procesos", default=f"1,4,{os.cpu_count() or 1}",
+                            help="Lista de números de procesos a probar, separados por coma.")
+
+    def handle(self, *args, **opciones):
+        procesos = sorted({int(p) for p in opciones["procesos"].split(",") if p.strip()})
+
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            # Crea una clave y un dataset sintético encriptado en la carpeta temporal
+            generar_clave()
+            data_path = os.path.join(media, "dataset")
+            total = generar_dataset_sintetico(data_path, opciones["usuarios"], opciones["capturas"])
+            lista = [(label, relativo) for label, archivos in escanear_dataset(data_path).items()
+                     for relativo in archivos]
+            self.stdout.write(f"Dataset sintético: {opciones['usuarios']} usuarios, {total} imágenes")
+
+            for n in procesos:
+                segundos, (imagenes, _, _) = medir(cargar_dataset, lista, data_path, n)
+                self.stdout.write(
+                    f"{n:>3} procesos: {len(imagenes)} imágenes en {segundos:.2f} s "
+                    f"({len(imagenes) / segundos:.0f} imágenes/s)"
+                )
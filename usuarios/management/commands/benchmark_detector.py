@@ -0,0 +1,69 @@
+# Comando: python manage.py benchmark_detector --video grabacion.mp4 [--backends haar,lbp,yunet] [--escalas 1,0.5]
+# Mide los fotogramas por segundo de cada detector de rostros sobre un video grabado,
+# para elegir el detector y la escala más convenientes para cada kiosco.
+import time  # Para medir tiempos
+import cv2  # OpenCV para leer el video
+from django.core.exceptions import ImproperlyConfigured  # Error cuando falta configurar un detector
+from django.core.management.base import BaseCommand, CommandError  # Clases base de los comandos
+from usuarios.detectores import obtener_detector  # Capa de detectores de rostros
+
+
+class Command(BaseCommand):
+    help = "Mide los fotogramas por segundo de los detectores de rostros sobre un video grabado."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--video", required=True, help="Ruta del video a procesar.")
+        parser.add_argument("--backends", default="haar", help="Detectores a probar, separados por coma (haar, lbp, yunet).")
+        parser.add_argument("--escalas", default="1,0.5", help="Escalas de reducción a probar, separadas por coma.")
+        parser.add_argument("--fotogramas", type=int, default=300, help="Máximo de fotogramas a usar del video.")
+        parser.add_argument("--cascada-lbp", default=None, help="Ruta de lbpcascade_frontalface_improved.xml.")
+        parser.add_argument("--modelo-yunet", default=None, help="Ruta del modelo ONNX de YuNet.")
+
+    # Lee los fotogramas del video una sola vez, para no medir el tiempo de decodificación
+    def leer_video(self, path, maximo):
+        cam = cv2.VideoCapture(path)
+        if not cam.isOpened():
+            raise CommandError(f"No se pudo abrir el video '{path}'.")
+        fotogramas = []
+        while len(fotogramas) < maximo:
+            ret, frame = cam.read()
+            if not ret:
+                break
+            fotogramas.append(frame)
+        cam.release()
+        if not fotogramas:
+            raise CommandError("El video no tiene fotogramas.")
+        return fotogramas
+
+    def handle(self, *args, **opciones):
+        fotogramas = self.leer_video(opciones["video"], opciones["fotogramas"])
+        alto, ancho = fotogramas[0].shape[:2]
+        self.stdout.write(f"Video: {len(fotogramas)} fotogramas de {ancho}x{alto}")
+
+        extras = {}
+        if opciones["cascada_lbp"]:
+            extras["cascada_lbp"] = opciones["cascada_lbp"]
+        if opciones["modelo_yunet"]:
+            extras["modelo_yunet"] = opciones["modelo_yunet"]
+
+        for backend in [b.strip() for b in opciones["backends"].split(",") if b.strip()]:
+            for escala in [float(e) for e in opciones["escalas"].split(",") if e.strip()]:
+                try:
+                    detector = obtener_detector(backend=backend, escala=escala, **extras)
+                except ImproperlyConfigured as error:
+                    self.stderr.write(f"{backend}: {error}")
+                    break
+
+                rostros = 0
+                inicio = time.perf_counter()
+                for frame in fotogramas:
+                    # Incluye la conversión a grises, igual que en las vistas
+                    gris = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                    rostros += len(detector.detectar(frame, gris))
+                segundos = time.perf_counter() - inicio
+
+                self.stdout.write(
+                    f"{backend:>6} escala {escala:<4}: {len(fotogramas) / segundos:7.1f} fps, "
+                    f"{1000 * segundos / len(fotogramas):6.1f} ms/fotograma, "
+                    f"{rostros / len(fotogramas):.2f} rostros/fotograma"
+                )
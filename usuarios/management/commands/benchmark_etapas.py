@@ -0,0 +1,217 @@
+# Comando: python manage.py benchmark_etapas [--usuarios 20] [--capturas 20] [--repeticiones 5]
+#                                            [--salida resultados.json] [--base base.json] [--tolerancia 0.25]
+# Mide las etapas principales con un dataset sintético encriptado creado en un MEDIA_ROOT temporal:
+#   - encriptar_imagen y desencriptar_imagen (por imagen)
+#   - carga del dataset (desencriptar y decodificar todas las imágenes)
+#   - entrenamiento LBPH (solo 'train', y el entrenamiento completo con el almacén y la base de datos)
+#   - carga del modelo entrenado y 'predict' por rostro
+# Los resultados se escriben en JSON; con --base se comparan con un resultado anterior y el
+# comando termina con error si alguna etapa es más lenta que la tolerancia permitida.
+# Los usuarios sintéticos se crean dentro de una transacción que se deshace al terminar. Para
+# correrlo sin MySQL: RECONOCIMIENTO_BD=sqlite (ver settings.py).
+import json  # Para escribir y leer los resultados
+import os  # Para construir rutas
+import platform  # Para anotar el equipo en los resultados
+import tempfile  # Para crear el MEDIA_ROOT temporal
+import time  # Para medir tiempos
+from datetime import datetime  # Fecha de la ejecución
+import cv2  # OpenCV para el reconocedor LBPH
+import numpy as np  # Para las etiquetas y los rostros de consulta
+from django.core.management.base import BaseCommand, CommandError  # Clases base de los comandos
+from django.db import DatabaseError, transaction  # Para deshacer los usuarios sintéticos
+from django.test import override_settings  # Para usar un MEDIA_ROOT temporal
+from usuarios.almacen import TAMANO_ROSTRO, AlmacenRostros  # Almacén preprocesado de rostros
+from usuarios.benchmarks import (comparar_resultados, generar_dataset_sintetico, medir, patron_usuario,
+                                 resumir_tiempos, rostro_sintetico)  # Utilidades de benchmark
+from usuarios.carga_paralela import cargar_dataset, numero_procesos  # Carga paralela del dataset
+from usuarios.cifrado import desencriptar_imagen, encriptar_imagen, generar_clave  # Funciones medidas
+from usuarios.entrenamiento import entrenar_modelo_lbph, escanear_dataset  # Entrenamiento LBPH
+from usuarios.lbph_binario import nombre_modelo_lbph  # Formato configurado del modelo LBPH
+from usuarios.models import Usuario  # Usuarios sintéticos
+from usuarios.reconocedor import RegistroModelos  # Carga del modelo como en el servidor
+
+# Versión del formato del archivo de resultados
+VERSION_RESULTADOS = 1
+
+
+# Se interrumpe la transacción para deshacer los usuarios sintéticos
+class _Deshacer(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Mide el cifrado, la carga del dataset, el entrenamiento LBPH, la carga del modelo y predict con un dataset sintético."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuarios", type=int, default=20, help="Número de usuarios sintéticos.")
+        parser.add_argument("--capturas", type=int, default=20, help="Capturas por usuario.")
+        parser.add_argument("--repeticiones", type=int, default=5, help="Repeticiones de cada medición.")
+        parser.add_argument("--consultas", type=int, default=200, help="Rostros a reconocer con predict.")
+        parser.add_argument("--procesos", type=int, default=1,
+                            help="Procesos para la carga del dataset (0 = los de settings o todos los núcleos).")
+        parser.add_argument("--salida", default=None, help="Archivo JSON donde se escriben los resultados.")
+        parser.add_argument("--base", default=None, help="Resultados anteriores (JSON) con los que comparar.")
+        parser.add_argument("--tolerancia", type=float, default=0.25,
+                            help="Aumento relativo de la mediana aceptado respecto de la base (0.25 = 25 %%).")
+
+    def handle(self, *args, **opciones):
+        if opciones["usuarios"] < 2 or opciones["capturas"] < 1 or opciones["repeticiones"] < 1:
+            raise CommandError("Se necesitan al menos 2 usuarios, 1 captura y 1 repetición.")
+        if opciones["tolerancia"] < 0:
+            raise CommandError("La tolerancia no puede ser negativa.")
+        base = None
+        if opciones["base"]:
+            try:
+                with open(opciones["base"], "r", encoding="utf-8") as archivo:
+                    base = json.load(archivo)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"No se pudo leer la base '{opciones['base']}': {error}")
+
+        parametros = {
+            "usuarios": opciones["usuarios"],
+            "capturas": opciones["capturas"],
+            "repeticiones": opciones["repeticiones"],
+            "consultas": opciones["consultas"],
+            "procesos": numero_procesos(opciones["procesos"] or None),
+            "modelo": nombre_modelo_lbph(),
+        }
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            try:
+                with transaction.atomic():
+                    etapas, aciertos = self.medir_etapas(media, parametros)
+                    raise _Deshacer
+            except _Deshacer:
+                pass
+            except DatabaseError as error:
+                raise CommandError(
+                    f"Error de base de datos: {error}. Cree o actualice las tablas con "
+                    "'python manage.py migrate'."
+                )
+
+        resultados = {
+            "version": VERSION_RESULTADOS,
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "entorno": {
+                "python": platform.python_version(),
+                "opencv": cv2.__version__,
+                "numpy": np.__version__,
+                "sistema": platform.platform(),
+                "procesador": platform.processor() or platform.machine(),
+                "nucleos": os.cpu_count(),
+            },
+            "parametros": parametros,
+            "etapas": etapas,
+            "aciertos_predict": aciertos,
+        }
+        self.mostrar(resultados)
+        if opciones["salida"]:
+            with open(opciones["salida"], "w", encoding="utf-8") as archivo:
+                json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Resultados guardados en {opciones['salida']}")
+        if base is not None:
+            self.comparar(resultados, base, opciones["tolerancia"])
+
+    # Ejecuta todas las mediciones; devuelve ({etapa: resumen}, aciertos de predict)
+    def medir_etapas(self, media, parametros):
+        repeticiones = parametros["repeticiones"]
+        etapas = {}
+        generar_clave()
+        data_path = os.path.join(media, "dataset")
+
+        # Dataset sintético con la misma estructura que las capturas, con usuarios reales en la
+        # base de datos para que el entrenamiento completo los considere
+        ids = []
+        for n in range(parametros["usuarios"]):
+            usuario = Usuario.objects.create(nombre=f"Sintetico{n}", rut=f"bench-{n}")
+            generar_dataset_sintetico(data_path, 1, parametros["capturas"], semilla=n, primer_id=usuario.id)
+            ids.append(usuario.id)
+        lista = [(label, relativo) for label, archivos in escanear_dataset(data_path).items()
+                 for relativo in archivos]
+        rutas = [os.path.join(data_path, relativo) for _, relativo in lista]
+        self.stdout.write(f"Dataset sintético: {len(ids)} usuarios, {len(rutas)} imágenes")
+
+        # Cifrado: cada repetición desencripta y vuelve a encriptar todo el dataset, que al
+        # final queda encriptado como al principio
+        descifrado, cifrado = [], []
+        for _ in range(repeticiones):
+            segundos, _ = medir(lambda: [desencriptar_imagen(ruta) for ruta in rutas])
+            descifrado.append(1000 * segundos / len(rutas))
+            segundos, _ = medir(lambda: [encriptar_imagen(ruta) for ruta in rutas])
+            cifrado.append(1000 * segundos / len(rutas))
+        etapas["desencriptar_imagen"] = resumir_tiempos(descifrado)
+        etapas["encriptar_imagen"] = resumir_tiempos(cifrado)
+
+        # Carga del dataset (desencriptar, decodificar y normalizar)
+        muestras = []
+        for _ in range(repeticiones):
+            segundos, (imagenes, labels, _) = medir(cargar_dataset, lista, data_path, parametros["procesos"])
+            muestras.append(1000 * segundos)
+        etapas["cargar_dataset"] = resumir_tiempos(muestras)
+
+        # Entrenamiento LBPH, solo el 'train' de OpenCV
+        muestras = []
+        for _ in range(repeticiones):
+            recognizer = cv2.face.LBPHFaceRecognizer_create()
+            segundos, _ = medir(recognizer.train, list(imagenes), labels.astype(np.int32))
+            muestras.append(1000 * segundos)
+        etapas["entrenar_lbph"] = resumir_tiempos(muestras)
+
+        # Entrenamiento completo como lo ejecuta la aplicación: incorpora el dataset a un almacén
+        # nuevo, lee los rostros, entrena y guarda el modelo (en el formato configurado)
+        path_modelo = os.path.join(media, parametros["modelo"])
+        muestras = []
+        for i in range(repeticiones):
+            segundos, _ = medir(
+                entrenar_modelo_lbph, incremental=False, data_path=data_path, path_modelo=path_modelo,
+                path_manifiesto=os.path.join(media, f"manifiesto_{i}.json"),
+                almacen=AlmacenRostros(os.path.join(media, f"almacen_{i}")), procesos=parametros["procesos"],
+            )
+            muestras.append(1000 * segundos)
+        etapas["entrenamiento_completo"] = resumir_tiempos(muestras)
+
+        # Carga del modelo con un registro nuevo en cada repetición (incluye el hash del archivo)
+        muestras = []
+        for _ in range(repeticiones):
+            segundos, modelo = medir(RegistroModelos().obtener_modelo, path_modelo)
+            muestras.append(1000 * segundos)
+        etapas["cargar_modelo"] = resumir_tiempos(muestras)
+
+        # Predict por rostro con capturas nuevas de usuarios conocidos
+        rng = np.random.default_rng(len(ids))
+        esperados = rng.choice(ids, size=parametros["consultas"])
+        consultas = [rostro_sintetico(patron_usuario(int(label), ids.index(label)), rng, TAMANO_ROSTRO)
+                     for label in esperados]
+        muestras, aciertos = [], 0
+        for rostro, esperado in zip(consultas, esperados):
+            inicio = time.perf_counter()
+            label, _ = modelo.recognizer.predict(rostro)
+            muestras.append(1000 * (time.perf_counter() - inicio))
+            aciertos += int(label) == int(esperado)
+        etapas["predict"] = resumir_tiempos(muestras)
+        return etapas, aciertos
+
+    def mostrar(self, resultados):
+        for etapa, resumen in resultados["etapas"].items():
+            self.stdout.write(
+                f"{etapa:<24} mediana {resumen['mediana_ms']:>10.3f} ms  "
+                f"(mín {resumen['minimo_ms']:.3f}, máx {resumen['maximo_ms']:.3f}, n={resumen['repeticiones']})"
+            )
+        self.stdout.write(f"Aciertos de predict: {resultados['aciertos_predict']}/{resultados['parametros']['consultas']}")
+
+    # Compara con la base y termina con error si hay regresiones
+    def comparar(self, resultados, base, tolerancia):
+        if base.get("parametros") != resultados["parametros"]:
+            self.stderr.write("Advertencia: la base se midió con otros parámetros; la comparación no es directa.")
+        if base.get("entorno", {}).get("procesador") != resultados["entorno"]["procesador"]:
+            self.stderr.write("Advertencia: la base se midió en otro equipo.")
+        regresiones = []
+        for etapa, anterior, actual, cambio, regresion in comparar_resultados(resultados, base, tolerancia):
+            marca = "REGRESIÓN" if regresion else "ok"
+            self.stdout.write(f"{etapa:<24} {anterior:>10.3f} -> {actual:>10.3f} ms  ({cambio:+.1%})  {marca}")
+            if regresion:
+                regresiones.append(etapa)
+        if regresiones:
+            raise CommandError(
+                f"{len(regresiones)} etapa(s) más lentas que la base en más de {tolerancia:.0%}: {', '.join(regresiones)}"
+            )
+        self.stdout.write(self.style.SUCCESS("Sin regresiones respecto de la base."))
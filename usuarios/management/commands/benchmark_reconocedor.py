@@ -0,0 +1,93 @@
+# Comando: python manage.py benchmark_reconocedor [--usuarios 100,1000,10000] [--capturas 2] [--consultas 50]
+# Compara el tiempo de 'predict' del reconocedor LBPH con el del reconocedor por embeddings
+# (una consulta a la vez y en lote) a medida que crece el número de usuarios enrolados.
+# Los rostros son sintéticos y se generan en memoria, sin tocar la base de datos ni el disco.
+import time  # Para medir tiempos
+import cv2  # OpenCV para el reconocedor LBPH
+import numpy as np  # Para generar los rostros y calcular percentiles
+from django.core.exceptions import ImproperlyConfigured  # Error de configuración del extractor
+from django.core.management.base import BaseCommand, CommandError  # Clases base de los comandos
+from usuarios.almacen import TAMANO_ROSTRO  # Tamaño de los rostros del almacén
+from usuarios.benchmarks import patron_usuario, rostro_sintetico  # Rostros sintéticos
+from usuarios.embeddings import IndiceEmbeddings, ReconocedorEmbeddings, crear_extractor  # Reconocedor por embeddings
+
+
+class Command(BaseCommand):
+    help = "Compara la latencia de predict de LBPH y del reconocedor por embeddings con 100, 1.000 y 10.000 usuarios."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--usuarios", default="100,1000,10000", help="Cantidades de usuarios, separadas por coma.")
+        parser.add_argument("--capturas", type=int, default=2, help="Capturas de entrenamiento por usuario.")
+        parser.add_argument("--consultas", type=int, default=50, help="Rostros a reconocer en cada prueba.")
+        parser.add_argument("--backend", default="lbp", help="Extractor de embeddings: lbp o sface.")
+        parser.add_argument("--max-imagenes-lbph", type=int, default=20000,
+                            help="Sobre esta cantidad de imágenes se omite LBPH (cada histograma ocupa 64 KB).")
+
+    # Genera 'capturas' rostros sintéticos para cada usuario
+    def generar(self, usuarios, capturas, rng):
+        rostros = np.empty((usuarios * capturas, TAMANO_ROSTRO, TAMANO_ROSTRO), dtype=np.uint8)
+        labels = np.repeat(np.arange(1, usuarios + 1, dtype=np.int32), capturas)
+        for i, label in enumerate(labels):
+            rostros[i] = rostro_sintetico(patron_usuario(int(label)), rng, TAMANO_ROSTRO)
+        return rostros, labels
+
+    # Mide la latencia de cada consulta; devuelve (p50 en ms, p95 en ms, aciertos)
+    def medir_consultas(self, predict, consultas, esperados):
+        tiempos = []
+        aciertos = 0
+        for rostro, esperado in zip(consultas, esperados):
+            inicio = time.perf_counter()
+            label, _ = predict(rostro)
+            tiempos.append(1000 * (time.perf_counter() - inicio))
+            aciertos += int(label) == int(esperado)
+        return np.percentile(tiempos, 50), np.percentile(tiempos, 95), aciertos
+
+    def handle(self, *args, **opciones):
+        rng = np.random.default_rng(0)
+        try:
+            extractor = crear_extractor(parametros={'extractor': opciones["backend"], 'grilla': 8})
+        except ImproperlyConfigured as error:
+            raise CommandError(str(error))
+
+        for usuarios in [int(u) for u in opciones["usuarios"].split(",") if u.strip()]:
+            rostros, labels = self.generar(usuarios, opciones["capturas"], rng)
+            esperados = rng.integers(1, usuarios + 1, size=opciones["consultas"])
+            consultas = [rostro_sintetico(patron_usuario(int(e)), rng, TAMANO_ROSTRO) for e in esperados]
+            self.stdout.write(f"{usuarios} usuarios ({len(rostros)} imágenes de entrenamiento):")
+
+            # LBPH: compara cada consulta con todos los histogramas de entrenamiento
+            if len(rostros) <= opciones["max_imagenes_lbph"]:
+                lbph = cv2.face.LBPHFaceRecognizer_create()
+                inicio = time.perf_counter()
+                lbph.train(list(rostros), labels)
+                entrenamiento = time.perf_counter() - inicio
+                p50, p95, aciertos = self.medir_consultas(lbph.predict, consultas, esperados)
+                self.stdout.write(
+                    f"  lbph          : p50 {p50:8.2f} ms, p95 {p95:8.2f} ms, aciertos {aciertos}/{len(consultas)}, "
+                    f"entrenamiento {entrenamiento:.1f} s"
+                )
+                del lbph
+            else:
+                self.stdout.write("  lbph          : omitido (supera --max-imagenes-lbph)")
+
+            # Embeddings: un centroide por usuario y un producto de matrices por consulta
+            inicio = time.perf_counter()
+            indice = IndiceEmbeddings(extractor)
+            indice.agregar(rostros, labels)
+            entrenamiento = time.perf_counter() - inicio
+            reconocedor = ReconocedorEmbeddings(indice)
+            p50, p95, aciertos = self.medir_consultas(reconocedor.predict, consultas, esperados)
+            self.stdout.write(
+                f"  {extractor.nombre:<5} (1 a 1) : p50 {p50:8.2f} ms, p95 {p95:8.2f} ms, aciertos {aciertos}/{len(consultas)}, "
+                f"entrenamiento {entrenamiento:.1f} s"
+            )
+
+            # Embeddings en lote: todas las consultas con un solo producto de matrices
+            inicio = time.perf_counter()
+            resultado, _ = reconocedor.predict_lote(consultas)
+            segundos = time.perf_counter() - inicio
+            aciertos = int(np.sum(resultado == esperados))
+            self.stdout.write(
+                f"  {extractor.nombre:<5} (lote)  : {1000 * segundos / len(consultas):8.2f} ms por rostro, "
+                f"aciertos {aciertos}/{len(consultas)}"
+            )
@@ -0,0 +1,77 @@
+# Comando: python manage.py exportar_modelo_lbph [--origen media/modelo_lbph.yml] [--destino media/modelo_lbph.bin]
+#                                                [--precision float16] [--verificar 200]
+# Convierte un modelo LBPH guardado por OpenCV (.yml) al formato binario mapeado en memoria
+# ('usuarios/lbph_binario.py'), sin volver a entrenar. También copia el manifiesto de
+# entrenamiento, así el próximo entrenamiento sigue siendo incremental sobre el archivo nuevo.
+# Con --verificar compara las predicciones de ambos modelos sobre rostros del almacén.
+import os  # Para las rutas de los modelos
+import time  # Para medir la conversión
+import cv2  # OpenCV para leer el modelo .yml
+import numpy as np  # Para elegir los rostros de la verificación
+from django.core.management.base import BaseCommand, CommandError  # Clases base de los comandos
+from usuarios.almacen import AlmacenRostros  # Rostros para la verificación
+from usuarios.entrenamiento import cargar_manifiesto, guardar_manifiesto, ruta_media  # Manifiestos del modelo
+from usuarios.lbph_binario import ReconocedorLBPHBinario, exportar_lbph, nombre_manifiesto_lbph  # Formato binario
+
+
+class Command(BaseCommand):
+    help = "Convierte el modelo LBPH .yml de OpenCV al formato binario mapeado en memoria."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--origen", default=None, help="Modelo .yml. Por defecto, media/modelo_lbph.yml.")
+        parser.add_argument("--destino", default=None, help="Modelo .bin. Por defecto, media/modelo_lbph.bin.")
+        parser.add_argument("--precision", choices=("float32", "float16"), default=None,
+                            help="Tipo de los histogramas. Por defecto, RECONOCEDOR['PRECISION_LBPH'].")
+        parser.add_argument("--verificar", type=int, default=0,
+                            help="Compara las predicciones de ambos modelos con N rostros del almacén.")
+
+    def handle(self, *args, **opciones):
+        origen = opciones["origen"] or ruta_media("modelo_lbph.yml")
+        destino = opciones["destino"] or ruta_media("modelo_lbph.bin")
+        if not destino.endswith(".bin"):
+            raise CommandError("El destino debe tener la extensión .bin")
+        if not os.path.exists(origen):
+            raise CommandError(f"No existe el modelo '{origen}'.")
+
+        inicio = time.perf_counter()
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.read(origen)
+        lectura = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        exportar_lbph(recognizer, destino, opciones["precision"])
+        escritura = time.perf_counter() - inicio
+        self.stdout.write(
+            f"Modelo convertido: {os.path.getsize(origen) / 1e6:.1f} MB (.yml, leído en {lectura:.2f} s) -> "
+            f"{os.path.getsize(destino) / 1e6:.1f} MB (.bin, escrito en {escritura:.2f} s)"
+        )
+
+        # El manifiesto del .yml describe los mismos registros del almacén que el modelo nuevo
+        manifiesto = cargar_manifiesto(os.path.join(os.path.dirname(origen), nombre_manifiesto_lbph(origen)))
+        if manifiesto is not None:
+            guardar_manifiesto(manifiesto, os.path.join(os.path.dirname(destino), nombre_manifiesto_lbph(destino)))
+            self.stdout.write("Manifiesto de entrenamiento copiado.")
+
+        if opciones["verificar"] > 0:
+            self.verificar(recognizer, ReconocedorLBPHBinario.cargar(destino), opciones["verificar"])
+
+    # Compara las etiquetas y distancias de ambos modelos con rostros elegidos al azar del almacén
+    def verificar(self, recognizer, binario, cantidad):
+        almacen = AlmacenRostros()
+        if not len(almacen):
+            self.stdout.write("El almacén está vacío; no hay rostros con que verificar.")
+            return
+        rostros, _ = almacen.leer()
+        indices = np.random.default_rng(0).choice(len(rostros), size=min(cantidad, len(rostros)), replace=False)
+        distintas, diferencia = 0, 0.0
+        for indice in indices:
+            label, distancia = recognizer.predict(rostros[indice])
+            label_binario, distancia_binario = binario.predict(rostros[indice])
+            distintas += int(label != label_binario)
+            if label == label_binario and distancia > 0:
+                diferencia = max(diferencia, abs(distancia - distancia_binario) / distancia)
+        self.stdout.write(
+            f"Verificación con {len(indices)} rostros: {distintas} etiquetas distintas, "
+            f"diferencia relativa máxima de distancia {diferencia:.2e}"
+        )
+        if distintas:
+            raise CommandError("Las predicciones del modelo binario no coinciden con las de OpenCV.")
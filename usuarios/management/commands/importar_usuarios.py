@@ -0,0 +1,169 @@
+# Comando: python manage.py importar_usuarios alumnos.csv --fotos fotos.zip [--procesos 4]
+# Enrola a muchos usuarios de una vez. El CSV debe tener las columnas 'nombre' y 'rut' (y
+# opcionalmente 'carrera'), separadas por coma o punto y coma. Las fotos pueden estar en una
+# carpeta o en un ZIP, en una subcarpeta por RUT o con el RUT al inicio del nombre del archivo.
+#
+# Los usuarios nuevos se crean con un solo 'bulk_create' (los RUT ya registrados se conservan).
+# Las fotos se procesan en paralelo, una tarea por usuario: se detecta el rostro, se revisa su
+# calidad, se encripta en memoria y se guarda en el dataset; los rostros se agregan además al
+# almacén de entrenamiento. Al final se informa el rendimiento y cada archivo que falló.
+import csv  # Para leer el CSV de usuarios
+import os  # Para validar las rutas
+import time  # Para medir el rendimiento
+from concurrent.futures import ProcessPoolExecutor, as_completed  # Procesos de trabajo
+from django.core.management.base import BaseCommand, CommandError  # Clases base de los comandos
+from usuarios.almacen import AlmacenRostros  # Almacén de rostros para el entrenamiento
+from usuarios.calidad import configuracion_captura  # Configuración del control de calidad
+from usuarios.carga_paralela import contexto_procesos, numero_procesos  # Procesos de trabajo
+from usuarios.cifrado import cargar_claves  # Claves de encriptación para los procesos
+from usuarios.detectores import configuracion_detector  # Configuración del detector
+from usuarios.entrenamiento import carpeta_usuario, ruta_dataset  # Carpetas del dataset
+from usuarios.importacion import importar_fotos_usuario, listar_fotos  # Tareas de importación
+from usuarios.rut import normalizar_rut  # Forma en que se guardan los RUT
+from usuarios.models import Usuario  # Modelo de usuarios
+
+# Rostros que se acumulan antes de escribirlos en el almacén
+LOTE_ALMACEN = 2000
+# Cantidad de RUT por consulta al buscar los IDs de los usuarios
+LOTE_CONSULTA = 500
+
+
+class Command(BaseCommand):
+    help = "Crea usuarios desde un CSV e importa sus fotos (carpeta o ZIP) al dataset de entrenamiento."
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv", help="CSV con las columnas nombre, rut y carrera.")
+        parser.add_argument("--fotos", default=None, help="Carpeta o archivo ZIP con las fotos de cada RUT.")
+        parser.add_argument("--procesos", type=int, default=None,
+                            help="Procesos de trabajo. Por defecto, ENTRENAMIENTO_PROCESOS o todos los núcleos.")
+
+    # Lee el CSV y devuelve {rut: (nombre, carrera)} y la lista de filas inválidas
+    def leer_csv(self, path):
+        with open(path, encoding="utf-8-sig", newline="") as archivo:
+            muestra = archivo.read(4096)
+            archivo.seek(0)
+            try:
+                dialecto = csv.Sniffer().sniff(muestra, delimiters=",;")
+            except csv.Error:
+                dialecto = csv.excel
+            lector = csv.DictReader(archivo, dialect=dialecto)
+            columnas = {(c or "").strip().lower() for c in lector.fieldnames or []}
+            if not {"nombre", "rut"} <= columnas:
+                raise CommandError("El CSV debe tener las columnas 'nombre' y 'rut'.")
+            usuarios, invalidas = {}, []
+            for numero, fila in enumerate(lector, start=2):
+                fila = {(c or "").strip().lower(): (v or "").strip() for c, v in fila.items()}
+                # 'bulk_create' no pasa por 'Usuario.save', así que el RUT se normaliza aquí
+                rut = normalizar_rut(fila.get("rut"))
+                if not rut or not fila.get("nombre"):
+                    invalidas.append((numero, "falta el nombre o el RUT"))
+                elif rut in usuarios:
+                    invalidas.append((numero, f"RUT {rut} repetido"))
+                else:
+                    usuarios[rut] = (fila["nombre"], fila.get("carrera") or None)
+        return usuarios, invalidas
+
+    # Devuelve {rut: (id, nombre)} de los usuarios registrados con los RUT indicados
+    def usuarios_registrados(self, ruts):
+        ruts = list(ruts)
+        registrados = {}
+        for inicio in range(0, len(ruts), LOTE_CONSULTA):
+            for usuario_id, rut, nombre in Usuario.objects.filter(rut__in=ruts[inicio:inicio + LOTE_CONSULTA]) \
+                    .values_list("id", "rut", "nombre"):
+                registrados[rut] = (usuario_id, nombre)
+        return registrados
+
+    def handle(self, *args, **opciones):
+        if not os.path.isfile(opciones["csv"]):
+            raise CommandError(f"No existe el archivo '{opciones['csv']}'.")
+        if opciones["fotos"] and not os.path.exists(opciones["fotos"]):
+            raise CommandError(f"No existe la carpeta o archivo '{opciones['fotos']}'.")
+
+        # 1. Usuarios: se crean en un solo INSERT por lotes los que aún no existen
+        inicio = time.perf_counter()
+        filas, invalidas = self.leer_csv(opciones["csv"])
+        existentes = self.usuarios_registrados(filas)
+        nuevos = [Usuario(nombre=nombre, rut=rut, carrera=carrera)
+                  for rut, (nombre, carrera) in filas.items() if rut not in existentes]
+        Usuario.objects.bulk_create(nuevos, batch_size=LOTE_CONSULTA, ignore_conflicts=True)
+        # 'bulk_create' no devuelve los IDs en todas las bases de datos, así que se consultan
+        registrados = self.usuarios_registrados(filas)
+        self.stdout.write(
+            f"Usuarios: {len(nuevos)} creados, {len(existentes)} ya registrados, "
+            f"{len(invalidas)} filas inválidas ({time.perf_counter() - inicio:.1f} s)"
+        )
+        for numero, motivo in invalidas:
+            self.stdout.write(f"  fila {numero}: {motivo}")
+        if not opciones["fotos"]:
+            return
+
+        # 2. Fotos: una tarea por usuario
+        inicio = time.perf_counter()
+        fotos = listar_fotos(opciones["fotos"])
+        fallos = []
+        tareas = []
+        data_path = ruta_dataset()
+        claves = tuple(cargar_claves())
+        detector = configuracion_detector()
+        captura = configuracion_captura()
+        for rut, archivos in fotos.items():
+            if rut not in registrados:
+                fallos.extend((archivo, "el RUT no está en el CSV ni registrado") for archivo in archivos)
+                continue
+            usuario_id, nombre = registrados[rut]
+            # Misma carpeta que 'capturar_imagenes' ("<id>_<nombre>", o la que el usuario ya tenga)
+            carpeta = carpeta_usuario(usuario_id, nombre, data_path)
+            tareas.append((usuario_id, carpeta, archivos, opciones["fotos"], data_path, claves, detector, captura))
+
+        almacen = AlmacenRostros()
+        total_fotos = sum(len(tarea[2]) for tarea in tareas)
+        rostros, labels, firmas = [], [], {}
+        importadas = omitidas = procesadas = 0
+        ultimo_aviso = 0.0
+
+        # Guarda en el almacén los rostros acumulados
+        def vaciar():
+            if rostros:
+                almacen.agregar(rostros, labels, firmas)
+                rostros.clear()
+                labels.clear()
+                firmas.clear()
+
+        def registrar(resultado, fotos_tarea):
+            nonlocal importadas, omitidas, procesadas, ultimo_aviso
+            usuario_id, rostros_usuario, firmas_usuario, fallos_usuario, omitidas_usuario = resultado
+            rostros.extend(rostros_usuario)
+            labels.extend([usuario_id] * len(rostros_usuario))
+            firmas.update(firmas_usuario)
+            fallos.extend(fallos_usuario)
+            importadas += len(rostros_usuario)
+            omitidas += omitidas_usuario
+            procesadas += fotos_tarea
+            if len(rostros) >= LOTE_ALMACEN:
+                vaciar()
+            # Informa el avance como máximo una vez por segundo
+            if time.monotonic() - ultimo_aviso >= 1 or procesadas == total_fotos:
+                ultimo_aviso = time.monotonic()
+                self.stdout.write(f"  {procesadas}/{total_fotos} fotos")
+
+        procesos = min(numero_procesos(opciones["procesos"]), max(1, len(tareas)))
+        if procesos == 1:
+            # Con un solo proceso no vale la pena crear el grupo de procesos
+            for tarea in tareas:
+                registrar(importar_fotos_usuario(tarea), len(tarea[2]))
+        else:
+            with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto_procesos()) as pool:
+                futuros = {pool.submit(importar_fotos_usuario, tarea): len(tarea[2]) for tarea in tareas}
+                for futuro in as_completed(futuros):
+                    registrar(futuro.result(), futuros[futuro])
+        vaciar()
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(
+            f"Fotos: {importadas} importadas, {omitidas} ya importadas, {len(fallos)} con errores, "
+            f"{segundos:.1f} s ({procesadas / segundos if segundos else 0:.1f} fotos/s, {procesos} procesos)"
+        )
+        for archivo, motivo in sorted(fallos):
+            self.stdout.write(f"  {archivo}: {motivo}")
+        if importadas:
+            self.stdout.write("Entrene el modelo para reconocer a los usuarios importados.")
@@ -0,0 +1,147 @@
+# Comando: python manage.py reconocer --source 0 --source rtsp://kiosco2/stream [--evento 3] [--fotogramas carpeta]
+# Servicio de reconocimiento sin ventana: atiende varias cámaras o videos a la vez, uno por
+# pipeline (captura, reconocimiento y salida en hilos propios), todos compartiendo el mismo
+# modelo cargado en memoria. En lugar de mostrar una ventana, escribe los eventos de asistencia
+# como líneas JSON en la salida estándar y, si se indica, guarda el último fotograma anotado
+# de cada fuente en una carpeta (por ejemplo, para mostrarlo en un panel).
+import json  # Para escribir los eventos
+import os  # Para las rutas de los fotogramas anotados
+import threading  # Para escribir en la salida desde varios hilos
+import time  # Para recargar el modelo y limitar la duración
+import cv2  # OpenCV para guardar los fotogramas anotados
+from django.core.exceptions import ImproperlyConfigured  # Error de configuración del detector
+from django.core.management.base import BaseCommand, CommandError  # Clases base de los comandos
+from usuarios.asistencia import SesionAsistencia  # Registro de asistencia por lotes
+from usuarios.detectores import configuracion_detector, crear_detector  # Detector de rostros
+from usuarios.diario import obtener_diario  # Diario local de asistencias
+from usuarios.models import Evento  # Modelo de eventos
+from usuarios.pipeline import PipelineReconocimiento, abrir_fuente  # Pipeline de fotogramas
+from usuarios.reconocedor import obtener_reconocedor  # Modelo compartido del proceso
+from usuarios.reconocimiento import ProcesadorReconocimiento, anotar  # Lógica por fotograma
+
+# Segundos entre revisiones de si el modelo cambió en el disco
+INTERVALO_RECARGA = 5
+# Segundos que se espera al salir para que el diario de asistencias termine de sincronizarse
+ESPERA_SINCRONIZACION = 10
+
+
+class Command(BaseCommand):
+    help = "Reconoce rostros sin ventana en una o varias cámaras o videos y emite los eventos de asistencia."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", action="append", required=True, dest="fuentes",
+                            help="Cámara (número), archivo de video o URL. Se puede repetir.")
+        parser.add_argument("--evento", type=int, default=None,
+                            help="ID del evento. Por defecto, el evento activo más reciente.")
+        parser.add_argument("--fotogramas", default=None,
+                            help="Carpeta donde guardar el último fotograma anotado de cada fuente.")
+        parser.add_argument("--cada", type=int, default=1,
+                            help="Guarda uno de cada N fotogramas anotados.")
+        parser.add_argument("--sin-descartar", action="store_true",
+                            help="Procesa todos los fotogramas (para videos) en lugar de solo el más reciente.")
+        parser.add_argument("--duracion", type=float, default=None,
+                            help="Segundos máximos de ejecución.")
+
+    # Obtiene el evento indicado o el activo más reciente, con las mismas reglas que la vista
+    def obtener_evento(self, evento_id):
+        if evento_id:
+            evento = Evento.objects.filter(id=evento_id).first()
+            if not evento:
+                raise CommandError("Evento no encontrado")
+            if not evento.estado:
+                raise CommandError(f"El evento '{evento.nom_evento}' no está activo")
+            return evento
+        evento = Evento.objects.filter(estado=True).order_by('-fecha').first()
+        if not evento:
+            raise CommandError("No hay eventos activos disponibles")
+        return evento
+
+    # Escribe una línea JSON en la salida estándar (protegida porque escriben varios hilos)
+    def emitir(self, datos):
+        with self._lock_salida:
+            self.stdout.write(json.dumps(datos, ensure_ascii=False))
+            self.stdout.flush()
+
+    # Crea la etapa de salida de una fuente: emite los eventos, guarda el fotograma anotado
+    # y revisa cada cierto tiempo si el modelo se volvió a entrenar
+    def crear_salida(self, indice, fuente, procesador, carpeta, cada):
+        estado = {'recarga': time.monotonic()}
+
+        def salida(fotograma):
+            for evento in fotograma.eventos:
+                self.emitir(dict(evento, fuente=fuente))
+            if carpeta and fotograma.numero % cada == 0:
+                anotar(fotograma.imagen, fotograma.resultados)
+                destino = os.path.join(carpeta, f"fuente_{indice}.jpg")
+                # Se escribe a un archivo temporal y se reemplaza, para no leer nunca una imagen a medias
+                temporal = os.path.join(carpeta, f"fuente_{indice}.tmp.jpg")
+                cv2.imwrite(temporal, fotograma.imagen)
+                os.replace(temporal, destino)
+            # Usa el modelo nuevo si se volvió a entrenar o cambiaron los invitados (el registro solo lo rearma si cambió)
+            if time.monotonic() - estado['recarga'] >= INTERVALO_RECARGA:
+                estado['recarga'] = time.monotonic()
+                procesador.recognizer = obtener_reconocedor(evento=procesador.sesion.evento)
+            return not self._detener.is_set()
+
+        return salida
+
+    def handle(self, *args, **opciones):
+        self._lock_salida = threading.Lock()
+        self._detener = threading.Event()
+
+        evento = self.obtener_evento(opciones["evento"])
+        try:
+            # Si el evento tiene invitados, se usa el reconocedor reducido a ellos
+            recognizer = obtener_reconocedor(evento=evento)
+        except FileNotFoundError:
+            raise CommandError("El modelo aún no ha sido entrenado")
+
+        carpeta = opciones["fotogramas"]
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+
+        # Las asistencias se anotan en el diario local; un hilo aparte las copia a la base de datos
+        diario = obtener_diario()
+        pipelines = []
+        for indice, fuente in enumerate(opciones["fuentes"]):
+            cam = abrir_fuente(fuente)
+            if not cam.isOpened():
+                raise CommandError(f"No se pudo abrir la fuente '{fuente}'.")
+            # Cada fuente tiene su propio detector (no se comparten entre hilos) y su propia
+            # sesión; la restricción única de Asistencia evita duplicados entre fuentes
+            try:
+                detector = crear_detector(configuracion_detector())
+            except ImproperlyConfigured as error:
+                raise CommandError(str(error))
+            procesador = ProcesadorReconocimiento(recognizer, detector, SesionAsistencia(evento, diario=diario))
+            salida = self.crear_salida(indice, fuente, procesador, carpeta, max(1, opciones["cada"]))
+            # Sin '--sin-descartar', los archivos de video se leen a su velocidad original, como una cámara
+            pipeline = PipelineReconocimiento(cam, procesador, salida, descartar=not opciones["sin_descartar"],
+                                              tiempo_real=not opciones["sin_descartar"] and os.path.isfile(fuente))
+            pipelines.append((fuente, procesador, pipeline.iniciar()))
+
+        self.stderr.write(f"Reconociendo en {len(pipelines)} fuente(s) para el evento '{evento.nom_evento}'.")
+        inicio = time.monotonic()
+        try:
+            # Espera a que terminen todas las fuentes, se cumpla la duración o se presione Ctrl+C
+            while any(pipeline.activo() for _, _, pipeline in pipelines):
+                if opciones["duracion"] and time.monotonic() - inicio >= opciones["duracion"]:
+                    break
+                time.sleep(0.2)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._detener.set()
+            for fuente, procesador, pipeline in pipelines:
+                pipeline.detener()
+                try:
+                    pipeline.esperar()
+                finally:
+                    # Guarda las asistencias que quedaron pendientes
+                    procesador.cerrar()
+                self.emitir({'tipo': 'estadisticas', 'fuente': fuente, 'latencias': pipeline.estadisticas()})
+            # Antes de salir intenta enviar lo que quedó en el diario; si la base de datos no
+            # responde, se enviará la próxima vez que se abra el diario
+            if diario is not None and not diario.sincronizador.vaciar(ESPERA_SINCRONIZACION):
+                self.stderr.write(f"Quedaron {diario.resumen()['pendientes']} asistencias en el diario local "
+                                  "sin sincronizar; se enviarán en la próxima ejecución.")
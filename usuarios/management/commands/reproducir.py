@@ -0,0 +1,136 @@
+# Comando: python manage.py reproducir grabacion.mp4|carpeta_fotogramas [--evento 3] [--modelo media/modelo_lbph.bin]
+#                                      [--fps 30] [--fotogramas 1000] [--desde-cero] [--guardar] [--salida informe.json]
+# Pasa un video grabado o una carpeta de fotogramas por la misma lógica de reconocimiento y
+# asistencia del kiosco, sin cámara ni ventana, e informa los fotogramas por segundo sostenidos,
+# la latencia por fotograma (p50/p95/p99), las consultas a la base de datos por fotograma y el
+# tiempo hasta confirmar la asistencia de cada persona.
+# Por defecto todo se ejecuta dentro de una transacción que se deshace al terminar, así la
+# misma grabación se puede reproducir muchas veces sin registrar asistencias reales.
+import json  # Para escribir el informe
+from django.core.exceptions import ImproperlyConfigured  # Error de configuración del detector
+from django.core.management.base import BaseCommand, CommandError  # Clases base de los comandos
+from django.db import transaction  # Para deshacer las asistencias de la reproducción
+from usuarios.asistencia import SesionAsistencia  # Registro de asistencia por lotes
+from usuarios.detectores import configuracion_detector, crear_detector  # Detector de rostros
+from usuarios.models import Evento  # Modelo de eventos
+from usuarios.reconocedor import obtener_reconocedor  # Modelo compartido del proceso
+from usuarios.reconocimiento import ProcesadorReconocimiento  # Lógica por fotograma
+from usuarios.reproduccion import RelojGrabacion, leer_grabacion, reproducir_grabacion  # Reproducción de grabaciones
+
+
+# Se interrumpe la transacción para deshacer las asistencias de la reproducción
+class _Deshacer(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Reproduce un video o una carpeta de fotogramas con la lógica de reconocimiento y mide su rendimiento."
+
+    def add_arguments(self, parser):
+        parser.add_argument("grabacion", help="Archivo de video o carpeta con los fotogramas (en orden alfabético).")
+        parser.add_argument("--evento", type=int, default=None,
+                            help="ID del evento. Por defecto, el evento activo más reciente.")
+        parser.add_argument("--modelo", default=None, help="Archivo del modelo. Por defecto, el configurado.")
+        parser.add_argument("--fps", type=float, default=30.0,
+                            help="Fotogramas por segundo de una carpeta de fotogramas.")
+        parser.add_argument("--fotogramas", type=int, default=None, help="Máximo de fotogramas a procesar.")
+        parser.add_argument("--desde-cero", action="store_true",
+                            help="Reproduce como si nadie tuviera asistencia en el evento (no borra las registradas).")
+        parser.add_argument("--guardar", action="store_true",
+                            help="Guarda las asistencias registradas en lugar de deshacerlas al terminar.")
+        parser.add_argument("--salida", default=None, help="Archivo JSON donde se escribe el informe completo.")
+
+    # Obtiene el evento indicado (aunque no esté activo, la grabación puede ser antigua) o el activo más reciente
+    def obtener_evento(self, evento_id):
+        if evento_id:
+            evento = Evento.objects.filter(id=evento_id).first()
+            if not evento:
+                raise CommandError("Evento no encontrado")
+            return evento
+        evento = Evento.objects.filter(estado=True).order_by('-fecha').first()
+        if not evento:
+            raise CommandError("No hay eventos activos disponibles; indique uno con --evento")
+        return evento
+
+    def handle(self, *args, **opciones):
+        if opciones["guardar"] and opciones["desde_cero"]:
+            raise CommandError("--guardar y --desde-cero no se pueden usar juntos.")
+        evento = self.obtener_evento(opciones["evento"])
+        try:
+            # Si el evento tiene invitados, se usa el reconocedor reducido a ellos, como en el kiosco
+            recognizer = obtener_reconocedor(path=opciones["modelo"], evento=evento)
+        except FileNotFoundError:
+            raise CommandError("El modelo aún no ha sido entrenado")
+        try:
+            detector = crear_detector(configuracion_detector())
+        except ImproperlyConfigured as error:
+            raise CommandError(str(error))
+
+        fotogramas = leer_grabacion(opciones["grabacion"], opciones["fps"], opciones["fotogramas"])
+        self.stderr.write(f"Reproduciendo '{opciones['grabacion']}' para el evento '{evento.nom_evento}'.")
+        try:
+            if opciones["guardar"]:
+                informe = self.reproducir(evento, recognizer, detector, fotogramas)
+            else:
+                with transaction.atomic():
+                    # Con --desde-cero las asistencias existentes se ignoran en memoria en lugar de
+                    # borrarlas: un DELETE dentro de esta transacción larga bloquearía esas filas
+                    # para los kioscos durante toda la reproducción. Al guardar los lotes, la
+                    # restricción única descarta las que ya existían.
+                    informe = self.reproducir(evento, recognizer, detector, fotogramas,
+                                              set() if opciones["desde_cero"] else None)
+                    raise _Deshacer
+        except _Deshacer:
+            pass
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        informe = {'grabacion': opciones["grabacion"], 'evento': evento.id, **informe}
+        self.mostrar(informe)
+        if opciones["salida"]:
+            with open(opciones["salida"], "w", encoding="utf-8") as archivo:
+                json.dump(informe, archivo, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Informe guardado en {opciones['salida']}")
+
+    # 'registrados' son los usuarios que se consideran ya registrados (None = los de la base de datos)
+    def reproducir(self, evento, recognizer, detector, fotogramas, registrados=None):
+        # La sesión se crea aquí para que sus consultas iniciales queden dentro de la transacción
+        reloj = RelojGrabacion()
+        sesion = SesionAsistencia(evento, reloj=reloj, registrados=registrados)
+        procesador = ProcesadorReconocimiento(recognizer, detector, sesion)
+        return reproducir_grabacion(procesador, fotogramas, reloj)
+
+    def mostrar(self, informe):
+        if not informe['fotogramas']:
+            self.stdout.write("La grabación no tiene fotogramas.")
+            return
+        latencia, consultas = informe['latencia'], informe['consultas']
+        self.stdout.write(
+            f"{informe['fotogramas']} fotogramas ({informe['segundos_grabacion']:.1f} s de grabación) "
+            f"en {informe['segundos_total']:.1f} s"
+        )
+        self.stdout.write(f"FPS sostenidos: {informe['fps_procesamiento']} procesando, {informe['fps_total']} incluyendo la lectura")
+        self.stdout.write(
+            f"Latencia por fotograma: p50 {latencia['p50_ms']} ms, p95 {latencia['p95_ms']} ms, "
+            f"p99 {latencia['p99_ms']} ms, máx {latencia['maximo_ms']} ms"
+        )
+        self.stdout.write(
+            f"Consultas: {consultas['por_fotograma']} por fotograma (máx {consultas['maximo_fotograma']}, "
+            f"{consultas['fotogramas_con_consultas']} fotogramas con consultas, {consultas['total']} en total)"
+        )
+        for etapa, resumen in informe['etapas'].items():
+            self.stdout.write(f"  {etapa:<16} promedio {resumen['promedio_ms']} ms, máx {resumen['maximo_ms']} ms")
+        for persona in informe['personas']:
+            if persona['ya_registrado']:
+                estado = "ya tenía asistencia"
+            elif persona['confirmado_en'] is None:
+                estado = "sin confirmar"
+            else:
+                estado = f"confirmado {persona['segundos_hasta_confirmar']:.2f} s después"
+            self.stdout.write(
+                f"  {persona['usuario_id']:>6} {persona['nombre'] or '?':<30} "
+                f"reconocido en {persona['reconocido_en']:.2f} s, {estado}"
+            )
+        self.stdout.write(
+            f"Personas confirmadas: {informe['confirmadas']} de {len(informe['personas'])} reconocidas"
+        )
@@ -0,0 +1,42 @@
+# Comando: python manage.py sincronizar_asistencias [--estado] [--purgar 7]
+# Copia a la base de datos las asistencias que quedaron pendientes en el diario local del
+# kiosco (por ejemplo, si la base de datos no respondía cuando se cerró el reconocimiento).
+# Es seguro ejecutarlo mientras el reconocimiento está en marcha: las asistencias ya enviadas
+# se descartan por la restricción única de 'Asistencia'.
+import os  # Para comprobar si existe el diario
+from django.core.management.base import BaseCommand, CommandError  # Clases base de los comandos
+from django.db import DatabaseError  # Errores de la base de datos central
+from usuarios.diario import DiarioAsistencias, SincronizadorDiario, ruta_diario  # Diario local de asistencias
+
+
+class Command(BaseCommand):
+    help = "Envía a la base de datos las asistencias pendientes del diario local del kiosco."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--diario", default=None, help="Archivo del diario. Por defecto, media/diario/asistencias.sqlite3.")
+        parser.add_argument("--estado", action="store_true", help="Solo muestra cuántas asistencias hay en cada estado.")
+        parser.add_argument("--purgar", type=int, default=None,
+                            help="Borra las asistencias ya sincronizadas hace más de N días.")
+
+    def handle(self, *args, **opciones):
+        path = opciones["diario"] or ruta_diario()
+        if not os.path.exists(path):
+            self.stdout.write("No hay diario de asistencias.")
+            return
+        diario = DiarioAsistencias(path)
+        try:
+            if not opciones["estado"]:
+                try:
+                    enviadas = SincronizadorDiario(diario).sincronizar()
+                except DatabaseError as error:
+                    raise CommandError(f"No se pudo sincronizar: {error}")
+                self.stdout.write(f"{enviadas} asistencias sincronizadas.")
+            if opciones["purgar"] is not None:
+                self.stdout.write(f"{diario.purgar(opciones['purgar'])} asistencias antiguas borradas del diario.")
+            resumen = diario.resumen()
+            self.stdout.write(
+                f"Diario: {resumen['pendientes']} pendientes, {resumen['sincronizadas']} sincronizadas, "
+                f"{resumen['descartadas']} descartadas."
+            )
+        finally:
+            diario.cerrar()
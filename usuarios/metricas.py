@@ -0,0 +1,276 @@
+# --- Métricas del procesamiento de imágenes ---
+# Mide cuánto tarda cada etapa del reconocimiento, la captura y el entrenamiento (leer el
+# fotograma, convertir a grises, detectar, predecir, consultar la base de datos, encriptar,
+# dibujar...) y cuenta fotogramas, rostros, desconocidos y confirmaciones.
+#   - Los tiempos se acumulan en histogramas con límites fijos: registrar una medición es una
+#     búsqueda binaria y un par de sumas, sin guardar las mediciones individuales.
+#   - La vista '/metrics' publica todo en el formato de texto de Prometheus.
+#   - Cada sesión (por ejemplo, una ventana de reconocimiento) puede llevar además su propio
+#     resumen ('ResumenSesion') y escribirlo en el log al terminar.
+# Las métricas son del proceso: con varios procesos de servidor, cada uno publica las suyas.
+# Se configuran en 'settings.METRICAS'.
+import bisect  # Para ubicar cada medición en su intervalo del histograma
+import json  # Para escribir el resumen de la sesión en el log
+import logging  # Log del resumen de cada sesión
+import threading  # Las métricas se actualizan desde varios hilos
+import time  # Para medir las etapas
+from collections import Counter  # Contadores de cada sesión
+from django.conf import settings  # Para leer la configuración
+
+logger = logging.getLogger(__name__)
+
+# Configuración por defecto; 'settings.METRICAS' puede sobrescribir cualquiera de estas claves
+CONFIGURACION_POR_DEFECTO = {
+    'ACTIVAS': True,
+    'RESUMEN_SESION': True,
+}
+
+# Límites (en segundos) de los intervalos de los histogramas: de medio milisegundo, para las
+# etapas de cada fotograma, a varios minutos, para el entrenamiento
+LIMITES = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+# Descripción de los contadores conocidos (los demás se publican sin descripción)
+DESCRIPCIONES = {
+    'fotogramas': "Fotogramas procesados por el reconocimiento.",
+    'rostros': "Rostros detectados por el reconocimiento.",
+    'predicciones': "Rostros enviados al reconocedor.",
+    'desconocidos': "Predicciones descartadas por confianza insuficiente o usuario inexistente.",
+    'confirmaciones': "Asistencias confirmadas.",
+    'capturas_aceptadas': "Rostros guardados al enrolar usuarios.",
+    'capturas_rechazadas': "Rostros descartados por el control de calidad al enrolar usuarios.",
+    'asistencias_sincronizadas': "Asistencias copiadas del diario local a la base de datos.",
+}
+
+_activas = None
+
+# Configuración de las métricas combinando la de 'settings' y los valores por defecto
+def configuracion_metricas():
+    configuracion = dict(CONFIGURACION_POR_DEFECTO)
+    configuracion.update(getattr(settings, 'METRICAS', {}))
+    return configuracion
+
+# Indica si las métricas están activas (se lee de 'settings' una sola vez)
+def metricas_activas():
+    global _activas
+    if _activas is None:
+        _activas = bool(configuracion_metricas()['ACTIVAS'])
+    return _activas
+
+# Contador de latencias de una etapa (en milisegundos): cantidad, promedio, máximo y último
+class EstadisticasEtapa:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.cantidad = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.ultimo = 0.0
+
+    # Registra la duración de una ejecución de la etapa, en segundos
+    def registrar(self, segundos):
+        ms = segundos * 1000
+        with self._lock:
+            self.cantidad += 1
+            self.total += ms
+            self.ultimo = ms
+            if ms > self.maximo:
+                self.maximo = ms
+
+    def resumen(self):
+        with self._lock:
+            return {
+                'cantidad': self.cantidad,
+                'promedio_ms': round(self.total / self.cantidad, 2) if self.cantidad else 0.0,
+                'maximo_ms': round(self.maximo, 2),
+                'ultimo_ms': round(self.ultimo, 2),
+            }
+
+# Histograma de duraciones con límites fijos
+class Histograma:
+
+    def __init__(self, limites=LIMITES):
+        self.limites = limites
+        self._lock = threading.Lock()
+        # Una posición por intervalo más una para los valores mayores al último límite
+        self.conteos = [0] * (len(limites) + 1)
+        self.suma = 0.0
+        self.cantidad = 0
+
+    def observar(self, segundos):
+        posicion = bisect.bisect_left(self.limites, segundos)
+        with self._lock:
+            self.conteos[posicion] += 1
+            self.suma += segundos
+            self.cantidad += 1
+
+    # Copia consistente de (conteos acumulados por límite, suma, cantidad)
+    def instantanea(self):
+        with self._lock:
+            conteos, suma, cantidad = list(self.conteos), self.suma, self.cantidad
+        acumulados, total = [], 0
+        for conteo in conteos[:-1]:
+            total += conteo
+            acumulados.append(total)
+        return acumulados, suma, cantidad
+
+# Métricas de una sesión: latencias por etapa y contadores propios
+class ResumenSesion:
+
+    def __init__(self):
+        self.etapas = {}
+        self.contadores = Counter()
+        self.inicio = time.monotonic()
+
+    def observar(self, etapa, segundos):
+        estadisticas = self.etapas.get(etapa)
+        if estadisticas is None:
+            estadisticas = self.etapas.setdefault(etapa, EstadisticasEtapa())
+        estadisticas.registrar(segundos)
+
+    def contar(self, nombre, cantidad=1):
+        self.contadores[nombre] += cantidad
+
+    def resumen(self):
+        return {
+            'segundos': round(time.monotonic() - self.inicio, 1),
+            'etapas': {etapa: estadisticas.resumen() for etapa, estadisticas in list(self.etapas.items())},
+            'contadores': dict(self.contadores),
+        }
+
+# Registro de métricas del proceso
+class RegistroMetricas:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas = {}  # {etapa: Histograma}
+        self._contadores = {}  # {(nombre, etiquetas): valor}
+
+    def observar(self, etapa, segundos):
+        histograma = self._histogramas.get(etapa)
+        if histograma is None:
+            with self._lock:
+                histograma = self._histogramas.setdefault(etapa, Histograma())
+        histograma.observar(segundos)
+
+    # 'etiquetas' es una tupla de pares (nombre, valor), por ejemplo (('motivo', 'borroso'),)
+    def contar(self, nombre, cantidad=1, etiquetas=()):
+        clave = (nombre, etiquetas)
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + cantidad
+
+    def valor(self, nombre, etiquetas=()):
+        return self._contadores.get((nombre, etiquetas), 0)
+
+    def histograma(self, etapa):
+        return self._histogramas.get(etapa)
+
+    # Descarta todas las métricas (útil en los benchmarks)
+    def reiniciar(self):
+        with self._lock:
+            self._histogramas.clear()
+            self._contadores.clear()
+
+    # Publica las métricas en el formato de texto de Prometheus
+    def exportar(self):
+        lineas = []
+        with self._lock:
+            histogramas = sorted(self._histogramas.items())
+            contadores = sorted(self._contadores.items())
+
+        if histogramas:
+            lineas.append("# HELP vision_etapa_segundos Duración de cada etapa del procesamiento de imágenes.")
+            lineas.append("# TYPE vision_etapa_segundos histogram")
+        for etapa, histograma in histogramas:
+            acumulados, suma, cantidad = histograma.instantanea()
+            for limite, acumulado in zip(histograma.limites, acumulados):
+                lineas.append(f'vision_etapa_segundos_bucket{{etapa="{etapa}",le="{limite}"}} {acumulado}')
+            lineas.append(f'vision_etapa_segundos_bucket{{etapa="{etapa}",le="+Inf"}} {cantidad}')
+            lineas.append(f'vision_etapa_segundos_sum{{etapa="{etapa}"}} {suma:.6f}')
+            lineas.append(f'vision_etapa_segundos_count{{etapa="{etapa}"}} {cantidad}')
+
+        anterior = None
+        for (nombre, etiquetas), valor in contadores:
+            metrica = f"vision_{nombre}_total"
+            if nombre != anterior:
+                lineas.append(f"# HELP {metrica} {DESCRIPCIONES.get(nombre, nombre)}")
+                lineas.append(f"# TYPE {metrica} counter")
+                anterior = nombre
+            lineas.append(f"{metrica}{formatear_etiquetas(etiquetas)} {valor}")
+        return lineas
+
+# Registro compartido por todo el proceso
+registro_metricas = RegistroMetricas()
+
+# Escribe las etiquetas de una métrica: {nombre="valor",...}
+def formatear_etiquetas(etiquetas):
+    if not etiquetas:
+        return ""
+    texto = ",".join(
+        '{}="{}"'.format(nombre, str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for nombre, valor in etiquetas
+    )
+    return f"{{{texto}}}"
+
+# Publica una métrica de tipo 'gauge' con un valor por cada combinación de etiquetas
+def formatear_gauge(nombre, ayuda, valores):
+    lineas = [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} gauge"]
+    for etiquetas, valor in valores:
+        lineas.append(f"{nombre}{formatear_etiquetas(etiquetas)} {valor}")
+    return lineas
+
+# Mide el tiempo de un bloque 'with' y lo registra en el histograma de la etapa (y en el
+# resumen de la sesión, si se indica)
+class Medicion:
+    __slots__ = ('etapa', 'resumen', 'inicio')
+
+    def __init__(self, etapa, resumen=None):
+        self.etapa = etapa
+        self.resumen = resumen
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *error):
+        segundos = time.perf_counter() - self.inicio
+        registro_metricas.observar(self.etapa, segundos)
+        if self.resumen is not None:
+            self.resumen.observar(self.etapa, segundos)
+        return False
+
+# Bloque 'with' que no mide nada (métricas desactivadas)
+class _SinMedicion:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *error):
+        return False
+
+_SIN_MEDICION = _SinMedicion()
+
+# Devuelve el bloque 'with' que mide una etapa: with medir('detectar', resumen): ...
+def medir(etapa, resumen=None):
+    if not metricas_activas():
+        return _SIN_MEDICION
+    return Medicion(etapa, resumen)
+
+# Registra una duración ya medida
+def observar(etapa, segundos, resumen=None):
+    if metricas_activas():
+        registro_metricas.observar(etapa, segundos)
+        if resumen is not None:
+            resumen.observar(etapa, segundos)
+
+# Suma a un contador. Las 'etiquetas' (por ejemplo motivo='borroso') solo se publican en el
+# registro del proceso; el resumen de la sesión las agrega en un solo contador.
+def contar(nombre, cantidad=1, resumen=None, **etiquetas):
+    if metricas_activas():
+        registro_metricas.contar(nombre, cantidad, tuple(sorted(etiquetas.items())))
+        if resumen is not None:
+            resumen.contar(nombre, cantidad)
+
+# Escribe en el log el resumen de una sesión si 'RESUMEN_SESION' está activo
+def registrar_resumen(nombre, datos):
+    if configuracion_metricas()['RESUMEN_SESION']:
+        logger.info("%s %s", nombre, json.dumps(datos, ensure_ascii=False))
@@ -0,0 +1,49 @@
+# Esquema original de la aplicación (usuarios, eventos y asistencias), tal como existía antes de
+# que el proyecto tuviera archivos de migración.
+# Las bases de datos creadas antes de esta migración ya tienen estas tablas: en ellas hay que
+# ejecutar la primera vez 'python manage.py migrate --fake-initial', que marca esta migración
+# como aplicada sin crear las tablas y aplica las siguientes normalmente.
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Evento',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('nom_evento', models.CharField(max_length=100)),
+                ('fecha', models.DateField()),
+                ('descripcion', models.CharField(blank=True, max_length=255, null=True)),
+                ('relator', models.CharField(blank=True, max_length=60, null=True)),
+                ('estado', models.BooleanField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Usuario',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('nombre', models.CharField(max_length=255)),
+                ('rut', models.CharField(max_length=20, unique=True)),
+                ('carrera', models.CharField(blank=True, max_length=100, null=True)),
+                ('imagen', models.BinaryField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Asistencia',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('evento_asist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='usuarios.evento')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='usuarios.usuario')),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Tabla de los entrenamientos del modelo en segundo plano: estado, fase y progreso de cada uno,
+# que consulta la vista de progreso mientras el entrenamiento avanza.
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Entrenamiento',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_curso', 'En curso'), ('completado', 'Completado'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('completo', models.BooleanField(default=False)),
+                ('modo', models.CharField(blank=True, max_length=20, null=True)),
+                ('fase', models.CharField(blank=True, max_length=20, null=True)),
+                ('fase_inicio', models.DateTimeField(blank=True, null=True)),
+                ('imagenes_cargadas', models.IntegerField(default=0)),
+                ('imagenes_totales', models.IntegerField(default=0)),
+                ('inicio', models.DateTimeField(auto_now_add=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('fin', models.DateTimeField(blank=True, null=True)),
+                ('mensaje', models.CharField(blank=True, max_length=255, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Huella de la imagen de perfil: la imagen pasa de la columna 'imagen' al almacén encriptado
+# 'media/imagenes/' (imagenes.py). La copia se hace en la migración siguiente.
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0002_entrenamiento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='imagen_hash',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
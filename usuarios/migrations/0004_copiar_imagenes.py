@@ -0,0 +1,63 @@
+# Copia las imágenes de perfil de la columna 'imagen' al almacén encriptado (con la clave de la
+# aplicación) y anota su huella en 'imagen_hash'. Se procesa por lotes en orden de ID, con una
+# transacción por lote, así una tabla grande no queda bloqueada durante toda la copia. Si se
+# interrumpe, al volver a ejecutar 'migrate' solo se procesan los usuarios que aún no tienen huella.
+# Al revertirla, los bytes se vuelven a copiar del almacén a la columna.
+from django.db import migrations, transaction
+from usuarios.imagenes import AlmacenImagenes  # Almacén de imágenes encriptadas
+
+# Usuarios que se procesan por transacción
+LOTE = 200
+
+
+def copiar_imagenes(apps, schema_editor):
+    Usuario = apps.get_model('usuarios', 'Usuario')
+    alias = schema_editor.connection.alias
+    almacen = AlmacenImagenes()
+    ultimo = 0
+    while True:
+        with transaction.atomic(using=alias):
+            filas = list(
+                Usuario.objects.using(alias)
+                .filter(id__gt=ultimo, imagen__isnull=False, imagen_hash__isnull=True)
+                .order_by('id').values_list('id', 'imagen')[:LOTE]
+            )
+            if not filas:
+                return
+            for usuario_id, datos in filas:
+                # Según la base de datos, la columna llega como bytes o memoryview
+                if datos:
+                    Usuario.objects.using(alias).filter(id=usuario_id).update(imagen_hash=almacen.guardar(bytes(datos)))
+        ultimo = filas[-1][0]
+
+
+def restaurar_imagenes(apps, schema_editor):
+    Usuario = apps.get_model('usuarios', 'Usuario')
+    alias = schema_editor.connection.alias
+    almacen = AlmacenImagenes()
+    ultimo = 0
+    while True:
+        with transaction.atomic(using=alias):
+            filas = list(
+                Usuario.objects.using(alias).filter(id__gt=ultimo, imagen_hash__isnull=False)
+                .order_by('id').values_list('id', 'imagen_hash')[:LOTE]
+            )
+            if not filas:
+                return
+            for usuario_id, huella in filas:
+                Usuario.objects.using(alias).filter(id=usuario_id).update(imagen=almacen.leer(huella))
+        ultimo = filas[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    # Cada lote confirma su propia transacción
+    atomic = False
+
+    dependencies = [
+        ('usuarios', '0003_usuario_imagen_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(copiar_imagenes, restaurar_imagenes),
+    ]
@@ -0,0 +1,16 @@
+# Elimina la columna antigua con los bytes de las imágenes, ya copiadas al almacén encriptado.
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0004_copiar_imagenes'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='usuario',
+            name='imagen',
+        ),
+    ]
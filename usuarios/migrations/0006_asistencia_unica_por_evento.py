@@ -0,0 +1,37 @@
+# Un usuario solo puede tener una asistencia por evento. El registro por lotes
+# ('bulk_create(ignore_conflicts=True)' en asistencia.py y en la sincronización del diario del
+# kiosco) depende de esta restricción para no duplicar filas cuando dos kioscos confirman a la
+# misma persona o un lote se vuelve a enviar.
+# Antes de crearla se eliminan los duplicados que ya existan: de cada (usuario, evento) se
+# conserva la primera asistencia (la de menor ID) y se borran las demás.
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def eliminar_duplicados(apps, schema_editor):
+    Asistencia = apps.get_model('usuarios', 'Asistencia')
+    alias = schema_editor.connection.alias
+    duplicados = (
+        Asistencia.objects.using(alias).values('usuario_id', 'evento_asist_id')
+        .annotate(cantidad=Count('id'), primera=Min('id')).filter(cantidad__gt=1)
+    )
+    for grupo in duplicados.iterator():
+        (Asistencia.objects.using(alias)
+         .filter(usuario_id=grupo['usuario_id'], evento_asist_id=grupo['evento_asist_id'])
+         .exclude(id=grupo['primera']).delete())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0005_remove_usuario_imagen'),
+    ]
+
+    operations = [
+        # Los duplicados borrados no se recuperan al revertir
+        migrations.RunPython(eliminar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='asistencia',
+            constraint=models.UniqueConstraint(fields=('usuario', 'evento_asist'), name='asistencia_unica_por_evento'),
+        ),
+    ]
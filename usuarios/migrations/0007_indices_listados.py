@@ -0,0 +1,33 @@
+# Índices de los listados paginados por clave: usuarios por nombre y por carrera, eventos por
+# fecha y asistencias por fecha y por evento.
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0006_asistencia_unica_por_evento'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['nombre', 'id'], name='usuario_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usuario',
+            index=models.Index(fields=['carrera', 'nombre'], name='usuario_carrera_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['fecha', 'id'], name='evento_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['evento_asist', 'fecha'], name='asistencia_evento_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['fecha', 'id'], name='asistencia_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Los RUT se guardan normalizados (sin puntos ni espacios y en mayúsculas, ver 'Usuario.save'),
+# igual que los que crea el comando 'importar_usuarios'. Esta migración normaliza los RUT que se
+# ingresaron antes tal como se escribieron, así una importación encuentra a esos usuarios en vez
+# de crearlos otra vez. Si la forma normalizada ya pertenece a otro usuario, el RUT se deja como
+# está para no perder datos; hay que revisar ese par a mano.
+from django.db import migrations
+
+from usuarios.rut import normalizar_rut
+
+
+def normalizar_ruts(apps, schema_editor):
+    Usuario = apps.get_model('usuarios', 'Usuario')
+    alias = schema_editor.connection.alias
+    existentes = set(Usuario.objects.using(alias).values_list('rut', flat=True))
+    for usuario_id, rut in Usuario.objects.using(alias).values_list('id', 'rut').iterator():
+        normalizado = normalizar_rut(rut)
+        if normalizado == rut or normalizado in existentes:
+            continue
+        Usuario.objects.using(alias).filter(id=usuario_id).update(rut=normalizado)
+        existentes.add(normalizado)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0007_indices_listados'),
+    ]
+
+    operations = [
+        # Al revertir no se recupera la forma en que se escribió cada RUT
+        migrations.RunPython(normalizar_ruts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Invitados de cada evento: el reconocimiento de un evento con invitados solo compara los
+# rostros con los de esas personas. Un evento sin invitados sigue aceptando a cualquier usuario.
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0008_normalizar_ruts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='invitados',
+            field=models.ManyToManyField(blank=True, related_name='eventos_invitado', to='usuarios.usuario'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# La fecha de una asistencia deja de ser 'auto_now_add' y pasa a tener un valor por defecto:
+# las asistencias que el diario del kiosco sincroniza más tarde conservan la hora en que se
+# confirmaron en lugar de la hora en que llegaron a la base de datos.
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0009_evento_invitados'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='asistencia',
+            name='fecha',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -1,4 +1,7 @@
 from django.db import models
+from django.utils import timezone
+from .imagenes import AlmacenImagenes  # Imágenes de perfil encriptadas fuera de la base de datos
+from .rut import normalizar_rut  # Forma única en que se guardan los RUT
 
 # Define el modelo para la tabla 'Usuario' en la base de datos.
 # Cada instancia de esta clase representa un registro de un usuario.
@@ -11,8 +14,33 @@ class Usuario(models.Model):
     rut = models.CharField(max_length=20, unique=True)
     # Campo para la carrera del usuario, puede estar en blanco o ser nulo.
     carrera = models.CharField(max_length=100, blank=True, null=True)
-    # Campo para almacenar datos binarios de una imagen, puede estar en blanco o ser nulo.
-    imagen = models.BinaryField(blank=True, null=True)
+    # Huella (SHA-256) de la imagen de perfil, puede estar en blanco o ser nula. La imagen no se
+    # guarda en esta tabla sino encriptada en 'media/imagenes/' (ver imagenes.py), así las
+    # consultas de usuarios nunca traen sus bytes.
+    imagen_hash = models.CharField(max_length=64, blank=True, null=True)
+
+    class Meta:
+        # Índices para los listados: se ordenan por nombre y se pueden filtrar por carrera.
+        # Los índices de los tres modelos se crean con la migración 0007.
+        indexes = [
+            models.Index(fields=['nombre', 'id'], name='usuario_nombre_idx'),
+            models.Index(fields=['carrera', 'nombre'], name='usuario_carrera_idx'),
+        ]
+
+    # Guarda el RUT siempre normalizado (sin puntos ni espacios y en mayúsculas), venga del
+    # formulario, de la vista de creación o del comando 'importar_usuarios'
+    def save(self, *args, **kwargs):
+        self.rut = normalizar_rut(self.rut)
+        super().save(*args, **kwargs)
+
+    # Guarda los bytes de la imagen de perfil en el almacén y deja su huella en el usuario
+    # (hay que llamar a 'save' después)
+    def asignar_imagen(self, datos):
+        self.imagen_hash = AlmacenImagenes().guardar(datos) if datos else None
+
+    # Devuelve los bytes de la imagen de perfil, o None si no tiene
+    def leer_imagen(self):
+        return AlmacenImagenes().leer(self.imagen_hash) if self.imagen_hash else None
 
     # Método que devuelve una representación en cadena del objeto, en este caso, el nombre del usuario.
     def __str__(self):
@@ -33,6 +61,15 @@ class Evento(models.Model):
     relator = models.CharField(max_length=60, blank=True, null=True)
     # Campo booleano para indicar el estado del evento (por ejemplo, activo o inactivo).
     estado = models.BooleanField()
+    # Usuarios invitados al evento (opcional). Si el evento tiene invitados, el reconocimiento
+    # solo compara los rostros con ellos; si no tiene, se compara con todos los usuarios.
+    invitados = models.ManyToManyField(Usuario, blank=True, related_name='eventos_invitado')
+
+    class Meta:
+        # Índice para el listado de eventos, que se ordena y filtra por fecha.
+        indexes = [
+            models.Index(fields=['fecha', 'id'], name='evento_fecha_idx'),
+        ]
 
     # Método que devuelve el nombre del evento como su representación en cadena.
     def __str__(self):
@@ -45,7 +82,67 @@ class Asistencia(models.Model):
     id = models.AutoField(primary_key=True)
     # Clave foránea que relaciona la asistencia con un usuario. Si el usuario se elimina, sus registros de asistencia también se eliminarán.
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
-    # Campo de fecha y hora que se establece automáticamente al crear el registro de asistencia.
-    fecha = models.DateTimeField(auto_now_add=True)
+    # Campo de fecha y hora de la asistencia. Por defecto es el momento de crear el registro, pero
+    # las asistencias que llegan desde el diario de un kiosco (diario.py) conservan la hora en que
+    # se confirmaron, aunque se sincronicen más tarde.
+    fecha = models.DateTimeField(default=timezone.now, editable=False)
     # Clave foránea que relaciona la asistencia con un evento. Si el evento se elimina, los registros de asistencia asociados también se eliminarán.
-    evento_asist = models.ForeignKey(Evento, on_delete=models.CASCADE)
\ No newline at end of file
+    evento_asist = models.ForeignKey(Evento, on_delete=models.CASCADE)
+
+    class Meta:
+        # Un usuario solo puede tener una asistencia por evento. Esto hace que los registros
+        # por lotes sean idempotentes: un duplicado se descarta en lugar de crear otra fila.
+        # La migración 0006 la crea en las bases existentes, después de eliminar los duplicados.
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'evento_asist'], name='asistencia_unica_por_evento'),
+        ]
+        # Índices para el listado de asistencias, que se ordena por fecha (más recientes primero)
+        # y se filtra por evento. La búsqueda por (usuario, evento_asist) ya usa el índice que
+        # crea la restricción única de arriba.
+        indexes = [
+            models.Index(fields=['evento_asist', 'fecha'], name='asistencia_evento_fecha_idx'),
+            models.Index(fields=['fecha', 'id'], name='asistencia_fecha_idx'),
+        ]
+
+# Define el modelo para la tabla 'Entrenamiento' en la base de datos.
+# Registra cada ejecución del entrenamiento del modelo en segundo plano y su progreso.
+class Entrenamiento(models.Model):
+    # Estados posibles de un entrenamiento.
+    PENDIENTE = 'pendiente'
+    EN_CURSO = 'en_curso'
+    COMPLETADO = 'completado'
+    ERROR = 'error'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_CURSO, 'En curso'),
+        (COMPLETADO, 'Completado'),
+        (ERROR, 'Error'),
+    ]
+
+    # Campo de clave primaria autoincremental para el entrenamiento.
+    id = models.AutoField(primary_key=True)
+    # Estado actual del entrenamiento.
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    # Indica si el entrenamiento se pidió completo (desde cero) o incremental.
+    completo = models.BooleanField(default=False)
+    # Modo que se usó realmente ('completo' o 'incremental'), se conoce al terminar.
+    modo = models.CharField(max_length=20, blank=True, null=True)
+    # Etapa en la que se encuentra el entrenamiento (sincronizando, leyendo, entrenando, guardando).
+    fase = models.CharField(max_length=20, blank=True, null=True)
+    # Fecha y hora en que comenzó la etapa actual, para estimar el tiempo restante.
+    fase_inicio = models.DateTimeField(blank=True, null=True)
+    # Número de imágenes cargadas y total de imágenes a cargar en la etapa actual.
+    imagenes_cargadas = models.IntegerField(default=0)
+    imagenes_totales = models.IntegerField(default=0)
+    # Fecha y hora de creación del entrenamiento.
+    inicio = models.DateTimeField(auto_now_add=True)
+    # Fecha y hora de la última actualización del progreso.
+    actualizado = models.DateTimeField(auto_now=True)
+    # Fecha y hora en que terminó, puede ser nula mientras está en curso.
+    fin = models.DateTimeField(blank=True, null=True)
+    # Mensaje de error, si el entrenamiento falló.
+    mensaje = models.CharField(max_length=255, blank=True, null=True)
+
+    # Método que devuelve una representación en cadena del entrenamiento.
+    def __str__(self):
+        return f"Entrenamiento {self.id} ({self.estado})"
@@ -0,0 +1,232 @@
+# --- Pipeline de fotogramas en etapas ---
+# Separa el reconocimiento en tres etapas que corren en paralelo, conectadas por colas acotadas:
+#   1. captura: lee la cámara (o un video) sin detenerse y deja solo el fotograma más reciente
+#   2. procesamiento: detección, seguimiento, predicción y asistencia (ProcesadorReconocimiento)
+#   3. salida: dibuja y muestra el resultado o lo envía a otro destino
+# Si una etapa se atrasa, las colas descartan el elemento más antiguo en lugar de acumularlo,
+# así una consulta lenta a la base de datos nunca detiene la cámara ni produce fotogramas viejos.
+# Cada etapa lleva contadores de latencia para saber dónde se va el tiempo.
+import threading  # Hilos de cada etapa
+import time  # Para medir latencias
+from collections import deque  # Cola de las etapas
+import cv2  # OpenCV para leer la cámara o el video
+from django.db import close_old_connections  # Cada hilo cierra su conexión al terminar
+from .metricas import EstadisticasEtapa, observar  # Latencias por etapa y métricas del proceso
+
+# Cola acotada: al llenarse, descarta el elemento más antiguo (o espera, si 'descartar' es False)
+class ColaUltimos:
+
+    def __init__(self, maximo=1, descartar=True):
+        self.maximo = maximo
+        self.descartar = descartar
+        self.descartados = 0
+        self._elementos = deque()
+        self._condicion = threading.Condition()
+        self._cerrada = False
+
+    # Agrega un elemento. Devuelve False si la cola está cerrada.
+    def poner(self, elemento):
+        with self._condicion:
+            while not self.descartar and len(self._elementos) >= self.maximo and not self._cerrada:
+                self._condicion.wait(0.1)
+            if self._cerrada:
+                return False
+            if len(self._elementos) >= self.maximo:
+                self._elementos.popleft()
+                self.descartados += 1
+            self._elementos.append(elemento)
+            self._condicion.notify_all()
+            return True
+
+    # Saca el elemento más antiguo. Devuelve None si la cola se cerró y quedó vacía, o si se acabó el tiempo.
+    def obtener(self, timeout=None):
+        with self._condicion:
+            limite = None if timeout is None else time.monotonic() + timeout
+            while not self._elementos and not self._cerrada:
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return None
+                self._condicion.wait(restante)
+            if not self._elementos:
+                return None
+            elemento = self._elementos.popleft()
+            self._condicion.notify_all()
+            return elemento
+
+    # Cierra la cola: quien espera deja de esperar y no se aceptan más elementos
+    def cerrar(self):
+        with self._condicion:
+            self._cerrada = True
+            self._condicion.notify_all()
+
+# Abre una fuente de video: un número (o texto numérico) es una cámara; cualquier otro texto es
+# la ruta de un archivo o una URL (rtsp://, http://...). También acepta un objeto con 'read()'.
+def abrir_fuente(fuente):
+    if hasattr(fuente, 'read'):
+        return fuente
+    if isinstance(fuente, int) or (isinstance(fuente, str) and fuente.isdigit()):
+        return cv2.VideoCapture(int(fuente))
+    return cv2.VideoCapture(fuente)
+
+# Fotograma que viaja entre etapas junto con sus datos
+class Fotograma:
+
+    def __init__(self, numero, imagen, capturado):
+        self.numero = numero
+        self.imagen = imagen
+        self.capturado = capturado  # Instante de captura (time.monotonic)
+        self.resultados = []
+        self.eventos = []
+
+# Pipeline de reconocimiento en tres etapas
+class PipelineReconocimiento:
+
+    def __init__(self, fuente, procesador, salida, descartar=True, tamano_cola=1, al_terminar=None,
+                 tiempo_real=False):
+        # 'fuente': cámara, archivo o URL (ver abrir_fuente)
+        self.fuente = fuente
+        # 'procesador': objeto con 'procesar(imagen, ahora)' que devuelve (resultados, eventos)
+        self.procesador = procesador
+        # 'salida': función que recibe un Fotograma ya procesado; si devuelve False, el pipeline se detiene
+        self.salida = salida
+        # Con 'descartar' en False no se pierde ningún fotograma (útil para procesar un video completo)
+        # Con 'tiempo_real', un archivo de video se lee a su velocidad original (como una cámara)
+        # en lugar de lo más rápido posible
+        self.tiempo_real = tiempo_real
+        # 'al_terminar': función que el hilo de procesamiento llama al terminar (por ejemplo, para
+        # guardar las asistencias pendientes desde el mismo hilo que las acumuló)
+        self.al_terminar = al_terminar
+        self.cola_captura = ColaUltimos(tamano_cola, descartar)
+        self.cola_salida = ColaUltimos(max(2, tamano_cola), descartar)
+        self.etapas = {
+            'captura': EstadisticasEtapa(),
+            'procesamiento': EstadisticasEtapa(),
+            'salida': EstadisticasEtapa(),
+            'total': EstadisticasEtapa(),
+        }
+        self._detener = threading.Event()
+        self._hilos = []
+        self.error = None
+
+    # Etapa 1: lee fotogramas continuamente
+    def _capturar(self):
+        cam = abrir_fuente(self.fuente)
+        numero = 0
+        intervalo = 0
+        if self.tiempo_real and hasattr(cam, 'get'):
+            intervalo = 1 / (cam.get(cv2.CAP_PROP_FPS) or 30)
+        comienzo = time.monotonic()
+        try:
+            while not self._detener.is_set():
+                if intervalo:
+                    # Espera hasta el instante que le corresponde a este fotograma en el video
+                    espera = comienzo + numero * intervalo - time.monotonic()
+                    if espera > 0:
+                        time.sleep(espera)
+                inicio = time.monotonic()
+                ret, imagen = cam.read()
+                if not ret:
+                    break
+                segundos = time.monotonic() - inicio
+                self.etapas['captura'].registrar(segundos)
+                observar('leer_fotograma', segundos)
+                numero += 1
+                if not self.cola_captura.poner(Fotograma(numero, imagen, time.monotonic())):
+                    break
+        finally:
+            if hasattr(cam, 'release'):
+                cam.release()
+            self.cola_captura.cerrar()
+
+    # Etapa 2: procesa cada fotograma (siempre el más reciente disponible)
+    def _procesar(self):
+        try:
+            while True:
+                fotograma = self.cola_captura.obtener()
+                if fotograma is None:
+                    break
+                inicio = time.monotonic()
+                fotograma.resultados, fotograma.eventos = self.procesador.procesar(
+                    fotograma.imagen, ahora=fotograma.capturado
+                )
+                self.etapas['procesamiento'].registrar(time.monotonic() - inicio)
+                if not self.cola_salida.poner(fotograma):
+                    break
+        except Exception as error:
+            self.error = error
+            self._detener.set()
+        finally:
+            self.cola_salida.cerrar()
+            try:
+                if self.al_terminar:
+                    self.al_terminar()
+            finally:
+                close_old_connections()
+
+    # Etapa 3: entrega los fotogramas procesados a la función de salida
+    def _entregar(self):
+        while True:
+            fotograma = self.cola_salida.obtener()
+            if fotograma is None:
+                break
+            inicio = time.monotonic()
+            continuar = self.salida(fotograma)
+            fin = time.monotonic()
+            self.etapas['salida'].registrar(fin - inicio)
+            self.etapas['total'].registrar(fin - fotograma.capturado)
+            if continuar is False:
+                self.detener()
+                break
+
+    # Inicia la captura y el procesamiento en hilos propios
+    def _iniciar_hilos(self):
+        for nombre, destino in (('captura', self._capturar), ('procesamiento', self._procesar)):
+            hilo = threading.Thread(target=destino, name=f"pipeline-{nombre}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    # Inicia las tres etapas en segundo plano (sin bloquear)
+    def iniciar(self):
+        self._iniciar_hilos()
+        hilo = threading.Thread(target=self._entregar, name="pipeline-salida", daemon=True)
+        hilo.start()
+        self._hilos.append(hilo)
+        return self
+
+    # Ejecuta el pipeline hasta que termine la fuente o se detenga. La etapa de salida corre en
+    # el hilo que llama (necesario para 'cv2.imshow' y 'cv2.waitKey').
+    def ejecutar(self):
+        self._iniciar_hilos()
+        try:
+            self._entregar()
+        finally:
+            self.detener()
+            self.esperar()
+        return self
+
+    # Pide a todas las etapas que terminen
+    def detener(self):
+        self._detener.set()
+        self.cola_captura.cerrar()
+        self.cola_salida.cerrar()
+
+    # Espera a que terminen los hilos
+    def esperar(self, timeout=None):
+        for hilo in self._hilos:
+            if hilo is not threading.current_thread():
+                hilo.join(timeout)
+        if self.error:
+            raise self.error
+
+    # Indica si alguna etapa sigue en ejecución
+    def activo(self):
+        return any(hilo.is_alive() for hilo in self._hilos)
+
+    # Latencias por etapa y fotogramas descartados en cada cola
+    def estadisticas(self):
+        datos = {nombre: etapa.resumen() for nombre, etapa in self.etapas.items()}
+        datos['descartados'] = {
+            'captura': self.cola_captura.descartados,
+            'salida': self.cola_salida.descartados,
+        }
+        return datos
@@ -0,0 +1,212 @@
+# --- Registro de reconocedores cargados en memoria ---
+# Leer 'modelo_lbph.yml' puede tardar varios segundos cuando hay miles de usuarios, así que
+# el modelo se carga una sola vez por proceso y se comparte entre todas las peticiones.
+# Antes de entregarlo se revisa la fecha de modificación y el tamaño del archivo; si cambiaron,
+# se calcula el hash del contenido y el modelo solo se vuelve a leer si el contenido es distinto.
+# Para los eventos con lista de invitados se arma además un reconocedor reducido solo con ellos,
+# que se guarda por evento y se vuelve a armar si cambian los invitados o el modelo.
+# El modelo LBPH en formato binario ('modelo_lbph.bin') no se lee: se mapea en memoria, así que
+# cargarlo es inmediato y todos los procesos comparten sus páginas.
+import hashlib  # Para calcular el hash del archivo del modelo
+import os  # Para consultar el archivo del modelo
+import threading  # Para que una sola petición recargue el modelo a la vez
+import time  # Para medir el tiempo de carga
+from collections import OrderedDict  # Para conservar solo los subconjuntos de los últimos eventos
+import cv2  # OpenCV para el reconocedor LBPH
+import numpy as np  # Para las etiquetas de los subconjuntos
+from django.conf import settings  # Para obtener la carpeta MEDIA_ROOT
+from .almacen import AlmacenRostros  # Rostros del almacén, para armar los subconjuntos LBPH
+from .embeddings import IndiceEmbeddings, ReconocedorEmbeddings, usa_embeddings  # Reconocedor por embeddings
+from .lbph_binario import DISTANCIA_MAXIMA, ReconocedorLBPHBinario, es_modelo_binario, nombre_modelo_lbph  # Modelo LBPH binario
+
+# Cantidad máxima de eventos con su reconocedor reducido en memoria
+MAX_SUBCONJUNTOS = 8
+
+# Ruta por defecto del modelo entrenado, según el reconocedor configurado. Si el formato
+# binario todavía no se ha generado, se sigue usando el .yml que haya de antes.
+def ruta_modelo():
+    nombre = "modelo_embeddings.npz" if usa_embeddings() else nombre_modelo_lbph()
+    path = os.path.join(settings.MEDIA_ROOT, nombre)
+    anterior = os.path.join(settings.MEDIA_ROOT, "modelo_lbph.yml")
+    if es_modelo_binario(path) and not os.path.exists(path) and os.path.exists(anterior):
+        return anterior
+    return path
+
+# Calcula el hash SHA-256 de un archivo leyéndolo por bloques
+def hash_archivo(path, bloque=1024 * 1024):
+    sha = hashlib.sha256()
+    with open(path, "rb") as archivo:
+        for datos in iter(lambda: archivo.read(bloque), b""):
+            sha.update(datos)
+    return sha.hexdigest()
+
+# Estima la memoria que ocupan los histogramas de un reconocedor LBPH sin copiarlos
+def memoria_lbph(recognizer):
+    celdas = recognizer.getGridX() * recognizer.getGridY()
+    tamano_histograma = celdas * (2 ** recognizer.getNeighbors())
+    etiquetas = recognizer.getLabels()
+    n = 0 if etiquetas is None else len(etiquetas)
+    # Cada histograma es un vector float32 (4 bytes) y cada etiqueta un int32 (4 bytes)
+    return n * tamano_histograma * 4 + n * 4
+
+# Información de un modelo cargado
+class ModeloCargado:
+
+    def __init__(self, path, recognizer, firma, hash_contenido, segundos_carga, bytes_memoria):
+        self.path = path
+        self.recognizer = recognizer
+        self.firma = firma  # (fecha de modificación, tamaño) del archivo al cargarlo
+        self.hash = hash_contenido
+        self.segundos_carga = segundos_carga
+        self.bytes_memoria = bytes_memoria
+        self.cargado_en = time.time()
+        self.recargas = 0
+
+    # Devuelve las métricas del modelo como diccionario
+    def metricas(self):
+        return {
+            "path": self.path,
+            "hash": self.hash,
+            "segundos_carga": round(self.segundos_carga, 3),
+            "bytes_memoria": self.bytes_memoria,
+            "bytes_archivo": self.firma[1],
+            "cargado_en": self.cargado_en,
+            "recargas": self.recargas,
+        }
+
+# Reconocedor sin usuarios (por ejemplo, si ningún invitado tiene capturas): todo es desconocido,
+# con la misma distancia finita que devuelve LBPH sin coincidencias (infinito no es JSON válido)
+class ReconocedorVacio:
+
+    def predict(self, rostro):
+        return -1, DISTANCIA_MAXIMA
+
+# Arma un reconocedor que solo considera a los usuarios indicados.
+# Con embeddings o con el modelo LBPH binario basta filtrar sus histogramas. LBPH de OpenCV no
+# permite quitar histogramas de un modelo, así que se entrena uno nuevo con los rostros de esos
+# usuarios desde el almacén.
+def crear_subconjunto(recognizer, ids, almacen=None):
+    if isinstance(recognizer, ReconocedorEmbeddings):
+        return ReconocedorEmbeddings(recognizer.indice.subconjunto(ids), recognizer.umbral_confianza)
+    if isinstance(recognizer, ReconocedorLBPHBinario):
+        return recognizer.subconjunto(ids)
+    imagenes, labels = (almacen or AlmacenRostros()).leer(ids_validos=ids)
+    if not len(imagenes):
+        return ReconocedorVacio()
+    subconjunto = cv2.face.LBPHFaceRecognizer_create(
+        recognizer.getRadius(), recognizer.getNeighbors(), recognizer.getGridX(), recognizer.getGridY()
+    )
+    subconjunto.train(list(imagenes), labels.astype(np.int32))
+    return subconjunto
+
+# Reconocedor reducido de un evento y la clave con la que se armó
+class SubconjuntoEvento:
+
+    def __init__(self, clave, recognizer, usuarios, segundos):
+        self.clave = clave  # (archivo del modelo, hash del modelo, invitados)
+        self.recognizer = recognizer
+        self.usuarios = usuarios
+        self.segundos = segundos
+
+# Registro de los modelos cargados en el proceso, uno por archivo
+class RegistroModelos:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._modelos = {}
+        self._lock_subconjuntos = threading.Lock()
+        self._subconjuntos = OrderedDict()
+
+    # Lee el archivo y crea el reconocedor (LBPH para '.yml' y '.bin', embeddings para '.npz')
+    def _cargar(self, path, firma, hash_contenido):
+        inicio = time.perf_counter()
+        if path.endswith(".npz"):
+            recognizer = ReconocedorEmbeddings(IndiceEmbeddings.cargar(path))
+            memoria = recognizer.bytes_memoria()
+        elif es_modelo_binario(path):
+            recognizer = ReconocedorLBPHBinario.cargar(path)
+            memoria = recognizer.bytes_memoria()
+        else:
+            recognizer = cv2.face.LBPHFaceRecognizer_create()
+            recognizer.read(path)
+            memoria = memoria_lbph(recognizer)
+        segundos = time.perf_counter() - inicio
+        return ModeloCargado(path, recognizer, firma, hash_contenido, segundos, memoria)
+
+    # Devuelve el modelo cargado del archivo indicado, leyéndolo solo si cambió
+    def obtener_modelo(self, path=None):
+        path = os.path.abspath(path or ruta_modelo())
+        estado = os.stat(path)
+        firma = (estado.st_mtime_ns, estado.st_size)
+
+        modelo = self._modelos.get(path)
+        if modelo is not None and modelo.firma == firma:
+            return modelo
+
+        with self._lock:
+            # Otra petición pudo haberlo recargado mientras se esperaba el lock
+            modelo = self._modelos.get(path)
+            if modelo is not None and modelo.firma == firma:
+                return modelo
+            hash_contenido = hash_archivo(path)
+            if modelo is not None and modelo.hash == hash_contenido:
+                # El archivo se reescribió con el mismo contenido: no hace falta volver a leerlo
+                modelo.firma = firma
+                return modelo
+            nuevo = self._cargar(path, firma, hash_contenido)
+            if modelo is not None:
+                nuevo.recargas = modelo.recargas + 1
+            # El modelo nuevo reemplaza al anterior de una sola vez; las peticiones que ya
+            # tenían el anterior lo siguen usando hasta terminar
+            self._modelos[path] = nuevo
+            return nuevo
+
+    # Devuelve el reconocedor del archivo indicado
+    def obtener(self, path=None):
+        return self.obtener_modelo(path).recognizer
+
+    # Devuelve el reconocedor para un evento: el reducido a sus invitados o, si el evento no
+    # tiene invitados, el modelo completo
+    def obtener_para_evento(self, evento_id, invitados, path=None):
+        modelo = self.obtener_modelo(path)
+        if not invitados:
+            return modelo.recognizer
+        clave = (modelo.path, modelo.hash, frozenset(invitados))
+        subconjunto = self._subconjuntos.get(evento_id)
+        if subconjunto is not None and subconjunto.clave == clave:
+            return subconjunto.recognizer
+
+        with self._lock_subconjuntos:
+            subconjunto = self._subconjuntos.get(evento_id)
+            if subconjunto is None or subconjunto.clave != clave:
+                inicio = time.perf_counter()
+                recognizer = crear_subconjunto(modelo.recognizer, invitados)
+                subconjunto = SubconjuntoEvento(clave, recognizer, len(invitados), time.perf_counter() - inicio)
+                self._subconjuntos[evento_id] = subconjunto
+            # Conserva solo los subconjuntos de los eventos usados más recientemente
+            self._subconjuntos.move_to_end(evento_id)
+            while len(self._subconjuntos) > MAX_SUBCONJUNTOS:
+                self._subconjuntos.popitem(last=False)
+            return subconjunto.recognizer
+
+    # Devuelve las métricas de todos los modelos cargados
+    def metricas(self):
+        return [modelo.metricas() for modelo in list(self._modelos.values())]
+
+    # Devuelve las métricas de los reconocedores reducidos por evento
+    def metricas_subconjuntos(self):
+        return [
+            {"evento": evento_id, "usuarios": sub.usuarios, "segundos_armado": round(sub.segundos, 3)}
+            for evento_id, sub in list(self._subconjuntos.items())
+        ]
+
+# Registro compartido por todo el proceso
+registro = RegistroModelos()
+
+# Devuelve el reconocedor del proceso, cargándolo o recargándolo si es necesario.
+# Si se indica un evento con invitados, devuelve el reconocedor reducido a ellos.
+def obtener_reconocedor(path=None, evento=None):
+    if evento is None:
+        return registro.obtener(path)
+    invitados = list(evento.invitados.values_list("id", flat=True))
+    return registro.obtener_para_evento(evento.id, invitados, path)
@@ -0,0 +1,270 @@
+# --- Procesamiento de fotogramas para el reconocimiento y la asistencia ---
+# Reúne en una clase la lógica que antes estaba dentro del bucle de 'reconocer_usuario':
+# detectar rostros, seguirlos entre fotogramas, predecir a quién pertenecen, confirmar la
+# identidad durante unos segundos y registrar la asistencia. El resultado de cada fotograma
+# se devuelve como datos (rectángulos, textos y eventos) y el dibujo se hace aparte, para
+# poder usar la misma lógica con o sin ventana.
+import time  # Para medir el tiempo de confirmación
+import cv2  # OpenCV para convertir y dibujar sobre los fotogramas
+from django.conf import settings  # Para leer la configuración del reconocimiento
+from .almacen import normalizar_rostro  # Mismo tamaño fijo con que se entrenó el modelo
+from .asistencia import SesionAsistencia  # Registro de asistencia (para los lotes)
+from .metricas import ResumenSesion, contar, medir  # Tiempos por etapa y contadores
+from .seguimiento import SeguidorRostros  # Seguimiento de varios rostros
+
+# Colores usados para cada estado (formato BGR)
+ROJO = (0, 0, 255)
+VERDE = (0, 255, 0)
+AMARILLO = (255, 255, 0)
+AMARILLO_CLARO = (0, 255, 255)
+
+# Devuelve un parámetro de 'settings.RECONOCIMIENTO' o su valor por defecto
+def parametro(nombre, por_defecto):
+    return getattr(settings, 'RECONOCIMIENTO', {}).get(nombre, por_defecto)
+
+# Devuelve el umbral de confianza para un reconocedor: el indicado, el propio del reconocedor
+# o el de 'settings.RECONOCIMIENTO'
+def umbral_de(recognizer, umbral_confianza=None):
+    return umbral_confianza or getattr(recognizer, 'umbral_confianza', None) or parametro('UMBRAL_CONFIANZA', 40)
+
+# Resultado del procesamiento de un rostro en un fotograma
+class ResultadoRostro:
+
+    def __init__(self, caja, texto, color, progreso=None, pista=None, usuario_id=None, confianza=None):
+        self.caja = caja  # Rectángulo (x, y, w, h)
+        self.texto = texto  # Texto a mostrar sobre el rostro
+        self.color = color  # Color del rectángulo y del texto
+        self.progreso = progreso  # Avance de la confirmación entre 0 y 1 (None si no aplica)
+        self.pista = pista  # ID de la pista de seguimiento
+        self.usuario_id = usuario_id  # Usuario reconocido (None si es desconocido)
+        self.confianza = confianza  # Distancia de la última predicción (menor es mejor)
+
+    # Devuelve el resultado como diccionario (para respuestas JSON y eventos)
+    def como_dict(self):
+        return {
+            'caja': [int(v) for v in self.caja],
+            'texto': self.texto,
+            'progreso': self.progreso,
+            'pista': self.pista,
+            'usuario_id': self.usuario_id,
+            'confianza': None if self.confianza is None else round(float(self.confianza), 2),
+        }
+
+# Procesador de fotogramas para una sesión de reconocimiento de un evento
+class ProcesadorReconocimiento:
+
+    def __init__(self, recognizer, detector, sesion, tiempo_confirmacion=None, umbral_confianza=None,
+                 predecir_cada=None, seguidor=None):
+        self.recognizer = recognizer
+        self.detector = detector
+        self.sesion = sesion  # SesionAsistencia del evento
+        # Segundos necesarios para confirmar un rostro antes de registrar la asistencia
+        self.tiempo_confirmacion = tiempo_confirmacion or parametro('TIEMPO_CONFIRMACION', 2)
+        # Una confianza menor a este valor indica una alta probabilidad de acierto
+        self.umbral_confianza = umbral_confianza
+        # Cada cuántos fotogramas se vuelve a predecir un rostro que ya se está siguiendo
+        self.predecir_cada = predecir_cada or parametro('PREDECIR_CADA', 5)
+        self.seguidor = seguidor or SeguidorRostros()
+        # Tiempos y contadores de esta sesión (además de los del proceso, en '/metrics')
+        self.metricas = ResumenSesion()
+
+    # Umbral de confianza vigente: el indicado al crear el procesador, el propio del reconocedor
+    # (el de embeddings usa otra escala de distancias) o el de la configuración
+    def umbral(self):
+        return umbral_de(self.recognizer, self.umbral_confianza)
+
+    # Procesa un fotograma BGR. Devuelve la lista de resultados (uno por rostro) y los eventos
+    # de asistencia registrados en este fotograma. 'ahora' permite indicar el instante del
+    # fotograma (por ejemplo, al reproducir un video); por defecto se usa el reloj del sistema.
+    def procesar(self, frame, ahora=None):
+        ahora = time.monotonic() if ahora is None else ahora
+        metricas = self.metricas
+        # Convierte a escala de grises y detecta rostros
+        with medir('convertir_gris', metricas):
+            gris = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        with medir('detectar', metricas):
+            cajas = self.detector.detectar(frame, gris)
+        # Asocia cada rostro con su pista de seguimiento
+        pistas = self.seguidor.actualizar(cajas)
+        contar('fotogramas', 1, metricas)
+        if len(cajas):
+            contar('rostros', len(cajas), metricas)
+
+        resultados = []
+        eventos = []
+        for pista in pistas:
+            x, y, w, h = pista.caja
+            # Solo se predice cuando la pista es nueva o pasaron 'predecir_cada' fotogramas
+            if pista.requiere_prediccion(self.predecir_cada):
+                with medir('predecir', metricas):
+                    # El modelo se entrenó con rostros de 100x100 del almacén: el recorte se lleva al mismo tamaño
+                    label, confianza = self.recognizer.predict(normalizar_rostro(gris[y:y+h, x:x+w]))
+                contar('predicciones', 1, metricas)
+                # El voto es "desconocido" (None) si la confianza no alcanza o el usuario ya no existe
+                conocido = confianza < self.umbral() and self.sesion.nombre(label) is not None
+                if not conocido:
+                    contar('desconocidos', 1, metricas)
+                pista.votar(label if conocido else None, confianza)
+
+            resultado, evento = self._estado_pista(pista, ahora)
+            resultados.append(resultado)
+            if evento:
+                eventos.append(evento)
+                contar('confirmaciones', 1, metricas)
+
+        # Guarda las asistencias pendientes si ya pasó el intervalo entre lotes
+        self.sesion.enviar()
+        return resultados, eventos
+
+    # Avanza la confirmación de una pista y devuelve su resultado y, si corresponde, el evento de asistencia
+    def _estado_pista(self, pista, ahora):
+        label = pista.etiqueta
+        caja = pista.caja
+        evento = None
+
+        # Si la mayoría de las predicciones es "desconocido"
+        if label is None:
+            pista.etiqueta_confirmando = None
+            pista.inicio_confirmacion = None
+            return ResultadoRostro(caja, "Desconocido", ROJO, pista=pista.id, confianza=pista.confianza), None
+
+        nombre = self.sesion.nombre(label)
+        # Si el usuario ya tiene registrada la asistencia para este evento
+        if self.sesion.ya_registrado(label):
+            pista.etiqueta_confirmando = None
+            pista.inicio_confirmacion = None
+            return ResultadoRostro(caja, f"{nombre} ya registrado", AMARILLO, pista=pista.id,
+                                   usuario_id=label, confianza=pista.confianza), None
+
+        # Si es un rostro nuevo o cambió la identidad, inicia la confirmación
+        if pista.etiqueta_confirmando != label:
+            pista.etiqueta_confirmando = label
+            pista.inicio_confirmacion = ahora
+            return ResultadoRostro(caja, f"Reconociendo a {nombre}", AMARILLO_CLARO, progreso=0.0,
+                                   pista=pista.id, usuario_id=label, confianza=pista.confianza), None
+
+        # Calcula cuánto tiempo lleva confirmándose esta pista
+        transcurrido = ahora - pista.inicio_confirmacion
+        progreso = min(1.0, transcurrido / self.tiempo_confirmacion)
+        if transcurrido >= self.tiempo_confirmacion:
+            # Registra la asistencia (se guarda en el próximo lote)
+            if self.sesion.registrar(label):
+                texto, color = f"Usuario {nombre} registrado", VERDE
+                evento = {
+                    'tipo': 'asistencia',
+                    'usuario_id': label,
+                    'nombre': nombre,
+                    'evento_id': self.sesion.evento.id,
+                    'pista': pista.id,
+                    'segundos_confirmacion': round(transcurrido, 2),
+                }
+            else:
+                texto, color = f"{nombre} ya registrado", AMARILLO
+            pista.etiqueta_confirmando = None
+            pista.inicio_confirmacion = None
+        else:
+            texto, color = f"Confirmando a {nombre}...", AMARILLO_CLARO
+
+        return ResultadoRostro(caja, texto, color, progreso=progreso, pista=pista.id,
+                               usuario_id=label, confianza=pista.confianza), evento
+
+    # Guarda todo lo pendiente al terminar
+    def cerrar(self):
+        self.sesion.cerrar()
+
+# Dibuja los resultados sobre el fotograma (rectángulos, textos y barras de confirmación)
+def anotar(frame, resultados):
+    with medir('dibujar'):
+        for resultado in resultados:
+            x, y, w, h = resultado.caja
+            # Dibuja una barra de progreso para la confirmación visual
+            if resultado.progreso:
+                cv2.rectangle(frame, (x, y + h + 5), (x + w, y + h + 15), (200, 200, 200), -1)
+                cv2.rectangle(frame, (x, y + h + 5), (x + int(w * resultado.progreso), y + h + 15), VERDE, -1)
+            # Dibuja el rectángulo y el texto sobre el fotograma
+            cv2.rectangle(frame, (x, y), (x+w, y+h), resultado.color, 2)
+            cv2.putText(frame, resultado.texto, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, resultado.color, 2)
+    return frame
+
+# Reconoce de una sola vez un lote de imágenes enviadas por un cliente (navegador o kiosco).
+# 'fotogramas' son imágenes completas (BGR o grises) en las que se buscan rostros y 'rostros' son
+# rostros ya recortados (en grises). Como la petición no guarda estado entre fotogramas, en lugar
+# de confirmar durante unos segundos se exige que el usuario se reconozca en al menos
+# 'coincidencias' rostros del mismo lote antes de registrar su asistencia.
+# Devuelve un diccionario con el resultado de cada imagen y las asistencias registradas.
+def reconocer_lote(recognizer, detector, evento, fotogramas=(), rostros=(), umbral_confianza=None,
+                   coincidencias=None):
+    umbral_confianza = umbral_de(recognizer, umbral_confianza)
+    coincidencias = coincidencias or parametro('COINCIDENCIAS_LOTE', 2)
+
+    # Primero detecta todos los rostros del lote, luego los predice y al final consulta la base de datos una sola vez
+    imagenes = []
+    recortes = []  # (imagen, caja, rostro)
+    for tipo, lista in (('fotograma', fotogramas), ('rostro', rostros)):
+        for imagen in lista:
+            salida = {'indice': len(imagenes), 'tipo': tipo, 'rostros': []}
+            imagenes.append(salida)
+            if imagen is None:
+                salida['error'] = "No se pudo leer la imagen"
+                continue
+            with medir('convertir_gris'):
+                gris = cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY) if imagen.ndim == 3 else imagen
+            if tipo == 'fotograma':
+                with medir('detectar'):
+                    cajas = detector.detectar(imagen, gris)
+            else:
+                cajas = [(0, 0, gris.shape[1], gris.shape[0])]
+            for (x, y, w, h) in cajas:
+                # Mismo tamaño fijo que los rostros con que se entrenó el modelo
+                recortes.append((salida, (x, y, w, h), normalizar_rostro(gris[y:y+h, x:x+w])))
+
+    # El reconocedor por embeddings resuelve todos los rostros con un solo producto de matrices
+    with medir('predecir_lote'):
+        if hasattr(recognizer, 'predict_lote'):
+            labels, confianzas = recognizer.predict_lote([rostro for _, _, rostro in recortes])
+        else:
+            pares = [recognizer.predict(rostro) for _, _, rostro in recortes]
+            labels, confianzas = [p[0] for p in pares], [p[1] for p in pares]
+    contar('fotogramas', len(imagenes))
+    contar('rostros', len(recortes))
+    contar('predicciones', len(recortes))
+    predicciones = [(salida, caja, int(label), float(confianza))
+                    for (salida, caja, _), label, confianza in zip(recortes, labels, confianzas)]
+
+    # Carga solo los usuarios reconocidos en el lote y registra a los que alcanzan las coincidencias
+    conocidos = [label for _, _, label, confianza in predicciones if confianza < umbral_confianza]
+    sesion = SesionAsistencia(evento, usuarios=set(conocidos))
+    votos = {}
+    for label in conocidos:
+        if sesion.nombre(label) is not None:
+            votos[label] = votos.get(label, 0) + 1
+
+    registrados = []
+    for label, cantidad in votos.items():
+        if cantidad >= coincidencias and sesion.registrar(label):
+            registrados.append(label)
+    sesion.cerrar()
+    contar('desconocidos', sum(1 for _, _, label, confianza in predicciones
+                               if confianza >= umbral_confianza or sesion.nombre(label) is None))
+    contar('confirmaciones', len(registrados))
+
+    for salida, caja, label, confianza in predicciones:
+        nombre = sesion.nombre(label) if confianza < umbral_confianza else None
+        if nombre is None:
+            estado, usuario_id = 'desconocido', None
+        elif label in registrados:
+            estado, usuario_id = 'registrado', label
+        elif sesion.ya_registrado(label):
+            estado, usuario_id = 'ya_registrado', label
+        else:
+            # Reconocido, pero en menos rostros de los necesarios para registrar la asistencia
+            estado, usuario_id = 'pendiente', label
+        salida['rostros'].append({
+            'caja': [int(v) for v in caja],
+            'usuario_id': usuario_id,
+            'nombre': nombre,
+            'confianza': round(confianza, 2),
+            'estado': estado,
+        })
+
+    return {'evento_id': evento.id, 'imagenes': imagenes, 'registrados': registrados}
@@ -0,0 +1,181 @@
+# --- Reproducción de grabaciones para medir el reconocimiento ---
+# Permite pasar un video grabado (o una carpeta de fotogramas) por la misma lógica de
+# reconocimiento y asistencia que usa el kiosco ('ProcesadorReconocimiento' y
+# 'SesionAsistencia'), sin cámara ni ventana, para reproducir y perfilar problemas de
+# rendimiento con grabaciones reales.
+# Los fotogramas se procesan uno tras otro en el mismo hilo y cada uno recibe el instante que
+# le corresponde en la grabación, así la confirmación de asistencia avanza al ritmo del video y
+# dos reproducciones de la misma grabación dan el mismo resultado.
+import os  # Para recorrer la carpeta de fotogramas
+import time  # Para medir la latencia de cada fotograma
+import cv2  # OpenCV para leer el video y las imágenes
+import numpy as np  # Para calcular los percentiles
+from django.db import connection  # Para contar las consultas a la base de datos
+
+# Extensiones de imagen aceptadas en una carpeta de fotogramas
+EXTENSIONES_IMAGEN = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Recorre los fotogramas de un video o de una carpeta de imágenes (en orden alfabético).
+# Entrega (número, segundo de la grabación, imagen BGR). 'fps' se usa para los fotogramas de
+# una carpeta y para los videos que no informan la posición de cada fotograma.
+def leer_grabacion(path, fps=30.0, maximo=None):
+    if os.path.isdir(path):
+        archivos = sorted(f for f in os.listdir(path) if f.lower().endswith(EXTENSIONES_IMAGEN))
+        for numero, archivo in enumerate(archivos[:maximo], start=1):
+            imagen = cv2.imread(os.path.join(path, archivo))
+            if imagen is not None:
+                yield numero, (numero - 1) / fps, imagen
+        return
+
+    cam = cv2.VideoCapture(path)
+    if not cam.isOpened():
+        raise ValueError(f"No se pudo abrir el video '{path}'.")
+    fps = cam.get(cv2.CAP_PROP_FPS) or fps
+    numero = 0
+    try:
+        while maximo is None or numero < maximo:
+            ret, imagen = cam.read()
+            if not ret:
+                break
+            numero += 1
+            milisegundos = cam.get(cv2.CAP_PROP_POS_MSEC)
+            yield numero, milisegundos / 1000 if milisegundos > 0 else (numero - 1) / fps, imagen
+    finally:
+        cam.release()
+
+# Reloj que marca el instante de la grabación en lugar del tiempo real. Se entrega a
+# 'SesionAsistencia' para que los lotes de asistencias se guarden cada tantos segundos del
+# video, como en el kiosco, aunque la reproducción vaya más rápido.
+class RelojGrabacion:
+
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+# Cuenta las consultas que se ejecutan en la conexión del hilo actual mientras está activo
+# ('with ContadorConsultas() as contador: ...'), usando 'connection.execute_wrapper'
+class ContadorConsultas:
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+        self._contexto = None
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.segundos += time.perf_counter() - inicio
+
+    def __enter__(self):
+        self._contexto = connection.execute_wrapper(self)
+        self._contexto.__enter__()
+        return self
+
+    def __exit__(self, *error):
+        return self._contexto.__exit__(*error)
+
+# Percentiles de una lista de duraciones en segundos, en milisegundos
+def percentiles_ms(segundos, percentiles=(50, 95, 99)):
+    if not segundos:
+        return {f"p{p}_ms": None for p in percentiles}
+    valores = np.percentile(np.asarray(segundos) * 1000, percentiles)
+    return {f"p{p}_ms": round(float(v), 2) for p, v in zip(percentiles, valores)}
+
+# Reproduce una grabación con un procesador de reconocimiento y devuelve el informe:
+# rendimiento, latencia por fotograma, consultas a la base de datos y tiempo hasta confirmar
+# la asistencia de cada persona. 'reloj' es el RelojGrabacion de la sesión de asistencia (si
+# tiene uno) y 'al_procesar' una función opcional que recibe (número, imagen, resultados,
+# eventos) después de cada fotograma.
+def reproducir_grabacion(procesador, fotogramas, reloj=None, al_procesar=None):
+    latencias = []
+    consultas = []
+    personas = {}  # {usuario_id: datos de la persona}
+    primer_segundo = ultimo_segundo = None
+    inicio_total = time.perf_counter()
+    segundos_lectura = 0.0
+    contador = ContadorConsultas()
+
+    with contador:
+        fotogramas = iter(fotogramas)
+        while True:
+            inicio = time.perf_counter()
+            siguiente = next(fotogramas, None)
+            segundos_lectura += time.perf_counter() - inicio
+            if siguiente is None:
+                break
+            numero, segundo, imagen = siguiente
+            if primer_segundo is None:
+                primer_segundo = segundo
+            ultimo_segundo = segundo
+            if reloj is not None:
+                reloj.ahora = segundo
+
+            antes = contador.consultas
+            inicio = time.perf_counter()
+            resultados, eventos = procesador.procesar(imagen, ahora=segundo)
+            latencias.append(time.perf_counter() - inicio)
+            consultas.append(contador.consultas - antes)
+
+            # Momento en que cada persona se reconoce por primera vez y en que se confirma
+            for resultado in resultados:
+                if resultado.usuario_id is not None and resultado.usuario_id not in personas:
+                    personas[resultado.usuario_id] = {
+                        'usuario_id': resultado.usuario_id,
+                        'nombre': procesador.sesion.nombre(resultado.usuario_id),
+                        'reconocido_en': round(segundo, 3),
+                        'ya_registrado': procesador.sesion.ya_registrado(resultado.usuario_id),
+                        'confirmado_en': None,
+                        'segundos_hasta_confirmar': None,
+                    }
+            for evento in eventos:
+                persona = personas.get(evento['usuario_id'])
+                if persona is not None and persona['confirmado_en'] is None:
+                    persona['confirmado_en'] = round(segundo, 3)
+                    persona['segundos_hasta_confirmar'] = round(segundo - persona['reconocido_en'], 3)
+
+            if al_procesar is not None:
+                al_procesar(numero, imagen, resultados, eventos)
+
+        # Las asistencias pendientes también cuentan como consultas de la sesión
+        antes = contador.consultas
+        procesador.cerrar()
+        consultas_cierre = contador.consultas - antes
+
+    segundos_total = time.perf_counter() - inicio_total
+    segundos_proceso = sum(latencias)
+    cantidad = len(latencias)
+    confirmaciones = [p['segundos_hasta_confirmar'] for p in personas.values()
+                      if p['segundos_hasta_confirmar'] is not None]
+    return {
+        'fotogramas': cantidad,
+        'segundos_grabacion': round(ultimo_segundo - primer_segundo, 3) if cantidad else 0.0,
+        'segundos_total': round(segundos_total, 3),
+        'segundos_lectura': round(segundos_lectura, 3),
+        # FPS sostenidos: solo el procesamiento y, aparte, incluyendo la lectura de la grabación
+        'fps_procesamiento': round(cantidad / segundos_proceso, 2) if segundos_proceso else None,
+        'fps_total': round(cantidad / segundos_total, 2) if segundos_total else None,
+        'latencia': {
+            'promedio_ms': round(1000 * segundos_proceso / cantidad, 2) if cantidad else None,
+            **percentiles_ms(latencias),
+            'maximo_ms': round(1000 * max(latencias), 2) if latencias else None,
+        },
+        'consultas': {
+            'total': contador.consultas,
+            'por_fotograma': round(sum(consultas) / cantidad, 3) if cantidad else None,
+            'maximo_fotograma': max(consultas) if consultas else 0,
+            'fotogramas_con_consultas': sum(1 for c in consultas if c),
+            'al_cerrar': consultas_cierre,
+            'segundos': round(contador.segundos, 3),
+        },
+        'personas': sorted(personas.values(), key=lambda p: p['reconocido_en']),
+        'confirmadas': len(confirmaciones),
+        'segundos_hasta_confirmar_promedio': (
+            round(sum(confirmaciones) / len(confirmaciones), 3) if confirmaciones else None
+        ),
+        'etapas': procesador.metricas.resumen()['etapas'],
+    }
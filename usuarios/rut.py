@@ -0,0 +1,8 @@
+# --- Forma en que se guardan los RUT ---
+# Módulo sin dependencias para que lo usen tanto los modelos como la importación masiva, el
+# formulario, las vistas y las migraciones sin cargar OpenCV ni los procesos de trabajo.
+
+# Normaliza un RUT: sin puntos ni espacios y en mayúsculas. Es la forma en que se guarda en la
+# base de datos (ver 'Usuario.save'), así el RUT del CSV, el de las fotos y el del formulario coinciden.
+def normalizar_rut(rut):
+    return (rut or '').replace('.', '').replace(' ', '').strip().upper()
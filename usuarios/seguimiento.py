@@ -0,0 +1,106 @@
+# --- Seguimiento de varios rostros entre fotogramas ---
+# Asocia los rostros detectados en cada fotograma con los del fotograma anterior según cuánto
+# se superponen sus rectángulos (IoU). Cada rostro seguido ("pista") guarda sus propias
+# predicciones y su propio tiempo de confirmación, de modo que varias personas frente a la
+# cámara se confirman en paralelo sin reiniciarse entre sí. Además, una pista solo necesita
+# volver a predecirse cada cierto número de fotogramas.
+from collections import Counter, deque  # Para la votación de etiquetas
+import numpy as np  # Para calcular las superposiciones de forma vectorizada
+
+# Calcula la matriz de IoU (intersección sobre unión) entre dos grupos de rectángulos (x, y, w, h)
+def matriz_iou(cajas_a, cajas_b):
+    a = np.asarray(cajas_a, dtype=np.float32).reshape(-1, 1, 4)
+    b = np.asarray(cajas_b, dtype=np.float32).reshape(1, -1, 4)
+    x1 = np.maximum(a[..., 0], b[..., 0])
+    y1 = np.maximum(a[..., 1], b[..., 1])
+    x2 = np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2])
+    y2 = np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3])
+    interseccion = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    union = a[..., 2] * a[..., 3] + b[..., 2] * b[..., 3] - interseccion
+    return np.where(union > 0, interseccion / np.maximum(union, 1e-6), 0.0)
+
+# Un rostro seguido a lo largo de varios fotogramas
+class Pista:
+
+    def __init__(self, id_pista, caja, votos):
+        self.id = id_pista
+        self.caja = tuple(int(v) for v in caja)
+        # Últimas predicciones (etiqueta o None si fue desconocido) para decidir por mayoría
+        self.votos = deque(maxlen=votos)
+        self.confianza = None
+        # Fotogramas transcurridos desde la última predicción (None = nunca se ha predicho)
+        self.sin_predecir = None
+        # Fotogramas seguidos en que la pista no se encontró
+        self.perdidos = 0
+        # Etiqueta que se está confirmando y desde cuándo
+        self.etiqueta_confirmando = None
+        self.inicio_confirmacion = None
+
+    # Agrega una predicción a la votación
+    def votar(self, label, confianza):
+        self.votos.append(label)
+        self.confianza = confianza
+        self.sin_predecir = 0
+
+    # Etiqueta con más votos entre las últimas predicciones (None si gana "desconocido")
+    @property
+    def etiqueta(self):
+        if not self.votos:
+            return None
+        return Counter(self.votos).most_common(1)[0][0]
+
+    # Indica si la pista debe volver a predecirse en este fotograma
+    def requiere_prediccion(self, cada):
+        return self.sin_predecir is None or self.sin_predecir >= cada
+
+# Seguidor de rostros: mantiene las pistas activas y las actualiza con cada fotograma
+class SeguidorRostros:
+
+    def __init__(self, umbral_iou=0.3, max_perdidos=5, votos=5):
+        # Superposición mínima para considerar que dos rectángulos son el mismo rostro
+        self.umbral_iou = umbral_iou
+        # Fotogramas que una pista puede desaparecer antes de descartarla
+        self.max_perdidos = max_perdidos
+        # Cantidad de predicciones que participan en la votación de cada pista
+        self.votos = votos
+        self.pistas = []
+        self._siguiente_id = 1
+
+    # Asocia los rectángulos detectados con las pistas existentes (emparejamiento voraz por
+    # mayor IoU). Devuelve la lista de pistas visibles en este fotograma, en el mismo orden
+    # que 'cajas'. Las pistas no encontradas se conservan unos fotogramas por si reaparecen.
+    def actualizar(self, cajas):
+        cajas = [tuple(int(v) for v in caja) for caja in cajas]
+        asignadas = [None] * len(cajas)
+        libres = set(range(len(self.pistas)))
+
+        if cajas and self.pistas:
+            iou = matriz_iou([p.caja for p in self.pistas], cajas)
+            # Recorre los pares de mayor a menor superposición
+            for indice in np.argsort(-iou, axis=None):
+                i, j = np.unravel_index(indice, iou.shape)
+                if iou[i, j] < self.umbral_iou:
+                    break
+                if i in libres and asignadas[j] is None:
+                    libres.discard(i)
+                    asignadas[j] = self.pistas[i]
+
+        # Actualiza las pistas encontradas y crea pistas nuevas para los rostros sin pareja
+        for j, caja in enumerate(cajas):
+            pista = asignadas[j]
+            if pista is None:
+                pista = asignadas[j] = Pista(self._siguiente_id, caja, self.votos)
+                self._siguiente_id += 1
+                self.pistas.append(pista)
+            else:
+                pista.caja = caja
+                pista.perdidos = 0
+                if pista.sin_predecir is not None:
+                    pista.sin_predecir += 1
+
+        # Las pistas no encontradas conservan su estado unos fotogramas (por si el detector falló
+        # en un fotograma aislado) y se descartan si llevan demasiado tiempo perdidas
+        for i in libres:
+            self.pistas[i].perdidos += 1
+        self.pistas = [p for p in self.pistas if p.perdidos <= self.max_perdidos]
+        return asignadas
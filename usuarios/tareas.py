@@ -0,0 +1,120 @@
+# --- Entrenamiento en segundo plano ---
+# Ejecuta el entrenamiento del modelo fuera de la petición HTTP, en un hilo administrado por
+# el propio proceso de Django (no requiere Celery, Redis ni otro intermediario).
+# Cada ejecución queda registrada en el modelo 'Entrenamiento', que guarda su estado y su
+# progreso; solo se permite un entrenamiento activo a la vez.
+import threading  # Para el lock del proceso y el latido del trabajo
+import time  # Para limitar la frecuencia de escritura del progreso
+from concurrent.futures import ThreadPoolExecutor  # Hilo que ejecuta los entrenamientos
+from datetime import timedelta  # Para detectar entrenamientos abandonados
+from django.conf import settings  # Para leer la configuración del entrenamiento
+from django.db import close_old_connections, transaction  # Manejo de conexiones y transacciones
+from django.utils import timezone  # Fechas con zona horaria
+from .entrenamiento import entrenar_modelo  # Lógica del entrenamiento
+from .models import Entrenamiento  # Registro de los entrenamientos
+
+# Un solo hilo: los entrenamientos nunca se ejecutan en paralelo dentro del proceso
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="entrenamiento")
+_lock = threading.Lock()
+# Cada cuántos segundos se marca que un entrenamiento sigue vivo
+INTERVALO_LATIDO = 30
+# Cada cuántos segundos, como máximo, se guarda el progreso en la base de datos
+INTERVALO_PROGRESO = 0.5
+
+# Minutos sin actualizaciones tras los cuales un entrenamiento se considera abandonado
+# (por ejemplo, si el proceso que lo ejecutaba se reinició)
+def minutos_abandono():
+    return getattr(settings, "ENTRENAMIENTO_MINUTOS_ABANDONO", 5)
+
+# Inicia un entrenamiento en segundo plano, salvo que ya haya uno activo.
+# Devuelve el entrenamiento (nuevo o el que ya estaba en curso) y si se creó uno nuevo.
+def iniciar_entrenamiento(completo=False):
+    with _lock, transaction.atomic():
+        activos = Entrenamiento.objects.select_for_update().filter(
+            estado__in=[Entrenamiento.PENDIENTE, Entrenamiento.EN_CURSO]
+        )
+        # Libera los entrenamientos que dejaron de dar señales de vida
+        limite = timezone.now() - timedelta(minutes=minutos_abandono())
+        activos.filter(actualizado__lt=limite).update(
+            estado=Entrenamiento.ERROR, fin=timezone.now(), actualizado=timezone.now(),
+            mensaje="El entrenamiento se interrumpió sin terminar.",
+        )
+        activo = activos.order_by('-inicio').first()
+        if activo:
+            return activo, False
+        trabajo = Entrenamiento.objects.create(completo=completo)
+
+    _executor.submit(_ejecutar, trabajo.id)
+    return trabajo, True
+
+# Actualiza campos de un entrenamiento sin cargarlo (también renueva la fecha de actualización)
+def _actualizar(entrenamiento_id, **campos):
+    Entrenamiento.objects.filter(id=entrenamiento_id).update(actualizado=timezone.now(), **campos)
+
+# Cuerpo del trabajo en segundo plano
+def _ejecutar(entrenamiento_id):
+    close_old_connections()
+    terminado = threading.Event()
+
+    # Mientras el entrenamiento corre, renueva periódicamente 'actualizado' para que no se
+    # considere abandonado durante etapas largas sin progreso visible (como el entrenamiento LBPH)
+    def latido():
+        while not terminado.wait(INTERVALO_LATIDO):
+            _actualizar(entrenamiento_id)
+        close_old_connections()
+
+    hilo_latido = threading.Thread(target=latido, daemon=True)
+    hilo_latido.start()
+
+    estado_fase = {"fase": None, "ultima": 0.0}
+
+    # Guarda el progreso, limitando las escrituras salvo cuando cambia la fase
+    def progreso(fase, cargadas, total):
+        ahora = time.monotonic()
+        cambio = fase != estado_fase["fase"]
+        if not cambio and cargadas < total and ahora - estado_fase["ultima"] < INTERVALO_PROGRESO:
+            return
+        campos = {"fase": fase, "imagenes_cargadas": cargadas, "imagenes_totales": total}
+        if cambio:
+            campos["fase_inicio"] = timezone.now()
+        _actualizar(entrenamiento_id, **campos)
+        estado_fase.update(fase=fase, ultima=ahora)
+
+    try:
+        trabajo = Entrenamiento.objects.get(id=entrenamiento_id)
+        _actualizar(entrenamiento_id, estado=Entrenamiento.EN_CURSO)
+        resultado = entrenar_modelo(incremental=not trabajo.completo, progreso=progreso)
+        _actualizar(entrenamiento_id, estado=Entrenamiento.COMPLETADO, modo=resultado["modo"],
+                    fase=None, fin=timezone.now())
+    except Exception as error:
+        _actualizar(entrenamiento_id, estado=Entrenamiento.ERROR, fin=timezone.now(),
+                    mensaje=str(error)[:255])
+    finally:
+        terminado.set()
+        hilo_latido.join()
+        close_old_connections()
+
+# Devuelve el estado de un entrenamiento como diccionario (para la respuesta JSON)
+def estado_entrenamiento(trabajo):
+    ahora = trabajo.fin or timezone.now()
+    transcurrido = (ahora - trabajo.inicio).total_seconds()
+
+    # Estima el tiempo restante de la fase actual según la velocidad de carga
+    eta = None
+    if trabajo.estado == Entrenamiento.EN_CURSO and trabajo.fase_inicio and trabajo.imagenes_cargadas:
+        segundos_fase = (ahora - trabajo.fase_inicio).total_seconds()
+        pendientes = trabajo.imagenes_totales - trabajo.imagenes_cargadas
+        eta = round(segundos_fase / trabajo.imagenes_cargadas * pendientes, 1)
+
+    return {
+        "id": trabajo.id,
+        "estado": trabajo.estado,
+        "completo": trabajo.completo,
+        "modo": trabajo.modo,
+        "fase": trabajo.fase,
+        "imagenes_cargadas": trabajo.imagenes_cargadas,
+        "imagenes_totales": trabajo.imagenes_totales,
+        "transcurrido": round(transcurrido, 1),
+        "eta": eta,
+        "mensaje": trabajo.mensaje,
+    }
@@ -1,24 +1,1451 @@
-"""
-Este archivo, tests.py, es donde se definen las pruebas para la aplicación 'usuarios'.
-Escribir pruebas es una práctica fundamental en el desarrollo de software para asegurar
-que el código funciona como se espera y para detectar errores o "regresiones"
-(cuando una nueva modificación rompe una funcionalidad que antes funcionaba).
-
-Puedes crear clases de prueba que hereden de django.test.TestCase y luego
-escribir métodos dentro de esas clases que prueben la lógica de tus modelos,
-vistas o cualquier otra parte de tu aplicación.
-"""
-from django.test import TestCase
-
-# Ejemplo de una clase de prueba:
-#
-# class MiModeloTests(TestCase):
-#
-#     def test_algo_funciona_correctamente(self):
-#         """
-#         Este es un método de prueba. El nombre debe empezar con 'test_'.
-#         Aquí puedes crear objetos, llamar a funciones y usar 'assertions'
-#         (como self.assertEqual, self.assertTrue) para verificar que el
-#         resultado es el esperado.
-#         """
-#         self.assertEqual(1 + 1, 2)
+# --- Pruebas de la aplicación 'usuarios' ---
+# Se ejecutan con 'python manage.py test usuarios'. Sin un servidor MySQL se puede usar SQLite:
+#   RECONOCIMIENTO_BD=sqlite python manage.py test usuarios
+# Las pruebas no usan cámara ni rostros reales: los rostros se generan con las mismas funciones
+# sintéticas de los benchmarks ('benchmarks.py') y cada prueba trabaja en una carpeta temporal.
+import asyncio  # Bucle de los espectadores de la transmisión
+import json  # Para leer las respuestas JSON
+import os  # Para las rutas de los archivos temporales
+import shutil  # Para borrar las carpetas temporales
+import tempfile  # Carpetas temporales de cada prueba
+import threading  # Para las pruebas de lo que se guarda por hilo
+import time  # Para adelantar el reloj de la transmisión
+import unittest  # Para omitir pruebas que dependen del sistema operativo
+from io import StringIO  # Salida de los comandos
+from datetime import date, timedelta  # Fechas de los eventos y entrenamientos de prueba
+from unittest import mock  # Para reemplazar el entrenamiento y el hilo de trabajo
+try:
+    import fcntl  # Bloqueo de archivos en Linux y macOS
+except ImportError:
+    fcntl = None
+import cv2  # OpenCV para los reconocedores LBPH de prueba
+import numpy as np  # Para comparar rostros y etiquetas
+from asgiref.sync import sync_to_async  # Para consultar la base de datos desde las pruebas asíncronas
+from cryptography.fernet import Fernet  # Clave de encriptación de las pruebas del almacén
+from django.core.cache import cache  # Caché de los conteos de asistencias
+from django.core.management import CommandError, call_command  # Para ejecutar los comandos
+from django.core.exceptions import ImproperlyConfigured  # Error de configuración
+from django.db import DatabaseError, IntegrityError, transaction  # Para probar la restricción única de asistencia
+from django.core.files.uploadedfile import SimpleUploadedFile  # Imágenes enviadas en las peticiones
+from django.test import SimpleTestCase, TestCase  # Clases base de las pruebas
+from django.urls import reverse  # URLs de las vistas
+from django.utils import timezone  # Fechas con zona horaria
+from .almacen import ETIQUETA_BORRADA, TAMANO_ROSTRO, AlmacenRostros  # Almacén preprocesado de rostros
+from .asistencia import SesionAsistencia  # Registro de asistencia por lotes
+from .benchmarks import comparar_resultados, generar_dataset_sintetico, patron_usuario, rostro_sintetico  # Utilidades de benchmark
+from .calidad import FiltroCapturas, configuracion_captura  # Control de calidad de las capturas
+from .carga_paralela import cargar_dataset, contexto_procesos  # Carga del dataset en varios procesos
+from .cifrado import (ServicioCifrado, cargar_claves, generar_clave, guardar_imagen_encriptada,
+                      leer_imagen_encriptada, ruta_clave)  # Encriptación de las imágenes
+from .detectores import DetectorRostros, crear_detector, obtener_detector  # Detectores de rostros
+from .diario import PENDIENTE, SINCRONIZADA, DiarioAsistencias, SincronizadorDiario  # Diario local
+from .embeddings import (DISTANCIA_MAXIMA, ExtractorLBP, IndiceEmbeddings, ReconocedorEmbeddings,
+                         configuracion_reconocedor, crear_extractor)  # Reconocedor por embeddings
+from .entrenamiento import entrenar_modelo, marcar_reentrenamiento_completo, ruta_dataset, ruta_modelo  # Entrenamiento
+from .exportacion import asistencias_exportables, escapar_celda, filas_por_lotes, lineas_csv  # Exportación a CSV
+from .imagenes import AlmacenImagenes  # Imágenes de perfil encriptadas
+from .importacion import importar_fotos_usuario, listar_fotos, rut_de_foto  # Importación masiva
+from .lbph_binario import ReconocedorLBPHBinario, agregar_lbph, crear_lbph_como, exportar_lbph  # Modelo LBPH en formato binario
+from .listados import (codificar_cursor, conteos_asistencias, decodificar_cursor, invalidar_conteos,
+                       paginar_por_clave)  # Paginación por clave y conteos
+from .metricas import (Histograma, RegistroMetricas, ResumenSesion, contar, formatear_gauge, medir, observar,
+                       registrar_resumen)  # Métricas del procesamiento
+from .models import Asistencia, Entrenamiento, Evento, Usuario  # Modelos de la base de datos
+from .pipeline import ColaUltimos, Fotograma, PipelineReconocimiento  # Etapas del reconocimiento en hilos
+from .reconocedor import RegistroModelos, ReconocedorVacio, crear_subconjunto  # Modelos cargados una vez por proceso
+from .reconocimiento import ProcesadorReconocimiento, reconocer_lote  # Reconocimiento de fotogramas y lotes
+from .reproduccion import RelojGrabacion, leer_grabacion, percentiles_ms, reproducir_grabacion  # Reproducción de grabaciones
+from .rut import normalizar_rut  # Forma en que se guardan los RUT
+from .seguimiento import SeguidorRostros, matriz_iou  # Seguimiento de varios rostros
+from .transmision import Espectador, Transmision  # Transmisión en vivo
+from . import tareas  # Entrenamiento en segundo plano
+
+
+# Crea una carpeta temporal que se borra al terminar la prueba
+def carpeta_temporal(prueba):
+    carpeta = tempfile.mkdtemp()
+    prueba.addCleanup(shutil.rmtree, carpeta, ignore_errors=True)
+    return carpeta
+
+# Rostros sintéticos de 100x100: 'capturas' por cada uno de los IDs indicados
+def rostros_sinteticos(ids, capturas, semilla=0):
+    rng = np.random.default_rng(semilla)
+    rostros, labels = [], []
+    for usuario_id in ids:
+        for _ in range(capturas):
+            rostros.append(rostro_sintetico(patron_usuario(usuario_id), rng, 100))
+            labels.append(usuario_id)
+    return rostros, np.array(labels, dtype=np.int32)
+
+# Entrena un reconocedor LBPH de OpenCV con rostros sintéticos de los IDs indicados
+def entrenar_lbph(ids, capturas=3, semilla=0):
+    rostros, labels = rostros_sinteticos(ids, capturas, semilla)
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.train(rostros, labels)
+    return recognizer
+
+# Usa una carpeta temporal como MEDIA_ROOT durante la prueba, con su propia clave de encriptación
+def media_temporal(prueba):
+    carpeta = carpeta_temporal(prueba)
+    ajustes = prueba.settings(MEDIA_ROOT=carpeta)
+    ajustes.enable()
+    prueba.addCleanup(ajustes.disable)
+    generar_clave()
+    return carpeta
+
+
+class EntrenamientoTests(TestCase):
+
+    def setUp(self):
+        media_temporal(self)
+
+    # Crea un usuario con 'capturas' rostros sintéticos encriptados en su carpeta del dataset
+    def enrolar(self, capturas=4):
+        usuario = Usuario.objects.create(nombre="Sintetico", rut=f"{Usuario.objects.count() + 1}-0")
+        generar_dataset_sintetico(ruta_dataset(), 1, capturas, primer_id=usuario.id)
+        return usuario
+
+    def entrenar(self):
+        return entrenar_modelo(procesos=1)
+
+    def test_solo_agrega_los_usuarios_nuevos(self):
+        self.enrolar()
+        self.enrolar()
+        self.assertEqual(self.entrenar(), {"modo": "completo", "imagenes": 8})
+        self.assertEqual(self.entrenar(), {"modo": "incremental", "imagenes": 0})
+        nuevo = self.enrolar()
+        self.assertEqual(self.entrenar(), {"modo": "incremental", "imagenes": 4})
+        labels = ReconocedorLBPHBinario.cargar(ruta_modelo()).labels
+        self.assertEqual(int(np.count_nonzero(labels == nuevo.id)), 4)
+
+    def test_editar_o_eliminar_un_usuario_reentrena_todo(self):
+        primero = self.enrolar()
+        self.enrolar()
+        self.entrenar()
+        marcar_reentrenamiento_completo()
+        self.assertEqual(self.entrenar()["modo"], "completo")
+        primero.delete()
+        self.assertEqual(self.entrenar(), {"modo": "completo", "imagenes": 4})
+        self.assertNotIn(primero.id, ReconocedorLBPHBinario.cargar(ruta_modelo()).labels)
+
+    def test_una_imagen_modificada_reentrena_todo(self):
+        usuario = self.enrolar()
+        self.entrenar()
+        # Una nueva captura reemplaza las imágenes del usuario con el mismo nombre de archivo
+        generar_dataset_sintetico(ruta_dataset(), 1, 2, semilla=1, primer_id=usuario.id)
+        self.assertEqual(self.entrenar(), {"modo": "completo", "imagenes": 4})
+        self.assertEqual(len(ReconocedorLBPHBinario.cargar(ruta_modelo()).labels), 4)
+
+
+class AlmacenRostrosTests(SimpleTestCase):
+
+    def setUp(self):
+        self.almacen = AlmacenRostros(carpeta_temporal(self))
+        self.fernet = Fernet(Fernet.generate_key())
+
+    def agregar(self, ids, capturas, origenes=None, semilla=0):
+        rostros, labels = rostros_sinteticos(ids, capturas, semilla)
+        self.almacen.agregar(rostros, labels, origenes, fernet=self.fernet)
+        return rostros, labels
+
+    def test_agregar_y_leer(self):
+        rostros, labels = self.agregar([1, 2], 3)
+        self.assertEqual(len(self.almacen), 6)
+        imagenes, leidas = self.almacen.leer(fernet=self.fernet)
+        np.testing.assert_array_equal(leidas, labels)
+        np.testing.assert_array_equal(imagenes, np.stack(rostros))
+        # Desde un registro y solo de algunos usuarios
+        imagenes, leidas = self.almacen.leer(desde=2, ids_validos=[2], fernet=self.fernet)
+        np.testing.assert_array_equal(leidas, [2, 2, 2])
+        np.testing.assert_array_equal(imagenes, np.stack(rostros[3:]))
+
+    def test_rostros_de_otro_tamano_se_normalizan(self):
+        self.almacen.agregar([np.zeros((150, 120), dtype=np.uint8)], [7], fernet=self.fernet)
+        imagenes, _ = self.almacen.leer(fernet=self.fernet)
+        self.assertEqual(imagenes.shape, (1, TAMANO_ROSTRO, TAMANO_ROSTRO))
+
+    def test_compactar_quita_usuarios_eliminados(self):
+        rostros, _ = self.agregar([1, 2, 3], 2, {f"{i}_x/{n}.jpg": [1, n] for i in (1, 2, 3) for n in range(2)})
+        self.assertEqual(self.almacen.compactar([1, 3]), 2)
+        imagenes, labels = self.almacen.leer(fernet=self.fernet)
+        np.testing.assert_array_equal(labels, [1, 1, 3, 3])
+        np.testing.assert_array_equal(imagenes, np.stack(rostros[:2] + rostros[4:]))
+        # El índice de orígenes se renumera con las posiciones nuevas
+        self.assertEqual(self.almacen.origenes()["3_x/1.jpg"], [1, 1, 3])
+        self.assertNotIn("2_x/0.jpg", self.almacen.origenes())
+
+    def test_reagregar_un_origen_borra_su_registro_anterior(self):
+        self.agregar([1], 2, {"1_x/0.jpg": [1, 1], "1_x/1.jpg": [1, 1]})
+        self.agregar([1], 1, {"1_x/0.jpg": [2, 2]}, semilla=1)
+        self.assertEqual(self.almacen.borrados(), 1)
+        self.assertEqual(self.almacen.etiquetas()[0], ETIQUETA_BORRADA)
+        self.assertEqual(self.almacen.origenes()["1_x/0.jpg"], [2, 2, 2])
+        _, labels = self.almacen.leer(ids_validos=[1], fernet=self.fernet)
+        self.assertEqual(len(labels), 2)
+        # Compactar elimina el registro borrado
+        self.assertEqual(self.almacen.compactar([1]), 1)
+        self.assertEqual(self.almacen.borrados(), 0)
+        self.assertEqual(self.almacen.origenes()["1_x/0.jpg"], [2, 2, 1])
+
+    def test_recolectar_borra_registros_sin_origen(self):
+        self.agregar([1], 2, {"1_x/0.jpg": [1, 1], "1_x/1.jpg": [1, 1]})
+        self.assertEqual(self.almacen.recolectar(["1_x/1.jpg"]), 1)
+        np.testing.assert_array_equal(self.almacen.etiquetas(), [1, ETIQUETA_BORRADA])
+
+    def test_escritura_interrumpida_se_recorta(self):
+        self.agregar([1], 2)
+        # Un rostro escrito sin su etiqueta (la escritura se cortó antes de las etiquetas)
+        with open(self.almacen.path_rostros, "ab") as archivo:
+            archivo.write(b"x" * 50)
+        self.assertEqual(len(self.almacen), 2)
+        self.agregar([2], 1)
+        _, labels = self.almacen.leer(fernet=self.fernet)
+        np.testing.assert_array_equal(labels, [1, 1, 2])
+
+
+# Detector que siempre encuentra los mismos rostros
+class DetectorFijo:
+
+    def __init__(self, *cajas):
+        self.cajas = list(cajas)
+
+    def detectar(self, frame, gris):
+        return list(self.cajas)
+
+
+# Reconocedor que reconoce siempre al mismo usuario y guarda los rostros que recibe
+class ReconocedorFijo:
+
+    def __init__(self, label, confianza=10.0):
+        self.label = label
+        self.confianza = confianza
+        self.rostros = []
+
+    def predict(self, rostro):
+        self.rostros.append(rostro)
+        return self.label, self.confianza
+
+
+# El modelo se entrena con los rostros de 100x100 del almacén: los recortes del detector, de
+# cualquier tamaño, se deben llevar al mismo tamaño antes de predecir
+class RecortesTests(TestCase):
+
+    def setUp(self):
+        self.evento = Evento.objects.create(nom_evento="Charla", fecha=date(2026, 1, 1), estado=True)
+        self.usuario = Usuario.objects.create(nombre="Ana", rut="11111111-1")
+        self.frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    def test_fotograma_en_vivo(self):
+        recognizer = ReconocedorFijo(self.usuario.id)
+        procesador = ProcesadorReconocimiento(recognizer, DetectorFijo((10, 20, 173, 173)),
+                                              SesionAsistencia(self.evento), umbral_confianza=40)
+        procesador.procesar(self.frame, ahora=0.0)
+        self.assertEqual([r.shape for r in recognizer.rostros], [(TAMANO_ROSTRO, TAMANO_ROSTRO)])
+
+    def test_lote(self):
+        recognizer = ReconocedorFijo(self.usuario.id)
+        reconocer_lote(recognizer, DetectorFijo((0, 0, 64, 64)), self.evento, fotogramas=[self.frame],
+                       rostros=[np.zeros((150, 150), dtype=np.uint8)], umbral_confianza=40)
+        self.assertEqual([r.shape for r in recognizer.rostros], [(TAMANO_ROSTRO, TAMANO_ROSTRO)] * 2)
+
+
+class CifradoTests(SimpleTestCase):
+
+    def setUp(self):
+        self.media = media_temporal(self)
+        self.servicio = ServicioCifrado(ruta_clave())
+
+    def test_rotar_la_clave_conserva_lo_encriptado(self):
+        token = self.servicio.encriptar(b"rostro")
+        self.servicio.rotar_clave()
+        self.assertEqual(len(cargar_claves()), 2)
+        self.assertEqual(self.servicio.desencriptar(token), b"rostro")
+        # Lo reencriptado solo necesita la clave nueva
+        self.assertEqual(Fernet(cargar_claves()[0]).decrypt(self.servicio.reencriptar(token)), b"rostro")
+
+    def test_otro_proceso_rota_la_clave(self):
+        fernet = self.servicio.fernet()
+        otro = ServicioCifrado(ruta_clave())
+        otro.rotar_clave()
+        token = otro.encriptar(b"rostro")
+        # Mientras no pase el intervalo se usa la clave ya cargada, sin leer el archivo
+        self.assertIs(self.servicio.fernet(), fernet)
+        self.servicio.INTERVALO_REVISION = 0
+        self.assertEqual(self.servicio.desencriptar(token), b"rostro")
+
+    def test_imagen_encriptada_en_disco(self):
+        imagen = rostro_sintetico(patron_usuario(1), np.random.default_rng(0), 100)
+        path = os.path.join(self.media, "rostro.jpg")
+        guardar_imagen_encriptada(path, imagen)
+        with open(path, "rb") as archivo:
+            # El JPEG nunca se escribe sin encriptar
+            self.assertFalse(archivo.read().startswith(b"\xff\xd8"))
+        leida = leer_imagen_encriptada(path)
+        self.assertEqual(leida.shape, imagen.shape)
+        self.assertLess(np.abs(leida.astype(int) - imagen).mean(), 10)
+
+
+class CargaParalelaTests(SimpleTestCase):
+
+    def setUp(self):
+        media_temporal(self)
+        generar_dataset_sintetico(ruta_dataset(), 3, 4)
+        self.lista = [(carpeta.split("_")[0], f"{carpeta}/{archivo}")
+                      for carpeta in sorted(os.listdir(ruta_dataset()))
+                      for archivo in sorted(os.listdir(os.path.join(ruta_dataset(), carpeta)))]
+
+    def test_varios_procesos_leen_lo_mismo_que_uno(self):
+        avances = []
+        imagenes, labels, leidos = cargar_dataset(self.lista, ruta_dataset(), procesos=3,
+                                                  progreso=lambda cargadas, total: avances.append((cargadas, total)))
+        esperadas, esperados, _ = cargar_dataset(self.lista, ruta_dataset(), procesos=1)
+        self.assertEqual(imagenes.shape, (12, TAMANO_ROSTRO, TAMANO_ROSTRO))
+        np.testing.assert_array_equal(imagenes, esperadas)
+        np.testing.assert_array_equal(labels, esperados)
+        self.assertEqual(leidos, [relativo for _, relativo in self.lista])
+        self.assertEqual(avances[-1], (12, 12))
+
+    def test_omite_archivos_que_no_se_pueden_leer(self):
+        _, relativo = self.lista[5]
+        with open(os.path.join(ruta_dataset(), relativo), "wb") as archivo:
+            archivo.write(b"no es un token")
+        imagenes, labels, leidos = cargar_dataset(self.lista, ruta_dataset(), procesos=2)
+        self.assertEqual(len(imagenes), 11)
+        self.assertEqual(len(labels), 11)
+        self.assertNotIn(relativo, leidos)
+
+    def test_los_procesos_no_se_crean_con_fork(self):
+        self.assertIn(contexto_procesos().get_start_method(), ("forkserver", "spawn"))
+
+
+# El trabajo se ejecuta en el mismo hilo de la prueba (dentro de su transacción), así que no se
+# cierran las conexiones a la base de datos ni se usa el hilo de entrenamiento
+@mock.patch("usuarios.tareas.close_old_connections")
+@mock.patch("usuarios.tareas._executor")
+class TareasTests(TestCase):
+
+    def test_solo_un_entrenamiento_activo(self, executor, _):
+        trabajo, nuevo = tareas.iniciar_entrenamiento()
+        self.assertTrue(nuevo)
+        otro, nuevo = tareas.iniciar_entrenamiento(completo=True)
+        self.assertFalse(nuevo)
+        self.assertEqual(otro.id, trabajo.id)
+        executor.submit.assert_called_once_with(tareas._ejecutar, trabajo.id)
+
+    def test_libera_un_entrenamiento_abandonado(self, executor, _):
+        trabajo, _ = tareas.iniciar_entrenamiento()
+        Entrenamiento.objects.filter(id=trabajo.id).update(actualizado=timezone.now() - timedelta(hours=1))
+        nuevo, creado = tareas.iniciar_entrenamiento()
+        self.assertTrue(creado)
+        self.assertNotEqual(nuevo.id, trabajo.id)
+        self.assertEqual(Entrenamiento.objects.get(id=trabajo.id).estado, Entrenamiento.ERROR)
+
+    def test_guarda_el_progreso_y_el_resultado(self, executor, _):
+        def entrenar(incremental, progreso):
+            progreso("leyendo", 3, 10)
+            progreso("leyendo", 10, 10)
+            return {"modo": "incremental" if incremental else "completo", "imagenes": 10}
+
+        trabajo, _ = tareas.iniciar_entrenamiento(completo=True)
+        with mock.patch("usuarios.tareas.entrenar_modelo", side_effect=entrenar):
+            tareas._ejecutar(trabajo.id)
+        estado = tareas.estado_entrenamiento(Entrenamiento.objects.get(id=trabajo.id))
+        self.assertEqual(estado["estado"], Entrenamiento.COMPLETADO)
+        self.assertEqual(estado["modo"], "completo")
+        self.assertEqual((estado["imagenes_cargadas"], estado["imagenes_totales"]), (10, 10))
+        self.assertIsNone(estado["eta"])
+
+    def test_un_error_queda_registrado(self, executor, _):
+        trabajo, _ = tareas.iniciar_entrenamiento()
+        with mock.patch("usuarios.tareas.entrenar_modelo", side_effect=RuntimeError("sin espacio")):
+            tareas._ejecutar(trabajo.id)
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.mensaje), (Entrenamiento.ERROR, "sin espacio"))
+        # Un entrenamiento con error no impide iniciar otro
+        self.assertTrue(tareas.iniciar_entrenamiento()[1])
+
+
+class RegistroModelosTests(SimpleTestCase):
+
+    def setUp(self):
+        self.path = os.path.join(carpeta_temporal(self), "modelo_lbph.yml")
+        entrenar_lbph([1, 2]).write(self.path)
+        self.registro = RegistroModelos()
+
+    # Cambia la fecha de modificación del archivo, como si se hubiera vuelto a escribir
+    def tocar(self):
+        estado = os.stat(self.path)
+        os.utime(self.path, ns=(estado.st_atime_ns, estado.st_mtime_ns + 10 ** 9))
+
+    def test_se_carga_una_sola_vez(self):
+        recognizer = self.registro.obtener(self.path)
+        self.assertIs(self.registro.obtener(self.path), recognizer)
+        # El mismo contenido escrito otra vez no se vuelve a leer
+        self.tocar()
+        self.assertIs(self.registro.obtener(self.path), recognizer)
+        self.assertEqual(self.registro.metricas()[0]["recargas"], 0)
+
+    def test_se_recarga_cuando_cambia_el_modelo(self):
+        anterior = self.registro.obtener(self.path)
+        entrenar_lbph([1, 2, 3]).write(self.path)
+        self.tocar()
+        recognizer = self.registro.obtener(self.path)
+        self.assertIsNot(recognizer, anterior)
+        self.assertEqual(sorted(set(recognizer.getLabels().ravel())), [1, 2, 3])
+        self.assertEqual(self.registro.metricas()[0]["recargas"], 1)
+
+
+# Motor de detección que devuelve rectángulos fijos y guarda el tamaño de la imagen que recibe
+class MotorFijo:
+    usa_color = False
+
+    def __init__(self, rostros):
+        self.rostros = np.array(rostros, dtype=np.int32).reshape(-1, 4)
+        self.recibidas = []
+
+    def detectar(self, imagen, min_size):
+        self.recibidas.append((imagen.shape, min_size))
+        return self.rostros.copy()
+
+
+class DetectoresTests(SimpleTestCase):
+
+    def setUp(self):
+        self.frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    def test_reduce_el_fotograma_y_devuelve_coordenadas_originales(self):
+        motor = MotorFijo([[50, 40, 60, 60]])
+        rostros = DetectorRostros(motor, escala=0.5, min_size=(80, 80)).detectar(self.frame)
+        self.assertEqual(motor.recibidas, [((240, 320), (40, 40))])
+        np.testing.assert_array_equal(rostros, [[100, 80, 120, 120]])
+
+    def test_ajusta_los_rectangulos_al_fotograma(self):
+        rostros = DetectorRostros(MotorFijo([[600, -5, 100, 100]])).detectar(self.frame)
+        np.testing.assert_array_equal(rostros, [[600, 0, 40, 100]])
+
+    def test_configuracion_invalida(self):
+        configuracion = {'BACKEND': 'lbp', 'CASCADA_LBP': None}
+        with self.assertRaises(ImproperlyConfigured):
+            crear_detector(configuracion)
+        with self.assertRaises(ImproperlyConfigured):
+            crear_detector({'BACKEND': 'otro'})
+
+    @mock.patch("usuarios.detectores._locales", new_callable=threading.local)
+    @mock.patch("usuarios.detectores.crear_detector", side_effect=lambda configuracion: object())
+    def test_un_detector_por_hilo_y_configuracion(self, crear, _):
+        detector = obtener_detector(escala=0.75)
+        self.assertIs(obtener_detector(escala=0.75), detector)
+        self.assertIsNot(obtener_detector(escala=0.5), detector)
+        otro_hilo = []
+        hilo = threading.Thread(target=lambda: otro_hilo.append(obtener_detector(escala=0.75)))
+        hilo.start()
+        hilo.join()
+        self.assertIsNot(otro_hilo[0], detector)
+        self.assertEqual(crear.call_count, 3)
+
+
+# Reloj manual para controlar cuándo se envían los lotes de asistencia
+class Reloj:
+
+    def __init__(self):
+        self.ahora = 0.0
+
+    def __call__(self):
+        return self.ahora
+
+
+class SesionAsistenciaTests(TestCase):
+
+    def setUp(self):
+        self.evento = Evento.objects.create(nom_evento="Charla", fecha=date(2026, 1, 1), estado=True)
+        self.usuarios = Usuario.objects.bulk_create([Usuario(nombre=f"U{i}", rut=f"{i}-0") for i in range(5)])
+        self.reloj = Reloj()
+
+    def sesion(self, **opciones):
+        return SesionAsistencia(self.evento, tamano_lote=3, intervalo=2.0, reloj=self.reloj, **opciones)
+
+    def guardadas(self):
+        return Asistencia.objects.filter(evento_asist=self.evento).count()
+
+    def test_envia_por_intervalo(self):
+        sesion = self.sesion()
+        self.assertTrue(sesion.registrar(self.usuarios[0].id))
+        self.assertFalse(sesion.registrar(self.usuarios[0].id))
+        self.assertEqual(sesion.enviar(), 0)
+        self.assertEqual(self.guardadas(), 0)
+        self.reloj.ahora = 2.5
+        self.assertEqual(sesion.enviar(), 1)
+        self.assertEqual(self.guardadas(), 1)
+
+    def test_envia_al_completar_el_lote(self):
+        sesion = self.sesion()
+        for usuario in self.usuarios[:3]:
+            sesion.registrar(usuario.id)
+        self.assertEqual(self.guardadas(), 3)
+        self.assertEqual(sesion.pendientes, [])
+        sesion.registrar(self.usuarios[3].id)
+        self.assertEqual(sesion.cerrar(), 1)
+        self.assertEqual(self.guardadas(), 4)
+
+    def test_carga_los_ya_registrados(self):
+        Asistencia.objects.create(usuario=self.usuarios[0], evento_asist=self.evento)
+        sesion = self.sesion()
+        self.assertTrue(sesion.ya_registrado(self.usuarios[0].id))
+        self.assertFalse(sesion.registrar(self.usuarios[0].id))
+        self.assertEqual(sesion.nombre(self.usuarios[1].id), "U1")
+
+    def test_dos_sesiones_no_duplican_la_asistencia(self):
+        primera, segunda = self.sesion(), self.sesion()
+        primera.registrar(self.usuarios[0].id)
+        segunda.registrar(self.usuarios[0].id)
+        primera.cerrar()
+        segunda.cerrar()
+        self.assertEqual(self.guardadas(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Asistencia.objects.create(usuario=self.usuarios[0], evento_asist=self.evento)
+
+    def test_registrados_indicados_no_consultan_la_base_de_datos(self):
+        Asistencia.objects.create(usuario=self.usuarios[0], evento_asist=self.evento)
+        with self.assertNumQueries(1):
+            sesion = self.sesion(registrados=set())
+        self.assertTrue(sesion.registrar(self.usuarios[0].id))
+        # La restricción única descarta la fila repetida al guardar
+        sesion.cerrar()
+        self.assertEqual(self.guardadas(), 1)
+
+
+class SeguimientoTests(SimpleTestCase):
+
+    def test_matriz_iou(self):
+        iou = matriz_iou([(0, 0, 10, 10)], [(0, 0, 10, 10), (5, 0, 10, 10), (20, 20, 5, 5)])
+        np.testing.assert_allclose(iou, [[1.0, 50 / 150, 0.0]])
+
+    def test_conserva_la_pista_entre_fotogramas(self):
+        seguidor = SeguidorRostros()
+        a, b = seguidor.actualizar([(100, 100, 80, 80), (400, 100, 80, 80)])
+        # Los rostros se mueven un poco y el detector los entrega en otro orden
+        segundo_b, segundo_a = seguidor.actualizar([(410, 105, 80, 80), (95, 100, 80, 80)])
+        self.assertIs(segundo_a, a)
+        self.assertIs(segundo_b, b)
+        self.assertEqual(a.caja, (95, 100, 80, 80))
+        self.assertNotEqual(a.id, b.id)
+
+    def test_una_pista_perdida_unos_fotogramas_se_recupera(self):
+        seguidor = SeguidorRostros(max_perdidos=2)
+        pista, = seguidor.actualizar([(100, 100, 80, 80)])
+        seguidor.actualizar([])
+        seguidor.actualizar([])
+        self.assertIs(seguidor.actualizar([(100, 100, 80, 80)])[0], pista)
+        for _ in range(3):
+            seguidor.actualizar([])
+        self.assertIsNot(seguidor.actualizar([(100, 100, 80, 80)])[0], pista)
+
+    def test_votacion_y_frecuencia_de_prediccion(self):
+        seguidor = SeguidorRostros(votos=3)
+        pista, = seguidor.actualizar([(0, 0, 50, 50)])
+        self.assertTrue(pista.requiere_prediccion(2))
+        for label in (7, None, 7):
+            pista.votar(label, 30.0)
+        self.assertEqual(pista.etiqueta, 7)
+        seguidor.actualizar([(0, 0, 50, 50)])
+        self.assertFalse(pista.requiere_prediccion(2))
+        seguidor.actualizar([(0, 0, 50, 50)])
+        self.assertTrue(pista.requiere_prediccion(2))
+        # Solo cuentan las últimas 'votos' predicciones
+        pista.votar(None, 90.0)
+        pista.votar(None, 90.0)
+        self.assertIsNone(pista.etiqueta)
+
+
+# Reconocedor que identifica a cada usuario por el brillo del rostro: claro o oscuro
+class ReconocedorPorBrillo:
+
+    def __init__(self, claro, oscuro):
+        self.claro = claro
+        self.oscuro = oscuro
+
+    def predict(self, rostro):
+        return (self.claro if rostro.mean() > 127 else self.oscuro), 10.0
+
+
+class ConfirmacionParalelaTests(TestCase):
+
+    def test_dos_personas_se_confirman_a_la_vez(self):
+        evento = Evento.objects.create(nom_evento="Charla", fecha=date(2026, 1, 1), estado=True)
+        ana = Usuario.objects.create(nombre="Ana", rut="1-1")
+        beto = Usuario.objects.create(nombre="Beto", rut="2-2")
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        frame[100:200, 100:200] = 255
+        procesador = ProcesadorReconocimiento(
+            ReconocedorPorBrillo(ana.id, beto.id), DetectorFijo((100, 100, 100, 100), (400, 100, 100, 100)),
+            SesionAsistencia(evento), tiempo_confirmacion=2, umbral_confianza=40,
+        )
+        confirmados = []
+        for segundo in (0.0, 1.0, 2.0):
+            _, eventos = procesador.procesar(frame, ahora=segundo)
+            confirmados.extend(evento['usuario_id'] for evento in eventos)
+        procesador.cerrar()
+        self.assertEqual(sorted(confirmados), sorted([ana.id, beto.id]))
+        self.assertEqual(Asistencia.objects.filter(evento_asist=evento).count(), 2)
+
+
+class ColaUltimosTests(SimpleTestCase):
+
+    def test_descarta_el_mas_antiguo(self):
+        cola = ColaUltimos(maximo=2)
+        for elemento in (1, 2, 3):
+            self.assertTrue(cola.poner(elemento))
+        self.assertEqual([cola.obtener(), cola.obtener()], [2, 3])
+        self.assertEqual(cola.descartados, 1)
+        self.assertIsNone(cola.obtener(timeout=0.01))
+
+    def test_sin_descartar_espera_al_consumidor(self):
+        cola = ColaUltimos(maximo=1, descartar=False)
+        productor = threading.Thread(target=lambda: [cola.poner(i) for i in range(5)])
+        productor.start()
+        recibidos = [cola.obtener(timeout=5) for _ in range(5)]
+        productor.join()
+        self.assertEqual(recibidos, list(range(5)))
+        self.assertEqual(cola.descartados, 0)
+
+    def test_cerrar_despierta_a_quien_espera(self):
+        cola = ColaUltimos()
+        cola.poner("ultimo")
+        cola.cerrar()
+        self.assertFalse(cola.poner("otro"))
+        # Lo que quedaba en la cola se entrega antes de terminar
+        self.assertEqual(cola.obtener(), "ultimo")
+        self.assertIsNone(cola.obtener())
+
+
+# Fuente de video con una cantidad fija de fotogramas
+class FuenteFija:
+
+    def __init__(self, cantidad):
+        self.restantes = cantidad
+
+    def read(self):
+        if not self.restantes:
+            return False, None
+        self.restantes -= 1
+        return True, np.zeros((4, 4, 3), dtype=np.uint8)
+
+
+# Procesador que cuenta los fotogramas; falla en el fotograma indicado
+class ProcesadorContador:
+
+    def __init__(self, falla_en=None):
+        self.procesados = 0
+        self.falla_en = falla_en
+
+    def procesar(self, imagen, ahora):
+        self.procesados += 1
+        if self.procesados == self.falla_en:
+            raise RuntimeError("falló el procesamiento")
+        return [self.procesados], []
+
+
+class PipelineTests(SimpleTestCase):
+
+    def test_entrega_todos_los_fotogramas_en_orden(self):
+        salidas, terminado = [], []
+        pipeline = PipelineReconocimiento(FuenteFija(20), ProcesadorContador(),
+                                          lambda fotograma: salidas.append(fotograma.numero),
+                                          descartar=False, al_terminar=lambda: terminado.append(True))
+        pipeline.ejecutar()
+        self.assertEqual(salidas, list(range(1, 21)))
+        self.assertEqual(terminado, [True])
+        self.assertEqual(pipeline.estadisticas()['descartados'], {'captura': 0, 'salida': 0})
+
+    def test_la_salida_puede_detenerlo(self):
+        salidas = []
+        pipeline = PipelineReconocimiento(FuenteFija(1000), ProcesadorContador(),
+                                          lambda fotograma: salidas.append(fotograma.numero) or len(salidas) < 3,
+                                          descartar=False)
+        pipeline.ejecutar()
+        self.assertEqual(len(salidas), 3)
+
+    def test_un_error_del_procesamiento_se_propaga(self):
+        pipeline = PipelineReconocimiento(FuenteFija(10), ProcesadorContador(falla_en=3), lambda fotograma: None,
+                                          descartar=False)
+        with self.assertRaisesMessage(RuntimeError, "falló el procesamiento"):
+            pipeline.ejecutar()
+
+
+# Codifica una imagen como JPEG para enviarla en una petición
+def archivo_jpeg(imagen, nombre="imagen.jpg"):
+    return SimpleUploadedFile(nombre, cv2.imencode(".jpg", imagen)[1].tobytes(), content_type="image/jpeg")
+
+# Lee una respuesta JSON rechazando valores que no son JSON estándar (Infinity, NaN)
+def leer_json(respuesta):
+    def invalido(valor):
+        raise ValueError(f"Valor no válido en JSON: {valor}")
+    return json.loads(respuesta.content, parse_constant=invalido)
+
+
+class ReconocerLoteTests(TestCase):
+
+    def setUp(self):
+        self.evento = Evento.objects.create(nom_evento="Charla", fecha=date(2026, 1, 1), estado=True)
+        self.usuario = Usuario.objects.create(nombre="Ana", rut="11111111-1")
+        self.url = reverse('reconocer_lote_usuario', args=[self.evento.id])
+        self.recognizer = ReconocedorFijo(self.usuario.id)
+        for nombre, valor in (("obtener_reconocedor", lambda evento: self.recognizer),
+                              ("obtener_detector", lambda: DetectorFijo((10, 10, 120, 120)))):
+            parche = mock.patch(f"usuarios.views.{nombre}", side_effect=valor)
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def enviar(self, **archivos):
+        return self.client.post(self.url, archivos)
+
+    def rostro(self):
+        return archivo_jpeg(np.full((120, 120), 128, dtype=np.uint8))
+
+    def test_registra_con_las_coincidencias_necesarias(self):
+        respuesta = leer_json(self.enviar(rostros=[self.rostro()]))
+        self.assertEqual(respuesta['registrados'], [])
+        self.assertEqual(respuesta['imagenes'][0]['rostros'][0]['estado'], 'pendiente')
+        respuesta = leer_json(self.enviar(rostros=[self.rostro(), self.rostro()]))
+        self.assertEqual(respuesta['registrados'], [self.usuario.id])
+        self.assertTrue(Asistencia.objects.filter(usuario=self.usuario, evento_asist=self.evento).exists())
+        respuesta = leer_json(self.enviar(fotogramas=[archivo_jpeg(np.zeros((240, 320, 3), dtype=np.uint8))]))
+        self.assertEqual(respuesta['imagenes'][0]['rostros'][0]['estado'], 'ya_registrado')
+
+    def test_informa_las_imagenes_que_no_se_pueden_leer(self):
+        vacio = SimpleUploadedFile("vacio.jpg", b"", content_type="image/jpeg")
+        respuesta = self.enviar(rostros=[vacio, self.rostro()])
+        self.assertEqual(respuesta.status_code, 200)
+        imagenes = leer_json(respuesta)['imagenes']
+        self.assertEqual(imagenes[0]['error'], "No se pudo leer la imagen")
+        self.assertEqual(len(imagenes[1]['rostros']), 1)
+
+    def test_rechaza_peticiones_invalidas(self):
+        self.assertEqual(self.enviar().status_code, 400)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        with self.settings(RECONOCIMIENTO={'MAX_IMAGENES_LOTE': 1}):
+            self.assertEqual(self.enviar(rostros=[self.rostro(), self.rostro()]).status_code, 400)
+        Evento.objects.filter(id=self.evento.id).update(estado=False)
+        self.assertEqual(self.enviar(rostros=[self.rostro()]).status_code, 400)
+        self.assertEqual(self.client.post(reverse('reconocer_lote_usuario', args=[999])).status_code, 404)
+
+    def test_modelo_sin_entrenar(self):
+        with mock.patch("usuarios.views.obtener_reconocedor", side_effect=FileNotFoundError):
+            respuesta = self.enviar(rostros=[self.rostro()])
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class TransmisionTests(TestCase):
+
+    def setUp(self):
+        self.evento = Evento.objects.create(nom_evento="Charla", fecha=date(2026, 1, 1), estado=True)
+        for nombre in ("obtener_reconocedor", "crear_detector", "obtener_diario"):
+            parche = mock.patch(f"usuarios.transmision.{nombre}", return_value=None)
+            parche.start()
+            self.addCleanup(parche.stop)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.transmision = Transmision(self.evento, fuente="camara", sin_espectadores=60)
+
+    # Ejecuta los mensajes entregados desde otros hilos al bucle de los espectadores
+    def recibir(self, espectador):
+        self.loop.run_until_complete(asyncio.sleep(0))
+        mensajes = []
+        while not espectador.cola.empty():
+            mensajes.append(espectador.cola.get_nowait())
+        return mensajes
+
+    def fotograma(self, *eventos):
+        fotograma = Fotograma(1, np.zeros((48, 64, 3), dtype=np.uint8), 0.0)
+        fotograma.eventos = list(eventos)
+        return fotograma
+
+    def test_espectador_lento_descarta_lo_mas_antiguo(self):
+        espectador = Espectador(self.loop, maximo=2)
+        for mensaje in ("a", "b", "c"):
+            espectador.entregar(mensaje)
+        self.assertEqual(self.recibir(espectador), ["b", "c"])
+        self.assertEqual(espectador.descartados, 1)
+
+    def test_reparte_fotogramas_y_eventos(self):
+        video = [self.transmision.suscribir('fotogramas', self.loop) for _ in range(2)]
+        eventos = self.transmision.suscribir('eventos', self.loop, maximo=10)
+        self.assertTrue(self.transmision._salida(self.fotograma({'usuario_id': 1, 'nombre': 'Ñandú'})))
+        jpegs = [self.recibir(espectador) for espectador in video]
+        # El JPEG se codifica una sola vez y todos reciben el mismo
+        self.assertEqual(len(jpegs[0]), 1)
+        self.assertIs(jpegs[0][0], jpegs[1][0])
+        self.assertEqual(jpegs[0][0][:2], b"\xff\xd8")
+        self.assertEqual([json.loads(m) for m in self.recibir(eventos)], [{'usuario_id': 1, 'nombre': 'Ñandú'}])
+
+    def test_se_detiene_sin_espectadores(self):
+        espectador = self.transmision.suscribir('fotogramas', self.loop)
+        self.transmision.desuscribir(espectador)
+        self.assertTrue(self.transmision._salida(self.fotograma()))
+        with mock.patch("usuarios.transmision.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertFalse(self.transmision._salida(self.fotograma()))
+
+
+class EmbeddingsTests(SimpleTestCase):
+
+    def indice(self, ids, capturas=4, semilla=0):
+        rostros, labels = rostros_sinteticos(ids, capturas, semilla)
+        indice = IndiceEmbeddings(ExtractorLBP(grilla=4))
+        indice.agregar(rostros, labels)
+        return indice
+
+    def test_reconoce_a_cada_usuario(self):
+        recognizer = ReconocedorEmbeddings(self.indice([3, 7, 11]), umbral_confianza=35)
+        rostros, labels = rostros_sinteticos([3, 7, 11], 2, semilla=1)
+        predichos, distancias = recognizer.predict_lote(rostros)
+        np.testing.assert_array_equal(predichos, labels)
+        self.assertEqual(distancias.dtype, np.float32)
+        self.assertEqual(recognizer.predict(rostros[0])[0], 3)
+
+    def test_agregar_por_partes_da_el_mismo_indice(self):
+        completo = self.indice([1, 2])
+        por_partes = IndiceEmbeddings(ExtractorLBP(grilla=4))
+        rostros, labels = rostros_sinteticos([1, 2], 4)
+        por_partes.agregar(rostros[:3], labels[:3])
+        por_partes.agregar(rostros[3:], labels[3:], lote=2)
+        np.testing.assert_array_equal(por_partes.labels, completo.labels)
+        np.testing.assert_array_equal(por_partes.conteos, [4, 4])
+        np.testing.assert_allclose(por_partes.centroides, completo.centroides, atol=1e-6)
+
+    def test_guardar_y_cargar(self):
+        indice = self.indice([5, 6])
+        path = os.path.join(carpeta_temporal(self), "modelo_embeddings.npz")
+        indice.guardar(path)
+        cargado = IndiceEmbeddings.cargar(path)
+        self.assertEqual(cargado.extractor.grilla, 4)
+        np.testing.assert_array_equal(cargado.labels, indice.labels)
+        np.testing.assert_allclose(cargado.centroides, indice.centroides)
+
+    def test_subconjunto_y_conservar(self):
+        indice = self.indice([1, 2, 3])
+        self.assertEqual(indice.subconjunto([3, 9]).labels.tolist(), [3])
+        indice.conservar({1, 2})
+        self.assertEqual(indice.labels.tolist(), [1, 2])
+        self.assertEqual(indice.centroides.shape, (2, indice.extractor.dimension))
+
+    def test_indice_vacio_devuelve_una_distancia_valida_en_json(self):
+        recognizer = ReconocedorEmbeddings(IndiceEmbeddings(ExtractorLBP(grilla=4)), umbral_confianza=35)
+        label, distancia = recognizer.predict(np.zeros((100, 100), dtype=np.uint8))
+        self.assertEqual(label, -1)
+        self.assertEqual(distancia, DISTANCIA_MAXIMA)
+        json.dumps({'confianza': distancia}, allow_nan=False)
+
+    def test_backend_desconocido(self):
+        with self.assertRaises(ImproperlyConfigured):
+            crear_extractor(configuracion_reconocedor(backend="otro"))
+
+
+class InvitadosTests(TestCase):
+
+    def setUp(self):
+        media_temporal(self)
+        self.evento = Evento.objects.create(nom_evento="Charla", fecha=date(2026, 1, 1), estado=True)
+        self.usuarios = [Usuario.objects.create(nombre=f"Usuario {i}", rut=f"{i}-{i}") for i in range(1, 4)]
+        self.ids = [usuario.id for usuario in self.usuarios]
+
+    def test_subconjunto_lbph_desde_el_almacen(self):
+        almacen = AlmacenRostros()
+        almacen.agregar(*rostros_sinteticos(self.ids, 3))
+        subconjunto = crear_subconjunto(entrenar_lbph(self.ids), self.ids[:2], almacen)
+        self.assertEqual(sorted(set(subconjunto.getLabels().ravel())), self.ids[:2])
+        # Invitados sin capturas: todos los rostros son desconocidos
+        vacio = crear_subconjunto(entrenar_lbph(self.ids), [999], almacen)
+        self.assertIsInstance(vacio, ReconocedorVacio)
+        self.assertEqual(vacio.predict(np.zeros((100, 100), dtype=np.uint8))[0], -1)
+
+    def test_subconjunto_por_evento_se_arma_una_vez(self):
+        indice = IndiceEmbeddings(ExtractorLBP(grilla=4))
+        indice.agregar(*rostros_sinteticos(self.ids, 3))
+        path = os.path.join(carpeta_temporal(self), "modelo_embeddings.npz")
+        indice.guardar(path)
+        registro = RegistroModelos()
+        completo = registro.obtener_para_evento(self.evento.id, [], path)
+        self.assertEqual(completo.indice.labels.tolist(), self.ids)
+        reducido = registro.obtener_para_evento(self.evento.id, self.ids[:1], path)
+        self.assertEqual(reducido.indice.labels.tolist(), self.ids[:1])
+        self.assertIs(registro.obtener_para_evento(self.evento.id, self.ids[:1], path), reducido)
+        # Si cambian los invitados se vuelve a armar
+        otro = registro.obtener_para_evento(self.evento.id, self.ids[1:], path)
+        self.assertEqual(otro.indice.labels.tolist(), self.ids[1:])
+        self.assertEqual(registro.metricas_subconjuntos()[0]["usuarios"], 2)
+
+    def test_lote_sin_invitados_entrenados_responde_json_valido(self):
+        url = reverse('reconocer_lote_usuario', args=[self.evento.id])
+        with mock.patch("usuarios.views.obtener_reconocedor", return_value=ReconocedorVacio()), \
+                mock.patch("usuarios.views.obtener_detector", return_value=DetectorFijo((0, 0, 100, 100))):
+            respuesta = self.client.post(url, {'rostros': [archivo_jpeg(np.zeros((100, 100), dtype=np.uint8))]})
+        rostro = leer_json(respuesta)['imagenes'][0]['rostros'][0]
+        self.assertEqual(rostro['estado'], 'desconocido')
+        self.assertEqual(rostro['confianza'], DISTANCIA_MAXIMA)
+
+    def test_editar_evento_ignora_ids_invalidos(self):
+        datos = {'nom_evento': "Charla", 'fecha': "2026-01-01", 'relator': "", 'descripcion': "",
+                 'estado': 'True', 'invitados': [str(self.ids[0]), "999", "abc"]}
+        respuesta = self.client.post(reverse('editar_evento', args=[self.evento.id]), datos)
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(list(self.evento.invitados.values_list('id', flat=True)), self.ids[:1])
+
+
+class CalidadCapturasTests(SimpleTestCase):
+
+    def setUp(self):
+        self.filtro = FiltroCapturas(configuracion_captura())
+        self.rostros, _ = rostros_sinteticos([1, 2, 3], 1)
+
+    def test_rechaza_por_cada_motivo(self):
+        casos = {
+            'pequeno': cv2.resize(self.rostros[0], (50, 50)),
+            'oscuro': np.full((100, 100), 10, dtype=np.uint8),
+            'claro': np.full((100, 100), 250, dtype=np.uint8),
+            'borroso': np.full((100, 100), 128, dtype=np.uint8),
+        }
+        for motivo, rostro in casos.items():
+            self.assertEqual(self.filtro.evaluar(rostro)[:2], (False, motivo))
+        self.assertEqual(self.filtro.resumen(), {'aceptados': 0, 'rechazados': dict.fromkeys(casos, 1)})
+
+    def test_descarta_duplicados(self):
+        for rostro in self.rostros:
+            aceptado, motivo, normalizado = self.filtro.evaluar(rostro)
+            self.assertTrue(aceptado, motivo)
+            self.assertEqual(normalizado.shape, (TAMANO_ROSTRO, TAMANO_ROSTRO))
+        self.assertEqual(self.filtro.evaluar(self.rostros[1].copy())[1], 'duplicado')
+        # Un rostro ya guardado en el dataset también cuenta como reciente
+        filtro = FiltroCapturas(configuracion_captura())
+        filtro.registrar(self.filtro.evaluar(self.rostros[0])[2])
+        self.assertEqual(filtro.evaluar(self.rostros[0])[1], 'duplicado')
+
+    def test_configuracion(self):
+        self.assertEqual(configuracion_captura()['TOTAL_CAPTURAS'], 100)
+        with self.settings(CAPTURA={'TAMANO_MINIMO': 40}):
+            configuracion = configuracion_captura(distancia_hash=0)
+        self.assertEqual((configuracion['TAMANO_MINIMO'], configuracion['DISTANCIA_HASH']), (40, 0))
+        self.assertEqual(configuracion['TOTAL_CAPTURAS'], 100)
+
+
+class CursorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        Usuario.objects.bulk_create([Usuario(nombre=f"Usuario {i % 7}", rut=f"{1000 + i}-{i % 10}") for i in range(23)])
+
+    def test_codificar_y_decodificar(self):
+        valores = ["Ñandú", 5, date(2026, 1, 2).isoformat()]
+        self.assertEqual(decodificar_cursor(codificar_cursor(valores)), valores)
+
+    def test_cursor_invalido(self):
+        self.assertIsNone(decodificar_cursor(None))
+        self.assertIsNone(decodificar_cursor("no es base64!"))
+        self.assertIsNone(decodificar_cursor(codificar_cursor([1])[:-2] + "{"))
+        # JSON válido que no es una lista
+        self.assertIsNone(decodificar_cursor("eyJhIjogMX0"))
+
+    def test_recorre_todas_las_filas_una_vez(self):
+        vistos = []
+        cursor = None
+        while True:
+            pagina = paginar_por_clave(Usuario.objects.all(), ["nombre", "id"], cursor, tamano=5)
+            vistos.extend(usuario.id for usuario in pagina)
+            cursor = pagina.siguiente
+            if cursor is None:
+                break
+        esperados = list(Usuario.objects.order_by("nombre", "id").values_list("id", flat=True))
+        self.assertEqual(vistos, esperados)
+
+    def test_orden_descendente(self):
+        primera = paginar_por_clave(Usuario.objects.all(), ["-id"], tamano=10)
+        segunda = paginar_por_clave(Usuario.objects.all(), ["-id"], primera.siguiente, tamano=10)
+        self.assertEqual(segunda.filas[0].id, primera.filas[-1].id - 1)
+
+    def test_cursor_modificado_muestra_la_primera_pagina(self):
+        primera = paginar_por_clave(Usuario.objects.all(), ["nombre", "id"], tamano=5)
+        for valores in (["abc", "x"], [None, 1], [["a"], 1], ["a", 1, 2]):
+            pagina = paginar_por_clave(Usuario.objects.all(), ["nombre", "id"], codificar_cursor(valores), tamano=5)
+            self.assertEqual([u.id for u in pagina], [u.id for u in primera])
+
+    def test_conteos_en_cache(self):
+        cache.clear()
+        evento = Evento.objects.create(nom_evento="Charla", fecha=date(2026, 1, 1), estado=True)
+        vacio = Evento.objects.create(nom_evento="Taller", fecha=date(2026, 1, 2), estado=True)
+        Asistencia.objects.create(usuario=Usuario.objects.first(), evento_asist=evento)
+        with self.assertNumQueries(1):
+            self.assertEqual(conteos_asistencias([evento.id, vacio.id]), {evento.id: 1, vacio.id: 0})
+        with self.assertNumQueries(0):
+            self.assertEqual(conteos_asistencias([evento.id]), {evento.id: 1})
+        Asistencia.objects.create(usuario=Usuario.objects.last(), evento_asist=evento)
+        invalidar_conteos([evento.id])
+        self.assertEqual(conteos_asistencias([evento.id]), {evento.id: 2})
+
+
+class ExportacionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.evento = Evento.objects.create(nom_evento="=SUMA(A1)", fecha=date(2026, 1, 1), estado=True)
+        otro = Evento.objects.create(nom_evento="Taller", fecha=date(2026, 1, 2), estado=True)
+        for i in range(4):
+            usuario = Usuario.objects.create(nombre=f"Usuario {i}", rut=f"{i}-{i}", carrera="Química" if i % 2 else None)
+            Asistencia.objects.create(usuario=usuario, evento_asist=cls.evento)
+        Asistencia.objects.create(usuario=usuario, evento_asist=otro)
+
+    def test_escapar_celda(self):
+        for valor in ("=1+1", "+56 9", "-2", "@SUM(A1)", "\tx", "\rx"):
+            self.assertEqual(escapar_celda(valor), f"'{valor}")
+        self.assertEqual(escapar_celda("Ana"), "Ana")
+        self.assertEqual(escapar_celda(5), 5)
+
+    def test_lotes_recorren_todas_las_filas(self):
+        asistencias = asistencias_exportables()
+        esperados = list(Asistencia.objects.order_by('id').values_list('id', flat=True))
+        # Con un múltiplo exacto del lote se necesita una consulta más, que vuelve vacía
+        for tamano, consultas in ((2, 3), (5, 2), (6, 1)):
+            with self.assertNumQueries(consultas):
+                self.assertEqual([fila[0] for fila in filas_por_lotes(asistencias, tamano)], esperados)
+
+    def test_lineas_csv(self):
+        lineas = list(lineas_csv(asistencias_exportables(evento_id=self.evento.id, carrera="Química"), 1))
+        self.assertEqual(lineas[0], "\ufeffRUT,Nombre,Carrera,Evento,Fecha del evento,Fecha de registro\r\n")
+        self.assertEqual(len(lineas), 3)
+        self.assertTrue(lineas[1].startswith("1-1,Usuario 1,Química,'=SUMA(A1),2026-01-01,"))
+        sin_bom = list(lineas_csv(asistencias_exportables(), bom=False))
+        self.assertEqual(len(sin_bom), 6)
+        self.assertTrue(sin_bom[0].startswith("RUT,"))
+
+    # La vista es asíncrona y su contenido se lee por lotes desde un generador asíncrono
+    async def test_descarga(self):
+        respuesta = await self.async_client.get(reverse('exportar_asistencias'), {'evento': self.evento.id})
+        self.assertEqual(respuesta['Content-Disposition'], f'attachment; filename="asistencias_evento_{self.evento.id}.csv"')
+        contenido = b"".join([parte async for parte in respuesta.streaming_content]).decode()
+        esperado = await sync_to_async(lambda: "".join(lineas_csv(asistencias_exportables(evento_id=self.evento.id))))()
+        self.assertEqual(contenido, esperado)
+
+
+class ImportacionTests(TestCase):
+
+    def setUp(self):
+        media_temporal(self)
+        self.fotos = carpeta_temporal(self)
+        # Las fotos sintéticas ya son el rostro completo
+        for nombre, parche in (("crear_detector", mock.patch("usuarios.importacion.crear_detector",
+                                                             return_value=DetectorFijo((0, 0, 100, 100)))),
+                               ("detectores", mock.patch.dict("usuarios.importacion._detectores", clear=True))):
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    # Escribe una foto sintética del usuario indicado en la carpeta de fotos
+    def foto(self, relativo, usuario_id, semilla=0):
+        path = os.path.join(self.fotos, relativo)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        rostro, _ = rostros_sinteticos([usuario_id], 1, semilla)
+        cv2.imwrite(path, rostro[0])
+
+    def test_normalizar_rut(self):
+        self.assertEqual(normalizar_rut(" 12.345.678-k "), "12345678-K")
+        self.assertEqual(normalizar_rut(None), "")
+
+    def test_rut_de_foto(self):
+        self.assertEqual(rut_de_foto("12.345.678-9.jpg"), "12345678-9")
+        self.assertEqual(rut_de_foto("fotos/12345678-k_2.png"), "12345678-K")
+        self.assertEqual(rut_de_foto("12345678-9/frente.jpg"), "12345678-9")
+        self.assertEqual(rut_de_foto("curso/11111111-1/perfil.jpg"), "11111111-1")
+
+    def test_listar_fotos_de_carpeta_y_zip(self):
+        self.foto("11111111-1/a.jpg", 1)
+        self.foto("22222222-2.png", 2)
+        with open(os.path.join(self.fotos, "notas.txt"), "w") as archivo:
+            archivo.write("no es una foto")
+        esperado = {"11111111-1": ["11111111-1/a.jpg"], "22222222-2": ["22222222-2.png"]}
+        self.assertEqual(listar_fotos(self.fotos), esperado)
+        path_zip = os.path.join(carpeta_temporal(self), "fotos.zip")
+        shutil.make_archive(path_zip[:-4], "zip", self.fotos)
+        self.assertEqual(listar_fotos(path_zip), esperado)
+
+    def test_informa_las_fotos_que_fallan(self):
+        self.foto("11111111-1/a.jpg", 1)
+        with open(os.path.join(self.fotos, "11111111-1", "b.jpg"), "wb") as archivo:
+            archivo.write(b"no es una imagen")
+        tarea = (1, "1_Ana", ["11111111-1/a.jpg", "11111111-1/b.jpg", "11111111-1/c.jpg"], self.fotos,
+                 ruta_dataset(), tuple(cargar_claves()), {}, configuracion_captura())
+        usuario_id, rostros, firmas, fallos, omitidas = importar_fotos_usuario(tarea)
+        self.assertEqual((usuario_id, len(rostros), omitidas), (1, 1, 0))
+        self.assertEqual(list(firmas), [f"1_Ana/{nombre}" for nombre in os.listdir(os.path.join(ruta_dataset(), "1_Ana"))])
+        self.assertEqual(fallos, [("11111111-1/b.jpg", "no es una imagen válida"), ("11111111-1/c.jpg", "no se pudo leer")])
+        # Sin rostro en la foto
+        with mock.patch("usuarios.importacion.crear_detector", return_value=DetectorFijo()), \
+                mock.patch.dict("usuarios.importacion._detectores", clear=True):
+            self.foto("11111111-1/d.jpg", 1, semilla=5)
+            fallos = importar_fotos_usuario(tarea[:2] + (["11111111-1/d.jpg"],) + tarea[3:])[3]
+        self.assertEqual(fallos, [("11111111-1/d.jpg", "sin rostro")])
+        # Volver a importar la misma foto no la duplica
+        _, rostros, _, _, omitidas = importar_fotos_usuario(tarea)
+        self.assertEqual((len(rostros), omitidas), (0, 1))
+
+    def test_comando(self):
+        Usuario.objects.create(nombre="Beto", rut="22222222-2")
+        path_csv = os.path.join(carpeta_temporal(self), "alumnos.csv")
+        with open(path_csv, "w", encoding="utf-8") as archivo:
+            archivo.write("Nombre;RUT;Carrera\nAna;11.111.111-1;Química\nBeto;22222222-2;\n;33333333-3;\nAna;11111111-1;\n")
+        self.foto("11111111-1/a.jpg", 1)
+        self.foto("22222222-2/a.jpg", 2)
+        self.foto("99999999-9/a.jpg", 9)
+        salida = StringIO()
+        call_command("importar_usuarios", path_csv, fotos=self.fotos, procesos=1, stdout=salida)
+        ana = Usuario.objects.get(rut="11111111-1")
+        self.assertEqual((ana.nombre, ana.carrera), ("Ana", "Química"))
+        self.assertIn("Usuarios: 1 creados, 1 ya registrados, 2 filas inválidas", salida.getvalue())
+        self.assertIn("99999999-9/a.jpg: el RUT no está en el CSV ni registrado", salida.getvalue())
+        _, labels = AlmacenRostros().leer()
+        self.assertEqual(sorted(labels.tolist()), sorted([ana.id, Usuario.objects.get(rut="22222222-2").id]))
+
+    @unittest.skipUnless(fcntl, "el bloqueo entre procesos se prueba con fcntl")
+    def test_almacen_espera_el_bloqueo_de_otro_proceso(self):
+        almacen = AlmacenRostros()
+        os.makedirs(almacen.carpeta, exist_ok=True)
+        # Otro descriptor del archivo de bloqueo se comporta como otro proceso para 'flock'
+        with open(almacen.path_bloqueo, "a+b") as archivo:
+            fcntl.flock(archivo.fileno(), fcntl.LOCK_EX)
+            escritor = threading.Thread(target=almacen.agregar, args=rostros_sinteticos([1], 1))
+            escritor.start()
+            escritor.join(0.2)
+            self.assertTrue(escritor.is_alive())
+            self.assertEqual(len(almacen), 0)
+            fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+        escritor.join(5)
+        self.assertEqual(len(almacen), 1)
+
+
+class ImagenesPerfilTests(TestCase):
+
+    def setUp(self):
+        media_temporal(self)
+        self.almacen = AlmacenImagenes()
+        self.jpeg = cv2.imencode(".jpg", np.full((20, 20, 3), 90, dtype=np.uint8))[1].tobytes()
+
+    def test_guardar_y_leer(self):
+        huella = self.almacen.guardar(self.jpeg)
+        self.assertEqual(len(huella), 64)
+        with open(self.almacen.ruta(huella), "rb") as archivo:
+            self.assertNotIn(self.jpeg, archivo.read())
+        self.assertEqual(self.almacen.leer(huella), self.jpeg)
+        # El mismo contenido se guarda una sola vez
+        self.assertEqual(self.almacen.guardar(self.jpeg), huella)
+        self.assertEqual(os.listdir(os.path.dirname(self.almacen.ruta(huella))), [f"{huella}.bin"])
+        self.almacen.eliminar(huella)
+        self.assertFalse(self.almacen.existe(huella))
+        self.assertIsNone(self.almacen.leer(huella))
+        self.almacen.eliminar(huella)
+
+    def test_vista_de_la_imagen(self):
+        usuario = Usuario(nombre="Ana", rut="11111111-1")
+        usuario.asignar_imagen(self.jpeg)
+        usuario.save()
+        respuesta = self.client.get(reverse('imagen_usuario', args=[usuario.id]))
+        self.assertEqual(respuesta.content, self.jpeg)
+        self.assertEqual(respuesta['Content-Type'], 'image/jpeg')
+        self.assertEqual(respuesta['ETag'], f'"{usuario.imagen_hash}"')
+        sin_imagen = Usuario.objects.create(nombre="Beto", rut="22222222-2")
+        self.assertEqual(self.client.get(reverse('imagen_usuario', args=[sin_imagen.id])).status_code, 404)
+
+    def test_editar_borra_la_imagen_que_ya_no_se_usa(self):
+        ana = Usuario.objects.create(nombre="Ana", rut="11111111-1")
+        beto = Usuario.objects.create(nombre="Beto", rut="22222222-2")
+        anterior = self.almacen.guardar(self.jpeg)
+        Usuario.objects.update(imagen_hash=anterior)
+        nueva = cv2.imencode(".png", np.zeros((20, 20, 3), dtype=np.uint8))[1].tobytes()
+        for usuario in (ana, beto):
+            self.client.post(reverse('editar_usuario', args=[usuario.id]),
+                             {'nombre': usuario.nombre, 'carrera': "", 'imagen': SimpleUploadedFile("a.png", nueva)})
+            usuario.refresh_from_db()
+            self.assertEqual(usuario.leer_imagen(), nueva)
+            # Se borra solo cuando el último usuario deja de usarla
+            self.assertEqual(self.almacen.existe(anterior), usuario == ana)
+        respuesta = self.client.post(reverse('editar_usuario', args=[ana.id]),
+                                     {'nombre': "Ana", 'carrera': "", 'imagen': SimpleUploadedFile("a.jpg", b"texto")})
+        self.assertContains(respuesta, "no es una imagen válida")
+
+class MetricasTests(SimpleTestCase):
+
+    def setUp(self):
+        # Cada prueba usa su propio registro, con las métricas activas
+        self.registro = RegistroMetricas()
+        for parche in (mock.patch("usuarios.metricas.registro_metricas", self.registro),
+                       mock.patch("usuarios.views.registro_metricas", self.registro),
+                       mock.patch("usuarios.metricas._activas", True)):
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def test_histograma_acumula_por_limite(self):
+        histograma = Histograma(limites=(0.01, 0.1, 1))
+        for segundos in (0.005, 0.01, 0.05, 2):
+            histograma.observar(segundos)
+        acumulados, suma, cantidad = histograma.instantanea()
+        self.assertEqual(acumulados, [2, 3, 3])
+        self.assertAlmostEqual(suma, 2.065)
+        self.assertEqual(cantidad, 4)
+
+    def test_medir_y_contar(self):
+        resumen = ResumenSesion()
+        with medir('detectar', resumen):
+            pass
+        observar('detectar', 0.2, resumen)
+        contar('capturas_rechazadas', 2, resumen, motivo='borroso')
+        contar('capturas_rechazadas', resumen=resumen, motivo='oscuro')
+        self.assertEqual(self.registro.histograma('detectar').cantidad, 2)
+        self.assertEqual(self.registro.valor('capturas_rechazadas', (('motivo', 'borroso'),)), 2)
+        datos = resumen.resumen()
+        self.assertEqual(datos['contadores'], {'capturas_rechazadas': 3})
+        self.assertEqual(datos['etapas']['detectar']['cantidad'], 2)
+        self.assertEqual(datos['etapas']['detectar']['maximo_ms'], 200.0)
+
+    def test_desactivadas_no_miden(self):
+        with mock.patch("usuarios.metricas._activas", False):
+            with medir('detectar'):
+                pass
+            contar('fotogramas')
+        self.assertIsNone(self.registro.histograma('detectar'))
+        self.assertEqual(self.registro.valor('fotogramas'), 0)
+
+    def test_formato_prometheus(self):
+        observar('predecir', 0.003)
+        contar('fotogramas', 5)
+        contar('capturas_rechazadas', motivo='com"illa\\')
+        lineas = self.registro.exportar()
+        self.assertIn('vision_etapa_segundos_bucket{etapa="predecir",le="0.005"} 1', lineas)
+        self.assertIn('vision_etapa_segundos_bucket{etapa="predecir",le="+Inf"} 1', lineas)
+        self.assertIn('vision_etapa_segundos_count{etapa="predecir"} 1', lineas)
+        self.assertIn('# TYPE vision_fotogramas_total counter', lineas)
+        self.assertIn('vision_fotogramas_total 5', lineas)
+        self.assertIn('vision_capturas_rechazadas_total{motivo="com\\"illa\\\\"} 1', lineas)
+        self.assertEqual(formatear_gauge("vision_x", "Ayuda.", [((), 3)]), ["# HELP vision_x Ayuda.", "# TYPE vision_x gauge", "vision_x 3"])
+        respuesta = self.client.get(reverse('metricas'))
+        self.assertIn('vision_fotogramas_total 5', respuesta.content.decode())
+
+    def test_resumen_de_sesion_en_el_log(self):
+        with self.assertLogs('usuarios.metricas', 'INFO') as registro:
+            registrar_resumen("reconocimiento", {'fotogramas': 3})
+        self.assertIn('reconocimiento {"fotogramas": 3}', registro.output[0])
+        with self.settings(METRICAS={'RESUMEN_SESION': False}), self.assertNoLogs('usuarios.metricas'):
+            registrar_resumen("reconocimiento", {})
+
+
+class ReproduccionTests(TestCase):
+
+    def setUp(self):
+        self.evento = Evento.objects.create(nom_evento="Charla", fecha=date(2026, 1, 1), estado=True)
+        self.usuario = Usuario.objects.create(nombre="Ana", rut="11111111-1")
+        self.carpeta = carpeta_temporal(self)
+        for i in range(4):
+            cv2.imwrite(os.path.join(self.carpeta, f"f{i}.png"), np.full((60, 80, 3), i, dtype=np.uint8))
+        with open(os.path.join(self.carpeta, "notas.txt"), "w") as archivo:
+            archivo.write("no es un fotograma")
+
+    def test_leer_carpeta_de_fotogramas(self):
+        fotogramas = list(leer_grabacion(self.carpeta, fps=2))
+        self.assertEqual([(numero, segundo) for numero, segundo, _ in fotogramas], [(1, 0.0), (2, 0.5), (3, 1.0), (4, 1.5)])
+        self.assertEqual(int(fotogramas[3][2][0, 0, 0]), 3)
+        self.assertEqual(len(list(leer_grabacion(self.carpeta, maximo=2))), 2)
+        with self.assertRaises(ValueError):
+            list(leer_grabacion(os.path.join(self.carpeta, "no_existe.mp4")))
+
+    def test_informe_de_la_reproduccion(self):
+        reloj = RelojGrabacion()
+        procesador = ProcesadorReconocimiento(ReconocedorFijo(self.usuario.id), DetectorFijo((10, 10, 40, 40)),
+                                              SesionAsistencia(self.evento, reloj=reloj), tiempo_confirmacion=2)
+        informe = reproducir_grabacion(procesador, leer_grabacion(self.carpeta, fps=1), reloj)
+        self.assertEqual((informe['fotogramas'], informe['segundos_grabacion']), (4, 3.0))
+        persona, = informe['personas']
+        self.assertEqual((persona['usuario_id'], persona['nombre'], persona['reconocido_en']), (self.usuario.id, "Ana", 0.0))
+        self.assertEqual(persona['segundos_hasta_confirmar'], 2.0)
+        self.assertEqual(informe['confirmadas'], 1)
+        # Solo el fotograma que confirma la asistencia consulta la base de datos (un INSERT)
+        self.assertEqual((informe['consultas']['total'], informe['consultas']['fotogramas_con_consultas']), (1, 1))
+        self.assertTrue(Asistencia.objects.filter(usuario=self.usuario, evento_asist=self.evento).exists())
+
+    def test_percentiles(self):
+        self.assertEqual(percentiles_ms([]), {'p50_ms': None, 'p95_ms': None, 'p99_ms': None})
+        self.assertEqual(percentiles_ms([0.001, 0.002, 0.003], (50,)), {'p50_ms': 2.0})
+
+    def test_comando_deshace_las_asistencias(self):
+        salida = os.path.join(carpeta_temporal(self), "informe.json")
+        with mock.patch("usuarios.management.commands.reproducir.obtener_reconocedor",
+                        return_value=ReconocedorFijo(self.usuario.id)), \
+                mock.patch("usuarios.management.commands.reproducir.crear_detector",
+                           return_value=DetectorFijo((10, 10, 40, 40))):
+            call_command("reproducir", self.carpeta, fps=1, salida=salida, stdout=StringIO(), stderr=StringIO())
+        with open(salida, encoding="utf-8") as archivo:
+            self.assertEqual(json.load(archivo)['confirmadas'], 1)
+        self.assertFalse(Asistencia.objects.exists())
+
+
+class ComparacionTests(SimpleTestCase):
+
+    def resultados(self, **medianas):
+        return {"etapas": {etapa: {"mediana_ms": valor} for etapa, valor in medianas.items()}}
+
+    def test_detecta_regresiones_segun_tolerancia(self):
+        comparacion = comparar_resultados(self.resultados(detectar=13.0, predecir=10.0),
+                                          self.resultados(detectar=10.0, predecir=10.0), 0.25)
+        (etapa, base, actual, cambio, regresion), sin_cambio = comparacion
+        self.assertEqual((etapa, base, actual, regresion), ("detectar", 10.0, 13.0, True))
+        self.assertAlmostEqual(cambio, 0.3)
+        self.assertEqual(sin_cambio, ("predecir", 10.0, 10.0, 0.0, False))
+
+    def test_omite_etapas_sin_base(self):
+        comparacion = comparar_resultados(self.resultados(detectar=5.0, nueva=1.0),
+                                          self.resultados(detectar=5.0, vieja=1.0, vacia=0), 0.1)
+        self.assertEqual([etapa for etapa, *_ in comparacion], ["detectar"])
+
+
+class DiarioAsistenciasTests(TestCase):
+
+    def setUp(self):
+        self.diario = DiarioAsistencias(os.path.join(carpeta_temporal(self), "asistencias.sqlite3"))
+        self.addCleanup(self.diario.cerrar)
+        self.sincronizador = SincronizadorDiario(self.diario)
+        self.evento = Evento.objects.create(nom_evento="Charla", fecha=date(2026, 1, 1), estado=True)
+        self.usuario = Usuario.objects.create(nombre="Ana", rut="11111111-1")
+
+    def test_anotar_dos_veces_no_duplica(self):
+        self.assertTrue(self.diario.anotar(self.evento.id, self.usuario.id))
+        self.assertFalse(self.diario.anotar(self.evento.id, self.usuario.id))
+        self.assertEqual(self.diario.resumen()['pendientes'], 1)
+        self.assertEqual(self.diario.registrados(self.evento.id), {self.usuario.id})
+
+    def test_sincronizar_es_idempotente(self):
+        self.diario.anotar(self.evento.id, self.usuario.id)
+        self.assertEqual(self.sincronizador.sincronizar(), 1)
+        self.assertEqual(self.sincronizador.sincronizar(), 0)
+        # Un lote reenviado (la marca de sincronizada se perdió) no duplica la asistencia
+        self.diario.marcar([f"{self.evento.id}:{self.usuario.id}"], PENDIENTE)
+        self.assertEqual(self.sincronizador.sincronizar(), 1)
+        self.assertEqual(Asistencia.objects.filter(evento_asist=self.evento).count(), 1)
+        self.assertEqual(self.diario.registrados(self.evento.id), set())
+
+    def test_se_puede_volver_a_registrar_si_se_borra_la_asistencia(self):
+        self.diario.anotar(self.evento.id, self.usuario.id)
+        self.sincronizador.sincronizar()
+        Asistencia.objects.all().delete()
+        self.assertTrue(self.diario.anotar(self.evento.id, self.usuario.id))
+        self.sincronizador.sincronizar()
+        self.assertEqual(Asistencia.objects.count(), 1)
+        self.assertEqual(self.diario.resumen(), {'pendientes': 0, 'sincronizadas': 1, 'descartadas': 0})
+
+    def test_descarta_usuarios_eliminados(self):
+        otro = Usuario.objects.create(nombre="Beto", rut="22222222-2")
+        self.diario.anotar(self.evento.id, otro.id)
+        otro.delete()
+        with self.assertLogs('usuarios.diario', 'WARNING'):
+            self.sincronizador.sincronizar()
+        self.assertEqual(Asistencia.objects.count(), 0)
+        self.assertEqual(self.diario.resumen()['descartadas'], 1)
+
+    def test_una_anotacion_nueva_durante_la_sincronizacion_queda_pendiente(self):
+        self.diario.anotar(self.evento.id, self.usuario.id)
+        clave = f"{self.evento.id}:{self.usuario.id}"
+        insertar = self.sincronizador._insertar
+
+        # Mientras se inserta el lote, otro sincronizador lo copia, alguien borra la asistencia
+        # y la persona se vuelve a registrar
+        def insertar_y_reanotar(filas):
+            insertar(filas)
+            self.diario.marcar([clave], SINCRONIZADA)
+            Asistencia.objects.all().delete()
+            self.assertTrue(self.diario.anotar(self.evento.id, self.usuario.id))
+
+        with mock.patch.object(self.sincronizador, "_insertar", side_effect=insertar_y_reanotar):
+            self.assertEqual(self.sincronizador.sincronizar_lote(), 1)
+        self.assertEqual(self.diario.registrados(self.evento.id), {self.usuario.id})
+        self.assertEqual(self.sincronizador.sincronizar(), 1)
+        self.assertEqual(Asistencia.objects.count(), 1)
+
+    def test_un_error_de_la_base_de_datos_deja_el_lote_pendiente(self):
+        self.diario.anotar(self.evento.id, self.usuario.id)
+        with mock.patch.object(self.sincronizador, "_insertar", side_effect=DatabaseError("sin conexión")):
+            with self.assertRaises(DatabaseError):
+                self.sincronizador.sincronizar_lote()
+        self.assertEqual(self.diario.resumen()['pendientes'], 1)
+        self.assertEqual(self.sincronizador.sincronizar(), 1)
+        self.assertEqual(Asistencia.objects.count(), 1)
+
+    def test_la_sesion_anota_en_el_diario(self):
+        sesion = SesionAsistencia(self.evento, diario=self.diario)
+        self.assertTrue(sesion.registrar(self.usuario.id))
+        sesion.cerrar()
+        self.assertEqual(self.diario.registrados(self.evento.id), {self.usuario.id})
+        # Otra sesión del mismo evento ya lo considera registrado, aunque no esté en la base de datos
+        self.assertTrue(SesionAsistencia(self.evento, diario=self.diario).ya_registrado(self.usuario.id))
+
+
+class LBPHBinarioTests(SimpleTestCase):
+
+    def setUp(self):
+        self.carpeta = carpeta_temporal(self)
+        self.rostros, self.labels = rostros_sinteticos(range(1, 6), 6)
+        self.consultas, self.esperados = rostros_sinteticos(range(1, 6), 2, semilla=1)
+
+    def entrenar(self, rostros, labels):
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.train(list(rostros), labels)
+        return recognizer
+
+    def comparar(self, recognizer, binario):
+        for consulta in self.consultas:
+            label, distancia = recognizer.predict(consulta)
+            label_binario, distancia_binario = binario.predict(consulta)
+            self.assertEqual(label_binario, label)
+            self.assertAlmostEqual(distancia_binario, distancia, delta=distancia * 1e-4)
+
+    def test_exportar_predice_igual_que_opencv(self):
+        recognizer = self.entrenar(self.rostros, self.labels)
+        path = os.path.join(self.carpeta, "modelo_lbph.bin")
+        exportar_lbph(recognizer, path, "float32")
+        binario = ReconocedorLBPHBinario.cargar(path)
+        self.comparar(recognizer, binario)
+        # La predicción por lotes da los mismos resultados que una por una
+        labels, distancias = binario.predict_lote(self.consultas)
+        for consulta, label, distancia in zip(self.consultas, labels, distancias):
+            self.assertEqual((label, distancia), binario.predict(consulta))
+
+    def test_agregar_equivale_a_entrenar_todo(self):
+        mitad = len(self.rostros) // 2
+        path = os.path.join(self.carpeta, "modelo_lbph.bin")
+        exportar_lbph(self.entrenar(self.rostros[:mitad], self.labels[:mitad]), path, "float32")
+        nuevos = crear_lbph_como(path)
+        nuevos.train(self.rostros[mitad:], self.labels[mitad:])
+        agregar_lbph(path, nuevos)
+        self.comparar(self.entrenar(self.rostros, self.labels), ReconocedorLBPHBinario.cargar(path))
+
+    def test_subconjunto_solo_predice_esos_usuarios(self):
+        path = os.path.join(self.carpeta, "modelo_lbph.bin")
+        exportar_lbph(self.entrenar(self.rostros, self.labels), path, "float32")
+        subconjunto = ReconocedorLBPHBinario.cargar(path).subconjunto([2, 3])
+        labels, _ = subconjunto.predict_lote(self.consultas)
+        self.assertTrue(set(labels) <= {2, 3})
+        # Sin usuarios todo es desconocido, con una distancia finita
+        self.assertEqual(ReconocedorLBPHBinario.cargar(path).subconjunto([99]).predict(self.consultas[0]),
+                         (-1, DISTANCIA_MAXIMA))
+
+    def test_float16_ocupa_la_mitad(self):
+        recognizer = self.entrenar(self.rostros, self.labels)
+        completo, reducido = (os.path.join(self.carpeta, f"{tipo}.bin") for tipo in ("float32", "float16"))
+        exportar_lbph(recognizer, completo, "float32")
+        exportar_lbph(recognizer, reducido, "float16")
+        binario = ReconocedorLBPHBinario.cargar(reducido)
+        self.assertEqual(binario.histogramas.nbytes * 2, ReconocedorLBPHBinario.cargar(completo).histogramas.nbytes)
+        for consulta in self.consultas:
+            label, distancia = recognizer.predict(consulta)
+            self.assertEqual(binario.predict(consulta)[0], label)
+            self.assertAlmostEqual(binario.predict(consulta)[1], distancia, delta=distancia * 1e-3)
+
+    def test_comando_exportar(self):
+        media = media_temporal(self)
+        recognizer = self.entrenar(self.rostros, self.labels)
+        recognizer.write(os.path.join(media, "modelo_lbph.yml"))
+        call_command("exportar_modelo_lbph", precision="float32", stdout=StringIO())
+        self.comparar(recognizer, ReconocedorLBPHBinario.cargar(ruta_modelo()))
+        with self.assertRaises(CommandError):
+            call_command("exportar_modelo_lbph", destino="modelo.yml", stdout=StringIO())
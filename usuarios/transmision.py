@@ -0,0 +1,156 @@
+# --- Transmisión en vivo del reconocimiento ---
+# Permite ver el reconocimiento desde el navegador en lugar de una ventana en el servidor.
+# Por cada evento hay un único pipeline de reconocimiento (una sola cámara y un solo modelo)
+# que, por cada fotograma procesado:
+#   - dibuja los resultados y codifica el JPEG una sola vez
+#   - reparte ese JPEG y los eventos de asistencia a todos los espectadores conectados
+# Cada espectador tiene su propia cola acotada dentro del bucle asíncrono (ASGI); si un
+# cliente es lento, se descartan sus fotogramas más antiguos y la cámara nunca lo espera.
+# Cuando nadie mira durante un tiempo, el pipeline se detiene y libera la cámara.
+# Igual que el comando 'reconocer', cada INTERVALO_RECARGA segundos vuelve a pedir el modelo
+# al registro del proceso, así usa el nuevo si se volvió a entrenar o cambiaron los invitados.
+import asyncio  # Colas de cada espectador
+import json  # Para los eventos
+import os  # Para saber si la fuente es un archivo de video
+import threading  # Para proteger el registro de transmisiones
+import time  # Para detener la transmisión sin espectadores
+import cv2  # OpenCV para codificar los fotogramas
+from .asistencia import SesionAsistencia  # Registro de asistencia por lotes
+from .detectores import configuracion_detector, crear_detector  # Detector de rostros
+from .diario import obtener_diario  # Diario local de asistencias
+from .metricas import medir  # Tiempo de codificación de los fotogramas
+from .pipeline import PipelineReconocimiento  # Captura, reconocimiento y salida en hilos
+from .reconocedor import obtener_reconocedor  # Modelo compartido del proceso
+from .reconocimiento import ProcesadorReconocimiento, anotar, parametro  # Lógica por fotograma
+
+# Segundos entre revisiones de si el modelo cambió en el disco
+INTERVALO_RECARGA = 5
+
+# Espectador conectado: recibe los mensajes en una cola de su bucle asíncrono
+class Espectador:
+
+    def __init__(self, loop, maximo):
+        self.loop = loop
+        self.cola = asyncio.Queue(maxsize=maximo)
+        self.descartados = 0
+
+    # Agrega un mensaje descartando el más antiguo si la cola está llena (se ejecuta en el bucle)
+    def _poner(self, mensaje):
+        if self.cola.full():
+            self.cola.get_nowait()
+            self.descartados += 1
+        self.cola.put_nowait(mensaje)
+
+    # Entrega un mensaje desde cualquier hilo
+    def entregar(self, mensaje):
+        try:
+            self.loop.call_soon_threadsafe(self._poner, mensaje)
+        except RuntimeError:
+            # El bucle del espectador ya se cerró
+            pass
+
+# Transmisión de un evento: un pipeline compartido por todos sus espectadores
+class Transmision:
+
+    def __init__(self, evento, fuente=None, calidad=None, sin_espectadores=None):
+        self.evento = evento
+        self.fuente = parametro('FUENTE_TRANSMISION', 0) if fuente is None else fuente
+        self.calidad = calidad or parametro('CALIDAD_JPEG', 80)
+        # Segundos que la transmisión sigue activa sin espectadores
+        self.sin_espectadores = sin_espectadores or parametro('SEGUNDOS_SIN_ESPECTADORES', 30)
+        self._lock = threading.Lock()
+        self._fotogramas = set()
+        self._eventos = set()
+        self._ultimo_espectador = time.monotonic()
+        self._ultima_recarga = time.monotonic()
+        self.procesador = ProcesadorReconocimiento(
+            obtener_reconocedor(evento=evento), crear_detector(configuracion_detector()),
+            SesionAsistencia(evento, diario=obtener_diario()),
+        )
+        # Las asistencias pendientes se guardan cuando el pipeline termina, por cualquier motivo
+        # Un archivo de video (útil para pruebas) se reproduce a su velocidad original
+        self.pipeline = PipelineReconocimiento(self.fuente, self.procesador, self._salida,
+                                               al_terminar=self.procesador.cerrar,
+                                               tiempo_real=os.path.isfile(str(self.fuente)))
+
+    # Inicia el pipeline en segundo plano
+    def iniciar(self):
+        self.pipeline.iniciar()
+        return self
+
+    # Indica si el pipeline sigue en ejecución
+    def activa(self):
+        return self.pipeline.activo()
+
+    # Registra un espectador de fotogramas ('fotogramas') o de eventos ('eventos')
+    def suscribir(self, tipo, loop, maximo=2):
+        espectador = Espectador(loop, maximo)
+        with self._lock:
+            (self._fotogramas if tipo == 'fotogramas' else self._eventos).add(espectador)
+        return espectador
+
+    def desuscribir(self, espectador):
+        with self._lock:
+            self._fotogramas.discard(espectador)
+            self._eventos.discard(espectador)
+            self._ultimo_espectador = time.monotonic()
+
+    # Etapa de salida del pipeline: codifica una vez y reparte a todos los espectadores
+    def _salida(self, fotograma):
+        with self._lock:
+            fotogramas = list(self._fotogramas)
+            eventos = list(self._eventos)
+            if fotogramas or eventos:
+                self._ultimo_espectador = time.monotonic()
+            elif time.monotonic() - self._ultimo_espectador > self.sin_espectadores:
+                # Nadie mira hace tiempo: detiene el pipeline y libera la cámara
+                return False
+
+        if fotogramas:
+            anotar(fotograma.imagen, fotograma.resultados)
+            with medir('codificar_jpeg'):
+                ok, jpeg = cv2.imencode(".jpg", fotograma.imagen, [cv2.IMWRITE_JPEG_QUALITY, self.calidad])
+            if ok:
+                datos = jpeg.tobytes()
+                for espectador in fotogramas:
+                    espectador.entregar(datos)
+
+        for evento in fotograma.eventos:
+            mensaje = json.dumps(evento, ensure_ascii=False)
+            for espectador in eventos:
+                espectador.entregar(mensaje)
+
+        # Usa el modelo nuevo si se volvió a entrenar o cambiaron los invitados (el registro solo lo rearma si cambió)
+        if time.monotonic() - self._ultima_recarga >= INTERVALO_RECARGA:
+            self._ultima_recarga = time.monotonic()
+            try:
+                self.procesador.recognizer = obtener_reconocedor(evento=self.evento)
+            except FileNotFoundError:
+                # El modelo se está reemplazando o se borró: se sigue con el que ya está cargado
+                pass
+        return True
+
+    # Detiene el pipeline (al terminar guarda las asistencias pendientes)
+    def detener(self):
+        self.pipeline.detener()
+        self.pipeline.esperar()
+
+# Transmisiones activas del proceso, una por evento
+_transmisiones = {}
+_lock_transmisiones = threading.Lock()
+
+# Devuelve la transmisión del evento, iniciándola si no existe o si ya terminó.
+# Abre la cámara y consulta la base de datos, así que desde una vista asíncrona se llama con 'sync_to_async'.
+def obtener_transmision(evento):
+    with _lock_transmisiones:
+        transmision = _transmisiones.get(evento.id)
+        if transmision is None or not transmision.activa():
+            transmision = _transmisiones[evento.id] = Transmision(evento).iniciar()
+        return transmision
+
+# Detiene todas las transmisiones (por ejemplo, al apagar el servidor)
+def detener_transmisiones():
+    with _lock_transmisiones:
+        for transmision in _transmisiones.values():
+            transmision.detener()
+        _transmisiones.clear()
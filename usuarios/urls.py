@@ -16,6 +16,9 @@ urlpatterns = [
     # URL para editar un usuario existente, identificado por su 'usuario_id'.
     path('usuario/<int:usuario_id>/editar/', views.editar_usuario, name='editar_usuario'),
     
+    # URL que entrega la imagen de perfil de un usuario.
+    path('usuario/<int:usuario_id>/imagen/', views.imagen_usuario, name='imagen_usuario'),
+    
     # URL para mostrar la lista de todos los eventos.
     path('eventos/', views.listar_eventos, name='listar_eventos'),
     
@@ -28,15 +31,35 @@ urlpatterns = [
     # URL para mostrar la lista de todas las asistencias registradas.
     path('asistencias/', views.listar_asistencias, name='listar_asistencias'),
     
+    # URL para descargar las asistencias en CSV (acepta los mismos filtros que el listado).
+    path('asistencias/exportar/', views.exportar_asistencias, name='exportar_asistencias'),
+    
     # URL para iniciar el proceso de captura de imágenes para un usuario específico.
     path('capturar_imagenes/<int:usuario_id>/', views.capturar_imagenes, name='capturar_imagenes'),
     
     # URL para iniciar el entrenamiento del modelo de reconocimiento facial.
     path('entrenar_modelo/', views.entrenar_modelo, name='entrenar_modelo'),
     
+    # URL que devuelve en formato JSON el progreso de un entrenamiento en segundo plano.
+    path('entrenar_modelo/<int:entrenamiento_id>/estado/', views.estado_entrenamiento_json, name='estado_entrenamiento'),
+    
+    # URL que devuelve las métricas (tiempo de carga y memoria) del modelo cargado en el proceso.
+    path('modelo/estado/', views.estado_modelo, name='estado_modelo'),
+    
+    # URL con las métricas del proceso (tiempos por etapa y contadores) en formato Prometheus.
+    path('metrics', views.metricas_prometheus, name='metricas'),
+    
     # URL para iniciar el reconocimiento facial y registrar la asistencia a un evento específico.
     path('reconocer_usuario/<int:evento_id>/', views.reconocer_usuario, name='reconocer_usuario'),
     
+    # URL que reconoce un lote de imágenes enviadas por un navegador o kiosco y responde en JSON.
+    path('reconocer_usuario/<int:evento_id>/lote/', views.reconocer_lote_usuario, name='reconocer_lote_usuario'),
+    
+    # URLs de la vista en vivo del reconocimiento: la página, el video MJPEG y los eventos de asistencia (SSE).
+    path('reconocer_usuario/<int:evento_id>/en_vivo/', views.reconocer_en_vivo, name='reconocer_en_vivo'),
+    path('reconocer_usuario/<int:evento_id>/video/', views.video_reconocimiento, name='video_reconocimiento'),
+    path('reconocer_usuario/<int:evento_id>/eventos/', views.eventos_reconocimiento, name='eventos_reconocimiento'),
+    
     # URL para cambiar el estado (activo/inactivo) de un evento.
     path('evento/cambiar_estado/<int:evento_id>/', views.cambiar_estado_evento, name='cambiar_estado_evento'),
 ]
\ No newline at end of file
@@ -3,11 +3,31 @@ import cv2  # OpenCV para el procesamiento de imágenes y video
 import os  # Para interactuar con el sistema operativo (crear carpetas, etc.)
 import time  # Para manejar tiempos de espera
 from django.shortcuts import get_object_or_404, render, redirect  # Atajos de Django para vistas
-from django.http import HttpResponse  # Para enviar respuestas HTTP simples
-from .models import Asistencia, Usuario, Evento  # Importa los modelos de la base de datos
+import asyncio  # Para las vistas de transmisión en vivo (ASGI)
+from asgiref.sync import sync_to_async  # Para usar el ORM y la cámara desde vistas asíncronas
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse  # Respuestas HTTP simples, JSON y continuas
+from django.views.decorators.http import require_POST  # Para aceptar solo peticiones POST
+from .models import Asistencia, Usuario, Evento, Entrenamiento  # Importa los modelos de la base de datos
+from .imagenes import AlmacenImagenes  # Imágenes de perfil encriptadas
 from .forms import EventoForm  # Importa el formulario para crear eventos
 import numpy as np  # Librería para operaciones numéricas, usada para el entrenamiento
 from datetime import date  # Para trabajar con fechas
+from .cifrado import guardar_imagen_encriptada  # Guarda las capturas encriptadas
+from .entrenamiento import carpeta_usuario, marcar_reentrenamiento_completo, ruta_dataset  # Entrenamiento del modelo
+from .tareas import iniciar_entrenamiento, estado_entrenamiento  # Entrenamiento en segundo plano
+from .reconocedor import obtener_reconocedor, registro  # Modelo cargado una vez por proceso
+from .detectores import obtener_detector  # Detector de rostros reutilizado entre peticiones
+from .asistencia import SesionAsistencia  # Registro de asistencia en memoria y por lotes
+from .diario import metricas_diarios, obtener_diario  # Diario local de asistencias del kiosco
+from .reconocimiento import ProcesadorReconocimiento, anotar, reconocer_lote, parametro  # Lógica de reconocimiento
+from .pipeline import PipelineReconocimiento  # Captura, reconocimiento y salida en hilos separados
+from .transmision import obtener_transmision  # Reconocimiento compartido por los espectadores en vivo
+from .almacen import AlmacenRostros  # Almacén preprocesado de rostros para el entrenamiento
+from .rut import normalizar_rut  # Forma en que se guardan los RUT
+from .calidad import FiltroCapturas  # Control de calidad y duplicados de las capturas
+from .exportacion import asistencias_exportables, lineas_csv_async  # Exportación de asistencias a CSV
+from .metricas import ResumenSesion, contar, formatear_gauge, medir, registrar_resumen, registro_metricas  # Métricas
+from .listados import paginar_por_clave, enlaces_pagina, conteos_asistencias, fecha_parametro, entero_parametro  # Listados paginados
 
 # --- Vistas relacionadas con la Interfaz de Usuario y Datos ---
 
@@ -30,14 +50,51 @@ def pagina_inicio(request):
     # Renderiza (dibuja) la plantilla 'inicio.html' y le pasa el evento y el mensaje
     return render(request, 'inicio.html', {'evento': evento, 'mensaje_evento': mensaje_evento})
 
-# Vista para mostrar una lista de todos los usuarios
+# Carreras registradas, para los filtros de los listados
+def carreras_registradas():
+    return (Usuario.objects.exclude(carrera__isnull=True).exclude(carrera='')
+            .order_by('carrera').values_list('carrera', flat=True).distinct())
+
+# Vista para mostrar la lista de usuarios, paginada por nombre y filtrable por carrera
 def listar_usuarios(request):
-    # Obtiene todos los objetos 'Usuario' de la base de datos
-    usuarios = Usuario.objects.all()
-    # Imprime los usuarios encontrados en la consola
-    print(f"Usuarios encontrados: {usuarios}")
-    # Renderiza la plantilla 'listar_usuarios.html' y le pasa la lista de usuarios
-    return render(request, 'listar_usuarios.html', {'usuarios': usuarios})
+    # Solo se cargan las columnas que muestra la tabla (nunca la imagen)
+    usuarios = Usuario.objects.only('id', 'nombre', 'rut', 'carrera')
+    carrera = request.GET.get('carrera')
+    if carrera:
+        usuarios = usuarios.filter(carrera=carrera)
+    pagina = paginar_por_clave(usuarios, ['nombre', 'id'], request.GET.get('cursor'))
+    # Renderiza la plantilla 'listar_usuarios.html' y le pasa la página de usuarios
+    return render(request, 'listar_usuarios.html', {
+        'usuarios': pagina,
+        'carreras': carreras_registradas(),
+        'carrera': carrera,
+        **enlaces_pagina(request, pagina),
+    })
+
+# Tamaño máximo de la imagen de perfil (bytes)
+TAMANO_MAXIMO_IMAGEN = 5 * 1024 * 1024
+
+# Decodifica una imagen en memoria; devuelve None si está vacía o no es una imagen válida
+def decodificar_imagen(datos, flags=cv2.IMREAD_COLOR):
+    if not datos:
+        return None
+    try:
+        return cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), flags)
+    except cv2.error:
+        return None
+
+# Lee la imagen de perfil subida en el formulario (campo 'imagen', opcional).
+# Devuelve (bytes, None), (None, None) si no se subió ninguna o (None, mensaje) si no es válida.
+def imagen_subida(request):
+    archivo = request.FILES.get('imagen')
+    if not archivo:
+        return None, None
+    if archivo.size > TAMANO_MAXIMO_IMAGEN:
+        return None, 'La imagen de perfil no puede superar los 5 MB.'
+    datos = archivo.read()
+    if decodificar_imagen(datos) is None:
+        return None, 'El archivo de la imagen de perfil no es una imagen válida.'
+    return datos, None
 
 # Vista para crear un nuevo usuario
 def crear_usuario(request):
@@ -54,11 +111,20 @@ def crear_usuario(request):
             # Si falta algún campo, vuelve a mostrar el formulario con un mensaje de error
             return render(request, 'crear_usuario.html', {'error': 'Todos los campos son obligatorios.'})
 
-        # Une los números del RUT y el dígito verificador
-        rut_completo = f"{rut_numeros}-{rut_dv}"
+        # Une los números del RUT y el dígito verificador, en la misma forma en que se guarda
+        rut_completo = normalizar_rut(f"{rut_numeros}-{rut_dv}")
+        if Usuario.objects.filter(rut=rut_completo).exists():
+            return render(request, 'crear_usuario.html', {'error': f'Ya existe un usuario con el RUT {rut_completo}.'})
+
+        # La imagen de perfil es opcional; si se subió, se guarda encriptada en el almacén
+        imagen, error = imagen_subida(request)
+        if error:
+            return render(request, 'crear_usuario.html', {'error': error})
 
         # Crea un nuevo objeto 'Usuario' con los datos del formulario
         usuario = Usuario(nombre=nombre, rut=rut_completo, carrera=carrera)
+        if imagen:
+            usuario.asignar_imagen(imagen)
         # Guarda el nuevo usuario en la base de datos
         usuario.save()
 
@@ -75,11 +141,22 @@ def editar_usuario(request, usuario_id):
     
     # Si el formulario de edición se ha enviado
     if request.method == 'POST':
+        imagen, error = imagen_subida(request)
+        if error:
+            return render(request, 'editar_usuario.html', {'usuario': usuario, 'error': error})
         # Actualiza los campos del usuario con los nuevos datos
         usuario.nombre = request.POST.get('nombre')
         usuario.carrera = request.POST.get('carrera')
+        anterior = usuario.imagen_hash
+        if imagen:
+            usuario.asignar_imagen(imagen)
         # Guarda los cambios en la base de datos
         usuario.save()
+        # Borra la imagen anterior si ya ningún usuario la usa
+        if anterior and anterior != usuario.imagen_hash and not Usuario.objects.filter(imagen_hash=anterior).exists():
+            AlmacenImagenes().eliminar(anterior)
+        # Al editar un usuario, el próximo entrenamiento del modelo será completo
+        marcar_reentrenamiento_completo()
         
         # Redirige al usuario a la lista de usuarios
         return redirect('listar_usuarios')
@@ -87,6 +164,24 @@ def editar_usuario(request, usuario_id):
     # Si la petición es GET, muestra el formulario de edición con los datos actuales del usuario
     return render(request, 'editar_usuario.html', {'usuario': usuario})
 
+# Vista que entrega la imagen de perfil de un usuario (desencriptada desde el almacén)
+def imagen_usuario(request, usuario_id):
+    usuario = get_object_or_404(Usuario.objects.only('id', 'imagen_hash'), id=usuario_id)
+    datos = usuario.leer_imagen()
+    if datos is None:
+        return HttpResponse("El usuario no tiene imagen de perfil", status=404)
+    if datos[:3] == b'\xff\xd8\xff':
+        tipo = 'image/jpeg'
+    elif datos[:8] == b'\x89PNG\r\n\x1a\n':
+        tipo = 'image/png'
+    else:
+        tipo = 'application/octet-stream'
+    respuesta = HttpResponse(datos, content_type=tipo)
+    # El archivo se nombra por su contenido: la misma huella siempre es la misma imagen
+    respuesta['ETag'] = f'"{usuario.imagen_hash}"'
+    respuesta['Cache-Control'] = 'private, max-age=3600'
+    return respuesta
+
 # --- Vistas relacionadas con el Reconocimiento Facial ---
 
 # Vista para capturar las imágenes del rostro de un usuario
@@ -94,43 +189,63 @@ def capturar_imagenes(request, usuario_id):
     # Obtiene el usuario por su ID
     usuario = get_object_or_404(Usuario, id=usuario_id)
 
-    # Define la ruta donde se guardarán las imágenes del usuario
-    path = f"media/dataset/{usuario.id}_{usuario.nombre}"
+    # Define la ruta donde se guardarán las imágenes del usuario. Si ya tiene una carpeta se reutiliza
+    # (aunque haya cambiado de nombre): las capturas nuevas reemplazan a las del mismo número.
+    carpeta = carpeta_usuario(usuario.id, usuario.nombre)
+    path = os.path.join(ruta_dataset(), carpeta)
     # Crea la carpeta si no existe
     os.makedirs(path, exist_ok=True)
 
     # Inicia la captura de video desde la cámara web (el 0 indica la cámara por defecto)
     cam = cv2.VideoCapture(0)
-    # Carga el clasificador de Haar para detectar rostros frontales
-    detector = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+    # Obtiene el detector de rostros configurado (se crea una sola vez y se reutiliza)
+    detector = obtener_detector()
+
+    # Filtro de calidad: descarta recortes pequeños, oscuros, borrosos o casi iguales a los anteriores
+    filtro = FiltroCapturas()
+    # Tiempos y contadores de esta captura
+    metricas = ResumenSesion()
 
     count = 0  # Contador para el número de imágenes capturadas
-    total_capturas = 100  # Define cuántas imágenes se van a tomar
+    total_capturas = filtro.configuracion['TOTAL_CAPTURAS']  # Define cuántas imágenes se van a tomar
+    rostros_capturados = []  # Rostros que se agregarán al almacén de entrenamiento
+    archivos_capturados = []  # Rutas relativas de los archivos guardados en el dataset
 
     # Bucle para capturar imágenes
     while True:
         # Lee un fotograma de la cámara
-        ret, frame = cam.read()
+        with medir('leer_fotograma', metricas):
+            ret, frame = cam.read()
         # Si no se pudo leer el fotograma, sale del bucle
         if not ret:
             break
 
         # Convierte el fotograma a escala de grises (mejora la detección)
-        gris = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        # Detecta rostros en la imagen en escala de grises
-        rostros = detector.detectMultiScale(gris, 1.3, 5)
+        with medir('convertir_gris', metricas):
+            gris = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        # Detecta rostros; los rectángulos vienen en coordenadas del fotograma original
+        with medir('detectar', metricas):
+            rostros = detector.detectar(frame, gris)
 
         # Itera sobre cada rostro detectado
         for (x, y, w, h) in rostros:
-            # Recorta la región del rostro
-            rostro = gris[y:y+h, x:x+w]
+            # Recorta la región del rostro y revisa su calidad; se guarda ya normalizado al tamaño fijo
+            aceptado, motivo, rostro = filtro.evaluar(gris[y:y+h, x:x+w])
+            if not aceptado:
+                contar('capturas_rechazadas', 1, metricas, motivo=motivo)
+                # Marca en rojo el rostro descartado y el motivo, para que el usuario se acomode
+                cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 0, 255), 2)
+                cv2.putText(frame, motivo, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+                continue
             # Define el nombre del archivo para la imagen del rostro
             file_name = f"{path}/rostro_{count}.jpg"
-            # Guarda la imagen del rostro en el archivo
-            cv2.imwrite(file_name, rostro)
-
-            # Encripta la imagen que se acaba de guardar
-            encriptar_imagen(file_name)
+            # Codifica el rostro en memoria, lo encripta y lo guarda en una sola escritura
+            with medir('guardar_captura', metricas):
+                guardar_imagen_encriptada(file_name, rostro)
+            contar('capturas_aceptadas', 1, metricas)
+            # Guarda el rostro para agregarlo al almacén al terminar la captura
+            rostros_capturados.append(rostro)
+            archivos_capturados.append(f"{carpeta}/rostro_{count}.jpg")
             # Incrementa el contador
             count += 1
 
@@ -147,7 +262,8 @@ def capturar_imagenes(request, usuario_id):
         cv2.putText(frame, progreso, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
 
         # Muestra la ventana con el fotograma de la cámara
-        cv2.imshow("Captura de Imágenes", frame)
+        with medir('mostrar', metricas):
+            cv2.imshow("Captura de Imágenes", frame)
 
         # Comprueba si se ha presionado la tecla 'q', si se ha alcanzado el total de capturas, o si se ha cerrado la ventana
         if cv2.waitKey(1) & 0xFF == ord('q') or count >= total_capturas or cv2.getWindowProperty("Captura de Imágenes", cv2.WND_PROP_VISIBLE) < 1:
@@ -158,71 +274,40 @@ def capturar_imagenes(request, usuario_id):
     # Libera la cámara y cierra todas las ventanas de OpenCV
     cam.release()
     cv2.destroyAllWindows()
+    registrar_resumen('capturar_imagenes', {'usuario': usuario.id, 'calidad': filtro.resumen(), **metricas.resumen()})
+
+    # Agrega todos los rostros capturados al almacén de entrenamiento en una sola escritura.
+    # Se registra la firma (tamaño y fecha) de cada archivo para que el entrenamiento no lo vuelva a importar;
+    # si el archivo ya existía, el almacén borra el rostro de la captura anterior.
+    if rostros_capturados:
+        firmas = {}
+        for relativo in archivos_capturados:
+            estado = os.stat(os.path.join(ruta_dataset(), relativo))
+            firmas[relativo] = [estado.st_size, estado.st_mtime_ns]
+        AlmacenRostros().agregar(rostros_capturados, [usuario.id] * len(rostros_capturados), firmas)
+
     # Redirige a la lista de usuarios
     return redirect('listar_usuarios')
 
 # Vista para entrenar el modelo de reconocimiento facial
 def entrenar_modelo(request):
-    # Ruta a la carpeta que contiene las imágenes de los usuarios
-    data_path = "media/dataset"
-    imagenes = []  # Lista para almacenar las imágenes de los rostros
-    labels = []    # Lista para almacenar las etiquetas (IDs) de los usuarios
-
-    # Recorre cada carpeta de usuario en el dataset
-    for carpeta in os.listdir(data_path):
-        # Extrae el ID del usuario del nombre de la carpeta (ej: "1_Nombre")
-        label = int(carpeta.split("_")[0])
-        # Ruta completa a la carpeta del usuario
-        carpeta_path = os.path.join(data_path, carpeta)
-
-        # Recorre cada imagen en la carpeta del usuario
-        for file in os.listdir(carpeta_path):
-            img_path = os.path.join(carpeta_path, file)
-            
-            # Desencripta la imagen para poder leerla
-            desencriptar_imagen(img_path)
-            # Lee la imagen en escala de grises
-            img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-            # Vuelve a encriptar la imagen por seguridad
-            encriptar_imagen(img_path)
-            
-            # Añade la imagen y su etiqueta a las listas
-            imagenes.append(img)
-            labels.append(label)
-
-    # Crea una instancia del reconocedor de rostros LBPH
-    recognizer = cv2.face.LBPHFaceRecognizer_create()
-    # Entrena el reconocedor con las imágenes y sus etiquetas
-    recognizer.train(imagenes, np.array(labels))
-    # Guarda el modelo entrenado en un archivo .yml
-    recognizer.save("media/modelo_lbph.yml")
-
-    # Crea una respuesta HTML para informar al usuario que el entrenamiento fue exitoso
-    response = HttpResponse("""
-        <html>
-            <head>
-                <meta http-equiv="refresh" content="3;url='/'">
-            </head>
-            <body>
-                <h2>Modelo entrenado y guardado con éxito.</h2>
-                <p>Redirigiendo a la página de inicio...</p>
-            </body>
-        </html>
-    """)
-    
-    return response
+    # Por defecto el entrenamiento es incremental; con '?completo=1' se fuerza un reentrenamiento desde cero
+    completo = request.GET.get('completo') == '1'
+    # Inicia el entrenamiento en segundo plano. Si ya hay uno en curso, se muestra ese en lugar de iniciar otro.
+    entrenamiento, nuevo = iniciar_entrenamiento(completo=completo)
+    # Renderiza la página de progreso, que consulta el estado del entrenamiento periódicamente
+    return render(request, 'entrenar.html', {'entrenamiento': entrenamiento, 'nuevo': nuevo})
+
+# Vista que devuelve en formato JSON el progreso de un entrenamiento
+def estado_entrenamiento_json(request, entrenamiento_id):
+    # Obtiene el entrenamiento por su ID. Si no lo encuentra, muestra un error 404.
+    entrenamiento = get_object_or_404(Entrenamiento, id=entrenamiento_id)
+    return JsonResponse(estado_entrenamiento(entrenamiento))
 
 # Vista para reconocer usuarios y registrar su asistencia
 def reconocer_usuario(request, evento_id=None):
-    # Crea una instancia del reconocedor y carga el modelo entrenado
-    recognizer = cv2.face.LBPHFaceRecognizer_create()
-    recognizer.read("media/modelo_lbph.yml")
-
-    # Carga el clasificador para detectar rostros
-    detector = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-
-    # Inicia la captura de video
-    cam = cv2.VideoCapture(0)
+    # Obtiene el detector de rostros configurado (se crea una sola vez y se reutiliza)
+    detector = obtener_detector()
 
     # Si se proporciona un ID de evento en la URL
     if evento_id:
@@ -243,120 +328,260 @@ def reconocer_usuario(request, evento_id=None):
         if not evento:
             return HttpResponse("No hay eventos activos disponibles", status=400)
 
-    last_recognized_id = None  # Almacena el ID del último rostro reconocido
-    recognition_start_time = None  # Almacena el tiempo en que se empezó a reconocer un rostro
-    CONFIRMATION_TIME = 2  # Segundos necesarios para confirmar un rostro antes de registrar la asistencia
-
-    # Bucle para el reconocimiento
-    while True:
-        # Lee un fotograma de la cámara
-        ret, frame = cam.read()
-        if not ret:
-            break
-
-        # Convierte a escala de grises y detecta rostros
-        gris = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        rostros = detector.detectMultiScale(gris, 1.3, 5)
-
-        # Si no se detectan rostros, reinicia las variables de confirmación
-        if len(rostros) == 0:
-            last_recognized_id = None
-            recognition_start_time = None
-
-        # Itera sobre los rostros detectados
-        for (x, y, w, h) in rostros:
-            # Recorta el rostro
-            rostro = gris[y:y+h, x:x+w]
-            # Intenta predecir a quién pertenece el rostro
-            label, confianza = recognizer.predict(rostro)
-
-            # Si la confianza es menor a 40 (un valor bajo indica una alta probabilidad de acierto)
-            if confianza < 40:
-                # Obtiene el usuario correspondiente al ID predicho
-                usuario = Usuario.objects.get(id=label)
-
-                # Comprueba si el usuario ya tiene registrada la asistencia para este evento
-                if Asistencia.objects.filter(usuario=usuario, evento_asist_id=evento.id).exists():
-                    texto = f"{usuario.nombre} ya registrado"
-                    color = (255, 255, 0)  # Amarillo
-                    # Reinicia la confirmación
-                    last_recognized_id = None
-                    recognition_start_time = None
-                else:
-                    # Si es el mismo rostro que se estaba viendo en el fotograma anterior
-                    if last_recognized_id == label:
-                        # Calcula cuánto tiempo ha pasado
-                        elapsed_time = time.time() - recognition_start_time
-                        
-                        # Dibuja una barra de progreso para la confirmación visual
-                        progress = int((elapsed_time / CONFIRMATION_TIME) * 100)
-                        cv2.rectangle(frame, (x, y + h + 5), (x + w, y + h + 15), (200, 200, 200), -1)
-                        cv2.rectangle(frame, (x, y + h + 5), (x + int(w * (progress / 100)), y + h + 15), (0, 255, 0), -1)
-
-                        # Si ha pasado el tiempo de confirmación
-                        if elapsed_time >= CONFIRMATION_TIME:
-                            # Vuelve a comprobar por si acaso y registra la asistencia
-                            if not Asistencia.objects.filter(usuario=usuario, evento_asist_id=evento.id).exists():
-                                Asistencia.objects.create(usuario=usuario, evento_asist_id=evento.id)
-                                texto = f"Usuario {usuario.nombre} registrado"
-                                color = (0, 255, 0)  # Verde
-                            else:
-                                texto = f"{usuario.nombre} ya registrado"
-                                color = (255, 255, 0)  # Amarillo
-                            
-                            # Reinicia la confirmación
-                            last_recognized_id = None
-                            recognition_start_time = None
-                        else:
-                            # Si aún no ha pasado el tiempo, muestra un mensaje de confirmando
-                            texto = f"Confirmando a {usuario.nombre}..."
-                            color = (0, 255, 255)  # Amarillo claro
-                    else:
-                        # Si es un nuevo rostro, inicia el proceso de confirmación
-                        last_recognized_id = label
-                        recognition_start_time = time.time()
-                        texto = f"Reconociendo a {usuario.nombre}"
-                        color = (0, 255, 255)  # Amarillo claro
-            else:
-                # Si la confianza es alta (desconocido)
-                last_recognized_id = None
-                recognition_start_time = None
-                texto = "Desconocido"
-                color = (0, 0, 255)  # Rojo
-
-            # Dibuja el rectángulo y el texto sobre el fotograma
-            cv2.rectangle(frame, (x, y), (x+w, y+h), color, 2)
-            cv2.putText(frame, texto, (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
-
-        # Muestra la ventana de reconocimiento
-        cv2.imshow("Reconocimiento Facial - presione 'q' para salir", frame)
-
-        # Sale del bucle si se presiona 'q' o se cierra la ventana
-        if cv2.waitKey(1) & 0xFF == ord('q') or cv2.getWindowProperty("Reconocimiento Facial - presione 'q' para salir", cv2.WND_PROP_VISIBLE) < 1:
+    # Obtiene el reconocedor compartido del proceso (solo se lee del disco si el modelo cambió).
+    # Si el evento tiene invitados, se usa el reconocedor reducido a ellos.
+    try:
+        recognizer = obtener_reconocedor(evento=evento)
+    except FileNotFoundError:
+        return HttpResponse("El modelo aún no ha sido entrenado", status=400)
+
+    # Carga en memoria las asistencias ya registradas del evento y los nombres de los usuarios.
+    # Las nuevas asistencias se anotan en el diario local y un hilo aparte las copia a la base de
+    # datos, así el reconocimiento no espera a la base de datos en cada fotograma.
+    sesion = SesionAsistencia(evento, diario=obtener_diario())
+
+    # Procesador de fotogramas: detecta, sigue cada rostro por separado, predice y confirma asistencias
+    procesador = ProcesadorReconocimiento(recognizer, detector, sesion)
+
+    ventana = "Reconocimiento Facial - presione 'q' para salir"
+
+    # Etapa de salida: dibuja el resultado y lo muestra. Devuelve False para detener el pipeline.
+    def mostrar(fotograma):
+        anotar(fotograma.imagen, fotograma.resultados)
+        with medir('mostrar', procesador.metricas):
+            cv2.imshow(ventana, fotograma.imagen)
+        # Sale si se presiona 'q' o se cierra la ventana
+        if cv2.waitKey(1) & 0xFF == ord('q') or cv2.getWindowProperty(ventana, cv2.WND_PROP_VISIBLE) < 1:
             print("Ventana de reconocimiento cerrada.")
-            break
-
-    # Libera la cámara y cierra las ventanas
-    cam.release()
-    cv2.destroyAllWindows()
+            return False
+        return True
+
+    # La cámara se lee en su propio hilo y el reconocimiento en otro, así una predicción o una
+    # consulta lenta no detiene la captura ni se procesan fotogramas atrasados
+    pipeline = PipelineReconocimiento(0, procesador, mostrar)
+    try:
+        pipeline.ejecutar()
+    finally:
+        # Guarda las asistencias que quedaron pendientes y cierra las ventanas
+        procesador.cerrar()
+        cv2.destroyAllWindows()
+    registrar_resumen('reconocer_usuario', {
+        'evento': evento.id, 'pipeline': pipeline.estadisticas(), **procesador.metricas.resumen(),
+    })
     # Redirige a la página de inicio
     return redirect('pagina_inicio')
 
+# Vista que reconoce un lote de imágenes enviadas desde un navegador o un kiosco.
+# Recibe un formulario multipart con archivos JPEG en 'fotogramas' (imágenes completas, se
+# detectan los rostros) y/o en 'rostros' (rostros ya recortados), y devuelve en JSON el
+# usuario, la confianza y el estado de la asistencia de cada rostro. La protección CSRF
+# sigue activa: el cliente debe enviar el token como en cualquier formulario.
+@require_POST
+def reconocer_lote_usuario(request, evento_id):
+    # Obtiene el evento y comprueba que esté activo
+    evento = Evento.objects.filter(id=evento_id).first()
+    if not evento:
+        return JsonResponse({'error': "Evento no encontrado"}, status=404)
+    if not evento.estado:
+        return JsonResponse({'error': f"El evento '{evento.nom_evento}' no está activo"}, status=400)
+
+    archivos_fotogramas = request.FILES.getlist('fotogramas')
+    archivos_rostros = request.FILES.getlist('rostros')
+    total = len(archivos_fotogramas) + len(archivos_rostros)
+    if not total:
+        return JsonResponse({'error': "Envíe al menos una imagen en 'fotogramas' o 'rostros'"}, status=400)
+    if total > parametro('MAX_IMAGENES_LOTE', 32):
+        return JsonResponse({'error': f"Se aceptan como máximo {parametro('MAX_IMAGENES_LOTE', 32)} imágenes por lote"}, status=400)
+
+    # Obtiene el reconocedor compartido (reducido a los invitados, si los hay) y el detector del hilo
+    try:
+        recognizer = obtener_reconocedor(evento=evento)
+    except FileNotFoundError:
+        return JsonResponse({'error': "El modelo aún no ha sido entrenado"}, status=400)
+    detector = obtener_detector()
+
+    # Decodifica las imágenes en memoria (None si el archivo está vacío o no es una imagen válida)
+    inicio = time.perf_counter()
+    resultado = reconocer_lote(
+        recognizer, detector, evento,
+        fotogramas=[decodificar_imagen(archivo.read(), cv2.IMREAD_COLOR) for archivo in archivos_fotogramas],
+        rostros=[decodificar_imagen(archivo.read(), cv2.IMREAD_GRAYSCALE) for archivo in archivos_rostros],
+    )
+    resultado['segundos'] = round(time.perf_counter() - inicio, 3)
+    return JsonResponse(resultado)
+
+# --- Transmisión en vivo del reconocimiento (requiere un servidor ASGI: uvicorn o daphne) ---
+
+# Obtiene un evento activo para transmitir, o la respuesta de error correspondiente
+def evento_para_transmision(evento_id):
+    evento = Evento.objects.filter(id=evento_id).first()
+    if not evento:
+        return None, HttpResponse("Evento no encontrado", status=404)
+    if not evento.estado:
+        return None, HttpResponse(f"El evento '{evento.nom_evento}' no está activo", status=400)
+    return evento, None
+
+# Página con la vista en vivo del reconocimiento y las asistencias registradas
+def reconocer_en_vivo(request, evento_id):
+    evento, error = evento_para_transmision(evento_id)
+    if error:
+        return error
+    return render(request, 'reconocer.html', {'evento': evento})
+
+# Conecta un espectador a la transmisión del evento (iniciándola si hace falta) y
+# devuelve sus mensajes mientras la transmisión siga activa
+async def mensajes_transmision(evento, tipo):
+    transmision = await sync_to_async(obtener_transmision)(evento)
+    espectador = transmision.suscribir(tipo, asyncio.get_running_loop())
+    try:
+        while True:
+            try:
+                yield await asyncio.wait_for(espectador.cola.get(), timeout=5)
+            except asyncio.TimeoutError:
+                # Sin mensajes: termina si la transmisión se detuvo (por ejemplo, se desconectó la cámara)
+                if not transmision.activa():
+                    break
+                if tipo == 'eventos':
+                    # Comentario SSE para mantener viva la conexión
+                    yield None
+    finally:
+        transmision.desuscribir(espectador)
+
+# Vista asíncrona que transmite los fotogramas anotados como MJPEG (se muestra con un <img>)
+async def video_reconocimiento(request, evento_id):
+    evento, error = await sync_to_async(evento_para_transmision)(evento_id)
+    if error:
+        return error
+    try:
+        await sync_to_async(obtener_reconocedor)()
+    except FileNotFoundError:
+        return HttpResponse("El modelo aún no ha sido entrenado", status=400)
+
+    async def partes():
+        async for jpeg in mensajes_transmision(evento, 'fotogramas'):
+            yield b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: " + str(len(jpeg)).encode() + b"\r\n\r\n" + jpeg + b"\r\n"
+
+    return StreamingHttpResponse(partes(), content_type="multipart/x-mixed-replace; boundary=frame")
+
+# Vista asíncrona que envía los eventos de asistencia como Server-Sent Events (JSON por evento)
+async def eventos_reconocimiento(request, evento_id):
+    evento, error = await sync_to_async(evento_para_transmision)(evento_id)
+    if error:
+        return error
+    try:
+        await sync_to_async(obtener_reconocedor)()
+    except FileNotFoundError:
+        return HttpResponse("El modelo aún no ha sido entrenado", status=400)
+
+    async def mensajes():
+        async for mensaje in mensajes_transmision(evento, 'eventos'):
+            yield ": sigue\n\n" if mensaje is None else f"data: {mensaje}\n\n"
+
+    respuesta = StreamingHttpResponse(mensajes(), content_type="text/event-stream")
+    respuesta['Cache-Control'] = 'no-cache'
+    return respuesta
+
+# Vista que publica las métricas del proceso en el formato de texto de Prometheus: tiempos por
+# etapa, contadores del reconocimiento y estado de los modelos cargados
+def metricas_prometheus(request):
+    lineas = registro_metricas.exportar()
+    modelos = registro.metricas()
+    lineas += formatear_gauge("vision_modelo_segundos_carga", "Segundos que tardó la última carga del modelo.",
+                              [((('path', m['path']),), m['segundos_carga']) for m in modelos])
+    lineas += formatear_gauge("vision_modelo_bytes_memoria", "Memoria estimada del modelo cargado.",
+                              [((('path', m['path']),), m['bytes_memoria']) for m in modelos])
+    lineas += formatear_gauge("vision_modelo_recargas", "Veces que se recargó el modelo desde el disco.",
+                              [((('path', m['path']),), m['recargas']) for m in modelos])
+    lineas += formatear_gauge("vision_subconjuntos_evento", "Reconocedores reducidos a los invitados de un evento en memoria.",
+                              [((), len(registro.metricas_subconjuntos()))])
+    diarios = metricas_diarios()
+    lineas += formatear_gauge("vision_diario_pendientes", "Asistencias del diario local que aún no llegan a la base de datos.",
+                              [((('path', d['path']),), d['pendientes']) for d in diarios if d['pendientes'] is not None])
+    lineas += formatear_gauge("vision_diario_fallos_seguidos", "Intentos seguidos fallidos de sincronizar el diario local.",
+                              [((('path', d['path']),), d['fallos_seguidos']) for d in diarios])
+    lineas += formatear_gauge("vision_diario_sincronizando", "1 si el hilo que sincroniza el diario local está en marcha.",
+                              [((('path', d['path']),), int(d['sincronizando'])) for d in diarios])
+    return HttpResponse("\n".join(lineas) + "\n", content_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Vista que devuelve en formato JSON las métricas de los modelos cargados y de los diarios de asistencias de este proceso
+def estado_modelo(request):
+    return JsonResponse({'modelos': registro.metricas(), 'subconjuntos': registro.metricas_subconjuntos(),
+                         'diarios': metricas_diarios()})
+
 # --- Vistas para la Gestión de Eventos y Asistencias ---
 
 # Vista para listar todos los registros de asistencia
 def listar_asistencias(request):
-    # Obtiene todas las asistencias y precarga los datos de usuario y evento para optimizar
-    asistencias = Asistencia.objects.select_related('usuario', 'evento_asist')
-    # Renderiza la plantilla y le pasa la lista de asistencias
-    return render(request, 'listar_asistencias.html', {'asistencias': asistencias})
-
-# Vista para listar todos los eventos
+    # Precarga los datos de usuario y evento en la misma consulta, pero solo las columnas que
+    # muestra la tabla (nunca la imagen del usuario)
+    asistencias = Asistencia.objects.select_related('usuario', 'evento_asist').only(
+        'id', 'fecha', 'usuario__nombre', 'usuario__carrera', 'evento_asist__nom_evento', 'evento_asist__estado'
+    )
+    # Filtros opcionales: evento, rango de fechas (AAAA-MM-DD) y carrera del usuario
+    evento_id = entero_parametro(request.GET.get('evento'))
+    desde = fecha_parametro(request.GET.get('desde'))
+    hasta = fecha_parametro(request.GET.get('hasta'))
+    carrera = request.GET.get('carrera')
+    if evento_id:
+        asistencias = asistencias.filter(evento_asist_id=evento_id)
+    if desde:
+        asistencias = asistencias.filter(fecha__date__gte=desde)
+    if hasta:
+        asistencias = asistencias.filter(fecha__date__lte=hasta)
+    if carrera:
+        asistencias = asistencias.filter(usuario__carrera=carrera)
+    # Las más recientes primero
+    pagina = paginar_por_clave(asistencias, ['-fecha', '-id'], request.GET.get('cursor'))
+    # La exportación usa los mismos filtros, sin el cursor de la página
+    parametros_exportar = request.GET.copy()
+    parametros_exportar.pop('cursor', None)
+    # Renderiza la plantilla y le pasa la página de asistencias
+    return render(request, 'listar_asistencias.html', {
+        'asistencias': pagina,
+        'eventos': Evento.objects.only('id', 'nom_evento').order_by('-fecha', '-id'),
+        'carreras': carreras_registradas(),
+        'filtros': {'evento': evento_id, 'desde': desde, 'hasta': hasta, 'carrera': carrera},
+        'parametros_exportar': parametros_exportar.urlencode(),
+        **enlaces_pagina(request, pagina),
+    })
+
+# Vista que descarga las asistencias en CSV, con los mismos filtros que el listado. El archivo
+# se genera mientras se envía, leyendo la base de datos por lotes. Es asíncrona para que el
+# servidor ASGI envíe cada lote en cuanto se lee, sin juntar el archivo completo en memoria.
+async def exportar_asistencias(request):
+    evento_id = entero_parametro(request.GET.get('evento'))
+    asistencias = asistencias_exportables(
+        evento_id=evento_id,
+        desde=fecha_parametro(request.GET.get('desde')),
+        hasta=fecha_parametro(request.GET.get('hasta')),
+        carrera=request.GET.get('carrera'),
+    )
+    nombre = f"asistencias_evento_{evento_id}.csv" if evento_id else "asistencias.csv"
+    respuesta = StreamingHttpResponse(lineas_csv_async(asistencias), content_type='text/csv; charset=utf-8')
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return respuesta
+
+# Vista para listar los eventos, paginados por fecha y filtrables por rango de fechas
 def listar_eventos(request):
-    # Obtiene todos los eventos, ordenados por fecha
-    eventos = Evento.objects.all().order_by('fecha')
-    # Renderiza la plantilla y le pasa la lista de eventos
-    return render(request, 'listar_eventos.html', {'eventos': eventos})
+    eventos = Evento.objects.only('id', 'nom_evento', 'fecha', 'descripcion', 'relator', 'estado')
+    desde = fecha_parametro(request.GET.get('desde'))
+    hasta = fecha_parametro(request.GET.get('hasta'))
+    if desde:
+        eventos = eventos.filter(fecha__gte=desde)
+    if hasta:
+        eventos = eventos.filter(fecha__lte=hasta)
+    # Ordenados por fecha
+    pagina = paginar_por_clave(eventos, ['fecha', 'id'], request.GET.get('cursor'))
+    # Cantidad de asistencias de cada evento de la página (en caché unos segundos)
+    conteos = conteos_asistencias(evento.id for evento in pagina)
+    for evento in pagina:
+        evento.total_asistencias = conteos[evento.id]
+    # Renderiza la plantilla y le pasa la página de eventos
+    return render(request, 'listar_eventos.html', {
+        'eventos': pagina,
+        'filtros': {'desde': desde, 'hasta': hasta},
+        **enlaces_pagina(request, pagina),
+    })
 
 # Vista para crear un nuevo evento
 def crear_evento(request):
@@ -374,8 +599,10 @@ def crear_evento(request):
         # Si es una petición GET, crea un formulario vacío
         form = EventoForm()
 
+    # Usuarios que se pueden elegir como invitados (sin cargar sus imágenes)
+    usuarios = Usuario.objects.only('id', 'nombre', 'rut').order_by('nombre')
     # Renderiza la plantilla para crear evento y le pasa el formulario
-    return render(request, 'crear_evento.html', {'form': form})
+    return render(request, 'crear_evento.html', {'form': form, 'usuarios': usuarios})
 
 # Vista para editar un evento existente
 def editar_evento(request, evento_id):
@@ -393,12 +620,19 @@ def editar_evento(request, evento_id):
         evento.estado = request.POST.get('estado') == 'True'
         # Guarda los cambios
         evento.save()
+        # Actualiza la lista de invitados (vacía = se reconoce a todos los usuarios). Solo se
+        # aceptan IDs de usuarios que existen; un ID inexistente violaría la clave foránea.
+        ids = [int(i) for i in request.POST.getlist('invitados') if i.isdigit()]
+        evento.invitados.set(Usuario.objects.filter(id__in=ids).values_list('id', flat=True))
 
         # Redirige a la lista de eventos
         return redirect('listar_eventos')
 
+    # Usuarios que se pueden elegir como invitados y los que ya están invitados
+    usuarios = Usuario.objects.only('id', 'nombre', 'rut').order_by('nombre')
+    invitados = set(evento.invitados.values_list('id', flat=True))
     # Si es una petición GET, muestra el formulario con los datos actuales del evento
-    return render(request, 'editar_evento.html', {'evento': evento})
+    return render(request, 'editar_evento.html', {'evento': evento, 'usuarios': usuarios, 'invitados': invitados})
 
 # Vista para cambiar el estado de un evento (activo/inactivo)
 def cambiar_estado_evento(request, evento_id):
@@ -412,54 +646,3 @@ def cambiar_estado_evento(request, evento_id):
         evento.save()
     # Redirige a la lista de eventos
     return redirect('listar_eventos')
-
-# --- Funciones de Encriptación ---
-from cryptography.fernet import Fernet  # Librería para encriptación simétrica
-
-# Genera una clave de encriptación y la guarda en un archivo
-def generar_clave():
-    # Genera una nueva clave
-    clave = Fernet.generate_key()
-    # Abre el archivo de la clave en modo de escritura binaria
-    with open("media/encryption_key.key", "wb") as key_file:
-        # Escribe la clave en el archivo
-        key_file.write(clave)
-
-# Carga la clave de encriptación desde el archivo
-def cargar_clave():
-    # Abre el archivo de la clave en modo de lectura binaria
-    with open("media/encryption_key.key", "rb") as key_file:
-        # Lee y devuelve la clave
-        return key_file.read()
-
-# Encripta un archivo de imagen
-def encriptar_imagen(path_imagen):
-    # Carga la clave
-    clave = cargar_clave()
-    # Crea un objeto Fernet con la clave
-    fernet = Fernet(clave)
-    # Abre la imagen en modo de lectura binaria
-    with open(path_imagen, "rb") as file:
-        datos = file.read()
-    # Encripta los datos de la imagen
-    datos_encriptados = fernet.encrypt(datos)
-    # Abre la misma imagen en modo de escritura binaria (sobrescribe el original)
-    with open(path_imagen, "wb") as file:
-        # Escribe los datos encriptados en el archivo
-        file.write(datos_encriptados)
-
-# Desencripta un archivo de imagen
-def desencriptar_imagen(path_imagen):
-    # Carga la clave
-    clave = cargar_clave()
-    # Crea un objeto Fernet con la clave
-    fernet = Fernet(clave)
-    # Abre el archivo encriptado en modo de lectura binaria
-    with open(path_imagen, "rb") as file:
-        datos_encriptados = file.read()
-    # Desencripta los datos
-    datos_desencriptados = fernet.decrypt(datos_encriptados)
-    # Abre el archivo en modo de escritura binaria (sobrescribe el encriptado)
-    with open(path_imagen, "wb") as file:
-        # Escribe los datos desencriptados
-        file.write(datos_desencriptados)
\ No newline at end of file